@@ -4,6 +4,8 @@ import importlib
 import json
 import ast
 from utils import get_mysql_engine, insert_to_mysql  # ORM-based helper functions
+from depot_data import refresh_absenteeism_counts
+from driver_percentiles import refresh_driver_percentiles
 
 
 def run_etl_dashboard():
@@ -165,6 +167,9 @@ def run_etl_dashboard():
                     if engine:
                         with st.spinner("⏳ Loading data into MySQL..."):
                             insert_to_mysql(engine, transformed_df, target_table)
+                        # re-rank drivers and recount absences on the next dashboard read
+                        refresh_driver_percentiles()
+                        refresh_absenteeism_counts()
                         st.success(f"✅ Successfully inserted data into `{target_table}` table!")
 
     else:
@@ -4,13 +4,15 @@ import os
 def user_sheet(user_depot, role):
     import streamlit as st
     import pandas as pd
-    from datetime import date, timedelta, datetime
+    from datetime import date, datetime
     from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
-    from db_config import get_session
-    from models import InputData, TSAdmin
+    from models import TSAdmin
     from st_aggrid.shared import JsCode
-    from auth import get_depot_settings
-    import re
+    from derived_fields import dependents, js_value_getter, load_formulas, sheet_frame
+    from input_backfill import backfill_sheet
+    from input_export import export_panel
+    from input_store import input_rows, input_sheet_state, upsert_input_data
+    from input_validation import InputValidator
 
     # --- Page Configuration ---
     st.markdown("""
@@ -43,109 +45,28 @@ def user_sheet(user_depot, role):
     st.title("TGSRTC PRODUCTIVITY DASHBOARD")
 
     category_to_column = config.get("category_to_column", {})
+    formulas = load_formulas(config)
+    validator = InputValidator(config)
 
     # --- Save Data ORM ---
     def save_to_db(grid_response, selected_depot, date_to_save):
         df = pd.DataFrame(grid_response["data"])
 
-        # 🧮 Recalculate totals before saving
-        for col in df.columns:
-            if re.match(r'\d{4}-\d{2}-\d{2}', col):
-                for idx, row in df.iterrows():
-                    category = row["Category"]
-
-                    if category == "Total Drivers (SL Reasons)":
-                        subcategories = [
-                            "Flu/Fever", "BP", "Orthopedic", "Heart", "Weakness", "Eye",
-                            "Accident/Injuries", "Neuro/Paralysis (Sick Leave)", "Piles", "Diabetes",
-                            "Thyroid", "Gas", "Dental", "Ear", "Skin/Allergy", "General Surgery",
-                            "Obesity", "Cancer"
-                        ]
-                        total = 0
-                        for sub in subcategories:
-                            sub_row = df[df["Category"] == sub]
-                            if not sub_row.empty:
-                                val = sub_row[col].values[0]
-                                total += float(val) if pd.notna(val) and val != '' else 0
-                        df.at[idx, col] = total
-
-                    elif category == "Diff (SL Reasons)":
-                        total_row = df[df["Category"] == "Total Drivers (SL Reasons)"]
-                        sick_leave_row = df[df["Category"] == "Sick Leave"]
-                        if not total_row.empty and not sick_leave_row.empty:
-                            total_val = float(total_row[col].values[0] or 0)
-                            sick_val = float(sick_leave_row[col].values[0] or 0)
-                            df.at[idx, col] = total_val - sick_val
-
-        date_columns = [col for col in df.columns if re.match(r'\d{4}-\d{2}-\d{2}', col)]
-        rows_to_insert = []
         target_date_str = date_to_save.strftime('%Y-%m-%d')
 
         if target_date_str not in df.columns:
             st.error(f"❌ Column '{target_date_str}' not found in grid data.")
             return False
 
-        row_data = {"depot_name": selected_depot, "data_date": pd.to_datetime(target_date_str).date()}
-        for _, r in df.iterrows():
-            cat = r["Category"]
-            if not isinstance(cat, str) or not cat.strip():
-                continue
-            db_col = category_to_column.get(cat.strip())
-            if db_col:
-                val = r[target_date_str]
-                try:
-                    val = float(val) if pd.notna(val) and val != '' else None
-                    val = int(val) if val and val.is_integer() else val
-                except Exception:
-                    pass
-                row_data[db_col] = val
-        # 🧮 Recompute Service/Driver Check before saving to DB
+        # 🧮 Derived rows recomputed, then one upsert (no lookup-then-update round trip)
+        rows = input_rows(sheet_frame(df, [target_date_str]), selected_depot, category_to_column, formulas)
         try:
-            if 'Driver for Bus Services' in df.columns and 'Actual Services' in df.columns:
-                df['Service/Driver Check'] = (
-                    df['Driver for Bus Services'].fillna(0) -
-                    df['Actual Services'].fillna(0)
-                )
-        except Exception as e:
-            st.warning(f"⚠️ Could not recompute 'Service/Driver Check' before saving: {e}")
-
-        rows_to_insert.append(row_data)
-
-        try:
-            with get_session() as db:
-                for row in rows_to_insert:
-                    existing = (
-                        db.query(InputData)
-                        .filter(InputData.depot_name == row["depot_name"])
-                        .filter(InputData.data_date == row["data_date"])
-                        .first()
-                    )
-                    if existing:
-                        for k, v in row.items():
-                            setattr(existing, k, v)
-                    else:
-                        db.add(InputData(**row))
-                db.commit()
+            upsert_input_data(rows)
             return True
         except Exception as e:
             st.error(f"Error saving data: {e}")
             return False
 
-    # --- Fetch Existing Data ORM ---
-    def fetch_existing_data_for_dates(depot_name, date_columns):
-        try:
-            with get_session() as db:
-                data = (
-                    db.query(InputData)
-                    .filter(InputData.depot_name == depot_name)
-                    .filter(InputData.data_date.in_(date_columns))
-                    .all()
-                )
-                return pd.DataFrame([{k: v for k, v in d.__dict__.items() if not k.startswith("_")} for d in data])
-        except Exception as e:
-            st.error(f"DB Error: {e}")
-            return pd.DataFrame()
-
     # --- Daily Depot Input Sheet Section ---
     st.header("DAILY SCHEDULE AND DRIVER DATA")
     st.markdown("### 📝 Enter New Record")
@@ -159,30 +80,21 @@ def user_sheet(user_depot, role):
         else:
             st.success(f"Depot: **{selected_depot}**")
 
+    # ✅ Page state (last date, depot type, the 10-day window's rows): one cached query
+    try:
+        sheet_state = input_sheet_state(selected_depot)
+    except Exception as e:
+        st.error(f"DB Error: {e}")
+        st.stop()
+
     # ✅ Show recent entries
-    with get_session() as db:
-        recent_dates = (
-            db.query(InputData.data_date)
-            .filter(InputData.depot_name == selected_depot)
-            .order_by(InputData.data_date.desc())
-            .limit(1)
-            .all()
-        )
-        if recent_dates:
-            formatted = [pd.to_datetime(r[0]).strftime("%d %b %y").upper() for r in recent_dates]
-            st.markdown("🗓 *Recently Entered Dates:* " + ", ".join(formatted))
-        else:
-            st.info("ℹ No data found in DB for this depot yet.")
-
-    # ✅ Compute next available date
-    with get_session() as db:
-        result = (
-            db.query(InputData.data_date)
-            .filter(InputData.depot_name == selected_depot)
-            .order_by(InputData.data_date.desc())
-            .first()
-        )
-        next_allowed_date = result[0] + timedelta(days=1) if result else date.today()
+    if sheet_state["last_date"]:
+        st.markdown("🗓 *Recently Entered Dates:* " + sheet_state["last_date"].strftime("%d %b %y").upper())
+    else:
+        st.info("ℹ No data found in DB for this depot yet.")
+
+    # ✅ Next available date
+    next_allowed_date = sheet_state["next_date"]
 
     with col2:
         user_selected_date = st.date_input(
@@ -196,58 +108,22 @@ def user_sheet(user_depot, role):
         st.info("Select a depot to proceed with data entry.")
         st.stop()
 
-    # ✅ Prepare date range columns
-    date_columns = [(user_selected_date - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(9, -1, -1)]
-
-    def check_existing_dates(depot_name, date_list):
-        try:
-            with get_session() as db:
-                rows = (
-                    db.query(InputData.data_date)
-                    .filter(InputData.depot_name == depot_name)
-                    .filter(InputData.data_date.in_(date_list))
-                    .all()
-                )
-                return {r[0].strftime("%Y-%m-%d") for r in rows}
-        except Exception as e:
-            st.error(f"Error checking existing dates: {e}")
-            return set()
+    # ✅ Backfill: every missing date up to today in one submit
+    entry_mode = st.radio("Entry mode", ["Daily entry", "Backfill missing dates"], horizontal=True, key="input_entry_mode")
+    if entry_mode == "Backfill missing dates":
+        backfill_sheet(selected_depot, next_allowed_date, config, formulas, validator)
+        return
 
-    existing_dates = check_existing_dates(selected_depot, date_columns)
+    # ✅ Prepare date range columns
+    date_columns = sheet_state["window_dates"]
 
-    # ✅ Depot Category Lookup via ORM
-    depot_config = get_depot_settings()
-    depot_type_from_admin = depot_config.get(selected_depot, {}).get("category", "N/A")
+    # ✅ Depot Category (TS_ADMIN)
+    depot_type_from_admin = sheet_state["category"] or "N/A"
     st.markdown(f"*Depot Type:* `{depot_type_from_admin}`")
 
     # ✅ Download Existing Data
     with st.expander("⬇️ Download Data"):
-        start_date = st.date_input("From Date", value=date.today() - timedelta(days=7))
-        end_date = st.date_input("To Date", value=date.today())
-
-        with get_session() as db:
-            data = (
-                db.query(InputData)
-                .filter(InputData.depot_name == selected_depot)
-                .filter(InputData.data_date.between(start_date, end_date))
-                .order_by(InputData.data_date)
-                .all()
-            )
-            df_download = pd.DataFrame([{k: v for k, v in d.__dict__.items() if not k.startswith("_")} for d in data])
-
-            if not df_download.empty:
-                category_to_column = config["category_to_column"]
-                column_to_category = {v: k for k, v in category_to_column.items()}
-                df_download = df_download.rename(columns=column_to_category)
-
-                st.download_button(
-                    label="📥 Download CSV",
-                    data=df_download.to_csv(index=False),
-                    file_name=f"{selected_depot}_{start_date}_{end_date}.csv",
-                    mime="text/csv",
-                )
-            else:
-                st.warning("⚠️ No data available for this range.")
+        export_panel({None: [selected_depot]}, config, formulas, key="dm_export", default_days=7)
 
 # --- Benchmarks (loaded from config.json instead of hardcoding) ---
     # --- Benchmarks (case-insensitive lookup) ---
@@ -270,33 +146,20 @@ def user_sheet(user_depot, role):
     df = pd.DataFrame(data)
     # FULLY FIXED VERSION OF YOUR DATA INJECTION LOGIC
 
-    # Step 1: Fetch existing data
-    existing_data_df = fetch_existing_data_for_dates(selected_depot, date_columns)
+    # Step 1: Existing rows of the window (from the page state)
+    existing_data_df = sheet_state["rows"]
 
-    # Step 2: Ensure 'data_date' format matches AgGrid column headers
+    # Step 2: One column per saved date, values matched to categories by DB column
     # 🔒 Identify DB-fetched cells to lock editing
     fetched_cells = set()
-    if not existing_data_df.empty and "data_date" in existing_data_df.columns:
-        existing_data_df["data_date"] = pd.to_datetime(existing_data_df["data_date"]).dt.strftime("%Y-%m-%d")
-        reverse_map = {v: k for k, v in category_to_column.items()}
-
-        for col_date in date_columns:
-            matching_rows = existing_data_df[existing_data_df["data_date"] == col_date]
-            if matching_rows.empty:
-                continue
-            row_data = matching_rows.iloc[0]
-
-            for db_col, value in row_data.items():
-                if db_col == "data_date" or pd.isna(value):
-                    continue
-
-                category = reverse_map.get(db_col)
-                if category:
-    # Match the row in DataFrame where Category == this category
-                    matched_index = df[df["Category"].str.strip().str.lower() == category.strip().lower()].index
-                    if not matched_index.empty:
-                        df.at[matched_index[0], col_date] = value
-                        fetched_cells.add((category.strip(), col_date))
+    if not existing_data_df.empty:
+        saved = existing_data_df[existing_data_df["data_date"].isin(date_columns)].drop_duplicates("data_date")
+        saved = saved.set_index("data_date").reindex(columns=list(category_to_column.values()))
+        saved.columns = [cat.strip().lower() for cat in category_to_column]
+        row_keys = df["Category"].str.strip().str.lower()
+        for col_date in sorted(saved.index):
+            df[col_date] = row_keys.map(saved.loc[col_date].dropna())
+            fetched_cells.update((cat.strip(), col_date) for cat in df.loc[df[col_date].notna(), "Category"])
 
     formatted_columns = {}
     for col in df.columns:
@@ -343,155 +206,47 @@ def user_sheet(user_depot, role):
         getRowId=JsCode("function(params) { return params.data.Category; }").js_code,
         suppressMovableColumns=True, # Prevent column reordering
         # Removed enableSorting=False from here as it's not a valid top-level grid option
-        onCellValueChanged=JsCode("""
-            function(params) {
+        onCellValueChanged=JsCode(f"""
+            function(params) {{
+                // derived fields each category feeds (directly or through other derived fields)
+                const DEPENDENTS = {json.dumps(dependents(formulas))};
                 const category = params.data.Category;
                 const colId = params.column.colId;
                 const api = params.api;
 
                 let categoriesToRecalculate = new Set();
 
-                const addCategory = (cat) => {
-                    if (!cat.startsWith('---')) {
+                const addCategory = (cat) => {{
+                    if (!cat.startsWith('---')) {{
                         categoriesToRecalculate.add(cat);
-                    }
-                };
+                    }}
+                }};
                 const editedRowNode = params.node;
                 editedRowNode.data[colId] = params.newValue;
-                // --- Define explicit dependencies for recalculation ---
-                if (category === 'Planned Services' || category === 'Actual Services') {
-                    addCategory('Service Variance');
-                    addCategory('Service/Driver Check');
-                }
-                if (category === 'Planned KM' || category === 'Actual KM') {
-                    addCategory('KM Variance');
-                    addCategory('KM/Driver');
-                }
-                if (['Actual KM', 'Driver for Bus Services'].includes(category)) {
-                    addCategory('KM/Driver');
-                    addCategory('Service/Driver Check');
-                }
-
-
-                if (['Total Drivers', 'Medically Unfit', 'Suspended Drivers'].includes(category)) {
-                    addCategory('Available Drivers-1');
-                    addCategory('% Available Drivers-1');
-                    addCategory('Available Drivers-2');
-                    addCategory('% Available Drivers-2');
-                    addCategory('Attending Drivers');
-                    addCategory('% Attending Drivers');
-                    addCategory('Driver shortage');
-                    addCategory('% Weekly Off & National Off');
-                    addCategory('% Special Off (Night Out/IC, Online)');
-                    addCategory('% Others');
-                    addCategory('% Leave & Absent');
-                    addCategory('% Sick Leave');
-                    addCategory('Service/Driver Check');
-                }
-
-                if (['Weekly Off & National Off', 'Special Off (Night Out/IC, Online)',
-                    'Training, PME(medical)', 'Others (SDI, DGT, LO, Parking,<br>Relief Van,Depot Spare,<br> Cargo, Releaving duty)',
-                    'Leave & Absent', 'Sick Leave'].includes(category)) {
-                    addCategory('Available Drivers-2');
-                    addCategory('% Available Drivers-2');
-                    addCategory('Attending Drivers');
-                    addCategory('% Attending Drivers');
-                    addCategory('Driver shortage');
-                    addCategory('Service/Driver Check');
-                    addCategory('% Weekly Off & National Off');
-                    addCategory('% Special Off (Night Out/IC, Online)');
-                    addCategory('% Others');
-                    addCategory('% Leave & Absent');
-                    addCategory('% Sick Leave');
-                }
-
-                if (['Available Drivers-2', 'Spot Absent'].includes(category)) {
-                    addCategory('Attending Drivers');
-                    addCategory('% Spot Absent');
-                    addCategory('% Attending Drivers');
-                    addCategory('Driver shortage');
-                    addCategory('Service/Driver Check');
-                }
-                if (['Drivers Required', 'Attending Drivers'].includes(category)) {
-                    addCategory('Driver shortage');
-                    addCategory('Service/Driver Check');
-                }
-                // NEW DEPENDENCY: Driver schedule calculation
-                if (category === 'Drivers Required' || category === 'Planned Schedules') {
-                    addCategory('Driver schedule');
-                }
-
-                // Recalculate Drivers on Duty if Attending Drivers, Double Duty, or Off Cancellation changes
-                if (['Attending Drivers', 'Double Duty', 'Off Cancellation'].includes(category)) {
-                    addCategory('Drivers on Duty');
-                    addCategory('Driver for Bus Services');
-                    addCategory('KM/Driver');
-                    addCategory('Service/Driver Check');
-                }
-                // Recalculate Driver for Bus Services if Drivers on Duty or Drivers as Conductors changes
-                if (['Drivers on Duty', 'Drivers as Conductors'].includes(category)) {
-                    addCategory('Driver for Bus Services');
-                    addCategory('Service/Driver Check');
-                    addCategory('KM/Driver');
-                }
-                // Recalculate KM/Driver if Actual KM or Drivers for Bus Services changes
-                if (['Actual KM', 'Driver for Bus Services'].includes(category)) {
-                    addCategory('KM/Driver');
-                }
-                // Recalculate Services/Driver Check if Drivers for Bus Services or Actual Services changes
-                if (['Driver for Bus Services', 'Actual Services'].includes(category)) {
-                    addCategory('Service/Driver Check');
-                }
-
-                if (['Double Duty', 'Off Cancellation', 'Weekly Off & National Off', 'Attending Drivers'].includes(category)) {
-                    addCategory('% Double Duty');
-                    addCategory('% Off Cancellation');
-                    addCategory('Service/Driver Check');
-                }
-
-                if (['Spondilitis', 'Spinal Disc', 'Vision/Color Blindness', 'Neuro/Paralysis (Medical)', 'Ortho'].includes(category)) {
-                    addCategory('Total Drivers (MU Reasons)');
-                    addCategory('Diff (MU Reasons)');
-                }
-                if (['Total Drivers (MU Reasons)', 'Medically Unfit'].includes(category)) {
-                    addCategory('Diff (MU Reasons)');
-                }
-
-                if (['Flu/Fever', 'BP', 'Orthopedic', 'Heart', 'Weakness', 'Eye',
-                    'Accident/Injuries', 'Neuro/Paralysis (Sick Leave)', 'Piles',
-                    'Diabetes', 'Thyroid', 'Gas', 'Dental', 'Ear', 'Skin/Allergy',
-                    'General Surgery', 'Obesity', 'Cancer'].includes(category)) {
-                    addCategory('Total Drivers (SL Reasons)');
-                    addCategory('Diff (SL Reasons)');
-                    
-                }
-                if (['Total Drivers (SL Reasons)', 'Sick Leave'].includes(category)) {
-                    addCategory('Diff (SL Reasons)');
-                    const currentTotalSLReasons = api.getRowNode('Total Drivers (SL Reasons)').data[colId];
-                    const currentSickLeave = api.getRowNode('Sick Leave').data[colId];
-                }
-
-                if (categoriesToRecalculate.size > 0) {
-                    setTimeout(() => {
-                        const rowNodesToRefresh = Array.from(categoriesToRecalculate).map(cat => api.getRowNode(cat));
-                        api.refreshCells({
+                (DEPENDENTS[category] || []).forEach(addCategory);
+
+                if (categoriesToRecalculate.size > 0) {{
+                    setTimeout(() => {{
+                        const rowNodesToRefresh = Array.from(categoriesToRecalculate)
+                            .map(cat => api.getRowNode(cat))
+                            .filter(node => node);
+                        api.refreshCells({{
                             rowNodes: rowNodesToRefresh,
                             columns: [colId],
                             force: true
-                        });
+                        }});
 
                         //  Force Service/Driver Check refresh explicitly
                         const driverCheckNode = api.getRowNode("Service/Driver Check");
-                        if (driverCheckNode) {
-                            api.refreshCells({
+                        if (driverCheckNode) {{
+                            api.refreshCells({{
                                 rowNodes: [driverCheckNode],
                                 force: true
-                            });
-                        }
-                    }, 100);
-}
-
-            }
+                            }});
+                        }}
+                    }}, 100);
+                }}
+            }}
         """).js_code,
     )
     fetched_cells_js = json.dumps([[cat.strip(), date] for cat, date in fetched_cells])
@@ -619,322 +374,7 @@ class CenteredNumberEditor {
                     return style;
                 }
             """).js_code,
-            valueGetter=JsCode(f"""
-                function(params) {{
-                    const category = params.data.Category;
-                    const dateCol = params.colDef.field;
-                    const api = params.api;
-
-                    // If it's a header row, return an empty string
-                    if (category.startsWith('---')) {{
-                        return '';
-                    }}
-
-                    const getCellValueAsNumber = (cat) => {{
-                        const rowNode = api.getRowNode(cat);
-                        if (rowNode && rowNode.data[dateCol] !== undefined && rowNode.data[dateCol] !== null && rowNode.data[dateCol] !== "") {{
-                            const value = parseFloat(rowNode.data[dateCol]);
-                            return isNaN(value) ? 0 : value;
-                        }}
-                        return 0;
-                    }};
-
-                    let result; // Declare result here to avoid 'not defined' errors
-
-                    if (category === "Service Variance") {{
-                        const plannedServices = getCellValueAsNumber('Planned Services');
-                        const actualServices = getCellValueAsNumber('Actual Services');
-                        result = actualServices - plannedServices;
-                        params.data[dateCol] = result;
-                        return result;
-                    }} else if (category === "KM Variance") {{
-                        const plannedKM = getCellValueAsNumber('Planned KM');
-                        const actualKM = getCellValueAsNumber('Actual KM');
-                        result = actualKM - plannedKM;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Driver schedule") {{ // NEW CALCULATION
-                        const driversRequired = getCellValueAsNumber('Drivers Required');
-                        const plannedSchedules = getCellValueAsNumber('Planned Schedules');
-                        if (plannedSchedules !== 0) {{
-                            result = (driversRequired / plannedSchedules).toFixed(0);
-                        }} else {{
-                            result = 0;
-                        }}
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Available Drivers-1") {{
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        const medicallyUnfit = getCellValueAsNumber('Medically Unfit');
-                        const suspendedDrivers = getCellValueAsNumber('Suspended Drivers');
-                        result = totalDrivers - medicallyUnfit - suspendedDrivers;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Available Drivers-1") {{
-                        const availableDrivers1 = getCellValueAsNumber('Available Drivers-1');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((availableDrivers1 / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Available Drivers-2") {{
-                        const availableDrivers1 = getCellValueAsNumber('Available Drivers-1');
-                        const weeklyOff = getCellValueAsNumber('Weekly Off & National Off');
-                        const specialOff = getCellValueAsNumber('Special Off (Night Out/IC, Online)');
-                        const trainingPME = getCellValueAsNumber('Training, PME(medical)');
-                        const others = getCellValueAsNumber('Others (SDI, DGT, LO, Parking,<br>Relief Van,Depot Spare,<br> Cargo, Releaving duty)');
-                        const leaveAbsent = getCellValueAsNumber('Leave & Absent');
-                        const sickLeave = getCellValueAsNumber('Sick Leave');
-
-                        const totalDeductions = weeklyOff + specialOff + trainingPME + others + leaveAbsent + sickLeave;
-                        result = availableDrivers1 - totalDeductions;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Available Drivers-2") {{
-                        const availableDrivers2 = getCellValueAsNumber('Available Drivers-2');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((availableDrivers2 / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Weekly Off & National Off") {{
-                        const weeklyOff = getCellValueAsNumber('Weekly Off & National Off');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((weeklyOff / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Special Off (Night Out/IC, Online)") {{
-                        const specialOff = getCellValueAsNumber('Special Off (Night Out/IC, Online)');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((specialOff / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Others") {{
-                        const trainingPME = getCellValueAsNumber('Training, PME(medical)');
-                        const others = getCellValueAsNumber('Others (SDI, DGT, LO, Parking,<br>Relief Van,Depot Spare,<br> Cargo, Releaving duty)');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-
-                        if (totalDrivers > 0) {{
-                            result = (((trainingPME + others) / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-
-                    else if (category === "% Leave & Absent") {{
-                        const leaveAbsent = getCellValueAsNumber('Leave & Absent');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((leaveAbsent / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Sick Leave") {{
-                        const sickLeave = getCellValueAsNumber('Sick Leave');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((sickLeave / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        console.log("SL % calc - sickLeave:", sickLeave, ", totalDrivers:", totalDrivers);
-                        return result;
-                        
-
-                    }}
-                    else if (category === "Attending Drivers") {{
-                        const availableDrivers2 = getCellValueAsNumber('Available Drivers-2');
-                        const spotAbsent = getCellValueAsNumber('Spot Absent');
-                        result = availableDrivers2 - spotAbsent;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Attending Drivers") {{
-                        const attendingDrivers = getCellValueAsNumber('Attending Drivers');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((attendingDrivers / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Spot Absent") {{
-                        const spotAbsent = getCellValueAsNumber('Spot Absent');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((spotAbsent / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Driver shortage") {{
-                        const driversRequired = getCellValueAsNumber('Drivers Required');
-                        const attendingDrivers = getCellValueAsNumber('Attending Drivers');
-                        if (driversRequired > attendingDrivers) {{
-                            result = driversRequired - attendingDrivers;
-                        }} else {{
-                            result = 0;
-                        }}
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Double Duty") {{
-                        const doubleDuty = getCellValueAsNumber('Double Duty');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((doubleDuty / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "% Off Cancellation") {{
-                        const offCancellation = getCellValueAsNumber('Off Cancellation');
-                        const totalDrivers = getCellValueAsNumber('Total Drivers');
-                        if (totalDrivers > 0) {{
-                            result = ((offCancellation / totalDrivers) * 100).toFixed(0);
-                            params.data[dateCol] = result;
-                            return result;
-                        }}
-                        result = '';
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Drivers on Duty") {{
-                        const attendingDrivers = getCellValueAsNumber('Attending Drivers');
-                        const doubleDuty = getCellValueAsNumber('Double Duty');
-                        const offCancellation = getCellValueAsNumber('Off Cancellation');
-                        result = attendingDrivers + doubleDuty + offCancellation;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Driver for Bus Services") {{
-                        const driversOnDuty = getCellValueAsNumber('Drivers on Duty');
-                        const driversAsConductors = getCellValueAsNumber('Drivers as Conductors');
-                        result = driversOnDuty - driversAsConductors;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "KM/Driver") {{
-                        const actualKM = getCellValueAsNumber('Actual KM');
-                        const driversForBusServices = getCellValueAsNumber('Driver for Bus Services');
-                        console.log(`KM/Driver Calculation - Actual KM: ${{actualKM}} Drivers for Bus Services: ${{driversForBusServices}}`);
-                        if (driversForBusServices !== 0) {{
-                            result = (actualKM / driversForBusServices).toFixed(0);
-                        }} else {{
-                            result = '';
-                        }}
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Service/Driver Check") {{
-                        const driversForBusServices = getCellValueAsNumber('Driver for Bus Services');
-                        const actualServices = getCellValueAsNumber('Actual Services');
-                        result = driversForBusServices - actualServices;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Total Drivers (MU Reasons)") {{
-                        const spondilitis = getCellValueAsNumber('Spondilitis');
-                        const spinalDisc = getCellValueAsNumber('Spinal Disc');
-                        const vision = getCellValueAsNumber('Vision/Color Blindness');
-                        const neuro = getCellValueAsNumber('Neuro/Paralysis (Medical)');
-                        const ortho = getCellValueAsNumber('Ortho');
-                        result = spondilitis + spinalDisc + vision + neuro + ortho;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Diff (MU Reasons)") {{
-                        const totalMUReasons = getCellValueAsNumber('Total Drivers (MU Reasons)');
-                        const medicallyUnfit = getCellValueAsNumber('Medically Unfit');
-                        result = totalMUReasons - medicallyUnfit;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Total Drivers (SL Reasons)") {{
-                        const fluFever = getCellValueAsNumber('Flu/Fever');
-                        const bp = getCellValueAsNumber('BP');
-                        const orthopedic = getCellValueAsNumber('Orthopedic');
-                        const heart = getCellValueAsNumber('Heart');
-                        const weakness = getCellValueAsNumber('Weakness');
-                        const eye = getCellValueAsNumber('Eye');
-                        const accidentInjuries = getCellValueAsNumber('Accident/Injuries');
-                        const neuroSickLeave = getCellValueAsNumber('Neuro/Paralysis (Sick Leave)');
-                        const piles = getCellValueAsNumber('Piles');
-                        const diabetes = getCellValueAsNumber('Diabetes');
-                        const thyroid = getCellValueAsNumber('Thyroid');
-                        const gas = getCellValueAsNumber('Gas');
-                        const dental = getCellValueAsNumber('Dental');
-                        const ear = getCellValueAsNumber('Ear');
-                        const skinAllergy = getCellValueAsNumber('Skin/Allergy');
-                        const generalSurgery = getCellValueAsNumber('General Surgery');
-                        const obesity = getCellValueAsNumber('Obesity');
-                        const cancer = getCellValueAsNumber('Cancer');
-
-                        const totalSLReasons = fluFever + bp + orthopedic + heart + weakness + eye + accidentInjuries +
-                                neuroSickLeave + piles + diabetes + thyroid + gas + dental + ear +
-                                skinAllergy + generalSurgery + obesity + cancer;
-                        result = totalSLReasons;
-                        params.data[dateCol] = result;
-                        return result;
-                    }}
-                    else if (category === "Diff (SL Reasons)") {{
-                            const totalSLReasons = getCellValueAsNumber('Total Drivers (SL Reasons)');
-                            const sickLeave = getCellValueAsNumber('Sick Leave');
-                            result = totalSLReasons - sickLeave;
-                            params.data[dateCol] = result;
-                            return result;
-                            }}
-                    
-
-                    const originalValue = params.data[dateCol];
-                    const numOriginalValue = parseFloat(originalValue);
-                    return isNaN(numOriginalValue) ? 0 : numOriginalValue;
-                }}
-            """).js_code,
+            valueGetter=JsCode(js_value_getter(formulas)).js_code,
             cellRenderer=JsCode("""
                 class BenchmarkCellRenderer {
                     init(params) {
@@ -1135,86 +575,8 @@ class CenteredNumberEditor {
             st.stop()
 
 
-        errors = []
-        editable_rows_set = set(editable_rows)
-        selected_date_col = user_selected_date.strftime("%Y-%m-%d")
-
-        for idx, row in df_input.iterrows():
-            category = row["Category"]
-            if category not in editable_rows_set:
-                continue  # Skip non-editable rows
-
-            value = row.get(selected_date_col)
-
-            # 1. Check missing value
-            if value in ("", None):
-                errors.append(f"❌ '{category}' is empty on {selected_date_col}")
-                continue
-
-            # 2. Check for integer
-            try:
-                int_value = int(value)
-            except:
-                errors.append(f"❌ '{category}' must be an integer on {selected_date_col}")
-                continue
-
-            # 3. Validation Rules 
-            if category in ["Schedules","Schedules Services","Planned Schedules", "Planned Services", "Actual Services", "Total Drivers"]:
-                if not (1<= int_value <= 999):
-                    errors.append(f"❌ '{category}' Check the value  on {selected_date_col}")
-
-            elif category in ["Schedules Kms","Planned KM", "Actual KM"]:
-                if not (1000 <= int_value <= 99999):
-                    errors.append(f"❌ '{category}' Check the value on {selected_date_col}")
-
-            elif category =="Drivers Required":
-                if int_value <= 0:
-                    errors.append(f"❌ '{category}' must be greater than 0 on {selected_date_col}")
-            elif category =="Service/Driver Check":
-                if int_value <= 0:
-                    errors.append(f"❌ '{category}' must be greater than 0 on {selected_date_col}")
-
-            # Remaining editable fields: must be integer and >= 0
-            else:
-                if int_value < 0:
-                    errors.append(f"❌ '{category}' cannot be negative on {selected_date_col}")
-
-        # ✅ Special validation (outside loop!)
-        try:
-            mu_total = int(df_input.loc[df_input["Category"] == "Total Drivers (MU Reasons)", selected_date_col].values[0])
-            medically_unfit = int(df_input.loc[df_input["Category"] == "Medically Unfit", selected_date_col].values[0])
-            if mu_total - medically_unfit != 0:
-                errors.append(f"❌ 'Diff (MU Reasons)' must be 0 on {selected_date_col}")
-        except:
-            errors.append(f"❌ Error calculating 'Diff (MU Reasons)' — please check values.")
-                # ✅ Special validation for Diff (SL Reasons)
-         # ✅ Validation for 'Diff (SL Reasons)' - REVISED CODE
-        try:
-            # Get the main "Sick Leave" value
-            sick_leave_val = df_input.loc[df_input["Category"] == "Sick Leave", selected_date_col].values[0]
-            sick_leave_val = float(sick_leave_val) if pd.notna(sick_leave_val) and sick_leave_val != '' else 0.0
-
-            # Manually calculate Total Drivers (SL Reasons) from its sub-components in Python
-            sl_subcategories = [
-                "Flu/Fever", "BP", "Orthopedic", "Heart", "Weakness", "Eye",
-                "Accident/Injuries", "Neuro/Paralysis (Sick Leave)", "Piles", "Diabetes",
-                "Thyroid", "Gas", "Dental", "Ear", "Skin/Allergy", "General Surgery",
-                "Obesity", "Cancer"
-            ]
-            calculated_sl_total = 0.0
-            for sub_cat in sl_subcategories:
-                # Ensure the subcategory exists in your DataFrame to avoid KeyError
-                if sub_cat in df_input["Category"].values:
-                    sub_val_raw = df_input.loc[df_input["Category"] == sub_cat, selected_date_col].values[0]
-                    calculated_sl_total += float(sub_val_raw) if pd.notna(sub_val_raw) and sub_val_raw != '' else 0.0
-            # Use a small tolerance for floating-point comparison
-            tolerance = 1e-9 # A very small number close to zero
-            if abs(calculated_sl_total - sick_leave_val) > tolerance:
-                errors.append(f"❌ 'Diff (SL Reasons)' must be 0 on {selected_date_col}. (Sum of reasons: {calculated_sl_total}, Sick Leave: {sick_leave_val})")
-        except Exception as e:
-            errors.append(f"❌ Error validating 'Diff (SL Reasons)' components — please check values. Details: {e}")
-
-
+        # ✅ All rules (whole numbers, config ranges, reason totals) in one vectorized pass
+        errors = validator.messages(validator.check(sheet_frame(df_input, [selected_date_col])))
 
         # ✅ Final error handling
         if errors:
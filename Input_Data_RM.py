@@ -2,12 +2,13 @@ import json, os
 import streamlit as st
 import pandas as pd
 from datetime import timedelta
-from mysql.connector import Error
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, JsCode
 
 # FIX: Ensure this import is present to define get_connection()
 from auth import get_depot_settings
 from db_config import get_session
+from derived_fields import load_formulas
+from input_store import category_grid, daily_sums
 from models import TSAdmin, InputData  # Add InputData if you have that ORM model
 
 
@@ -15,6 +16,7 @@ from models import TSAdmin, InputData  # Add InputData if you have that ORM mode
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.json")
 with open(CONFIG_PATH, "r") as f:
     config_data = json.load(f)
+formulas = load_formulas(config_data)
 
 def RM_sheet(user_region, role):
     st.title("TGSRTC PRODUCTIVITY DASHBOARD (REGIONAL MANAGER VIEW)")
@@ -82,38 +84,12 @@ def RM_sheet(user_region, role):
         for col_date in date_columns:
             df[col_date] = None  # create empty date columns
 
-        # Fetch data
-        def fetch_existing_data_for_dates(depot_name, date_columns):
-            try:
-                with get_session() as db:
-                    data = db.query(InputData).filter(
-                        InputData.depot_name == depot_name,
-                        InputData.data_date.in_(date_columns)
-                    ).all()
-                    return pd.DataFrame([{k: v for k, v in d.__dict__.items() if not k.startswith("_")} for d in data])
-
-            except Error as e:
-                st.error(f"DB Error: {e}")
-                return pd.DataFrame()
-
-        existing = fetch_existing_data_for_dates(selected_depot, date_columns)
-        if not existing.empty and "data_date" in existing.columns:
-            existing["data_date"] = pd.to_datetime(existing["data_date"]).dt.strftime("%Y-%m-%d")
-            reverse_map = {v:k for k,v in config_data["category_to_column"].items()}
-
-            # fill df across selected date columns
-            for col_date in date_columns:
-                row = existing[existing["data_date"] == col_date]
-                if row.empty: 
-                    continue
-                for db_col, val in row.iloc[0].items():
-                    if db_col == "data_date" or pd.isna(val): 
-                        continue
-                    cat = reverse_map.get(db_col)
-                    if cat:
-                        idx = df[df["Category"].str.strip().str.lower() == cat.strip().lower()].index
-                        if not idx.empty:
-                            df.at[idx[0], col_date] = val
+        # Fetch data: one SELECT for the range, pivoted into the grid in one step
+        try:
+            sums = daily_sums([selected_depot], start_date, end_date, config_data["category_to_column"], formulas)
+            df[date_columns] = category_grid(sums, df["Category"], date_columns).to_numpy()
+        except Exception as e:
+            st.error(f"DB Error: {e}")
 
         # --- AgGrid Configuration (copied from DM style but view-only) ---
         gb = GridOptionsBuilder.from_dataframe(df)
@@ -337,43 +313,12 @@ def RM_sheet(user_region, role):
             for col_date in date_columns:
                 df[col_date] = None
 
-            # --- fetch & aggregate data ---
-            def fetch_region_data(dep_list, date_columns):
-                try:
-                    with get_session() as db:
-                        data = (
-                            db.query(InputData)
-                            .filter(InputData.depot_name.in_(dep_list))
-                            .filter(InputData.data_date.in_(date_columns))
-                            .all()
-                        )
-                        return pd.DataFrame([{k: v for k, v in d.__dict__.items() if not k.startswith("_")} for d in data])
-                except Exception as e:
-                    st.error(f"DB Error: {e}")
-                    return pd.DataFrame()
-
-
-            existing = fetch_region_data(rm_depots, date_columns)
-            if not existing.empty and "data_date" in existing.columns:
-                existing["data_date"] = pd.to_datetime(existing["data_date"]).dt.strftime("%Y-%m-%d")
-                reverse_map = {v:k for k,v in config_data["category_to_column"].items()}
-
-                # group by date and sum all numeric cols
-                grouped = existing.groupby("data_date").sum(numeric_only=True).reset_index()
-
-                # fill df
-                for col_date in date_columns:
-                    row = grouped[grouped["data_date"] == col_date]
-                    if row.empty:
-                        continue
-                    for db_col, val in row.iloc[0].items():
-                        if db_col == "data_date" or pd.isna(val):
-                            continue
-                        cat = reverse_map.get(db_col)
-                        if cat:
-                            idx = df[df["Category"].str.strip().str.lower() == cat.strip().lower()].index
-                            if not idx.empty:
-                                df.at[idx[0], col_date] = val
+            # --- region totals per date: SUM ... GROUP BY data_date in SQL, one pivot ---
+            try:
+                sums = daily_sums(rm_depots, start_date, end_date, config_data["category_to_column"], formulas)
+                df[date_columns] = category_grid(sums, df["Category"], date_columns).to_numpy()
+            except Exception as e:
+                st.error(f"DB Error: {e}")
 
             gb = GridOptionsBuilder.from_dataframe(df)
             gb.configure_default_column(resizable=False, sortable=False, wrapText=False, autoHeight=False, editable=False)
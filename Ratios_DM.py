@@ -1,10 +1,10 @@
 import streamlit as st
-import pandas as pd
 import base64
 from datetime import date, timedelta
 import json
 from db_config import get_session
-from models import InputData, TSAdmin
+from models import TSAdmin
+from ratio_cube import period_window, ratio_cube
 
 # --------- Load config ----------
 try:
@@ -38,22 +38,17 @@ class prod_ratios_DM:
         """, unsafe_allow_html=True)
         st.markdown("<h1 style='text-align: center;'>🚍 Productivity Budget 8 Ratios (Rural/Urban)</h1>", unsafe_allow_html=True)
 
-        # ✅ ORM Database connection
+        # ✅ Shared ratio store: any period is two prefix-sum lookups
         try:
-            with get_session() as db:
-                data_query = db.query(InputData).all()
-                df = pd.DataFrame([{k: v for k, v in d.__dict__.items() if not k.startswith("_")} for d in data_query])
+            cube = ratio_cube()
         except Exception as err:
             st.error(f"MySQL connection error: {err}")
             st.stop()
 
-        if df.empty:
+        if not cube.depots:
             st.warning("⚠ No data found in input_data table.")
             st.stop()
 
-        df['data_date'] = pd.to_datetime(df['data_date'], errors='coerce')
-
-        all_depots = sorted(df['depot_name'].dropna().unique())
         time_periods = ['Daily', 'Monthly', 'Quarterly', 'Yearly']
 
         col_a, col_b = st.columns(2)
@@ -83,17 +78,16 @@ class prod_ratios_DM:
         with col_b:
             selected_time_period = st.selectbox("Select Time Period:", time_periods)
 
-        filtered_df = df[df['depot_name'] == selected_depot]
-        min_date = filtered_df["data_date"].min()
-        max_date = filtered_df["data_date"].max()
-        if pd.isna(min_date) or pd.isna(max_date):
+        bounds = cube.bounds([selected_depot])
+        if bounds is None:
             st.warning("⚠ No valid date data found for the selected depot.")
             today = date.today()
             min_date = today - timedelta(days=30)
             max_date = today
         else:
-            min_date = min_date.date() if hasattr(min_date, "date") else min_date
-            max_date = max_date.date() if hasattr(max_date, "date") else max_date
+            min_date, max_date = bounds[0].date(), bounds[1].date()
+        years = sorted(cube.years([selected_depot]), reverse=True)
+        window = None
 
         col_c, col_d = st.columns(2)
 
@@ -101,11 +95,11 @@ class prod_ratios_DM:
         if selected_time_period == "Daily":
             with col_c:
                 date_filter = st.date_input("Select Date", min_value=min_date, max_value=max_date, value=max_date)
-            filtered_df = filtered_df[filtered_df['data_date'] == pd.to_datetime(date_filter)]
+            window = period_window("Daily", day=date_filter)
 
         elif selected_time_period == "Monthly":
             with col_c:
-                year_filter = st.selectbox("Year:", sorted(filtered_df['data_date'].dt.year.dropna().unique(), reverse=True), key="monthly_year")
+                year_filter = st.selectbox("Year:", years, key="monthly_year")
             with col_d:
                 month_filter = st.selectbox(
                     "Month:",
@@ -114,14 +108,12 @@ class prod_ratios_DM:
                                           "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"][x - 1],
                     key="monthly_month"
                 )
-            filtered_df = filtered_df[
-                (filtered_df['data_date'].dt.year == year_filter) &
-                (filtered_df['data_date'].dt.month == month_filter)
-            ]
+            if year_filter is not None:
+                window = period_window("Monthly", year=year_filter, month=month_filter)
 
         elif selected_time_period == "Quarterly":
             with col_c:
-                year_filter = st.selectbox("Year:", sorted(filtered_df['data_date'].dt.year.dropna().unique(), reverse=True), key="quarterly_year")
+                year_filter = st.selectbox("Year:", years, key="quarterly_year")
             with col_d:
                 quarter_filter = st.selectbox("Quarter:", ["Q1 (Jan–Mar)", "Q2 (Apr–Jun)", "Q3 (Jul–Sep)", "Q4 (Oct–Dec)"], key="quarter")
             quarter_map = {
@@ -131,26 +123,27 @@ class prod_ratios_DM:
                 "Q4 (Oct–Dec)": (10, 12)
             }
             start_month, end_month = quarter_map[quarter_filter]
-            filtered_df = filtered_df[
-                (filtered_df['data_date'].dt.year == year_filter) &
-                (filtered_df['data_date'].dt.month >= start_month) &
-                (filtered_df['data_date'].dt.month <= end_month)
-            ]
+            if year_filter is not None:
+                window = period_window("Quarterly", year=year_filter, quarter=end_month // 3)
 
         elif selected_time_period == "Yearly":
             with col_c:
-                year_filter = st.selectbox("Year:", sorted(filtered_df['data_date'].dt.year.dropna().unique(), reverse=True), key="yearly_year")
-            filtered_df = filtered_df[filtered_df['data_date'].dt.year == year_filter]
+                year_filter = st.selectbox("Year:", years, key="yearly_year")
+            if year_filter is not None:
+                window = period_window("Yearly", year=year_filter)
+
+        # Days, sums and means of the selected period
+        stats = cube.totals(window[0], window[1], [selected_depot]).iloc[0] if window else None
 
         # If data exists
-        if not filtered_df.empty:
-            num_days = filtered_df['data_date'].nunique()
+        if stats is not None and stats["days"] > 0:
+            num_days = int(stats["days"])
 
             st.markdown(f"<h2 style='text-align: center;'>Productivity Ratios For {selected_depot.capitalize()}</h2>", unsafe_allow_html=True)
             st.markdown(f"<mark> Category: {category.capitalize()}  |  Days Considered: {num_days}<mark>", unsafe_allow_html=True)
 
-            planned_schedules = int(filtered_df['Planned_Schedules'].sum())
-            total_drivers = int(filtered_df['Total_Drivers'].sum())
+            planned_schedules = int(stats['Planned_Schedules'])
+            total_drivers = int(stats['Total_Drivers'])
             drivers_per_schedule = (total_drivers / planned_schedules) if planned_schedules != 0 else 0
             drivers_per_schedule = round(drivers_per_schedule, 2)
 
@@ -242,7 +235,7 @@ class prod_ratios_DM:
 
             rows = ""
             for metric, col in metric_map.items():
-                value = round(filtered_df[col].mean(), 2)
+                value = round(stats[col], 2)
                 base_label = metric.replace(" (%)", "")
                 benchmark = thresholds.get(base_label, None)
                 variance = round(value - benchmark, 2) if benchmark is not None else None
@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import base64
 import json
 import calendar
@@ -8,7 +7,8 @@ import streamlit.components.v1 as components
 from datetime import date, timedelta
 
 from db_config import get_session
-from models import InputData, TSAdmin
+from models import TSAdmin
+from ratio_cube import period_window, ratio_cube
 
 # --------- Load config ----------
 try:
@@ -69,35 +69,25 @@ class prod_ratios_RM:
         """, unsafe_allow_html=True)
         st.markdown("<h1 style='text-align: center;'>🚍 Productivity Budget - All Depots Comparison</h1>", unsafe_allow_html=True)
 
-        # ✅ ORM Database Fetch
+        # ✅ Region depots (TS_ADMIN) and the shared ratio store
         try:
             with get_session() as db:
-                # Join InputData and TSAdmin by depot_name for this region
-                query = (
-                    db.query(InputData, TSAdmin.category)
-                    .join(TSAdmin, InputData.depot_name == TSAdmin.depot_name)
+                rows = (
+                    db.query(TSAdmin.depot_name, TSAdmin.category)
                     .filter(TSAdmin.region == self.user_region)
                     .all()
                 )
-
-                # Convert ORM results into DataFrame
-                data_list = []
-                for input_row, category in query:
-                    row_dict = {k: v for k, v in input_row.__dict__.items() if not k.startswith("_")}
-                    row_dict["category"] = category
-                    data_list.append(row_dict)
-
-                df = pd.DataFrame(data_list)
+            categories = {depot: category or "" for depot, category in rows}
+            cube = ratio_cube()
         except Exception as e:
             st.error(f"Error fetching data: {e}")
             st.stop()
 
-        if df.empty:
+        region_depots = [d for d in categories if d in set(cube.depots)]
+        if not region_depots:
             st.warning("⚠ No data available for the selected region.")
             st.stop()
 
-        df["data_date"] = pd.to_datetime(df["data_date"], errors="coerce")
-
         # --- Time Period Selection ---
         time_periods = ['Daily', 'Monthly', 'Quarterly', 'Yearly']
         selected_time_period = st.selectbox("Select Time Period:", time_periods)
@@ -108,27 +98,26 @@ class prod_ratios_RM:
         year_filter = None
         quarter_filter = None
 
-        min_date = df["data_date"].min()
-        max_date = df["data_date"].max()
-        if pd.isna(min_date) or pd.isna(max_date):
+        bounds = cube.bounds(region_depots)
+        if bounds is None:
             today = date.today()
             min_date = today - timedelta(days=30)
             max_date = today
         else:
-            min_date = min_date.date() if hasattr(min_date, "date") else min_date
-            max_date = max_date.date() if hasattr(max_date, "date") else max_date
+            min_date, max_date = bounds[0].date(), bounds[1].date()
+        years = sorted(cube.years(region_depots), reverse=True)
 
         col_e, col_f = st.columns(2)
-        filtered_df = pd.DataFrame()
+        window = None
 
         if selected_time_period == "Daily":
             with col_e:
                 date_filter = st.date_input("Select Date", min_value=min_date, max_value=max_date, value=max_date)
-            filtered_df = df[df['data_date'] == pd.to_datetime(date_filter)]
+            window = period_window("Daily", day=date_filter)
 
         elif selected_time_period == "Monthly":
             with col_e:
-                year_filter = st.selectbox("Year:", sorted(df['data_date'].dt.year.dropna().unique(), reverse=True), key="monthly_year_all")
+                year_filter = st.selectbox("Year:", years, key="monthly_year_all")
             with col_f:
                 month_filter = st.selectbox(
                     "Month:",
@@ -136,30 +125,30 @@ class prod_ratios_RM:
                     format_func=lambda x: ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"][x-1],
                     key="monthly_month_all"
                 )
-            filtered_df = df[
-                (df['data_date'].dt.year == year_filter) &
-                (df['data_date'].dt.month == month_filter)
-            ]
+            if year_filter is not None:
+                window = period_window("Monthly", year=year_filter, month=month_filter)
 
         elif selected_time_period == "Quarterly":
             with col_e:
-                year_filter = st.selectbox("Year:", sorted(df['data_date'].dt.year.dropna().unique(), reverse=True), key="quarterly_year_all")
+                year_filter = st.selectbox("Year:", years, key="quarterly_year_all")
             with col_f:
                 quarter_filter = st.selectbox("Quarter:", ["Q1 (Jan–Mar)","Q2 (Apr–Jun)","Q3 (Jul–Sep)","Q4 (Oct–Dec)"], key="quarter_all")
             quarter_map = {"Q1 (Jan–Mar)": (1,3), "Q2 (Apr–Jun)": (4,6), "Q3 (Jul–Sep)": (7,9), "Q4 (Oct–Dec)": (10,12)}
             start_month, end_month = quarter_map[quarter_filter]
-            filtered_df = df[
-                (df['data_date'].dt.year == year_filter) &
-                (df['data_date'].dt.month >= start_month) &
-                (df['data_date'].dt.month <= end_month)
-            ]
+            if year_filter is not None:
+                window = period_window("Quarterly", year=year_filter, quarter=end_month // 3)
 
         elif selected_time_period == "Yearly":
             with col_e:
-                year_filter = st.selectbox("Year:", sorted(df['data_date'].dt.year.dropna().unique(), reverse=True), key="yearly_year_all")
-            filtered_df = df[df['data_date'].dt.year == year_filter]
-
-        if filtered_df.empty:
+                year_filter = st.selectbox("Year:", years, key="yearly_year_all")
+            if year_filter is not None:
+                window = period_window("Yearly", year=year_filter)
+
+        # One row per depot with data in the period: days, sums and means from the store
+        stats = cube.totals(window[0], window[1], region_depots) if window else None
+        if stats is not None:
+            stats = stats[stats["days"] > 0]
+        if stats is None or stats.empty:
             st.warning("⚠ No data available for the selected filters.")
             st.stop()
 
@@ -192,7 +181,7 @@ class prod_ratios_RM:
             "Drivers/Schedule (Ratio)": "Drivers/Schedule"
         }
 
-        depots = sorted(filtered_df["depot_name"].unique())
+        depots = sorted(stats.index)
         html_rows = ""
 
         for metric, base_label in metric_map.items():
@@ -203,7 +192,7 @@ class prod_ratios_RM:
                 benchmarks = []
                 for depot in depots:
                     try:
-                        cat = filtered_df.loc[filtered_df["depot_name"] == depot, "category"].iloc[0].capitalize()
+                        cat = categories[depot].capitalize()
                         benchmark = BENCHMARKS.get(cat, {}).get(base_label, None)
                         if benchmark is not None:
                             benchmarks.append(benchmark)
@@ -215,24 +204,21 @@ class prod_ratios_RM:
             depot_cells = ""
             depot_values_for_avg = []
             for depot in depots:
-                depot_df = filtered_df[filtered_df["depot_name"] == depot]
-                if depot_df.empty:
-                    depot_cells += "<td>---</td>"
-                    continue
+                depot_stats = stats.loc[depot]
 
                 try:
                     if metric == "Planned Schedules":
-                        value = int(depot_df["Planned_Schedules"].sum())
+                        value = int(depot_stats["Planned_Schedules"])
                     elif metric == "Total Drivers":
-                        value = int(depot_df["Total_Drivers"].sum())
+                        value = int(depot_stats["Total_Drivers"])
                     elif metric == "Drivers/Schedule (Ratio)":
-                        planned_schedules = depot_df["Planned_Schedules"].sum()
-                        total_drivers = depot_df["Total_Drivers"].sum()
+                        planned_schedules = depot_stats["Planned_Schedules"]
+                        total_drivers = depot_stats["Total_Drivers"]
                         value = round(total_drivers / planned_schedules, 2) if planned_schedules else 0
                     else:
                         col_name = config.get("category_to_column", {}).get(base_label, None)
-                        if col_name and col_name in depot_df.columns:
-                            value = round(depot_df[col_name].mean(), 1)
+                        if col_name and col_name in depot_stats.index:
+                            value = round(depot_stats[col_name], 1)
                         else:
                             value = "---"
                 except Exception:
@@ -246,7 +232,7 @@ class prod_ratios_RM:
                 # color compare with benchmark if applicable
                 if base_label and isinstance(value, (int, float)):
                     try:
-                        cat = depot_df["category"].iloc[0].capitalize()
+                        cat = categories[depot].capitalize()
                         benchmark_val = BENCHMARKS.get(cat, {}).get(base_label, None)
                         if benchmark_val is not None:
                             delta = value - benchmark_val
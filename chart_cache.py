@@ -0,0 +1,89 @@
+import hashlib
+import json
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# ----------------------------------------------------------------------
+# 📊 Figure cache shared by the dashboards
+# ----------------------------------------------------------------------
+# Figures are memoized on (chart type, data fingerprint, options) and rendered
+# with a key derived from the same triple, so an unchanged chart is neither
+# rebuilt nor remounted on rerun (a random uuid key forces a remount every time).
+# Cached figures are shared between sessions: treat them as read-only.
+
+MAX_FIGURES = 256
+
+_figures = OrderedDict()
+_lock = threading.Lock()
+
+
+def data_fingerprint(*objs):
+    """Stable hash of DataFrames / Series / plain values (content, columns and dtypes)."""
+    h = hashlib.md5()
+    for obj in objs:
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            frame = isinstance(obj, pd.DataFrame)
+            h.update(repr(obj.columns if frame else obj.name).encode())
+            h.update(repr(list(obj.dtypes) if frame else obj.dtype).encode())
+            try:
+                h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+            except TypeError:
+                # unhashable cells (lists, dicts) - fall back to pickling the frame
+                h.update(pickle.dumps(obj))
+        else:
+            h.update(json.dumps(obj, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def chart_key(chart_type, *data, **options):
+    """Stable Streamlit element key for a chart of chart_type over data with options."""
+    return f"{chart_type}_{data_fingerprint(*data, options)[:16]}"
+
+
+def cached_figure(chart_type, data, build, **options):
+    """
+    Return build(data, **options), memoized on (chart_type, data fingerprint, options).
+    The cache is a bounded LRU shared across sessions.
+    """
+    return _figure(chart_key(chart_type, data, **options), data, build, options)
+
+
+def _figure(key, data, build, options):
+    """The figure cached under key, built and stored on a miss."""
+    with _lock:
+        fig = _figures.get(key)
+        if fig is not None:
+            _figures.move_to_end(key)
+            return fig
+
+    fig = build(data, **options)
+
+    with _lock:
+        _figures[key] = fig
+        _figures.move_to_end(key)
+        while len(_figures) > MAX_FIGURES:
+            _figures.popitem(last=False)
+    return fig
+
+
+def plotly_chart(chart_type, data, build, **options):
+    """Build (or reuse) a plotly figure and render it with a stable key."""
+    # one fingerprint serves as both the cache key and the element key
+    key = chart_key(chart_type, data, **options)
+    fig = _figure(key, data, build, options)
+    st.plotly_chart(fig, use_container_width=True, key=key)
+    return fig
+
+
+def altair_chart(chart, chart_type, *data, **options):
+    """Render an Altair chart with a key derived from its type, source data and options."""
+    key = chart_key(chart_type, *data, **options)
+    try:
+        st.altair_chart(chart, use_container_width=True, key=key)
+    except TypeError:
+        # Streamlit versions whose st.altair_chart has no key argument
+        st.altair_chart(chart, use_container_width=True)
@@ -1,13 +1,20 @@
 import pandas as pd
 import streamlit as st
 import plotly.express as px
-import uuid
-from sqlalchemy import create_engine
 import itertools
 import hashlib
 import calendar
-from urllib.parse import quote_plus
 from auth import get_depot_by_userid, get_role_by_userid
+from chart_cache import plotly_chart, chart_key
+from depot_data import (
+    MU_REASON_COLS, SL_REASON_COLS, load_mu_sl_monthly, normalize_depots,
+    load_absenteeism_counts, absenteeism_by_depot, absenteeism_total, leave_type_counts, freeze, shared_cache,
+    fragment, open_section
+)
+from driver_data import fy_label, fy_start_year
+from driver_percentiles import RANKING_COLUMNS, driver_percentiles, fy_caption
+from driver_rankings import RANK_METRICS, SHOW_OPTIONS, driver_totals, top_bottom
+from query_runner import QueryError, run_queries
 import json
 from mysql.connector import Error
 import pymysql
@@ -80,7 +87,8 @@ def get_depot_settings(_conn):
             cursor.close()
 
 # ---------------------- 2. DATA FETCHING & PROCESSING --------------------------
-#@st.cache_data(show_spinner=False, ttl=3600) # Cache the result for 1 hour
+# Cached for 1 hour and shared between sessions: each caller gets its own views (see depot_data.shared_cache)
+@shared_cache(show_spinner=False, ttl=3600)
 def preaggregate(selected_depot, depot_settings):
     
     OP_DATE = "operations_date"
@@ -99,47 +107,36 @@ def preaggregate(selected_depot, depot_settings):
 
     selected_depot = str(selected_depot).replace("\xa0", " ").strip().upper()
 
-    try:
-        db_user = config['db']['user']
-        db_password = quote_plus(config['db']['password'])
-        db_host = config['db']['host']
-        db_name = config['db']['database']
-        engine = create_engine(f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}")
-    except Exception as e:
-        st.error(f"❌ Error creating DB engine: {e}")
-        empty_df = pd.DataFrame()
-        return empty_df, empty_df, empty_df, empty_df
-
-    def read_table(query, params=None):
-        try:
-            with st.spinner("Loading data…"):
-                df = pd.read_sql(query, engine, params=params)
-            df.columns = [c.strip().lower() for c in df.columns]
-            return df
-        except Exception as e:
-            st.error(f"❌ Database error: {e}")
-            return pd.DataFrame()
-
     # Query only for selected depot — keep existing behavior for per-depot charts
     rtc_query = f"""
         SELECT * FROM daily_operations 
         WHERE TRIM({DEPOT}) LIKE %s COLLATE utf8mb4_general_ci
     """
-    rtc = read_table(rtc_query, params=(selected_depot,))
-
-    service_master = read_table("SELECT service_number, dept_time, arr_time, day_night_code, depot FROM service_master")
-
+    service_master_query = f"""
+        SELECT service_number, dept_time, arr_time, day_night_code, depot FROM service_master 
+        WHERE TRIM({DEPOT}) LIKE %s COLLATE utf8mb4_general_ci
+    """
     lsa_query = f"""
-        SELECT * FROM driver_absenteeism 
+        SELECT {EMP_ID}, {DEPOT}, {LEAVE_TYPE}, `{LSA_DATE}` FROM driver_absenteeism 
         WHERE TRIM({DEPOT}) LIKE %s COLLATE utf8mb4_general_ci
     """
-    lsa = read_table(lsa_query, params=(selected_depot,))
-
     ghc_query = f"""
-        SELECT * FROM ghc_2024 
+        SELECT employee_ID, depot, final_Grading FROM ghc_2024 
         WHERE TRIM({DEPOT}) LIKE %s COLLATE utf8mb4_general_ci
     """
-    ghc_2024 = read_table(ghc_query, params=(selected_depot,))
+
+    # The four reads are independent: run them concurrently on pooled connections
+    with st.spinner("Loading data…"):
+        tables = run_queries({
+            "daily_operations": (rtc_query, (selected_depot,)),
+            "service_master": (service_master_query, (selected_depot,)),
+            "driver_absenteeism": (lsa_query, (selected_depot,)),
+            "ghc_2024": (ghc_query, (selected_depot,)),
+        })
+    for df in tables.values():
+        df.columns = [c.strip().lower() for c in df.columns]
+    rtc, service_master = tables["daily_operations"], tables["service_master"]
+    lsa, ghc_2024 = tables["driver_absenteeism"], tables["ghc_2024"]
 
     for df in [rtc, service_master, lsa, ghc_2024]:
         if DEPOT in df.columns:
@@ -256,7 +253,7 @@ def preaggregate(selected_depot, depot_settings):
     if "region" not in depot_monthly.columns:
         depot_monthly["region"] = depot_monthly[DEPOT].map(lambda d: depot_settings.get(d, {}).get("region", "Unknown"))
 
-    return depot_monthly, driver_monthly, lsa_valid, ghc_2024
+    return freeze(depot_monthly), freeze(driver_monthly), freeze(lsa_valid), freeze(ghc_2024)
 
 def format_indian(num):
     """Format number in Indian numbering system (Lakhs, Crores)."""
@@ -301,6 +298,13 @@ def plot_comparison_bar(combined_df, ycol, avg1, avg2, depot1, depot2, title, yt
         .sort_values(['year', 'month'])
     )
     chart_df['month_label'] = chart_df['month'].dt.strftime('%b-%y')
+    plotly_chart(
+        "comparison_bar", chart_df, _comparison_bar_figure,
+        avg1=avg1, avg2=avg2, depot1=depot1, depot2=depot2, title=title, ytitle=ytitle,
+        color_map=color_map, compare_with_region=compare_with_region
+    )
+
+def _comparison_bar_figure(chart_df, avg1, avg2, depot1, depot2, title, ytitle, color_map, compare_with_region):
     fig = px.bar(
         chart_df,
         x='month_label',
@@ -351,7 +355,7 @@ def plot_comparison_bar(combined_df, ycol, avg1, avg2, depot1, depot2, title, yt
             font=dict(size=10),
         ),
     )
-    st.plotly_chart(fig, use_container_width=True, key=str(uuid.uuid4()))
+    return fig
 
 def plot_bar(df, ycol, depot_avg=None, title="", ytitle="", depot=None, region_avg=None):
     if df.empty or ycol not in df.columns:
@@ -374,6 +378,12 @@ def plot_bar(df, ycol, depot_avg=None, title="", ytitle="", depot=None, region_a
         st.info(f"ℹ️ Cannot display graph for '{ytitle}': No data points found after aggregation.")
         return
     chart_df["month_label"] = chart_df["month"].dt.strftime("%b-%y")
+    plotly_chart(
+        "bar", chart_df, _bar_figure,
+        ycol=ycol, depot_avg=depot_avg, title=title, ytitle=ytitle, region_avg=region_avg
+    )
+
+def _bar_figure(chart_df, ycol, depot_avg, title, ytitle, region_avg):
     fig = px.bar(
         chart_df,
         x="month_label",
@@ -414,7 +424,7 @@ def plot_bar(df, ycol, depot_avg=None, title="", ytitle="", depot=None, region_a
         yaxis_title=ytitle,
         bargap=0.3
     )
-    st.plotly_chart(fig, use_container_width=True, key=str(uuid.uuid4()))
+    return fig
 
 
 def compute_region_avgs(depot_monthly, depot_name, depot_settings):
@@ -463,6 +473,7 @@ def compute_true_region_avg(depot_monthly, depot_name, depot_settings, year_sel=
         "absenteeism": region_df["absenteeism"].mean()
     }
 
+@fragment
 def show_main_bar_line_charts(df1, depot, depot_monthly=None, depot_settings=None, mysql_conn=None):
     """
     Display depot-level performance charts with an optional region average overlay.
@@ -488,6 +499,11 @@ def show_main_bar_line_charts(df1, depot, depot_monthly=None, depot_settings=Non
     if show_region_avg:
         year_sel = st.session_state.get("year_sel", "All")
 
+        # on a fragment rerun the page's connection has already been closed by depot_DM()
+        own_conn = None
+        if mysql_conn is not None and not getattr(mysql_conn, "open", True):
+            mysql_conn = own_conn = get_connection()
+
         # 1) Prefer DB-driven metric: total_km_per_depot_per_month (if present)
         if mysql_conn is not None:
             try:
@@ -568,6 +584,9 @@ def show_main_bar_line_charts(df1, depot, depot_monthly=None, depot_settings=Non
         if region_avg_km is None:
             st.warning("Region average could not be computed (DB and fallback both failed).")
 
+        if own_conn:
+            own_conn.close()
+
     # ---------------- Display Charts ----------------
     avg_label = "Region Average" if show_region_avg else "Depot Average"
 
@@ -680,7 +699,7 @@ def get_region_means_from_db(mysql_conn, current_depot, year_sel="All"):
     Notes:
       - Uses parameterized queries to avoid SQL injection.
       - If year_sel == "All", aggregates over all available years.
-      - absenteeism is computed from driver_absenteeism (COUNT per depot).
+      - absenteeism comes from the cached absenteeism_counts rollup (rows per depot).
     """
     try:
         if not current_depot:
@@ -711,16 +730,12 @@ def get_region_means_from_db(mysql_conn, current_depot, year_sel="All"):
         # Build placeholders and params for IN(...)
         placeholders = ",".join(["%s"] * len(region_depots))
         params_ops = tuple(region_depots)
-        params_lsa = tuple(region_depots)
 
         # Optional year filter
         year_filter_ops = ""
-        year_filter_lsa = ""
         if year_sel != "All":
             year_filter_ops = " AND YEAR(operations_date) = %s "
-            year_filter_lsa = " AND YEAR(`date`) = %s "
             params_ops = params_ops + (int(year_sel),)
-            params_lsa = params_lsa + (int(year_sel),)
 
         # 3) per-depot operational aggregates from daily_operations (sum per depot)
         ops_query = f"""
@@ -736,16 +751,8 @@ def get_region_means_from_db(mysql_conn, current_depot, year_sel="All"):
 
         ops_df = pd.read_sql(ops_query, mysql_conn, params=params_ops)
 
-        # 4) per-depot absenteeism counts from driver_absenteeism (count per depot)
-        lsa_query = f"""
-            SELECT TRIM(UPPER(depot)) AS depot,
-                   COUNT(*) AS absenteeism
-            FROM driver_absenteeism
-            WHERE TRIM(UPPER(depot)) IN ({placeholders})
-            {year_filter_lsa}
-            GROUP BY TRIM(UPPER(depot))
-        """
-        lsa_df = pd.read_sql(lsa_query, mysql_conn, params=params_lsa)
+        # 4) per-depot absenteeism counts from the absenteeism_counts rollup
+        lsa_df = absenteeism_by_depot(load_absenteeism_counts(tuple(region_depots)), year_sel)
 
         # Normalize/merge
         if ops_df.columns.dtype != "O":
@@ -845,15 +852,11 @@ def get_region_avgs_from_ts_admin(mysql_conn, current_depot, depot_monthly, year
 
         placeholders = ",".join(["%s"] * num_depots)
         params_ops = tuple(region_depots)
-        params_lsa = tuple(region_depots)
 
         year_filter_ops = ""
-        year_filter_lsa = ""
         if year_sel != "All":
             year_filter_ops = " AND YEAR(operations_date) = %s "
-            year_filter_lsa = " AND YEAR(`date`) = %s "
             params_ops = params_ops + (int(year_sel),)
-            params_lsa = params_lsa + (int(year_sel),)
 
         # 3) Region sums
         ops_sum_query = f"""
@@ -865,12 +868,6 @@ def get_region_avgs_from_ts_admin(mysql_conn, current_depot, depot_monthly, year
             WHERE TRIM(UPPER(depot)) IN ({placeholders})
             {year_filter_ops}
         """
-        lsa_sum_query = f"""
-            SELECT COUNT(*) AS region_total_absenteeism
-            FROM driver_absenteeism
-            WHERE TRIM(UPPER(depot)) IN ({placeholders})
-            {year_filter_lsa}
-        """
         months_query = f"""
             SELECT COUNT(DISTINCT DATE_FORMAT(operations_date, '%%Y-%%m')) AS months_present
             FROM daily_operations
@@ -885,11 +882,12 @@ def get_region_avgs_from_ts_admin(mysql_conn, current_depot, depot_monthly, year
             st.error(f"Error fetching region ops sums for {region_name}: {e}")
             ops_sum_df = pd.DataFrame(columns=['region_total_km','region_total_hours','region_total_earnings'])
 
+        # absenteeism (region total and per depot) is answered from the cached rollup
         try:
-            lsa_sum_df = pd.read_sql(lsa_sum_query, mysql_conn, params=params_lsa)
+            abs_counts = load_absenteeism_counts(tuple(region_depots))
         except Exception as e:
-            st.error(f"Error fetching region absenteeism sum for {region_name}: {e}")
-            lsa_sum_df = pd.DataFrame(columns=['region_total_absenteeism'])
+            st.error(f"Error fetching region absenteeism for {region_name}: {e}")
+            abs_counts = None
 
         try:
             months_df = pd.read_sql(months_query, mysql_conn, params=params_ops)
@@ -912,7 +910,7 @@ def get_region_avgs_from_ts_admin(mysql_conn, current_depot, depot_monthly, year
         region_total_km = safe_scalar(ops_sum_df, 'region_total_km', float, 0.0)
         region_total_hours = safe_scalar(ops_sum_df, 'region_total_hours', float, 0.0)
         region_total_earnings = safe_scalar(ops_sum_df, 'region_total_earnings', float, 0.0)
-        region_total_abs = safe_scalar(lsa_sum_df, 'region_total_absenteeism', int, 0)
+        region_total_abs = absenteeism_total(abs_counts, year=year_sel)
         months_present = safe_scalar(months_df, 'months_present', int, 0)
 
         # avoid division by zero
@@ -937,14 +935,6 @@ def get_region_avgs_from_ts_admin(mysql_conn, current_depot, depot_monthly, year
             {year_filter_ops}
             GROUP BY TRIM(UPPER(depot))
         """
-        lsa_depot_query = f"""
-            SELECT TRIM(UPPER(depot)) AS depot,
-                   COUNT(*) AS absenteeism
-            FROM driver_absenteeism
-            WHERE TRIM(UPPER(depot)) IN ({placeholders})
-            {year_filter_lsa}
-            GROUP BY TRIM(UPPER(depot))
-        """
 
         try:
             ops_df = pd.read_sql(ops_depot_query, mysql_conn, params=params_ops)
@@ -952,11 +942,7 @@ def get_region_avgs_from_ts_admin(mysql_conn, current_depot, depot_monthly, year
             st.error(f"Error fetching per-depot ops for {region_name}: {e}")
             ops_df = pd.DataFrame(columns=['depot','total_km','total_hours','total_earnings'])
 
-        try:
-            lsa_df = pd.read_sql(lsa_depot_query, mysql_conn, params=params_lsa)
-        except Exception as e:
-            st.error(f"Error fetching per-depot absenteeism for {region_name}: {e}")
-            lsa_df = pd.DataFrame(columns=['depot','absenteeism'])
+        lsa_df = absenteeism_by_depot(abs_counts, year_sel)
 
         # Normalize columns to lowercase
         for df in [ops_df, lsa_df]:
@@ -1061,19 +1047,24 @@ def depot_DM():
     st.markdown(f"<span style='font-size: 1.5em;'><b>{depot1}</b></span> ({depot_category})", unsafe_allow_html=True)
 
     # ------------------- Fetch Data for selected depot -------------------
-    depot_monthly, driver_monthly, lsa_valid, ghc_2024 = preaggregate(selected_depot, depot_settings)
+    try:
+        depot_monthly, driver_monthly, lsa_valid, ghc_2024 = preaggregate(selected_depot, depot_settings)
+    except QueryError:
+        st.stop()  # already reported by run_queries
 
     # ------------------- Normalize Dataframes -------------------
     if depot_monthly is None or depot_monthly.empty:
         depot_monthly = pd.DataFrame(columns=[DEPOT, "year", "month", "total_km", "total_hours", "total_earnings", "absenteeism", "region", "category"])
     else:
-        # ensure region & category columns exist (use depot_settings mapping)
+        # ensure region & category columns exist (use depot_settings mapping); depot names are
+        # already normalized by preaggregate, whose frames are cached and must not be written to
+        derived = {}
         if "region" not in depot_monthly.columns:
-            depot_monthly["region"] = depot_monthly[DEPOT].map(lambda d: depot_settings.get(str(d).strip().upper(), {}).get("region", "Unknown"))
+            derived["region"] = depot_monthly[DEPOT].map(lambda d: depot_settings.get(str(d).strip().upper(), {}).get("region", "Unknown"))
         if "category" not in depot_monthly.columns:
-            depot_monthly["category"] = depot_monthly[DEPOT].map(lambda d: depot_settings.get(str(d).strip().upper(), {}).get("category", "Unknown"))
-        # normalize depot column
-        depot_monthly[DEPOT] = depot_monthly[DEPOT].astype(str).str.strip().str.upper()
+            derived["category"] = depot_monthly[DEPOT].map(lambda d: depot_settings.get(str(d).strip().upper(), {}).get("category", "Unknown"))
+        if derived:
+            depot_monthly = depot_monthly.assign(**derived)
 
     if driver_monthly is None or driver_monthly.empty:
         driver_monthly = pd.DataFrame(columns=[DEPOT, EMP_ID, "year", "month", "total_km", "total_hours", "total_earnings", "absenteeism"])
@@ -1108,8 +1099,7 @@ def depot_DM():
                 driver_monthly = driver_monthly[driver_monthly["year"] == year_int]
             if not lsa_valid.empty and "year" in lsa_valid.columns:
                 lsa_valid = lsa_valid[lsa_valid["year"] == year_int]
-            if not ghc_2024.empty and "year" in ghc_2024.columns:
-                ghc_2024 = ghc_2024[ghc_2024["year"] == year_int]
+            # ghc_2024 is one grading round (no year column): its grades apply to every year
         except Exception:
             st.warning("Year filter couldn't be applied cleanly; continuing without strict year filter.")
 
@@ -1124,12 +1114,18 @@ def depot_DM():
 
     # ------------------- Per-depot charts -------------------
     # These show depot-only charts with optional region-average lines handled by show_main_bar_line_charts()
-    show_main_bar_line_charts(filtered_depot_monthly, depot1, depot_monthly, depot_settings, mysql_conn=mysql_conn)
+    # sections with their own widgets are fragments, so changing them only reruns that section
+    with st.expander("📊 KMs, Hours, Earnings & Absenteeism", expanded=True):
+        show_main_bar_line_charts(filtered_depot_monthly, depot1, depot_monthly, depot_settings, mysql_conn=mysql_conn)
     # ----------------- Other Visualizations -------------------
-    show_absenteeism_pie(depot1, lsa_valid, year_sel, is_region=False, region_depots=None)
-    show_health_grade_distribution(depot1, ghc_2024, is_region=False, region_depots=None)
-    show_top_bottom_drivers(depot1, driver_monthly, years, DEPOT, EMP_ID, is_region=False, region_depots=None)
-    show_mu_sl_reasons(depot1, config['db'], is_region=False, region_depots=None)
+    # these sections run their own queries, so they only load once opened
+    if open_section("🗓️ Absenteeism Reasons & Health Grades", "dm_section_absenteeism"):
+        show_absenteeism_pie(depot1, year_sel, is_region=False, region_depots=None)
+        show_health_grade_distribution(depot1, ghc_2024, is_region=False, region_depots=None)
+    if open_section("🏅 Top & Bottom Drivers", "dm_section_drivers"):
+        show_top_bottom_drivers(depot1, driver_monthly, years, DEPOT, EMP_ID, is_region=False, region_depots=None)
+    if open_section("🩺 MU & SL Reasons", "dm_section_mu_sl"):
+        show_mu_sl_reasons(depot1, config['db'], is_region=False, region_depots=None)
 
     # ------------------- Close Connection -------------------
     if mysql_conn:
@@ -1137,43 +1133,25 @@ def depot_DM():
 
 # ---------------------- 4. MISC VISUALIZATION FUNCTIONS ----------------------
 
-def show_absenteeism_pie(entity_name, lsa_df, year_sel="All", is_region=False, region_depots=None):
-    # Column literals for local function use
-    DEPOT = "depot"
-    
+def show_absenteeism_pie(entity_name, year_sel="All", is_region=False, region_depots=None):
     st.markdown("## 5. Absenteeism Reasons Distribution")
-    if lsa_df is None or lsa_df.empty:
-        st.info(f"🚫 No leave data found for **{entity_name}**.")
-        return
+    depots = region_depots if is_region and region_depots else [entity_name]
 
-    lsa_df[DEPOT] = lsa_df[DEPOT].astype(str).str.strip().str.upper()
-    if is_region and region_depots:
-        depots_upper = [d.upper() for d in region_depots]
-        lsa_df = lsa_df[lsa_df[DEPOT].isin(depots_upper)]
-    else:
-        lsa_df = lsa_df[lsa_df[DEPOT] == entity_name.strip().upper()]
-
-    if lsa_df.empty:
-        st.info(f"🚫 No records for **{entity_name}** after filtering.")
+    # leave-type totals come from the cached absenteeism_counts rollup
+    try:
+        counts = load_absenteeism_counts(normalize_depots(depots))
+    except Exception as e:
+        st.error(f"❌ Error loading absenteeism for **{entity_name}**: {e}")
+        return
+    if counts.empty:
+        st.info(f"🚫 No leave data found for **{entity_name}**.")
         return
 
-    lsa_df['date'] = pd.to_datetime(lsa_df['date'], errors="coerce")
-    lsa_df['year'] = lsa_df['date'].dt.year
-    lsa_valid = lsa_df.dropna(subset=['leave_type']).copy()
-    
-    if year_sel != "All":
-        lsa_valid = lsa_valid[lsa_valid["year"] == int(year_sel)]
-
-    if lsa_valid.empty:
+    leave_counts = leave_type_counts(counts, depots, year_sel)
+    if leave_counts.empty:
         st.info(f"🚫 No leave data for **{entity_name}** in year {year_sel}.")
         return
 
-    leave_counts = (
-        lsa_valid['leave_type']
-        .value_counts()
-        .reset_index(name="Count")
-        .rename(columns={"index": "leave_type"})
-    )
     fig = px.pie(
         leave_counts,
         names="leave_type",
@@ -1182,36 +1160,30 @@ def show_absenteeism_pie(entity_name, lsa_df, year_sel="All", is_region=False, r
         color_discrete_sequence=px.colors.qualitative.Set3
     )
     fig.update_traces(textposition="inside", textinfo="percent+label")
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(fig, use_container_width=True, key=chart_key("absenteeism_pie", leave_counts, entity=entity_name))
 
 
 def show_health_grade_distribution(entity_name, ghc_2024, is_region=False, region_depots=None):
     st.markdown("## 6. Employee Health Grade Distribution")
-    
-    # FIX: Convert columns to string first to avoid AttributeError on Linux
-    ghc_2024.columns = ghc_2024.columns.astype(str).str.strip().str.lower().str.replace(" ", "_")
 
+    # ghc_2024 comes from preaggregate (read-only, lower-case columns, upper-case depot): filter, don't mutate
     if "final_grading" not in ghc_2024.columns or "depot" not in ghc_2024.columns:
         st.error("❌ Required health check columns ('final_grading' or 'depot') not found.")
         return
 
-    ghc_2024["depot"] = ghc_2024["depot"].astype(str).str.strip().str.upper()
-
     if is_region and region_depots:
         depots_upper = [d.upper() for d in region_depots]
-        ghc3_filtered = ghc_2024[ghc_2024["depot"].isin(depots_upper)].copy()
+        grades = ghc_2024.loc[ghc_2024["depot"].isin(depots_upper), "final_grading"]
     else:
-        ghc3_filtered = ghc_2024[ghc_2024["depot"] == entity_name.strip().upper()].copy()
+        grades = ghc_2024.loc[ghc_2024["depot"] == entity_name.strip().upper(), "final_grading"]
 
-    if ghc3_filtered.empty:
+    if grades.empty:
         st.warning(f"⚠️ No health grade data found for **{entity_name}**.")
         return
 
-    ghc3_filtered.rename(columns={"final_grading": "grade"}, inplace=True)
-    ghc3_filtered = ghc3_filtered[ghc3_filtered["grade"].notna()]
-    ghc3_filtered["grade"] = ghc3_filtered["grade"].astype(str).str.strip()
+    grades = grades.dropna().astype(str).str.strip().rename("grade")
 
-    grade_counts = ghc3_filtered.groupby("grade").size().reset_index(name="num_employees")
+    grade_counts = grades.to_frame().groupby("grade").size().reset_index(name="num_employees")
     if grade_counts.empty:
         st.info(f"ℹ️ No Health Grade data available for {entity_name}.")
         return
@@ -1237,34 +1209,35 @@ def show_health_grade_distribution(entity_name, ghc_2024, is_region=False, regio
     )
     col1, col2, col3 = st.columns([1, 6, 1])
     with col2:
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key=chart_key("health_grades", grade_counts, entity=entity_name))
 
 #TOP & BOTTOM DRIVERS
+@fragment
 def show_top_bottom_drivers(entity_name, driver_monthly, years, DEPOT_COL, EMP_COL, is_region=False, region_depots=None):
     """
-    Show Top & Bottom 5 drivers for either a depot or all depots in a region.
+    Show Top & Bottom drivers (fixed count or top/bottom share) for either a depot or all depots in a region.
     """
-    st.markdown("## Top & Bottom 5 Drivers")
+    st.markdown("## Top & Bottom Drivers")
 
-    # Filter by depot or region
-    if is_region and region_depots:
-        depot_keys = [d.strip().lower() for d in region_depots]
-        df = driver_monthly[driver_monthly[DEPOT_COL].str.strip().str.lower().isin(depot_keys)].copy()
-    else:
-        df = driver_monthly[driver_monthly[DEPOT_COL].str.strip().str.lower() == entity_name.strip().lower()].copy()
-
-    if df.empty:
+    # Filter by depot or region (depot names are already upper-cased by preaggregate)
+    depot_keys = {d.strip().upper() for d in (region_depots if is_region and region_depots else [entity_name])}
+    if driver_monthly is None or driver_monthly.empty or DEPOT_COL not in driver_monthly.columns:
         st.info(f"🚫 No driver data for **{entity_name}**.")
         return
+    scope = driver_monthly.loc[driver_monthly[DEPOT_COL].isin(depot_keys), ["year", "month"]]
 
-    df["month_label"] = df["month"].dt.strftime("%b-%y")
+    if scope.empty:
+        st.info(f"🚫 No driver data for **{entity_name}**.")
+        return
 
     # ---------------- Filters ----------------
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
 
-    # ✅ Year options with latest year selected by default
-    year_list = sorted(df["year"].dropna().unique())
-    year_options = ["All"] + [str(y) for y in year_list]
+    # ✅ Year options (calendar years, then financial years) with latest year selected by default
+    year_list = sorted(scope["year"].dropna().unique())
+    month_fy = fy_start_year(pd.to_datetime(scope["month"]))
+    fy_starts = {f"FY {fy_label(int(s))}": int(s) for s in sorted(month_fy.dropna().unique())}
+    year_options = ["All"] + [str(y) for y in year_list] + list(fy_starts)
     default_year_index = year_options.index(str(max(year_list))) if len(year_list) > 0 else 0
 
     top_year = col1.selectbox(
@@ -1275,13 +1248,15 @@ def show_top_bottom_drivers(entity_name, driver_monthly, years, DEPOT_COL, EMP_C
     )
 
     # ✅ Month options with latest month selected by default
+    fy_start = fy_starts.get(top_year)
     if top_year == "All":
-        month_options = sorted(df["month_label"].unique(), key=lambda x: pd.to_datetime(x, format="%b-%y"))
+        months = scope["month"]
+    elif fy_start is not None:
+        months = scope.loc[month_fy == fy_start, "month"]
     else:
-        month_options = sorted(
-            df[df["year"] == int(top_year)]["month_label"].unique(),
-            key=lambda x: pd.to_datetime(x, format="%b-%y")
-        )
+        months = scope.loc[scope["year"] == int(top_year), "month"]
+    month_values = sorted(months.dropna().unique())
+    month_options = [pd.Timestamp(m).strftime("%b-%y") for m in month_values]
 
     month_options_display = ["All"] + month_options
     default_month_index = month_options_display.index(month_options[-1]) if month_options else 0
@@ -1293,167 +1268,118 @@ def show_top_bottom_drivers(entity_name, driver_monthly, years, DEPOT_COL, EMP_C
         key="top_driver_month"
     )
 
-    # ✅ Add "Earnings" to rank options
-    rank_by = col3.selectbox("Rank by", ["KMs", "Hours", "Earnings", "Absenteeism"])
-
-    # ---------------- Apply filters ----------------
-    if top_year != "All":
-        df = df[df["year"] == int(top_year)]
-    if top_month != "All":
-        df = df[df["month_label"] == top_month]
-
-    if df.empty:
-        st.info("🚫 No driver data for selected filters.")
-        return
-
-    # ✅ Map rank column correctly
-    rank_col_map = {
-        "KMs": "total_km",
-        "Hours": "total_hours",
-        "Earnings": "total_earnings",
-        "Absenteeism": "absenteeism",
-    }
-    rank_col = rank_col_map[rank_by]
+    rank_by = col3.selectbox("Rank by", list(RANK_METRICS))
+    show = col4.selectbox("Show", list(SHOW_OPTIONS), key="top_driver_show")
 
     # ---------------- Summarize ----------------
-    summary = df.groupby(EMP_COL).agg(
-        total_km=('total_km', 'sum'),
-        total_hours=('total_hours', 'sum'),
-        total_earnings=('total_earnings', 'sum'),
-        absenteeism=('absenteeism', 'sum')
-    ).reset_index()
+    month = None if top_month == "All" else month_values[month_options.index(top_month)]
+    summary = driver_totals(
+        driver_monthly, depot_keys, "All" if fy_start is not None else top_year, month, DEPOT_COL, EMP_COL, fy_start=fy_start
+    )
 
     if summary.empty:
-        st.info("🚫 No data after grouping.")
+        st.info("🚫 No driver data for selected filters.")
         return
 
     # ✅ Top and bottom logic (Absenteeism is reversed)
-    if rank_by == "Absenteeism":
-        top5 = summary.sort_values(rank_col, ascending=True).head(5)
-        bottom5 = summary.sort_values(rank_col, ascending=False).head(5)
-    else:
-        top5 = summary.sort_values(rank_col, ascending=False).head(5)
-        bottom5 = summary.sort_values(rank_col, ascending=True).head(5)
-
-    top5.insert(0, "Rank", range(1, len(top5) + 1))
-    bottom5.insert(0, "Rank", range(1, len(bottom5) + 1))
-    top5 = top5.set_index("Rank")
-    bottom5 = bottom5.set_index("Rank")
+    n, percentile = SHOW_OPTIONS[show]
+    top, bottom = top_bottom(summary, RANK_METRICS[rank_by], n=n, percentile=percentile)
+
+    # ✅ Where the listed drivers stand (shared percentile store): the store ranks each
+    # (depot, driver) over a financial year, so it is only shown when the ranking above does too
+    ranks_fy = fy_start is not None and month is None
+    if ranks_fy:
+        scopes = ("Region", "State") if is_region else ("Depot", "Region", "State")
+        store = driver_percentiles()
+        metric = RANKING_COLUMNS[RANK_METRICS[rank_by]]
+        top = store.with_percentiles(top, DEPOT_COL, EMP_COL, fy_start, metric, scopes)
+        bottom = store.with_percentiles(bottom, DEPOT_COL, EMP_COL, fy_start, metric, scopes)
 
     # ---------------- Display ----------------
     colA, colB = st.columns(2)
-    colA.subheader(f"7. Top 5 by {rank_by} ({'Region' if is_region else 'Depot'})")
-    colA.dataframe(top5)
-    colB.subheader(f"8. Bottom 5 by {rank_by} ({'Region' if is_region else 'Depot'})")
-    colB.dataframe(bottom5)
+    colA.subheader(f"7. Top {show} by {rank_by} ({'Region' if is_region else 'Depot'})")
+    colA.dataframe(top)
+    colB.subheader(f"8. Bottom {show} by {rank_by} ({'Region' if is_region else 'Depot'})")
+    colB.dataframe(bottom)
+    if ranks_fy:
+        st.caption(fy_caption(fy_start))
+    else:
+        st.caption("Depot / region / state percentiles are shown for a whole financial year: pick an FY under Year and All months.")
 
 #MU & SL REASONS
+@fragment
 def show_mu_sl_reasons(entity_name, db_config, is_region=False, region_depots=None):
     st.markdown("## 9. Medical Unfit (MU) & Sick Leave (SL) Reasons")
-    db_user = config['db']['user']
-    db_password = quote_plus(config['db']['password'])
-    db_host = config['db']['host']
-    db_name = config['db']['database']
 
-    engine = create_engine(f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}")
+    # Monthly MU/SL rollup for the depot (or the region's depots), cached; the
+    # year / month selectors below only slice it.
+    depots = region_depots if is_region and region_depots else [entity_name]
     try:
-        df = pd.read_sql("SELECT * FROM input_data", con=engine)
+        df = load_mu_sl_monthly(normalize_depots(depots))
     except Exception as e:
         st.error(f"Error fetching input_data for MU/SL reasons: {e}")
         return
-        
-    df.columns = df.columns.astype(str).str.strip().str.replace(" ", "_").str.lower()
-    
-    if "depot_name" not in df.columns or "data_date" not in df.columns:
-        st.error("❌ Required columns ('depot_name' or 'data_date') missing in input_data.")
-        return
-
-    df["depot_name"] = df["depot_name"].astype(str).str.strip().str.lower()
-
-    if is_region and region_depots:
-        region_keys = [d.strip().lower() for d in region_depots]
-        df = df[df["depot_name"].isin(region_keys)]
-    else:
-        df = df[df["depot_name"] == entity_name.strip().lower()]
 
     if df.empty:
         st.info(f"🚫 No MU/SL data found for **{entity_name.title()}**.")
         return
 
-    df["data_date"] = pd.to_datetime(df["data_date"], errors="coerce")
-    today = pd.Timestamp.today().normalize()
-    df = df[df["data_date"].notna() & (df["data_date"] <= today)]
-    df["year"] = df["data_date"].dt.year
-    df["month_period"] = df["data_date"].dt.to_period("M")
-
     col1, col2 = st.columns(2)
 
+    # ---- Year selectbox ----
     years = sorted(df["year"].dropna().unique())
     year_options = ["All"] + [str(y) for y in years]
     default_year_index = year_options.index(str(max(years))) if len(years) > 0 else 0
 
-    selected_year = col1.selectbox("Year", year_options, index=default_year_index, key="year_selectbox")
+    selected_year = col1.selectbox(
+        "Year", year_options,
+        index=default_year_index,
+        key="year_selectbox"
+    )
+
+    # ---- Filter by selected year ----
     filtered_df = df if selected_year == "All" else df[df["year"] == int(selected_year)]
 
-    month_period_unique = filtered_df["month_period"].dropna().unique()
-    month_display = [m.strftime("%b-%Y") for m in sorted(month_period_unique)]
+    # ---- Month selectbox ----
+    months = sorted(filtered_df["month"].unique())
+    month_display = [pd.Timestamp(m).strftime("%b-%Y") for m in months]
 
     if month_display:
-        default_month = month_display[-1]
+        # ✅ Default to the latest month
         month_options = ["All"] + month_display
-        default_month_index = month_options.index(default_month)
-        selected_month = col2.selectbox("Month", month_options, index=default_month_index, key="month_selectbox")
+        selected_month = col2.selectbox(
+            "Month", month_options,
+            index=len(month_options) - 1,
+            key="month_selectbox"
+        )
     else:
         selected_month = "All"
 
+    # ---- Filter by selected month ----
     if selected_month != "All":
-        try:
-            selected_period = pd.Period(pd.to_datetime(selected_month, format="%b-%Y"), freq="M")
-            filtered_df = filtered_df[filtered_df["month_period"] == selected_period]
-        except ValueError:
-            st.warning("Invalid month selected for filtering.")
-
+        filtered_df = filtered_df[filtered_df["month"] == months[month_display.index(selected_month)]]
 
     if filtered_df.empty:
         st.info("🚫 No MU/SL data available for the selected filters.")
         return
 
+    mu_totals = filtered_df[MU_REASON_COLS].sum()
+    sl_totals = filtered_df[SL_REASON_COLS].sum()
 
-    mu_cols = [
-        'spondilitis', 'spinal_disc', 'vision_color_blindness',
-        'neuro_paralysis_medical', 'ortho', 'diff_mu_reasons', 'total_drivers_mu_reasons'
-    ]
-    sl_cols = [
-        'flu_fever', 'bp', 'orthopedic', 'heart', 'weakness', 'eye',
-        'accident_injuries', 'neuro_paralysis_sick_leave', 'piles', 'diabetes',
-        'thyroid', 'gas', 'dental', 'ear', 'skin_allergy', 'general_surgery',
-        'obesity', 'cancer', 'total_drivers_sl_reasons', 'diff_sl_reasons'
-    ]
-    
-    mu_cols_present = [c for c in mu_cols if c in filtered_df.columns]
-    sl_cols_present = [c for c in sl_cols if c in filtered_df.columns]
-
-    if not mu_cols_present and not sl_cols_present:
-        st.error("❌ No MU/SL reason columns found in the filtered data.")
-        return
-
-    mu_totals = filtered_df[mu_cols_present].sum()
-    sl_totals = filtered_df[sl_cols_present].sum()
-
-    mu_df = mu_totals.drop(['diff_mu_reasons', 'total_drivers_mu_reasons'], errors="ignore").reset_index()
+    mu_df = mu_totals.drop(['Diff_MU_Reasons', 'Total_Drivers_MU_Reasons'], errors="ignore").reset_index()
     mu_df.columns = ['Reason', 'Count']
     mu_df = mu_df[mu_df['Count'] > 0]
     mu_df['Reason'] = mu_df['Reason'].str.replace('_', ' ').str.title()
 
-    sl_df = sl_totals.drop(['diff_sl_reasons', 'total_drivers_sl_reasons'], errors="ignore").reset_index()
+    sl_df = sl_totals.drop(['Diff_SL_Reasons', 'Total_Drivers_SL_Reasons'], errors="ignore").reset_index()
     sl_df.columns = ['Reason', 'Count']
     sl_df = sl_df[sl_df['Count'] > 0]
     sl_df['Reason'] = sl_df['Reason'].str.replace('_', ' ').str.title()
 
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("Total MU Drivers", int(mu_totals.get('total_drivers_mu_reasons', 0)))
+    c1.metric("Total MU Drivers", int(mu_totals.get('Total_Drivers_MU_Reasons', 0)))
     c2.metric("MU Reasons Count", len(mu_df))
-    c3.metric("Total SL Drivers", int(sl_totals.get('total_drivers_sl_reasons', 0)))
+    c3.metric("Total SL Drivers", int(sl_totals.get('Total_Drivers_SL_Reasons', 0)))
     c4.metric("SL Reasons Count", len(sl_df))
 
     col_mu, col_sl = st.columns(2)
@@ -1466,7 +1392,7 @@ def show_mu_sl_reasons(entity_name, db_config, is_region=False, region_depots=No
                             title=f"Medical Unfit (MU) Reasons – {entity_name.title()}")
             fig_mu.update_traces(texttemplate='%{text}', textposition='outside')
             fig_mu.update_layout(xaxis_title='Reason', yaxis_title='Count')
-            st.plotly_chart(fig_mu, use_container_width=True)
+            st.plotly_chart(fig_mu, use_container_width=True, key=chart_key("mu_reasons", mu_df, entity=entity_name))
 
     with col_sl:
         if not sl_df.empty:
@@ -1477,7 +1403,7 @@ def show_mu_sl_reasons(entity_name, db_config, is_region=False, region_depots=No
                             title=f"Sick Leave (SL) Reasons – {entity_name.title()}")
             fig_sl.update_traces(texttemplate='%{text}', textposition='outside')
             fig_sl.update_layout(xaxis_title='Reason', yaxis_title='Count')
-            st.plotly_chart(fig_sl, use_container_width=True)
+            st.plotly_chart(fig_sl, use_container_width=True, key=chart_key("sl_reasons", sl_df, entity=entity_name))
 
 
 if __name__ == "__main__":
@@ -1,10 +1,8 @@
 import pandas as pd
+import numpy as np
 #CHECK 22:41
 import streamlit as st
 import plotly.express as px
-import uuid
-from sqlalchemy import create_engine
-from urllib.parse import quote_plus
 import itertools
 import hashlib
 import datetime
@@ -13,6 +11,16 @@ import calendar
 import mysql.connector
 import json
 from auth import get_role_by_userid, get_depot_by_userid, get_depot_settings,get_connection
+from chart_cache import plotly_chart, chart_key
+from depot_data import (
+    MU_REASON_COLS, SL_REASON_COLS, load_mu_sl_monthly, normalize_depots,
+    load_absenteeism_counts, absenteeism_total, leave_type_counts, freeze, service_hours, leave_date_sql, shared_cache,
+    fragment, open_section
+)
+from driver_data import fy_label, fy_start_year
+from driver_percentiles import RANKING_COLUMNS, driver_percentiles, fy_caption
+from driver_rankings import RANK_METRICS, SHOW_OPTIONS, driver_totals, top_bottom
+from query_runner import QueryError, run_queries
 
 from mysql.connector import Error
 import pymysql
@@ -350,25 +358,9 @@ def compute_region_averages(mysql_conn, region, year_sel="All", debug=False):
                     pass
                 total_km = total_hours = total_earnings = 0.0
 
-        # 4) absenteeism (we count rows in driver_absenteeism table)
+        # 4) absenteeism (rows of driver_absenteeism, from the cached absenteeism_counts rollup)
         try:
-            if start_date and end_date:
-                q_abs = f"""
-                    SELECT COUNT(*) FROM driver_absenteeism
-                    WHERE UPPER(TRIM(depot)) IN ({format_placeholders})
-                      AND date BETWEEN %s AND %s
-                """
-                params_abs = tuple(depots) + (start_date, end_date)
-            else:
-                q_abs = f"""
-                    SELECT COUNT(*) FROM driver_absenteeism
-                    WHERE UPPER(TRIM(depot)) IN ({format_placeholders})
-                """
-                params_abs = tuple(depots)
-
-            cursor.execute(q_abs, params_abs)
-            abs_row = cursor.fetchone()
-            total_abs = int(abs_row[0]) if abs_row and abs_row[0] is not None else 0
+            total_abs = absenteeism_total(load_absenteeism_counts(tuple(depots)), year=year_sel)
         except Exception:
             total_abs = 0
 
@@ -407,171 +399,172 @@ def compute_region_averages(mysql_conn, region, year_sel="All", debug=False):
 
 
 # ---------------------- PREAGGREGATE FUNCTION --------------------------
-@st.cache_data(show_spinner="Loading data …")
-def preaggregate(selected_depot, config):
+def _normalize_depots(depots):
+    if isinstance(depots, str):
+        depots = [depots]
+    return tuple(sorted({str(d).strip().upper() for d in (depots or []) if d and str(d).strip()}))
+
+
+def _split_by_depot(df, depots, columns):
+    """Split one frame into {depot: slice}; depots without rows get an empty frame with the same columns."""
+    if df is None or df.empty or DEPOT_COL not in df.columns:
+        return {d: pd.DataFrame(columns=columns) for d in depots}
+    groups = {d: g.reset_index(drop=True) for d, g in df.groupby(DEPOT_COL, sort=False)}
+    return {d: groups.get(d, pd.DataFrame(columns=df.columns)) for d in depots}
+
+
+# preaggregate_many caches one entry per (depot, year range) with shared_cache
+# (bounded, with a TTL): a comparison pair or a region view is assembled from its
+# depots' own entries, and the depots not cached yet are read together in one batch.
+DEPOT_CACHE_SIZE = 64
+DEPOT_CACHE_TTL = 600  # seconds
+
+
+def _year_bounds(year_range):
+    """None, or an inclusive (start_year, end_year) tuple of ints (a single year is accepted)."""
+    if year_range is None:
+        return None
+    if not isinstance(year_range, (tuple, list)):
+        year_range = (year_range, year_range)
+    return int(year_range[0]), int(year_range[1])
+
+
+def preaggregate_many(depots, year_range=None, config=config):
     """
-    Prepares depot and driver monthly data, LSA data, and GHC for the selected depot.
-    Returns: depot_monthly, driver_monthly, lsa_valid, ghc_2024
+    Preaggregates for several depots at once (depot comparison, region views).
+    Each depot is cached on its own; the depots missing from the cache are loaded
+    in one batch (see _load_preaggregates).
+
+    depots: depot name or iterable of depot names.
+    year_range: None for all years, a single year, or an inclusive (start_year, end_year) tuple.
+    Returns: {depot: (depot_monthly, driver_monthly, lsa_valid, ghc_2024)}, the caller's
+    own views of frames shared between sessions (see depot_data.session_view).
     """
- 
-
-    # fallback column-names: use module-level constants if present, else defaults
-    km_col = globals().get('KM_COL', 'opd_kms')
-    date_col = globals().get('DATE_SRD_COL', 'operations_date')
-    depot_col = globals().get('DEPOT_COL', 'depot')
-    hours_col = globals().get('HOURS_COL', 'hours')
-    earnings_col = globals().get('EARNINGS_COL', 'earnings')
-    emp_col = globals().get('EMP_COL', 'employee_id')
-    lsa_date_col = globals().get('LSA_DATE_COL', 'date')
-    leave_type_col = globals().get('LEAVE_TYPE_COL', 'leave_type')
+    depots = _normalize_depots(depots)
+    if not depots:
+        return {}
+    year_range = _year_bounds(year_range)
+    batch = {}
+    return {d: _depot_preaggregates(d, year_range, _depots=depots, _batch=batch) for d in depots}
 
-    if not selected_depot:
-        st.warning("⚠️ No depot selected for current user.")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
-    selected_depot = selected_depot.strip().upper()
+@shared_cache(show_spinner="Loading data …", max_entries=DEPOT_CACHE_SIZE, ttl=DEPOT_CACHE_TTL)
+def _depot_preaggregates(depot, year_range, _depots, _batch):
+    """
+    One depot's preaggregates. On a miss the depot is read together with the depots
+    requested after it (_depots, not hashed); the frames land in _batch, one dict per
+    preaggregate_many call, so the misses that follow are served without a query.
+    """
+    if depot not in _batch:
+        _batch.update(_load_preaggregates(_depots[_depots.index(depot):], year_range))
+    return _batch[depot]
 
-    # ------------------- DB Connection -------------------
-    db_user = config['db']['user']
-    db_password = quote_plus(config['db']['password'])
-    db_host = config['db']['host']
-    db_name = config['db']['database']
 
-    engine = create_engine(f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}")
+@st.cache_resource(show_spinner=False, ttl=DEPOT_CACHE_TTL)
+def operation_years(depots):
+    """Years with daily_operations rows for depots, ascending (the Year filter's options)."""
+    depots = _normalize_depots(depots)
+    if not depots:
+        return []
+    placeholders = ",".join(["%s"] * len(depots))
+    query = (
+        f"SELECT DISTINCT YEAR({DATE_SRD_COL}) AS year FROM daily_operations "
+        f"WHERE UPPER(TRIM(depot)) IN ({placeholders}) AND {DATE_SRD_COL} IS NOT NULL"
+    )
+    years = run_queries({"daily_operations": (query, depots)})["daily_operations"]
+    return sorted(int(y) for y in years["year"].dropna()) if not years.empty else []
 
-    # Initialize empty DataFrames
-    depot_monthly = driver_monthly = lsa_valid = ghc_2024 = pd.DataFrame()
 
-    # ------------------- Daily Operations -------------------
-    try:
-        rtc = pd.read_sql(
-            "SELECT * FROM daily_operations WHERE UPPER(TRIM(depot)) = %s",
-            engine,
-            params=(selected_depot,)
-        )
-        # defensive normalization (SQL filter may already have applied)
-        rtc = rtc[rtc:= rtc] if False else rtc  # placeholder to keep structure if needed
-        rtc = rtc[rtc['depot'].astype(str).str.strip().str.upper() == selected_depot]
-        if rtc.empty:
-            st.warning(f"No data found for depot {selected_depot}")
-    except Exception as e:
-        st.error(f"❌ Database error while reading 'daily_operations': {e}")
-        rtc = pd.DataFrame()
+def _load_preaggregates(depots, year_range):
+    """
+    One batched read for depots (normalized): operations for every depot in one
+    query, service_master / driver_absenteeism / ghc_2024 once for the batch (scoped
+    in SQL to those depots and years, needed columns only), and the monthly frames
+    built with a single groupby before being sliced per depot.
+    """
+    # half-open [start, end) bounds so DATETIME / text timestamps on the last day are kept
+    date_bounds = None
+    if year_range is not None:
+        date_bounds = (f"{int(year_range[0])}-01-01", f"{int(year_range[1]) + 1}-01-01")
 
-    # ------------------- Service Master -------------------
-    try:
-        service_master = pd.read_sql(
-            "SELECT service_number, dept_time, arr_time, day_night_code, depot FROM service_master",
-            engine
-        )
-    except Exception as e:
-        st.error(f"❌ Database error while reading 'service_master': {e}")
-        service_master = pd.DataFrame()
+    placeholders = ",".join(["%s"] * len(depots))
 
-    # ------------------- Driver Absenteeism -------------------
-    try:
-        lsa = pd.read_sql("SELECT * FROM driver_absenteeism", engine)
-    except Exception as e:
-        st.error(f"❌ Database error while reading 'driver_absenteeism': {e}")
-        lsa = pd.DataFrame()
+    # ------------------- Daily Operations (all depots, one query) -------------------
+    ops_query = f"SELECT * FROM daily_operations WHERE UPPER(TRIM(depot)) IN ({placeholders})"
+    ops_params = depots
+    if date_bounds:
+        ops_query += f" AND {DATE_SRD_COL} >= %s AND {DATE_SRD_COL} < %s"
+        ops_params = depots + date_bounds
 
-    # ------------------- GHC Data -------------------
-    try:
-        ghc_2024 = pd.read_sql("SELECT * FROM ghc_2024", engine)
-    except Exception as e:
-        st.error(f"❌ Database error while reading 'ghc_2024': {e}")
-        ghc_2024 = pd.DataFrame()
+    # ------------------- Service Master -------------------
+    service_query = (
+        f"SELECT service_number, dept_time, arr_time, day_night_code, depot FROM service_master "
+        f"WHERE UPPER(TRIM(depot)) IN ({placeholders})"
+    )
 
-    # ------------------- Normalize Keys -------------------
+    # ------------------- Driver Absenteeism (requested depots / years, needed columns only) -------------------
+    lsa_query = (
+        f"SELECT {EMP_COL}, {DEPOT_COL}, {LEAVE_TYPE_COL}, {leave_date_sql()} AS `{LSA_DATE_COL}` FROM driver_absenteeism "
+        f"WHERE UPPER(TRIM({DEPOT_COL})) IN ({placeholders}) AND {LEAVE_TYPE_COL} IS NOT NULL"
+    )
+    lsa_params = depots
+    if date_bounds:
+        lsa_query += f" AND {leave_date_sql()} >= %s AND {leave_date_sql()} < %s"
+        lsa_params = depots + date_bounds
+
+    # ------------------- GHC Data (requested depots only) -------------------
+    ghc_query = f"SELECT employee_ID, depot, final_Grading FROM ghc_2024 WHERE UPPER(TRIM(depot)) IN ({placeholders})"
+
+    # ------------------- Run the four reads concurrently (pooled connections) -------------------
+    tables = run_queries({
+        "daily_operations": (ops_query, ops_params),
+        "service_master": (service_query, depots),
+        "driver_absenteeism": (lsa_query, lsa_params),
+        "ghc_2024": (ghc_query, depots),
+    })
+    rtc, service_master = tables["daily_operations"], tables["service_master"]
+    lsa, ghc_2024 = tables["driver_absenteeism"], tables["ghc_2024"]
+
+    # ------------------- Merge Data + Calculate Hours -------------------
     if not rtc.empty:
         rtc["service_number"] = rtc["service_number"].astype(str).str.strip().str.upper()
-        rtc[depot_col] = rtc[depot_col].astype(str).str.strip().str.upper()
+        rtc[DEPOT_COL] = rtc[DEPOT_COL].astype(str).str.strip().str.upper()
+        rtc = rtc[rtc[DEPOT_COL].isin(depots)].copy()
 
-    if not service_master.empty:
+    if not rtc.empty and not service_master.empty:
         service_master["service_number"] = service_master["service_number"].astype(str).str.strip().str.upper()
         service_master["depot"] = service_master["depot"].astype(str).str.strip().str.upper()
+        service_master = service_master.drop_duplicates(subset=['depot', 'service_number'], keep='first')
 
-    # ------------------- Convert Times -------------------
-    def convert_time(x):
-        if pd.isnull(x):
-            return None
-        if isinstance(x, pd.Timedelta):
-            return (datetime.min + x).time()
-        if isinstance(x, datetime):
-            return x.time()
-        if isinstance(x, str):
-            try:
-                return datetime.strptime(x, "%H:%M:%S").time()
-            except:
-                return None
-        return None
-
-    if not service_master.empty:
-        service_master['dept_time'] = service_master['dept_time'].apply(convert_time)
-        service_master['arr_time'] = service_master['arr_time'].apply(convert_time)
-    else:
-        # ensure these cols exist to avoid later KeyErrors
-        for c in ['dept_time', 'arr_time', 'day_night_code']:
-            if c not in service_master.columns:
-                service_master[c] = None
-
-    # ------------------- Calculate Hours -------------------
-    def time_cal(dep, arr, day_night_code):
-        dummy_date = datetime.today().date()
-        if not isinstance(dep, time) or not isinstance(arr, time):
-            return None
-        DEP_TIME_dt = datetime.combine(dummy_date, dep)
-        ARR_TIME_dt = datetime.combine(dummy_date, arr)
-        if day_night_code == 'N':
-            ARR_TIME_dt += timedelta(days=1)
-            duration = ARR_TIME_dt - DEP_TIME_dt
-            if duration.total_seconds() < 6 * 3600:
-                ARR_TIME_dt += timedelta(days=1)
-                duration = ARR_TIME_dt - DEP_TIME_dt
-        else:
-            if ARR_TIME_dt < DEP_TIME_dt:
-                ARR_TIME_dt += timedelta(days=1)
-            duration = ARR_TIME_dt - DEP_TIME_dt
-        return duration.total_seconds() / 3600
-
-        # ------------------- Merge Data (Fixed) -------------------
-    if not rtc.empty and not service_master.empty:
-        # Normalize depot names before merge
-        rtc['depot'] = rtc['depot'].astype(str).str.strip().str.upper()
-        service_master['depot'] = service_master['depot'].astype(str).str.strip().str.upper()
-
-        # Deduplicate service_master by depot + service_number
-        service_master_unique = service_master.drop_duplicates(subset=['depot', 'service_number'], keep='first')
+        # hours are a property of the service, so compute them once per service, not once per duty row
+        service_master[HOURS_COL] = service_hours(
+            service_master['dept_time'], service_master['arr_time'], service_master['day_night_code']
+        )
 
-        # Merge safely on depot + service_number
-        merged_df = pd.merge(
-            rtc,
-            service_master_unique[['depot', 'service_number', 'dept_time', 'arr_time', 'day_night_code']],
+        rtc = pd.merge(
+            rtc.drop(columns=[HOURS_COL], errors="ignore"),
+            service_master[['depot', 'service_number', 'dept_time', 'arr_time', 'day_night_code', HOURS_COL]],
             on=['depot', 'service_number'],
             how='left',
             suffixes=('_rtc', '_master')
         )
 
-        # Calculate hours
-        merged_df['hours'] = merged_df.apply(
-            lambda row: time_cal(row.get('dept_time'), row.get('arr_time'), row.get('day_night_code')),
-            axis=1
-        )
-
-        # Final cleanup
-        rtc = merged_df
-        rtc[DEPOT_COL] = rtc['depot'].astype(str).str.strip().str.upper()
-
-
     # ------------------- Normalize GHC -------------------
     if not ghc_2024.empty:
         ghc_2024 = ghc_2024.rename(columns=lambda x: x.strip().lower().replace(" ", "_"))
         ghc_2024["depot"] = ghc_2024["depot"].astype(str).str.strip().str.upper()
+        ghc_2024 = ghc_2024[ghc_2024["depot"].isin(depots)]
+
+    # ------------------- Monthly Aggregates (single groupby for all depots) -------------------
+    monthly_cols = [DEPOT_COL, "year", "month", "total_km", "total_hours", "total_earnings"]
+    depot_monthly = pd.DataFrame(columns=monthly_cols)
+    driver_monthly = pd.DataFrame(columns=monthly_cols[:1] + [EMP_COL] + monthly_cols[1:])
 
-    # ------------------- Normalize RTC -------------------
     if not rtc.empty:
         rtc[DATE_SRD_COL] = pd.to_datetime(rtc[DATE_SRD_COL], errors="coerce")
         rtc[KM_COL] = pd.to_numeric(rtc[KM_COL], errors="coerce")
+        if HOURS_COL not in rtc.columns:
+            rtc[HOURS_COL] = np.nan
         rtc[HOURS_COL] = pd.to_numeric(rtc[HOURS_COL], errors="coerce")
         rtc[EARNINGS_COL] = pd.to_numeric(rtc[EARNINGS_COL], errors="coerce")
         rtc["month"] = rtc[DATE_SRD_COL].dt.to_period("M").dt.to_timestamp()
@@ -590,10 +583,14 @@ def preaggregate(selected_depot, config):
         ).reset_index()
 
     # ------------------- Normalize LSA -------------------
+    lsa_valid = pd.DataFrame()
     if not lsa.empty:
         lsa[LSA_DATE_COL] = pd.to_datetime(lsa[LSA_DATE_COL], errors="coerce")
         lsa[DEPOT_COL] = lsa[DEPOT_COL].astype(str).str.strip().str.upper()
-        lsa_valid = lsa.dropna(subset=[LEAVE_TYPE_COL]).copy()
+        lsa_valid = lsa[lsa[DEPOT_COL].isin(depots)].dropna(subset=[LEAVE_TYPE_COL])
+        if year_range is not None:
+            lsa_valid = lsa_valid[lsa_valid[LSA_DATE_COL].dt.year.between(int(year_range[0]), int(year_range[1]))]
+        lsa_valid = lsa_valid[[EMP_COL, DEPOT_COL, LEAVE_TYPE_COL, LSA_DATE_COL]].copy()
         lsa_valid["month"] = lsa_valid[LSA_DATE_COL].dt.to_period("M").dt.to_timestamp()
         lsa_valid["year"] = lsa_valid[LSA_DATE_COL].dt.year
 
@@ -602,9 +599,52 @@ def preaggregate(selected_depot, config):
 
         depot_monthly = pd.merge(depot_monthly, depot_abs, on=[DEPOT_COL, "year", "month"], how="left").fillna(0)
         driver_monthly = pd.merge(driver_monthly, driver_abs, on=[DEPOT_COL, EMP_COL, "year", "month"], how="left").fillna(0)
-    else:
-        lsa_valid = pd.DataFrame()
 
+    # ------------------- Per-depot slices -------------------
+    depot_parts = _split_by_depot(depot_monthly, depots, depot_monthly.columns)
+    driver_parts = _split_by_depot(driver_monthly, depots, driver_monthly.columns)
+    lsa_parts = _split_by_depot(lsa_valid, depots, lsa_valid.columns)
+    ghc_parts = _split_by_depot(ghc_2024, depots, ghc_2024.columns)
+
+    return {
+        d: (freeze(depot_parts[d]), freeze(driver_parts[d]), freeze(lsa_parts[d]), freeze(ghc_parts[d]))
+        for d in depots
+    }
+
+
+def combine_preaggregates(results, depots=None):
+    """
+    Concatenate per-depot preaggregate_many() slices back into single frames
+    (for region-level charts). Returns: depot_monthly, driver_monthly, lsa_valid, ghc_2024
+    """
+    keys = _normalize_depots(depots) if depots is not None else tuple(results)
+    parts = [results[d] for d in keys if d in results]
+    if not parts:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    combined = []
+    for i in range(4):
+        frames = [p[i] for p in parts if p[i] is not None and not p[i].empty]
+        combined.append(pd.concat(frames, ignore_index=True, sort=False) if frames else parts[0][i])
+    return tuple(combined)
+
+
+def preaggregate(selected_depot, config, year_range=None):
+    """
+    Prepares depot and driver monthly data, LSA data, and GHC for the selected depot
+    (optionally only for year_range, see preaggregate_many).
+    Returns: depot_monthly, driver_monthly, lsa_valid, ghc_2024
+    """
+    if not selected_depot:
+        st.warning("⚠️ No depot selected for current user.")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+    selected_depot = selected_depot.strip().upper()
+    results = preaggregate_many((selected_depot,), year_range=year_range, config=config)
+    depot_monthly, driver_monthly, lsa_valid, ghc_2024 = results.get(
+        selected_depot, (pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame())
+    )
+    if depot_monthly.empty:
+        st.warning(f"No data found for depot {selected_depot}")
     return depot_monthly, driver_monthly, lsa_valid, ghc_2024
 
 
@@ -667,6 +707,14 @@ def plot_comparison_bar(combined_df, ycol, avg1, avg2, depot1, depot2, title, yt
     )
     chart_df['month_label'] = chart_df['month'].dt.strftime('%b-%y')
 
+    plotly_chart(
+        "comparison_bar", chart_df, _comparison_bar_figure,
+        avg1=avg1, avg2=avg2, depot1=depot1, depot2=depot2, title=title, ytitle=ytitle,
+        color_map=color_map, compare_with_region=compare_with_region
+    )
+
+
+def _comparison_bar_figure(chart_df, avg1, avg2, depot1, depot2, title, ytitle, color_map, compare_with_region):
     # Build bar chart
     fig = px.bar(
         chart_df,
@@ -723,8 +771,7 @@ def plot_comparison_bar(combined_df, ycol, avg1, avg2, depot1, depot2, title, yt
             font=dict(size=10),
         ),
     )
-
-    st.plotly_chart(fig, use_container_width=True, key=str(uuid.uuid4()))
+    return fig
 
 
 def plot_bar(df, ycol, depot_avg, title, ytitle, depot=None, region_avg=None):
@@ -754,6 +801,13 @@ def plot_bar(df, ycol, depot_avg, title, ytitle, depot=None, region_avg=None):
             bar_color = color_map.get(depot, default_color)
             line_color = bar_color
 
+    plotly_chart(
+        "bar", chart_df, _bar_figure,
+        ycol=ycol, depot_avg=depot_avg, title=title, ytitle=ytitle, bar_color=bar_color, region_avg=region_avg
+    )
+
+
+def _bar_figure(chart_df, ycol, depot_avg, title, ytitle, bar_color, region_avg):
     # Plot bar chart
     fig = px.bar(
         chart_df,
@@ -800,9 +854,9 @@ def plot_bar(df, ycol, depot_avg, title, ytitle, depot=None, region_avg=None):
         xaxis_title="Month-Year",
         yaxis_title=ytitle,
     )
+    return fig
 
-    st.plotly_chart(fig, use_container_width=True, key=str(uuid.uuid4()))
-
+@fragment
 def show_main_bar_line_charts(df1, depot, region_avgs=None, show_region=False):
     """
     Draw KMs / Hours / Earnings / Absenteeism bar charts for a depot.
@@ -1058,12 +1112,36 @@ def depot_RM():
             st.warning("No other depots available to compare in your region.")
             compare_regions = False
 
+    depots_to_load = (depot1, depot2) if compare_regions and depot2 else (depot1,)
+
+    # ------------------- Year Filter (options from SQL, so the loads below are scoped to the year) -------------------
+    try:
+        all_years = operation_years(depots_to_load)
+    except QueryError:
+        st.stop()  # already reported by run_queries
+    year_options = ["All"] + [str(y) for y in all_years]
+    current_year = datetime.datetime.now().year
+    default_index = year_options.index(str(current_year)) if str(current_year) in year_options else 0
+
+    col = st.columns([3, 7, 1])
+    with col[0]:
+        year_sel = st.selectbox("Year", year_options, index=default_index, key="year_sel")
+    year_range = None if year_sel == "All" else int(year_sel)
+
     # ------------------- Load Data for Depot1 -------------------
-    depot1_monthly, driver_monthly1, lsavalid1, ghc1 = preaggregate(selected_depot=depot1, config=config)
-    # ensure columns exist and normalise
-    if not depot1_monthly.empty and DEPOT_COL in depot1_monthly.columns:
-        depot1_monthly[DEPOT_COL] = depot1_monthly[DEPOT_COL].astype(str).str.strip().str.upper()
-    depot1_monthly["Category"] = depot1_monthly.get(DEPOT_COL, pd.Series()).map(depot_settings).fillna("Unknown")
+    # one batched load for depot1 and (if comparing) depot2
+    try:
+        depot_frames = preaggregate_many(depots_to_load, year_range=year_range, config=config)
+        if depot1 in depot_frames:
+            depot1_monthly, driver_monthly1, lsavalid1, ghc1 = depot_frames[depot1]
+        else:
+            depot1_monthly, driver_monthly1, lsavalid1, ghc1 = preaggregate(selected_depot=depot1, config=config, year_range=year_range)
+    except QueryError:
+        st.stop()  # already reported by run_queries
+    # depot names are already normalised by preaggregate_many; derive instead of writing into the cached frame
+    depot1_monthly = depot1_monthly.assign(
+        Category=depot1_monthly.get(DEPOT_COL, pd.Series(dtype=object)).map(depot_settings).fillna("Unknown")
+    )
 
     # ------------------- Load Data for Depot2 (if comparing) -------------------
     depot2_monthly = pd.DataFrame(columns=["year", "month", "total_km", "total_hours", "total_earnings", "absenteeism"])
@@ -1072,13 +1150,9 @@ def depot_RM():
     ghc2 = pd.DataFrame()
 
     if compare_regions and depot2:
-        # prefer the preaggregate result (consistent normalization)
+        # depot2 comes out of the same batched load as depot1 (consistent normalization)
         try:
-            depot2_monthly, driver_monthly2, lsavalid2, ghc2 = preaggregate(selected_depot=depot2, config=config)
-            if depot2_monthly is None or depot2_monthly.empty:
-                # fallback: run SQL to fetch monthly aggregates (safe)
-                if year_sel := None:  # placeholder to avoid NameError; will set year_sel below before using SQL
-                    pass
+            depot2_monthly, driver_monthly2, lsavalid2, ghc2 = depot_frames[depot2]
         except Exception:
             # ensure it's a DataFrame
             depot2_monthly = pd.DataFrame(columns=["year", "month", "total_km", "total_hours", "total_earnings", "absenteeism"])
@@ -1086,22 +1160,10 @@ def depot_RM():
             lsavalid2 = pd.DataFrame()
             ghc2 = pd.DataFrame()
 
-    # ------------------- Year Filter (build from available data) -------------------
-    # Build years after both preaggregates so we know available years
-    # ------------------- Build Year options and select -------------------
     years1 = sorted(depot1_monthly["year"].dropna().unique()) if not depot1_monthly.empty else []
-    years2 = sorted(depot2_monthly["year"].dropna().unique()) if (compare_regions and depot2_monthly is not None and not depot2_monthly.empty) else []
-
-    all_years = sorted(list(set(years1 + years2)))
-    year_options = ["All"] + [str(y) for y in all_years]
-    current_year = datetime.datetime.now().year
-    default_index = year_options.index(str(current_year)) if str(current_year) in year_options else 0
-
-    col = st.columns([3, 7, 1])
-    with col[0]:
-        year_sel = st.selectbox("Year", year_options, index=default_index, key="year_sel")
 
     # ------------------- APPLY YEAR FILTER TO PREAGGREGATED DATA -------------------
+    # the frames are already scoped to year_range in SQL, so these filters keep every row
     def apply_year_filter_monthly(df_monthly, year_sel):
         if df_monthly is None or df_monthly.empty:
             return pd.DataFrame(columns=["year", "month", "total_km", "total_hours", "total_earnings", "absenteeism", "Depot"])
@@ -1167,9 +1229,6 @@ def depot_RM():
                 st.error(f"Error loading monthly data for {depot2}: {e}")
                 depot2_monthly = pd.DataFrame(columns=["year", "month", "total_km", "total_hours", "total_earnings", "absenteeism"])
 
-        # normalize depot2_monthly if it has depot col
-        if not depot2_monthly.empty and DEPOT_COL in depot2_monthly.columns:
-            depot2_monthly[DEPOT_COL] = depot2_monthly[DEPOT_COL].astype(str).str.strip().str.upper()
         # ensure Depot column exists for consistent downstream processing
         if "Depot" not in depot2_monthly.columns:
             depot2_monthly = depot2_monthly.assign(Depot=depot2 if depot2 else None)
@@ -1219,12 +1278,35 @@ def depot_RM():
                 region_avgs = None
                 region_depots = None
 
+        # region views: every depot of the region in one batched load instead of one load per depot,
+        # made only when a section that shows them is open
+        region_views = {}
+
+        def region_view():
+            if not region_views:
+                ghc_view, drivers_view = ghc1, driver_monthly1
+                if show_region_checkbox and region_depots:
+                    try:
+                        region_frames = preaggregate_many(tuple(region_depots), year_range=year_range, config=config)
+                    except QueryError:
+                        st.stop()  # already reported by run_queries
+                    _, drivers_view, _, ghc_view = combine_preaggregates(region_frames)
+                    drivers_view = apply_year_filter_monthly(drivers_view, year_sel)
+                region_views.update(ghc=ghc_view, drivers=drivers_view)
+            return region_views["ghc"], region_views["drivers"]
+
         # single-depot charts (pass show_region boolean so lines only show when checked)
-        show_main_bar_line_charts(depot1_monthly, depot1, region_avgs=region_avgs, show_region=show_region_checkbox)
-        show_absenteeism_pie(depot1, lsavalid1, year_sel, is_region=show_region_checkbox, region_depots=region_depots)
-        show_health_grade_distribution(depot1, ghc1, is_region=show_region_checkbox, region_depots=region_depots)
-        show_top_bottom_drivers(depot1, driver_monthly1, years1, DEPOT_COL, EMP_COL, is_region=show_region_checkbox, region_depots=region_depots)
-        show_mu_sl_reasons(depot1, config['db'], is_region=show_region_checkbox, region_depots=region_depots)
+        # sections with their own filters are fragments, so their widgets only rerun that section;
+        # sections that run their own queries only load once opened
+        with st.expander("📊 KMs, Hours, Earnings & Absenteeism", expanded=True):
+            show_main_bar_line_charts(depot1_monthly, depot1, region_avgs=region_avgs, show_region=show_region_checkbox)
+        if open_section("🗓️ Absenteeism Reasons & Health Grades", "rm_section_absenteeism"):
+            show_absenteeism_pie(depot1, year_sel, is_region=show_region_checkbox, region_depots=region_depots)
+            show_health_grade_distribution(depot1, region_view()[0], is_region=show_region_checkbox, region_depots=region_depots)
+        if open_section("🏅 Top & Bottom Drivers", "rm_section_drivers"):
+            show_top_bottom_drivers(depot1, region_view()[1], years1, DEPOT_COL, EMP_COL, is_region=show_region_checkbox, region_depots=region_depots)
+        if open_section("🩺 MU & SL Reasons", "rm_section_mu_sl"):
+            show_mu_sl_reasons(depot1, config['db'], is_region=show_region_checkbox, region_depots=region_depots)
 
     # --- Compare mode: show both depots' metrics side-by-side and comparison charts
     else:
@@ -1254,22 +1336,21 @@ def depot_RM():
 
             # Defensive: ensure dataframes are DataFrames and have expected metric columns
             def ensure_monthly_df(df, depot_name):
+                # returns a new frame; the input may be a shared cached frame
                 if df is None:
                     df = pd.DataFrame(columns=["year", "month", "total_km", "total_hours", "total_earnings", "absenteeism"])
-                for c in ["total_km", "total_hours", "total_earnings", "absenteeism"]:
-                    if c not in df.columns:
-                        df[c] = 0.0
+                missing = {c: 0.0 for c in ["total_km", "total_hours", "total_earnings", "absenteeism"] if c not in df.columns}
                 if "Depot" not in df.columns:
-                    df = df.assign(Depot=depot_name)
+                    missing["Depot"] = depot_name
                 # ensure month is datetime if available
                 if "month" in df.columns:
                     try:
-                        df["month"] = pd.to_datetime(df["month"], errors="coerce")
+                        missing["month"] = pd.to_datetime(df["month"], errors="coerce")
                     except Exception:
                         pass
                 else:
-                    df["month"] = pd.NaT
-                return df
+                    missing["month"] = pd.NaT
+                return df.assign(**missing)
 
             depot1_monthly = ensure_monthly_df(depot1_monthly, depot1)
             depot2_monthly = ensure_monthly_df(depot2_monthly, depot2)
@@ -1319,39 +1400,40 @@ def depot_RM():
                     return float(vals.mean()) if not vals.empty else 0.0
 
                 # Plot comparisons for each metric (this matches your original behavior)
-                for metric, title, unit in [
-                    ("total_km", "Total KMs", "KMs"),
-                    ("total_hours", "Total Hours", "Hours"),
-                    ("total_earnings", "Total Earnings", "Earnings"),
-                    ("absenteeism", "Absenteeism", "Absenteeism")
-                ]:
-                    avg1 = safe_mean(depot1_monthly, metric)
-                    avg2 = safe_mean(depot2_monthly, metric)
-
-                    # pass region_avgs values into the comparison plots if the checkbox is checked
-                    region_line = None
-                    if region_avgs and metric in region_avgs and show_region_checkbox:
-                        region_line = region_avgs.get(metric)
-
-                    # If your plot_comparison_bar supports a region avg param, pass it (some versions don't)
-                    try:
-                        plot_comparison_bar(
-                            combined_df, metric,
-                            avg1, avg2,
-                            depot1, depot2,
-                            f"Comparison – {title}", unit,
-                            compare_with_region=True,
-                            region_avg=region_line
-                        )
-                    except TypeError:
-                        # fallback to original signature
-                        plot_comparison_bar(
-                            combined_df, metric,
-                            avg1, avg2,
-                            depot1, depot2,
-                            f"Comparison – {title}", unit,
-                            compare_with_region=True
-                        )
+                with st.expander(f"🔁 {depot1} vs {depot2}", expanded=True):
+                    for metric, title, unit in [
+                        ("total_km", "Total KMs", "KMs"),
+                        ("total_hours", "Total Hours", "Hours"),
+                        ("total_earnings", "Total Earnings", "Earnings"),
+                        ("absenteeism", "Absenteeism", "Absenteeism")
+                    ]:
+                        avg1 = safe_mean(depot1_monthly, metric)
+                        avg2 = safe_mean(depot2_monthly, metric)
+
+                        # pass region_avgs values into the comparison plots if the checkbox is checked
+                        region_line = None
+                        if region_avgs and metric in region_avgs and show_region_checkbox:
+                            region_line = region_avgs.get(metric)
+
+                        # If your plot_comparison_bar supports a region avg param, pass it (some versions don't)
+                        try:
+                            plot_comparison_bar(
+                                combined_df, metric,
+                                avg1, avg2,
+                                depot1, depot2,
+                                f"Comparison – {title}", unit,
+                                compare_with_region=True,
+                                region_avg=region_line
+                            )
+                        except TypeError:
+                            # fallback to original signature
+                            plot_comparison_bar(
+                                combined_df, metric,
+                                avg1, avg2,
+                                depot1, depot2,
+                                f"Comparison – {title}", unit,
+                                compare_with_region=True
+                            )
 
 
 
@@ -1366,57 +1448,30 @@ if __name__ == "__main__":
 #  ------------------------------------------
 # 📊 PIE CHART (Leave Type Distribution)
 # ------------------------------------------
-def show_absenteeism_pie(entity_name, lsa_df, year_sel="All", is_region=False, region_depots=None):
+def show_absenteeism_pie(entity_name, year_sel="All", is_region=False, region_depots=None):
     """
     Show absenteeism reasons distribution as a pie chart.
-    Works for both depot-level and region-level ("All" selection).
+    Works for both depot-level and region-level ("All" selection); leave-type totals
+    are read from the cached absenteeism_counts rollup.
     """
     st.markdown("## 5. Absenteeism Reasons Distribution")
+    depots = region_depots if is_region and region_depots else [entity_name]
 
-    if lsa_df is None or lsa_df.empty:
-        st.info(f"🚫 No leave data found for **{entity_name}**.")
-        return
-
-    # Normalize depot col
-    lsa_df['depot'] = lsa_df['depot'].astype(str).str.strip().str.upper()
-
-    # Filter depots
-    if is_region and region_depots:
-        depots_upper = [d.upper() for d in region_depots]
-        lsa_df = lsa_df[lsa_df['depot'].isin(depots_upper)]
-    else:
-        lsa_df = lsa_df[lsa_df['depot'] == entity_name.strip().upper()]
-
-    if lsa_df.empty:
-        st.info(f"🚫 No records for **{entity_name}** after filtering.")
+    try:
+        counts = load_absenteeism_counts(normalize_depots(depots))
+    except Exception as e:
+        st.error(f"❌ Error loading absenteeism for **{entity_name}**: {e}")
         return
-
-    # Parse date + add year
-    lsa_df['date'] = pd.to_datetime(lsa_df['date'], errors="coerce")
-    lsa_df['year'] = lsa_df['date'].dt.year
-
-    # Drop missing leave types
-    lsa_valid = lsa_df.dropna(subset=['leave_type']).copy()
-    if lsa_valid.empty:
-        st.info(f"🚫 No valid leave types for **{entity_name}**.")
+    if counts.empty:
+        st.info(f"🚫 No leave data found for **{entity_name}**.")
         return
 
-    # Filter by year
-    if year_sel != "All":
-        lsa_valid = lsa_valid[lsa_valid["year"] == int(year_sel)]
-
-    if lsa_valid.empty:
+    # Group leave types
+    leave_counts = leave_type_counts(counts, depots, year_sel)
+    if leave_counts.empty:
         st.info(f"🚫 No leave data for **{entity_name}** in year {year_sel}.")
         return
 
-    # Group leave types
-    leave_counts = (
-        lsa_valid['leave_type']
-        .value_counts()
-        .reset_index(name="Count")
-        .rename(columns={"index": "leave_type"})
-    )
-
     # Pie chart
     fig = px.pie(
         leave_counts,
@@ -1427,18 +1482,17 @@ def show_absenteeism_pie(entity_name, lsa_df, year_sel="All", is_region=False, r
     )
     fig.update_traces(textposition="inside", textinfo="percent+label")
 
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(fig, use_container_width=True, key=chart_key("absenteeism_pie", leave_counts, entity=entity_name))
 
 
 def show_health_grade_distribution(entity_name, ghc_2024, is_region=False, region_depots=None):
     """
     Show employee health grade distribution.
     Works for both depot-level and region-level ("All" selection).
+    ghc_2024 is the read-only frame from preaggregate (lower-case columns, upper-case depot).
     """
     st.markdown("## 6. Employee Health Grade Distribution")
 
-    ghc_2024.columns = ghc_2024.columns.str.strip().str.lower().str.replace(" ", "_")
-
     if "final_grading" not in ghc_2024.columns:
         st.error("❌ 'final_grading' column not found.")
         return
@@ -1447,28 +1501,24 @@ def show_health_grade_distribution(entity_name, ghc_2024, is_region=False, regio
         st.error("❌ 'depot' column not found.")
         return
 
-    ghc_2024["depot"] = ghc_2024["depot"].astype(str).str.strip().str.upper()
-
     # Filter by depot or region
     if is_region and region_depots:
         depots_upper = [d.upper() for d in region_depots]
-        ghc3_filtered = ghc_2024[ghc_2024["depot"].isin(depots_upper)].copy()
+        grades = ghc_2024.loc[ghc_2024["depot"].isin(depots_upper), "final_grading"]
     else:
-        ghc3_filtered = ghc_2024[ghc_2024["depot"] == entity_name.strip().upper()].copy()
+        grades = ghc_2024.loc[ghc_2024["depot"] == entity_name.strip().upper(), "final_grading"]
 
-    if ghc3_filtered.empty:
+    if grades.empty:
         st.warning(f"⚠️ No health grade data found for **{entity_name}**.")
         return
 
-    ghc3_filtered.rename(columns={"final_grading": "grade"}, inplace=True)
-    ghc3_filtered = ghc3_filtered[ghc3_filtered["grade"].notna()]
-    ghc3_filtered["grade"] = ghc3_filtered["grade"].astype(str).str.strip()
+    grades = grades.dropna().astype(str).str.strip().rename("grade")
 
-    if ghc3_filtered.empty:
+    if grades.empty:
         st.warning(f"⚠️ No valid health grade data for **{entity_name}**.")
         return
 
-    grade_counts = ghc3_filtered.groupby("grade").size().reset_index(name="num_employees")
+    grade_counts = grades.to_frame().groupby("grade").size().reset_index(name="num_employees")
     if grade_counts.empty:
         st.info(f"ℹ️ No Health Grade data available for {entity_name}.")
         return
@@ -1497,34 +1547,35 @@ def show_health_grade_distribution(entity_name, ghc_2024, is_region=False, regio
 
     col1, col2, col3 = st.columns([1, 6, 1])
     with col2:
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key=chart_key("health_grades", grade_counts, entity=entity_name))
 
 #TOP & BOTTOM DRIVERS
+@fragment
 def show_top_bottom_drivers(entity_name, driver_monthly, years, DEPOT_COL, EMP_COL, is_region=False, region_depots=None):
     """
-    Show Top & Bottom 5 drivers for either a depot or all depots in a region.
+    Show Top & Bottom drivers (fixed count or top/bottom share) for either a depot or all depots in a region.
     """
-    st.markdown("## Top & Bottom 5 Drivers")
+    st.markdown("## Top & Bottom Drivers")
 
-    # Filter by depot or region
-    if is_region and region_depots:
-        depot_keys = [d.strip().lower() for d in region_depots]
-        df = driver_monthly[driver_monthly[DEPOT_COL].str.strip().str.lower().isin(depot_keys)].copy()
-    else:
-        df = driver_monthly[driver_monthly[DEPOT_COL].str.strip().str.lower() == entity_name.strip().lower()].copy()
-
-    if df.empty:
+    # Filter by depot or region (depot names are already upper-cased by preaggregate)
+    depot_keys = {d.strip().upper() for d in (region_depots if is_region and region_depots else [entity_name])}
+    if driver_monthly is None or driver_monthly.empty or DEPOT_COL not in driver_monthly.columns:
         st.info(f"🚫 No driver data for **{entity_name}**.")
         return
+    scope = driver_monthly.loc[driver_monthly[DEPOT_COL].isin(depot_keys), ["year", "month"]]
 
-    df["month_label"] = df["month"].dt.strftime("%b-%y")
+    if scope.empty:
+        st.info(f"🚫 No driver data for **{entity_name}**.")
+        return
 
     # ---------------- Filters ----------------
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
 
-    # ✅ Year options with latest year selected by default
-    year_list = sorted(df["year"].dropna().unique())
-    year_options = ["All"] + [str(y) for y in year_list]
+    # ✅ Year options (calendar years, then financial years) with latest year selected by default
+    year_list = sorted(scope["year"].dropna().unique())
+    month_fy = fy_start_year(pd.to_datetime(scope["month"]))
+    fy_starts = {f"FY {fy_label(int(s))}": int(s) for s in sorted(month_fy.dropna().unique())}
+    year_options = ["All"] + [str(y) for y in year_list] + list(fy_starts)
     default_year_index = year_options.index(str(max(year_list))) if len(year_list) > 0 else 0
 
     top_year = col1.selectbox(
@@ -1535,13 +1586,15 @@ def show_top_bottom_drivers(entity_name, driver_monthly, years, DEPOT_COL, EMP_C
     )
 
     # ✅ Month options with latest month selected by default
+    fy_start = fy_starts.get(top_year)
     if top_year == "All":
-        month_options = sorted(df["month_label"].unique(), key=lambda x: pd.to_datetime(x, format="%b-%y"))
+        months = scope["month"]
+    elif fy_start is not None:
+        months = scope.loc[month_fy == fy_start, "month"]
     else:
-        month_options = sorted(
-            df[df["year"] == int(top_year)]["month_label"].unique(),
-            key=lambda x: pd.to_datetime(x, format="%b-%y")
-        )
+        months = scope.loc[scope["year"] == int(top_year), "month"]
+    month_values = sorted(months.dropna().unique())
+    month_options = [pd.Timestamp(m).strftime("%b-%y") for m in month_values]
 
     month_options_display = ["All"] + month_options
     default_month_index = month_options_display.index(month_options[-1]) if month_options else 0
@@ -1553,97 +1606,62 @@ def show_top_bottom_drivers(entity_name, driver_monthly, years, DEPOT_COL, EMP_C
         key="top_driver_month"
     )
 
-    # ✅ Add "Earnings" to rank options
-    rank_by = col3.selectbox("Rank by", ["KMs", "Hours", "Earnings", "Absenteeism"])
-
-    # ---------------- Apply filters ----------------
-    if top_year != "All":
-        df = df[df["year"] == int(top_year)]
-    if top_month != "All":
-        df = df[df["month_label"] == top_month]
-
-    if df.empty:
-        st.info("🚫 No driver data for selected filters.")
-        return
-
-    # ✅ Map rank column correctly
-    rank_col_map = {
-        "KMs": "total_km",
-        "Hours": "total_hours",
-        "Earnings": "total_earnings",
-        "Absenteeism": "absenteeism",
-    }
-    rank_col = rank_col_map[rank_by]
+    rank_by = col3.selectbox("Rank by", list(RANK_METRICS))
+    show = col4.selectbox("Show", list(SHOW_OPTIONS), key="top_driver_show")
 
     # ---------------- Summarize ----------------
-    summary = df.groupby(EMP_COL).agg(
-        total_km=('total_km', 'sum'),
-        total_hours=('total_hours', 'sum'),
-        total_earnings=('total_earnings', 'sum'),
-        absenteeism=('absenteeism', 'sum')
-    ).reset_index()
+    month = None if top_month == "All" else month_values[month_options.index(top_month)]
+    summary = driver_totals(
+        driver_monthly, depot_keys, "All" if fy_start is not None else top_year, month, DEPOT_COL, EMP_COL, fy_start=fy_start
+    )
 
     if summary.empty:
-        st.info("🚫 No data after grouping.")
+        st.info("🚫 No driver data for selected filters.")
         return
 
     # ✅ Top and bottom logic (Absenteeism is reversed)
-    if rank_by == "Absenteeism":
-        top5 = summary.sort_values(rank_col, ascending=True).head(5)
-        bottom5 = summary.sort_values(rank_col, ascending=False).head(5)
-    else:
-        top5 = summary.sort_values(rank_col, ascending=False).head(5)
-        bottom5 = summary.sort_values(rank_col, ascending=True).head(5)
-
-    top5.insert(0, "Rank", range(1, len(top5) + 1))
-    bottom5.insert(0, "Rank", range(1, len(bottom5) + 1))
-    top5 = top5.set_index("Rank")
-    bottom5 = bottom5.set_index("Rank")
+    n, percentile = SHOW_OPTIONS[show]
+    top, bottom = top_bottom(summary, RANK_METRICS[rank_by], n=n, percentile=percentile)
+
+    # ✅ Where the listed drivers stand (shared percentile store): the store ranks each
+    # (depot, driver) over a financial year, so it is only shown when the ranking above does too
+    ranks_fy = fy_start is not None and month is None
+    if ranks_fy:
+        scopes = ("Region", "State") if is_region else ("Depot", "Region", "State")
+        store = driver_percentiles()
+        metric = RANKING_COLUMNS[RANK_METRICS[rank_by]]
+        top = store.with_percentiles(top, DEPOT_COL, EMP_COL, fy_start, metric, scopes)
+        bottom = store.with_percentiles(bottom, DEPOT_COL, EMP_COL, fy_start, metric, scopes)
 
     # ---------------- Display ----------------
     colA, colB = st.columns(2)
-    colA.subheader(f"7. Top 5 by {rank_by} ({'Region' if is_region else 'Depot'})")
-    colA.dataframe(top5)
-    colB.subheader(f"8. Bottom 5 by {rank_by} ({'Region' if is_region else 'Depot'})")
-    colB.dataframe(bottom5)
+    colA.subheader(f"7. Top {show} by {rank_by} ({'Region' if is_region else 'Depot'})")
+    colA.dataframe(top)
+    colB.subheader(f"8. Bottom {show} by {rank_by} ({'Region' if is_region else 'Depot'})")
+    colB.dataframe(bottom)
+    if ranks_fy:
+        st.caption(fy_caption(fy_start))
+    else:
+        st.caption("Depot / region / state percentiles are shown for a whole financial year: pick an FY under Year and All months.")
 
 #MU/SL Reasons
+@fragment
 def show_mu_sl_reasons(entity_name, db_config, is_region=False, region_depots=None):
     st.markdown("## 9. Medical Unfit (MU) & Sick Leave (SL) Reasons")
-    db_user = config['db']['user']
-    db_password = quote_plus(config['db']['password'])  # Encode special characters
-    db_host = config['db']['host']
-    db_name = config['db']['database']
-
-    engine = create_engine(f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}")
-    df = pd.read_sql("SELECT * FROM input_data", con=engine)
-    df.columns = df.columns.str.strip().str.replace(" ", "_")
-    # ... rest of your function
 
-
-    if "depot_name" not in df.columns or "data_date" not in df.columns:
-        st.error("❌ Required columns ('depot_name' or 'data_date') missing in input_data.")
+    # Monthly MU/SL rollup for the depot (or the region's depots), cached; the
+    # year / month selectors below only slice it.
+    depots = region_depots if is_region and region_depots else [entity_name]
+    try:
+        df = load_mu_sl_monthly(normalize_depots(depots))
+    except Exception as e:
+        st.error(f"Error fetching input_data for MU/SL reasons: {e}")
         return
 
-    df["depot_name"] = df["depot_name"].astype(str).str.strip().str.lower()
-
-    # Filter by region (All depots) OR single depot
-    if is_region and region_depots:
-        region_keys = [d.strip().lower() for d in region_depots]
-        df = df[df["depot_name"].isin(region_keys)]
-    else:
-        df = df[df["depot_name"] == entity_name.strip().lower()]
-
     if df.empty:
         st.info(f"🚫 No MU/SL data found for **{entity_name.title()}**.")
         return
 
-    df["data_date"] = pd.to_datetime(df["data_date"], errors="coerce")
-    today = pd.Timestamp.today().normalize()
-    df = df[df["data_date"].notna() & (df["data_date"] <= today)]
-    df["year"] = df["data_date"].dt.year
-    df["month_period"] = df["data_date"].dt.to_period("M")
-
     col1, col2 = st.columns(2)
 
     # ---- Year selectbox ----
@@ -1661,17 +1679,15 @@ def show_mu_sl_reasons(entity_name, db_config, is_region=False, region_depots=No
     filtered_df = df if selected_year == "All" else df[df["year"] == int(selected_year)]
 
     # ---- Month selectbox ----
-    month_display = [m.strftime("%b-%Y") for m in sorted(filtered_df["month_period"].unique())]
+    months = sorted(filtered_df["month"].unique())
+    month_display = [pd.Timestamp(m).strftime("%b-%Y") for m in months]
 
     if month_display:
         # ✅ Default to the latest month
-        default_month = month_display[-1]  # last item is latest because list is sorted
         month_options = ["All"] + month_display
-        default_month_index = month_options.index(default_month)
-
         selected_month = col2.selectbox(
             "Month", month_options,
-            index=default_month_index,
+            index=len(month_options) - 1,
             key="month_selectbox"
         )
     else:
@@ -1679,32 +1695,14 @@ def show_mu_sl_reasons(entity_name, db_config, is_region=False, region_depots=No
 
     # ---- Filter by selected month ----
     if selected_month != "All":
-        selected_period = pd.Period(pd.to_datetime(selected_month, format="%b-%Y"), freq="M")
-        filtered_df = filtered_df[filtered_df["month_period"] == selected_period]
+        filtered_df = filtered_df[filtered_df["month"] == months[month_display.index(selected_month)]]
 
     if filtered_df.empty:
         st.info("🚫 No MU/SL data available for the selected filters.")
         return
 
-
-    mu_cols = [
-        'Spondilitis', 'Spinal_Disc', 'Vision_Color_Blindness',
-        'Neuro_Paralysis_Medical', 'Ortho', 'Diff_MU_Reasons', 'Total_Drivers_MU_Reasons'
-    ]
-    sl_cols = [
-        'Flu_Fever', 'BP', 'Orthopedic', 'Heart', 'Weakness', 'Eye',
-        'Accident_Injuries', 'Neuro_Paralysis_Sick_Leave', 'Piles', 'Diabetes',
-        'Thyroid', 'Gas', 'Dental', 'Ear', 'Skin_Allergy', 'General_Surgery',
-        'Obesity', 'Cancer', 'Total_Drivers_SL_Reasons', 'Diff_SL_Reasons'
-    ]
-
-    missing_cols = [c for c in mu_cols + sl_cols if c not in filtered_df.columns]
-    if missing_cols:
-        st.error(f"❌ Missing expected columns: {missing_cols}")
-        return
-
-    mu_totals = filtered_df[mu_cols].sum()
-    sl_totals = filtered_df[sl_cols].sum()
+    mu_totals = filtered_df[MU_REASON_COLS].sum()
+    sl_totals = filtered_df[SL_REASON_COLS].sum()
 
     mu_df = mu_totals.drop(['Diff_MU_Reasons', 'Total_Drivers_MU_Reasons'], errors="ignore").reset_index()
     mu_df.columns = ['Reason', 'Count']
@@ -1730,7 +1728,7 @@ def show_mu_sl_reasons(entity_name, db_config, is_region=False, region_depots=No
                             title=f"Medical Unfit (MU) Reasons – {entity_name.title()}")
             fig_mu.update_traces(texttemplate='%{text}', textposition='outside')
             fig_mu.update_layout(xaxis_title='Reason', yaxis_title='Count')
-            st.plotly_chart(fig_mu, use_container_width=True)
+            st.plotly_chart(fig_mu, use_container_width=True, key=chart_key("mu_reasons", mu_df, entity=entity_name))
 
     with col_sl:
         if not sl_df.empty:
@@ -1741,7 +1739,7 @@ def show_mu_sl_reasons(entity_name, db_config, is_region=False, region_depots=No
                             title=f"Sick Leave (SL) Reasons – {entity_name.title()}")
             fig_sl.update_traces(texttemplate='%{text}', textposition='outside')
             fig_sl.update_layout(xaxis_title='Reason', yaxis_title='Count')
-            st.plotly_chart(fig_sl, use_container_width=True)
+            st.plotly_chart(fig_sl, use_container_width=True, key=chart_key("sl_reasons", sl_df, entity=entity_name))
 
 
 # Add background watermark
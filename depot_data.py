@@ -0,0 +1,312 @@
+import functools
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from db_config import engine
+
+# ----------------------------------------------------------------------
+# 🗄️ Cached data loaders shared by the depot dashboards
+# ----------------------------------------------------------------------
+# Each loader pushes the depot filter, the column projection and the
+# aggregation into SQL and caches the (small) rollup it returns, so
+# selector changes on the page are served from cache.
+#
+# Loaders cache with shared_cache, a wrapper around st.cache_resource: the
+# cache holds one frozen frame (freeze()) per key instead of st.cache_data's
+# fresh deep copy per hit, and every hit hands the caller its own shallow
+# view (session_view()). Adding, replacing, renaming or dropping columns and
+# in-place sorts / resets only change that view; writing into shared values
+# either copies first (pandas copy-on-write) or raises on the write-protected
+# buffers. Either way nothing a renderer does reaches the cached frame.
+
+# input_data columns behind the "MU Reasons" / "SL Reasons" grid sections
+MU_REASON_COLS = [
+    'Spondilitis', 'Spinal_Disc', 'Vision_Color_Blindness',
+    'Neuro_Paralysis_Medical', 'Ortho', 'Diff_MU_Reasons', 'Total_Drivers_MU_Reasons'
+]
+SL_REASON_COLS = [
+    'Flu_Fever', 'BP', 'Orthopedic', 'Heart', 'Weakness', 'Eye',
+    'Accident_Injuries', 'Neuro_Paralysis_Sick_Leave', 'Piles', 'Diabetes',
+    'Thyroid', 'Gas', 'Dental', 'Ear', 'Skin_Allergy', 'General_Surgery',
+    'Obesity', 'Cancer', 'Total_Drivers_SL_Reasons', 'Diff_SL_Reasons'
+]
+
+# input_data is edited all day from the DM sheet, so rollups expire
+ROLLUP_TTL = 600
+
+# driver_absenteeism.date is TEXT, stored as uploaded from the LSA sheets:
+# ISO (yyyy-mm-dd, optionally followed by a time) or day-first (dd-mm-yyyy,
+# dd/mm/yyyy). LEAVE_DATE_FORMATS maps a pattern of the date part to its
+# STR_TO_DATE format ("%%" because the queries go through pyformat params).
+LEAVE_DATE_FORMATS = {
+    "^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}$": "%%Y-%%m-%%d",
+    "^[0-9]{1,2}-[0-9]{1,2}-[0-9]{4}$": "%%d-%%m-%%Y",
+    "^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}$": "%%d/%%m/%%Y",
+}
+
+
+def freeze(df):
+    """
+    Frame to keep in a shared cache. Text columns become Arrow-backed strings where
+    pyarrow is available and numpy buffers are write-protected. This protects the
+    values only: hand the frame out through session_view(), never as is.
+    """
+    if df is None:
+        return pd.DataFrame()
+    columns = {}
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) == "string":
+            try:
+                s = s.astype("string[pyarrow]")
+            except (ImportError, TypeError, ValueError):
+                pass
+        if isinstance(s.dtype, np.dtype):
+            values = s.to_numpy(copy=True)
+            values.flags.writeable = False
+        else:
+            values = s.array.copy()
+        columns[col] = values
+    frozen = pd.DataFrame(columns, index=df.index.copy(), copy=False)
+    frozen.attrs["read_only"] = True
+    return frozen
+
+
+def _frame_view(df):
+    view = df.copy(deep=False)
+    for i, dtype in enumerate(df.dtypes):
+        if not isinstance(dtype, np.dtype):
+            # extension arrays (Arrow strings, categoricals) are mutable objects:
+            # give the view its own (an Arrow copy shares the immutable buffers)
+            view.isetitem(i, df.iloc[:, i].array.copy())
+    return view
+
+
+def session_view(obj):
+    """
+    The caller's own view of a cached result: every DataFrame in it (also inside
+    tuples, lists and dicts) becomes a shallow copy sharing the frozen buffers.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return _frame_view(obj)
+    if isinstance(obj, dict):
+        return {k: session_view(v) for k, v in obj.items()}
+    if isinstance(obj, (tuple, list)):
+        return type(obj)(session_view(v) for v in obj)
+    return obj
+
+
+def shared_cache(**cache_args):
+    """st.cache_resource(**cache_args) whose hits are handed out through session_view()."""
+    def decorate(func):
+        cached = st.cache_resource(**cache_args)(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return session_view(cached(*args, **kwargs))
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorate
+
+
+def leave_date_sql(col="`date`"):
+    """SQL DATE of a driver_absenteeism text date column (NULL when it matches none of LEAVE_DATE_FORMATS)."""
+    part = f"SUBSTRING_INDEX(TRIM({col}), ' ', 1)"
+    cases = " ".join(
+        f"WHEN {part} REGEXP '{pattern}' THEN STR_TO_DATE({part}, '{fmt}')"
+        for pattern, fmt in LEAVE_DATE_FORMATS.items()
+    )
+    return f"(CASE {cases} END)"
+
+
+def normalize_depots(depots):
+    """Sorted, de-duplicated, upper-cased tuple of depot names (stable cache key)."""
+    if isinstance(depots, str):
+        depots = [depots]
+    return tuple(sorted({str(d).strip().upper() for d in (depots or []) if d and str(d).strip()}))
+
+
+# ------------------------------
+# Page sections
+# ------------------------------
+# st.fragment (Streamlit >= 1.37) lets a section rerun on its own when one of its widgets changes;
+# older Streamlit falls back to normal full-page reruns.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+def open_section(label, key):
+    """
+    Collapsed-by-default section header (a toggle). Expanders always run their body,
+    so sections that query on their own are gated on this instead: nothing in the
+    section is loaded until it is opened, and it stays open across reruns.
+    """
+    toggle = getattr(st, "toggle", None) or st.checkbox
+    return toggle(label, value=False, key=key)
+
+
+# ------------------------------
+# Service durations
+# ------------------------------
+def _time_to_seconds(values):
+    """
+    Vectorized equivalent of the old convert_time(): seconds since midnight for
+    TIME columns (pymysql returns them as timedelta), datetimes or "HH:MM:SS" strings.
+    Anything else becomes NaN.
+    """
+    s = pd.Series(values)
+    if pd.api.types.is_timedelta64_dtype(s):
+        return s.dt.total_seconds() % 86400
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return (s - s.dt.normalize()).dt.total_seconds()
+
+    secs = pd.Series(np.nan, index=s.index)
+    is_td = s.map(lambda x: isinstance(x, (timedelta, pd.Timedelta)))
+    if is_td.any():
+        secs[is_td] = pd.to_timedelta(s[is_td]).dt.total_seconds() % 86400
+    is_dt = s.map(lambda x: isinstance(x, datetime))
+    if is_dt.any():
+        dts = pd.to_datetime(s[is_dt])
+        secs[is_dt] = (dts - dts.dt.normalize()).dt.total_seconds()
+    is_str = s.map(lambda x: isinstance(x, str))
+    if is_str.any():
+        parsed = pd.to_datetime(s[is_str], format="%H:%M:%S", errors="coerce")
+        secs[is_str] = (parsed - parsed.dt.normalize()).dt.total_seconds()
+    return secs
+
+
+def service_hours(dept_time, arr_time, day_night_code):
+    """
+    Vectorized time_cal(): duty hours per service.
+    Night services ('N') always end the next day (two days later if that still gives
+    under 6 hours); other services roll over midnight only when arrival < departure.
+    """
+    dep = _time_to_seconds(dept_time).to_numpy(dtype=float)
+    arr = _time_to_seconds(arr_time).to_numpy(dtype=float)
+    night = (pd.Series(day_night_code).to_numpy() == 'N')
+
+    duration = arr - dep
+    duration = np.where(night | (duration < 0), duration + 86400, duration)
+    duration = np.where(night & (duration < 6 * 3600), duration + 86400, duration)
+    return pd.Series(duration / 3600, index=pd.Series(dept_time).index)
+
+
+# ------------------------------
+# MU / SL reasons
+# ------------------------------
+@shared_cache(show_spinner="Loading MU/SL reasons …", ttl=ROLLUP_TTL)
+def load_mu_sl_monthly(depots):
+    """
+    MU/SL reason counts per (depot, month) for the given depots, summed in SQL.
+    Rows dated in the future are ignored. Returns columns:
+    depot, year, month (month start Timestamp) + MU_REASON_COLS + SL_REASON_COLS.
+    """
+    depots = normalize_depots(depots)
+    columns = ["depot", "year", "month"] + MU_REASON_COLS + SL_REASON_COLS
+    if not depots:
+        return freeze(pd.DataFrame(columns=columns))
+
+    placeholders = ",".join(["%s"] * len(depots))
+    sums = ",\n            ".join(f"COALESCE(SUM(`{c}`), 0) AS `{c}`" for c in MU_REASON_COLS + SL_REASON_COLS)
+    query = f"""
+        SELECT
+            UPPER(TRIM(depot_name)) AS depot,
+            YEAR(data_date) AS year,
+            MONTH(data_date) AS month_num,
+            {sums}
+        FROM input_data
+        WHERE UPPER(TRIM(depot_name)) IN ({placeholders})
+          AND data_date IS NOT NULL
+          AND data_date <= CURDATE()
+        GROUP BY UPPER(TRIM(depot_name)), YEAR(data_date), MONTH(data_date)
+    """
+    df = pd.read_sql(query, engine, params=depots)
+    if df.empty:
+        return freeze(pd.DataFrame(columns=columns))
+
+    df["month"] = pd.to_datetime(dict(year=df["year"], month=df["month_num"], day=1))
+    df[MU_REASON_COLS + SL_REASON_COLS] = df[MU_REASON_COLS + SL_REASON_COLS].apply(pd.to_numeric, errors="coerce").fillna(0)
+    return freeze(df[columns].sort_values(["depot", "month"]).reset_index(drop=True))
+
+
+# ------------------------------
+# Absenteeism counts
+# ------------------------------
+ABSENTEEISM_COLUMNS = ["depot", "year", "month", "leave_type", "count"]
+
+
+@st.cache_resource(show_spinner="Loading absenteeism …", ttl=ROLLUP_TTL)
+def _statewide_absenteeism():
+    # one scan of driver_absenteeism for every depot: a per-depot filter on
+    # UPPER(TRIM(depot)) couldn't use an index anyway
+    query = f"""
+        SELECT depot, YEAR(leave_date) AS year, MONTH(leave_date) AS month, leave_type, COUNT(*) AS count
+        FROM (
+            SELECT UPPER(TRIM(depot)) AS depot, {leave_date_sql()} AS leave_date, leave_type
+            FROM driver_absenteeism
+        ) AS leaves
+        GROUP BY depot, YEAR(leave_date), MONTH(leave_date), leave_type
+    """
+    df = pd.read_sql(query, engine)
+    if df.empty:
+        return freeze(pd.DataFrame(columns=ABSENTEEISM_COLUMNS))
+    df["count"] = pd.to_numeric(df["count"], errors="coerce").fillna(0).astype(int)
+    return freeze(df[ABSENTEEISM_COLUMNS].sort_values(["depot", "year", "month"]).reset_index(drop=True))
+
+
+def load_absenteeism_counts(depots):
+    """
+    driver_absenteeism rolled up to (depot, year, month, leave_type, count) for the
+    given depots, sliced from the statewide rollup (built once per ROLLUP_TTL or
+    refresh_absenteeism_counts). Rows without a leave_type are kept (leave_type None)
+    so totals still match a plain COUNT(*); rows without a date get year / month NaN.
+    """
+    depots = normalize_depots(depots)
+    counts = _statewide_absenteeism()
+    return counts[counts["depot"].isin(depots)].reset_index(drop=True)
+
+
+def refresh_absenteeism_counts():
+    """Drop the statewide rollup so the next reader rebuilds it (after an ETL load)."""
+    _statewide_absenteeism.clear()
+
+
+def absenteeism_total(counts, depots=None, year="All"):
+    """Total absence rows in an absenteeism_counts frame, optionally for some depots / one year."""
+    if counts is None or counts.empty:
+        return 0
+    mask = pd.Series(True, index=counts.index)
+    if depots is not None:
+        mask &= counts["depot"].isin(normalize_depots(depots))
+    if year != "All":
+        mask &= counts["year"] == int(year)
+    return int(counts.loc[mask, "count"].sum())
+
+
+def absenteeism_by_depot(counts, year="All"):
+    """Absence rows per depot (columns: depot, absenteeism) for year ("All" or a year)."""
+    if counts is None or counts.empty:
+        return pd.DataFrame(columns=["depot", "absenteeism"])
+    if year != "All":
+        counts = counts[counts["year"] == int(year)]
+    return counts.groupby("depot")["count"].sum().rename("absenteeism").reset_index()
+
+
+def leave_type_counts(counts, depots, year="All"):
+    """Leave type -> Count for the given depots and year ("All" or a year), largest first."""
+    if counts is None or counts.empty:
+        return pd.DataFrame(columns=["leave_type", "Count"])
+    mask = counts["depot"].isin(normalize_depots(depots)) & counts["leave_type"].notna()
+    if year != "All":
+        mask &= counts["year"] == int(year)
+    return (
+        counts.loc[mask]
+        .groupby("leave_type")["count"]
+        .sum()
+        .sort_values(ascending=False)
+        .rename("Count")
+        .reset_index()
+    )
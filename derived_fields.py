@@ -0,0 +1,218 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------
+# 🧮 Derived input fields, declared once in config.json
+# ----------------------------------------------------------------------
+# "derived_fields" (next to "category_to_column") maps each calculated
+# category to a formula over other categories:
+#   {"op": "sum",   "args": [a, b, ...]}                  a + b + ...
+#   {"op": "sub",   "args": [a, b, ...]}                  a - b - ...
+#   {"op": "ratio", "args": [a, ...], "by": d}            (a + ...) / d
+# with optional "scale" (x 100 for the % rows), "round" (decimals, half away
+# from zero like JS toFixed), "min" (lower clip) and, for ratios, "default"
+# (value when d is 0; blank when absent). Blank or non-numeric inputs count
+# as 0. The same graph is evaluated here as whole-column numpy operations
+# over any number of (depot, date) rows, and emitted as JS for the AgGrid
+# input sheet, so the sheet, the edit page and saved rows cannot disagree.
+
+OPS = ("sum", "sub", "ratio")
+HEADER_PREFIX = "---"
+
+
+def load_formulas(config=None):
+    """The "derived_fields" formulas of config (config.json when None), in evaluation order."""
+    if config is None:
+        with open("config.json") as f:
+            config = json.load(f)
+    formulas = config.get("derived_fields", {})
+    return {name: formulas[name] for name in formula_order(formulas)}
+
+
+def inputs_of(formula):
+    return list(formula["args"]) + ([formula["by"]] if "by" in formula else [])
+
+
+def formula_order(formulas):
+    """Derived field names ordered so every formula comes after the derived fields it reads."""
+    order, state = [], {}
+
+    def visit(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Derived fields form a cycle: {' -> '.join(path + [name])}")
+        formula = formulas[name]
+        if formula.get("op") not in OPS:
+            raise ValueError(f"Derived field '{name}' has unknown op {formula.get('op')!r}")
+        state[name] = "visiting"
+        for dep in inputs_of(formula):
+            if dep in formulas:
+                visit(dep, path + [name])
+        state[name] = "done"
+        order.append(name)
+
+    for name in formulas:
+        visit(name, [])
+    return order
+
+
+def dependents(formulas):
+    """{category: derived fields that change when it changes}, following chains of derived fields."""
+    direct = {}
+    for name, formula in formulas.items():
+        for dep in inputs_of(formula):
+            direct.setdefault(dep, set()).add(name)
+    out = {}
+    for cat in direct:
+        seen, stack = set(), list(direct[cat])
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.add(name)
+                stack.extend(direct.get(name, ()))
+        order = list(formulas)
+        out[cat] = sorted(seen, key=order.index)
+    return out
+
+
+def _round_half_away(values, decimals):
+    factor = 10.0 ** decimals
+    return np.sign(values) * np.floor(np.abs(values) * factor + 0.5) / factor
+
+
+def evaluate(frame, formulas):
+    """
+    frame (one row per depot / date, one column per category) with every derived
+    category (re)computed in one vectorized pass. Blank derived values are NaN.
+    """
+    n = len(frame)
+    values = {}
+
+    def column(cat):
+        if cat in values:
+            return np.nan_to_num(values[cat], nan=0.0)
+        if cat not in frame.columns:
+            return np.zeros(n)
+        return pd.to_numeric(frame[cat], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+    for name, formula in formulas.items():
+        args = [column(a) for a in formula["args"]]
+        op = formula["op"]
+        if op == "sum":
+            result = np.sum(args, axis=0) if args else np.zeros(n)
+        elif op == "sub":
+            result = args[0] - np.sum(args[1:], axis=0) if len(args) > 1 else args[0]
+        else:
+            den = column(formula["by"])
+            default = formula.get("default")
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result = np.where(
+                    den != 0,
+                    np.sum(args, axis=0) / np.where(den != 0, den, 1) * formula.get("scale", 1),
+                    np.nan if default is None else default,
+                )
+        if "min" in formula:
+            result = np.where(np.isnan(result), result, np.maximum(result, formula["min"]))
+        if "round" in formula:
+            result = _round_half_away(result, formula["round"])
+        values[name] = result
+    return frame.assign(**values)
+
+
+def sheet_frame(sheet, value_cols, category_col="Category"):
+    """A Category x value-column sheet turned into one row per value column (date), one column per category."""
+    cats = sheet[category_col].astype(str).str.strip()
+    rows = ~cats.str.startswith(HEADER_PREFIX) & ~cats.duplicated()
+    return sheet.loc[rows, value_cols].set_axis(cats[rows]).T
+
+
+def apply_to_sheet(sheet, value_cols, formulas, category_col="Category"):
+    """
+    A Category x value-column sheet (the input grid, the edit page) with the derived
+    rows recomputed for every value column; header ("---") rows are left alone.
+    """
+    cats = sheet[category_col].astype(str).str.strip()
+    wide = sheet_frame(sheet, value_cols, category_col)
+    derived = evaluate(wide, formulas)[[c for c in formulas if c in set(cats)]]
+    out = sheet.copy()
+    for col in value_cols:
+        out[col] = out[col].astype(object)
+    for cat, row_vals in derived.T.iterrows():
+        idx = cats.index[cats == cat]
+        out.loc[idx, value_cols] = [[None if pd.isna(v) else v for v in row_vals.to_numpy()]] * len(idx)
+    return out
+
+
+def recompute_columns(df, category_to_column, formulas):
+    """
+    input_data rows (DB column names, any number of depots and dates) with the
+    derived columns recomputed in a single pass over all rows.
+    """
+    to_cat = {col: cat for cat, col in category_to_column.items() if col in df.columns}
+    derived = evaluate(df[list(to_cat)].rename(columns=to_cat), formulas)
+    cols = {category_to_column[cat]: derived[cat].to_numpy() for cat in formulas if cat in category_to_column}
+    return df.assign(**cols)
+
+
+_JS_VALUE_GETTER = """
+function(params) {
+    const FORMULAS = __FORMULAS__;
+    const category = params.data.Category;
+    const dateCol = params.colDef.field;
+    const api = params.api;
+
+    // If it's a header row, return an empty string
+    if (category.startsWith('---')) {
+        return '';
+    }
+
+    const numberOf = (cat) => {
+        const value = FORMULAS[cat] ? compute(cat) : (api.getRowNode(cat) || {data: {}}).data[dateCol];
+        if (value === undefined || value === null || value === '') {
+            return 0;
+        }
+        const num = parseFloat(value);
+        return isNaN(num) ? 0 : num;
+    };
+
+    const compute = (cat) => {
+        const f = FORMULAS[cat];
+        const vals = f.args.map(numberOf);
+        const total = vals.reduce((a, b) => a + b, 0);
+        let result;
+        if (f.op === 'sum') {
+            result = total;
+        } else if (f.op === 'sub') {
+            result = vals.slice(1).reduce((a, b) => a - b, vals[0]);
+        } else {
+            const den = numberOf(f.by);
+            if (den === 0) {
+                return f.default === undefined || f.default === null ? '' : f.default;
+            }
+            result = (total / den) * (f.scale === undefined ? 1 : f.scale);
+        }
+        if (f.min !== undefined) {
+            result = Math.max(f.min, result);
+        }
+        return f.round === undefined ? result : result.toFixed(f.round);
+    };
+
+    if (FORMULAS[category]) {
+        const result = compute(category);
+        params.data[dateCol] = result;
+        return result;
+    }
+
+    const originalValue = params.data[dateCol];
+    const numOriginalValue = parseFloat(originalValue);
+    return isNaN(numOriginalValue) ? 0 : numOriginalValue;
+}
+"""
+
+
+def js_value_getter(formulas):
+    """AgGrid valueGetter source evaluating formulas per date column (derived values are written back to the row)."""
+    return _JS_VALUE_GETTER.replace("__FORMULAS__", json.dumps(formulas))
@@ -1,6 +1,13 @@
 import base64
 import pandas as pd
 import altair as alt
+from chart_cache import altair_chart
+from driver_data import depot_data_version, enrich_driver_frames, financial_years, fy_label, load_depot_tables
+from driver_index import driver_index
+from driver_percentiles import driver_percentiles, fy_caption
+from driver_scorecards import scorecard_export_ui
+from query_runner import QueryError
+from grade_charts import grade_box_swarm
 import mysql.connector
 import streamlit as st
 from mysql.connector import Error
@@ -78,69 +85,45 @@ class driver_depot_dashboard_ui_DM:
         if self.ops_df is None:
             self.load_data()
 
-        # Financial years dictionary
-        self.financial_years = {
-            "01-04-2023 to 31-03-2024": (pd.Timestamp("2023-04-01"), pd.Timestamp("2024-03-31")),
-            "01-04-2024 to 31-03-2025": (pd.Timestamp("2024-04-01"), pd.Timestamp("2025-03-31")),
-        }
-        def get_financial_year(self, date):
-            """Return the financial year string (e.g. 2023-2024) for a given date."""
-            if pd.isna(date):
-                return None
-            year = date.year
-            return f"{year-1}-{year}" if date.month < 4 else f"{year}-{year+1}"
+        # Financial years present in the operations data
+        self.financial_years = financial_years(self.ops_df)
 
     # ---------------- Data Loading ----------------
     def load_data(self):
-        sql = Sql_connection()
-
-        # Load each dataset safely
-        self.driver_df = sql.load_sql_data('driver_details', 'unit', self.user_depot)
-        self.ops_df = sql.load_sql_data('daily_operations', 'depot', self.user_depot)
-        self.ser_df = sql.load_sql_data('service_master', 'depot', self.user_depot)
-        self.abs_df = sql.load_sql_data('driver_absenteeism', 'depot', self.user_depot)
-        self.ghc1_df = sql.load_sql_data('ghc_2024', 'depot', self.user_depot)
-
-        # --- Helper for safe datetime parsing ---
-        def safe_date_format(df, col):
-            if df.empty:
-                return df
-            if col not in df.columns:
-                st.warning(f"⚠ Column '{col}' missing in dataset. Skipping date conversion.")
-                return df
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-            df.dropna(subset=[col], inplace=True)
-            df['MONTH_YEAR'] = df[col].dt.to_period('M').astype(str)
-            return df
+        # Load the five independent tables concurrently
+        try:
+            self.data_version = depot_data_version(self.user_depot)
+            tables = load_depot_tables(self.user_depot, self.data_version)
+        except QueryError:
+            st.stop()  # already reported by run_queries
+        self.driver_df = tables['driver_details']
+        self.ops_df = tables['daily_operations']
+        self.ser_df = tables['service_master']
+        self.abs_df = tables['driver_absenteeism']
+        self.ghc1_df = tables['ghc_2024']
 
         # --- Operations Data ---
         if self.ops_df.empty:
             st.error("❌ 'operations' data unavailable for this depot.")
             self.ops_df = pd.DataFrame(columns=['EMPLOYEE_ID', 'OPERATIONS_DATE', 'OPD_KMS', 'DAILY_EARNINGS', 'DAY_NIGHT'])
-        else:
-            # Handle missing date column
-            if 'OPERATIONS_DATE' not in self.ops_df.columns:
-                st.warning("⚠ 'OPERATIONS_DATE' column missing in daily_operations table.")
-                self.ops_df['OPERATIONS_DATE'] = pd.NaT
-            self.ops_df = safe_date_format(self.ops_df, 'OPERATIONS_DATE')
-            self.ops_df['FINANCIAL_YEAR'] = self.ops_df['OPERATIONS_DATE'].apply(self.get_financial_year)
-            self.max_date = self.ops_df['OPERATIONS_DATE'].max()
+        elif 'OPERATIONS_DATE' not in self.ops_df.columns:
+            st.warning("⚠ 'OPERATIONS_DATE' column missing in daily_operations table.")
 
         # --- Absenteeism Data ---
-        if not self.abs_df.empty:
-            self.abs_df = safe_date_format(self.abs_df, 'DATE')
-        else:
+        if self.abs_df.empty:
             st.info("No absenteeism records found for this depot.")
 
         # --- Service Master ---
-        if not self.ser_df.empty:
-            if {'DEPT_TIME', 'ARR_TIME'}.issubset(self.ser_df.columns):
-                self.ser_df['HOURS'] = (self.ser_df['DEPT_TIME'] - self.ser_df['ARR_TIME']).dt.total_seconds().abs() / 3600
-            else:
-                st.warning("⚠ Missing 'DEPT_TIME' or 'ARR_TIME' columns in service_master.")
-                self.ser_df['HOURS'] = 0
-        else:
+        if self.ser_df.empty:
             st.info("No service master data available.")
+        elif not {'DEPT_TIME', 'ARR_TIME'}.issubset(self.ser_df.columns):
+            st.warning("⚠ Missing 'DEPT_TIME' or 'ARR_TIME' columns in service_master.")
+
+        # --- Enrichment (MONTH_YEAR, FINANCIAL_YEAR, service HOURS), cached per depot and data version ---
+        self.ops_df, self.abs_df, self.ser_df, _ = enrich_driver_frames(
+            self.user_depot, self.ops_df, self.abs_df, self.ser_df, version=self.data_version
+        )
+        self.max_date = self.ops_df['OPERATIONS_DATE'].max()
 
         # --- GHC / Health Data ---
         if self.ghc1_df.empty:
@@ -150,35 +133,13 @@ class driver_depot_dashboard_ui_DM:
         if self.driver_df.empty:
             st.warning("⚠ No driver details available for this depot.")
 
-            # Convert dates
-            self.ops_df['OPERATIONS_DATE'] = pd.to_datetime(self.ops_df['OPERATIONS_DATE'], errors='coerce')
-            self.abs_df['DATE'] = pd.to_datetime(self.abs_df['DATE'], errors='coerce')
-
-            # Format and add MONTH_YEAR
-            self.ops_df = self.parse_and_format(self.ops_df, 'OPERATIONS_DATE')
-            self.abs_df = self.parse_and_format(self.abs_df, 'DATE')
-            self.ser_df['HOURS'] = self.ser_df['DEPT_TIME'] - self.ser_df['ARR_TIME']
-            self.ser_df['HOURS'] = abs(self.ser_df['HOURS'].dt.total_seconds() / 3600).round(2)
-            # Add financial year
-            self.ops_df['FINANCIAL_YEAR'] = self.ops_df['OPERATIONS_DATE'].apply(self.get_financial_year)
-            self.max_date = self.ops_df['OPERATIONS_DATE'].max()
+        # --- Per-driver index (driver switches become lookups) ---
+        self.index = driver_index(
+            self.ops_df, self.abs_df, self.ser_df, self.ghc1_df, self.driver_df, version=self.data_version
+        )
         
 
     # ---------------- Helpers ----------------
-    def parse_and_format(self, df, date_col):
-        if date_col in df.columns:
-            df[date_col] = pd.to_datetime(df[date_col], errors='coerce', dayfirst=True)
-            df.dropna(subset=[date_col], inplace=True)
-            df['MONTH_YEAR'] = df[date_col].dt.to_period('M').dt.strftime('%Y-%m')
-        return df
-
-    def get_financial_year(self, date):
-        year = date.year
-        if date.month < 4:
-            return f"{year-1}-{year}"
-        else:
-            return f"{year}-{year+1}"
-
     @staticmethod
     def get_user_depot(_conn, userid):
         if not userid:
@@ -221,7 +182,7 @@ class driver_depot_dashboard_ui_DM:
 
             # Driver selection
             with col3:
-                drivers_in_depot = self.ops_df['EMPLOYEE_ID'].unique().tolist()
+                drivers_in_depot = self.index.drivers()
                 if not drivers_in_depot:
                     st.warning("⚠ No drivers found for this depot.")
                     st.stop()
@@ -236,33 +197,18 @@ class driver_depot_dashboard_ui_DM:
                 if self.max_date >= i:
                     self.month_year.append(i.strftime('%Y-%m'))
             month_year_df = pd.DataFrame({'MONTH_YEAR':self.month_year})        
-            # -- Filter data for selection --
-            drv_ops = self.ops_df[
-                (self.ops_df['EMPLOYEE_ID'] == self.selected_driver) &
-                (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) & (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-            ]
-            drv_leaves = self.abs_df[
-                (self.abs_df['EMPLOYEE_ID'] == self.selected_driver) &
-                (self.abs_df['DATE'] >= self.fy_start) & (self.abs_df['DATE'] <= self.fy_end)
-            ]
-            drv_hours = pd.merge(self.ops_df, self.ser_df[['SERVICE_NUMBER','HOURS']],on='SERVICE_NUMBER',how='left')
-            drv_hours['HOURS'] = drv_hours['HOURS'].fillna(0)
-            drv_hours2 = drv_hours[(drv_hours['OPERATIONS_DATE'] >= self.fy_start) & (drv_hours['OPERATIONS_DATE'] <= self.fy_end)]
-            drv_hours = drv_hours[(drv_hours['EMPLOYEE_ID'] == self.selected_driver) & (drv_hours['OPERATIONS_DATE'] >= self.fy_start) & (drv_hours['OPERATIONS_DATE'] <= self.fy_end)]
-            drv_health = self.ghc1_df[self.ghc1_df['EMPLOYEE_ID'] == self.selected_driver] if 'EMPLOYEE_ID' in self.ghc1_df.columns else pd.DataFrame()
-            drv_ghcgrade = pd.merge(self.ghc1_df[['EMPLOYEE_ID','AGE', 'FINAL_GRADING']], drv_hours2[['EMPLOYEE_ID','HOURS']], on='EMPLOYEE_ID', how='right')
-            drv_ghcgrade['HOURS'] = drv_ghcgrade['HOURS'].fillna(0)
-            self.drv_leaves2 = self.abs_df[
-                (self.abs_df['DATE'] >= self.fy_start) & (self.abs_df['DATE'] <= self.fy_end)
-            ]
-            self.drv_leaves2 = self.drv_leaves2.groupby('EMPLOYEE_ID')['LEAVE_TYPE'].count()
-            self.drv_leaves2 = self.drv_leaves2.reset_index()
+            # -- Driver slices from the per-driver index; depot-wide frames are computed once per FY --
+            fy = self.index.window(self.fy_start, self.fy_end)
+            drv_ops = self.index.ops(self.selected_driver, self.fy_start, self.fy_end)
+            drv_leaves = self.index.leaves(self.selected_driver, self.fy_start, self.fy_end)
+            drv_hours = drv_ops
+            drv_hours2 = fy["ops"]
+            drv_monthly = self.index.monthly(self.selected_driver, self.month_year)
+            self.drv_leaves2 = fy["leave_counts"]
             drv_lsa_ghc = pd.merge(self.drv_leaves2,self.ghc1_df[['EMPLOYEE_ID','FINAL_GRADING']], on='EMPLOYEE_ID',how='inner') 
 
             # Depot-wide averages for context
-            depot_ops_time = self.ops_df[
-                (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) & (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-            ]
+            depot_ops_time = fy["ops"]
             depot_kms_avg = depot_ops_time['OPD_KMS'].mean() if not depot_ops_time.empty and 'OPD_KMS' in depot_ops_time.columns else 0
             depot_earnings_avg = depot_ops_time['DAILY_EARNINGS'].mean() if not depot_ops_time.empty and 'DAILY_EARNINGS' in depot_ops_time.columns else 0
             depot_hours_avg = drv_hours2['HOURS'].mean()
@@ -271,7 +217,7 @@ class driver_depot_dashboard_ui_DM:
 
        
         try:
-            driver_info = self.driver_df[self.driver_df['EMPLOYEE_ID'] == str(self.selected_driver)]
+            driver_info = self.index.details(self.selected_driver)
             col_det, col_sum = st.columns(2)
             with col_det:
                 st.markdown("## Driver Details")
@@ -299,9 +245,6 @@ class driver_depot_dashboard_ui_DM:
             lsa_leaves = f"{(drv_leaves['LEAVE_TYPE'] == 'L').sum()} + {(drv_leaves['LEAVE_TYPE'] == 'S').sum()} + {(drv_leaves['LEAVE_TYPE'] == 'A').sum()}"
 
             # Depot-wide averages
-            depot_ops_time = self.ops_df[
-                (self.ops_df['OPERATIONS_DATE'].between(self.fy_start, self.fy_end))
-            ]
             depot_kms_avg = depot_ops_time['OPD_KMS'].mean() if not depot_ops_time.empty and 'OPD_KMS' in depot_ops_time.columns else 0
             depot_earnings_avg = depot_ops_time['DAILY_EARNINGS'].mean() if not depot_ops_time.empty and 'DAILY_EARNINGS' in depot_ops_time.columns else 0
             depot_hours_avg = drv_hours2['HOURS'].mean() if not drv_hours2.empty else 0
@@ -345,6 +288,13 @@ class driver_depot_dashboard_ui_DM:
             )
 
 
+        # --- Standing in the FY: depot / region / state percentiles (shared store) ---
+        standing = driver_percentiles().standing_table(self.selected_driver, self.fy_start.year, self.user_depot)
+        if not standing.empty:
+            st.markdown("### Driver Standing")
+            st.dataframe(standing, use_container_width=True)
+            st.caption(fy_caption(self.fy_start.year))
+
         def chart_legend(label, bar_color, label2=None, bar_color2=None, avg_label="Average Line: Red"):
             s = "<div style='display:flex;align-items:center;gap:24px;margin:10px 0 20px 0;'>"
             s += f"<span style='display:inline-block;width:35px;height:14px;background:{bar_color};margin-right:8px;border-radius:2px;'></span>"
@@ -359,9 +309,7 @@ class driver_depot_dashboard_ui_DM:
         # --------- Visualizations ---------
         # --- Monthly Kilometers ---
         st.markdown("### Monthly Kilometers Driven")
-        monthly_kms = drv_ops.groupby('MONTH_YEAR')['OPD_KMS'].sum().reset_index()
-        monthly_kms = pd.merge(monthly_kms, month_year_df, on='MONTH_YEAR',how='outer')
-        monthly_kms = monthly_kms.fillna(0)
+        monthly_kms = drv_monthly[['MONTH_YEAR', 'OPD_KMS']]
         total_kms_period = monthly_kms['OPD_KMS'].sum()
         st.markdown(f"<div style='font-size:20px;color:#1957a6;margin-bottom:0;'><b>Total Kilometers:</b> {total_kms_period:,.2f} KMs</div>", unsafe_allow_html=True)
         avg_kms = monthly_kms['OPD_KMS'].mean() if not monthly_kms.empty else 0
@@ -389,15 +337,13 @@ class driver_depot_dashboard_ui_DM:
             y='OPD_KMS:Q',
             text='label:N'
         )
-        st.altair_chart((bars + kms_text + avg_line + avg_text).properties(width=900), use_container_width=True)
+        altair_chart((bars + kms_text + avg_line + avg_text).properties(width=900), "driver_monthly_kms", monthly_kms)
         chart_legend("Bar: Blue", "#1f77b4", None, None, "Average Line: Red")
 
         # --- Monthly Earnings ---
         if 'DAILY_EARNINGS' in drv_ops.columns:
             st.markdown("### Monthly Earnings")
-            monthly_earnings = drv_ops.groupby('MONTH_YEAR')['DAILY_EARNINGS'].sum().reset_index()
-            monthly_earnings = pd.merge(monthly_earnings, month_year_df, on='MONTH_YEAR',how='outer')
-            monthly_earnings = monthly_earnings.fillna(0)
+            monthly_earnings = drv_monthly[['MONTH_YEAR', 'DAILY_EARNINGS']]
             total_earnings_period = monthly_earnings['DAILY_EARNINGS'].sum()
             st.markdown(f"<div style='font-size:20px;color:#1957a6;margin-bottom:0;'><b>Total Earnings:</b> ₹{total_earnings_period:,.2f}</div>", unsafe_allow_html=True)
             avg_earn = monthly_earnings['DAILY_EARNINGS'].mean() if not monthly_earnings.empty else 0
@@ -427,7 +373,7 @@ class driver_depot_dashboard_ui_DM:
                 y='DAILY_EARNINGS:Q',
                 text='label:N'
             )
-            st.altair_chart((bars2+ earnings_text + avg_line2 + avg_text2).properties(width=900), use_container_width=True)
+            altair_chart((bars2+ earnings_text + avg_line2 + avg_text2).properties(width=900), "driver_monthly_earnings", monthly_earnings)
             chart_legend("Bar: Blue", "#1f77b4", None, None, "Average Line: Red")
 
         # --- Day vs Night Duties ---
@@ -435,7 +381,7 @@ class driver_depot_dashboard_ui_DM:
             st.markdown("### Day vs Night Duties")
 
             # Group duties
-            dn_summary = drv_ops.groupby(['DAY_NIGHT', 'MONTH_YEAR']).size().reset_index(name='Count')
+            dn_summary = drv_ops.groupby(['DAY_NIGHT', 'MONTH_YEAR'], observed=True).size().reset_index(name='Count')
 
             # Ensure every month has both D and N entries
             duty_types = ['D', 'N']
@@ -503,7 +449,7 @@ class driver_depot_dashboard_ui_DM:
             )
 
             # Combine and show chart
-            st.altair_chart((bars_dn + text_labels + avg_lines + avg_texts).properties(width=900), use_container_width=True)
+            altair_chart((bars_dn + text_labels + avg_lines + avg_texts).properties(width=900), "driver_day_night", dn_summary, avg_df)
 
             chart_legend("Day Out: Blue", "#1f77b4", "Night Out: Purple", "#5A00FF", "Average Line: Red")
 
@@ -512,9 +458,7 @@ class driver_depot_dashboard_ui_DM:
         # --- PRODUCTIVITY HOURS ---
         if not drv_hours.empty:
             st.markdown("### PRODUCTIVITY HOURS")
-            hours_monthly = drv_hours.groupby('MONTH_YEAR')['HOURS'].sum()
-            hours_monthly = pd.merge(hours_monthly, month_year_df, on='MONTH_YEAR',how='outer')
-            hours_monthly = hours_monthly.fillna(0)
+            hours_monthly = drv_monthly[['MONTH_YEAR', 'HOURS']]
             total_hours = hours_monthly['HOURS'].sum()
             st.markdown(f"<div style='font-size:20px;color:#1957a6;margin-bottom:0;'><b>Total Hours:</b> {total_hours} hrs</div>", unsafe_allow_html=True)
             avg_hours = hours_monthly['HOURS'].mean() if not hours_monthly.empty else 0
@@ -542,7 +486,7 @@ class driver_depot_dashboard_ui_DM:
                 y='HOURS:Q',
                 text='label:N'
             )
-            st.altair_chart((hours_bars + hours_text + hours_avg_line + hours_avg_text).properties(width=900), use_container_width=True)
+            altair_chart((hours_bars + hours_text + hours_avg_line + hours_avg_text).properties(width=900), "driver_monthly_hours", hours_monthly)
             chart_legend("Bar: Blue", "#1f77b4", None, None, "Average Line: Red")
         else:
             st.info("No hours data for selected filters.")
@@ -550,9 +494,7 @@ class driver_depot_dashboard_ui_DM:
         # --- Absenteeism/Leave Monthly ---
         if not drv_leaves.empty:
             st.markdown("### Absenteeism / Leave Summary")
-            leave_monthly = drv_leaves.groupby('MONTH_YEAR').size().reset_index(name='Leave_Days')
-            leave_monthly = pd.merge(leave_monthly, month_year_df, on='MONTH_YEAR',how='outer')
-            leave_monthly = leave_monthly.fillna(0)
+            leave_monthly = drv_monthly[['MONTH_YEAR', 'Leave_Days']]
             total_leaves_period = leave_monthly['Leave_Days'].sum()
             st.markdown(f"<div style='font-size:20px;color:#1957a6;margin-bottom:0;'><b>Total for Period:</b> {total_leaves_period} Days</div>", unsafe_allow_html=True)
             avg_leave = leave_monthly['Leave_Days'].mean() if not leave_monthly.empty else 0
@@ -580,7 +522,7 @@ class driver_depot_dashboard_ui_DM:
                 y='Leave_Days:Q',
                 text='label:N'
             )
-            st.altair_chart((leave_bars + leaves_text + leave_avg_line + leave_avg_text).properties(width=900), use_container_width=True)
+            altair_chart((leave_bars + leaves_text + leave_avg_line + leave_avg_text).properties(width=900), "driver_monthly_leaves", leave_monthly)
             chart_legend("Bar: Blue", "#1f77b4", None, None, "Average Line: Red")
         else:
             st.info("No leave/absenteeism data for selected filters.")
@@ -601,68 +543,22 @@ class driver_depot_dashboard_ui_DM:
             if missing_cols:
                 st.error(f"Missing required columns in dataset: {', '.join(missing_cols)}")
             else:
-                # Filter and aggregate data
-                drv_ghcgrade = pd.merge(
-                    self.ghc1_df[['EMPLOYEE_ID', 'FINAL_GRADING']],
-                    drv_hours2[['EMPLOYEE_ID', 'HOURS']],
-                    on='EMPLOYEE_ID', how='right'
-                )
-                drv_ghcgrade['HOURS'] = drv_ghcgrade['HOURS'].fillna(0)
+                # Hours per employee and grade for the FY (computed once per FY by the index)
+                sorted_data3 = fy["hours_by_grade"]
 
-                if drv_ghcgrade.empty:
+                if drv_hours2.empty:
                     st.warning("No data available for the selected depot.")
                 else:
-                    # Aggregate hours per employee and grade
-                    sorted_data3 = drv_ghcgrade.dropna(subset=['FINAL_GRADING']).groupby(
-                        ['EMPLOYEE_ID', 'FINAL_GRADING'], as_index=False
-                    )['HOURS'].sum()
-
-                    # Box plot of hours by health grade
-                    box_plot = alt.Chart(sorted_data3).mark_boxplot(size=20).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('HOURS:Q', title='Annual Hours')
-                    ).properties(
-                        title=alt.TitleParams(
-                            text=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',
-                            anchor='middle'
-                        )
-                    )
-
-                    # Swarm plot (jittered points)
-                    swarm_plot = alt.Chart(sorted_data3).mark_point(
-                        color='red',
-                        size=30
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', axis=alt.Axis(labelAngle=0)),
-                        y=alt.Y('HOURS:Q'),
-                        tooltip=[
-                            alt.Tooltip('EMPLOYEE_ID', title='Employee ID'),
-                            alt.Tooltip('HOURS', title='Annual Hours')
-                        ]
-                    ).transform_calculate(
-                        jitter='sqrt(-2*log(random()))*cos(2*PI*random())'  # Jitter simulation
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('HOURS:Q')
-                    )
 
-                    # Highlight the selected employee
-                    highlighted_employee = alt.Chart(
-                        sorted_data3[sorted_data3['EMPLOYEE_ID'] == self.selected_driver]
-                    ).mark_point(
-                        color='yellow',
-                        size=200,
-                        filled=True
-                    ).encode(
-                        x='FINAL_GRADING:N',
-                        y='HOURS:Q'
+                    # Box stats per grade + a bounded swarm sample, reduced server-side
+                    final_chart = grade_box_swarm(
+                        sorted_data3, 'HOURS', self.selected_driver,
+                        title=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',
+                        y_title='Annual Hours', tooltip_title='Annual Hours'
                     )
 
-                    # Combine charts
-                    final_chart = box_plot + swarm_plot + highlighted_employee
-
                     # Display in Streamlit
-                    st.altair_chart(final_chart, use_container_width=True)
+                    altair_chart(final_chart, "driver_hours_vs_grade", sorted_data3, driver=self.selected_driver)
 
         else:
             st.error("Failed to load GHC data.")
@@ -690,60 +586,20 @@ class driver_depot_dashboard_ui_DM:
                 if drv_lsa_ghc.empty:
                     st.warning("No data available for the selected driver!")
                 else:
-                    # Create the bar graph with matplotlib
-                                    
-                    # Create a box plot
-                    box_plot = alt.Chart(drv_lsa_ghc).mark_boxplot(size=20).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('LEAVE_TYPE:Q', title=None)
-                    ).properties(
-                        title=alt.TitleParams(
-                                        text=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',  # Correctly display selected depot in the title
-                                        anchor='middle'  # Center the title
-                                    ),
+                    # Box stats per grade + a bounded swarm sample, reduced server-side
+                    final_chart = grade_box_swarm(
+                        drv_lsa_ghc, 'LEAVE_TYPE', self.selected_driver,
+                        title=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',
+                        y_title=None, tooltip_title='Annual Leaves'
                     )
                     
-                    # Create a swarm plot (jittered points)
-                    swarm_plot = alt.Chart(drv_lsa_ghc).mark_point(
-                        color='red',
-                        size=30
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('LEAVE_TYPE:Q', title=None),
-                        tooltip=[
-                                    alt.Tooltip('EMPLOYEE_ID', title='Employee ID'),  # Custom label for employee ID
-                                    alt.Tooltip('LEAVE_TYPE', title='Annual Leaves')  # Custom label for total operational kilometers
-                                ],
-                    ).transform_calculate(
-                        jitter='sqrt(-2*log(random()))*cos(2*PI*random())'  # Simulate jittering
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade', axis=alt.Axis(labelAngle=0)),
-                        y=alt.Y('LEAVE_TYPE:Q', title=None)
-                    )
-                    
-                    # Highlight the selected employee with a larger yellow dot
-                    highlighted_employee = alt.Chart(drv_lsa_ghc[drv_lsa_ghc['EMPLOYEE_ID'] == self.selected_driver]).mark_point(
-                        color='yellow',
-                        size=200, filled=True
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('LEAVE_TYPE:Q'),
-                        #tooltip=['employee_id', 'tot_opd_kms']
-                    )
-
-                    # Combine the box plot, swarm plot, highlighted employee point, and the custom legend
-                    final_chart = (box_plot + swarm_plot + highlighted_employee)
-                    
                     # Display the chart in Streamlit
-                    st.altair_chart(final_chart, use_container_width=True)
+                    altair_chart(final_chart, "driver_leaves_vs_grade", drv_lsa_ghc, driver=self.selected_driver)
         else:
                 st.error("Failed to load data.")
 
         # Filter health data for selected driver
-        drv_health = pd.DataFrame()
-        if hasattr(self, 'ghc1_df') and self.ghc1_df is not None:
-            if 'EMPLOYEE_ID' in self.ghc1_df.columns:
-                drv_health = self.ghc1_df[self.ghc1_df['EMPLOYEE_ID'] == self.selected_driver]
+        drv_health = self.index.health(self.selected_driver)
 
         # --- Health Profile ---
         # --- Health Profile ---
@@ -773,62 +629,22 @@ class driver_depot_dashboard_ui_DM:
 
 
     def driver_depot_ui(self):
-        # --- Filter driver-specific data ---
-        drv_ops = self.ops_df[
-            (self.ops_df['EMPLOYEE_ID'] == self.selected_driver) &
-            (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) &
-            (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-        ]
-        
-        drv_leaves = self.abs_df[
-            (self.abs_df['EMPLOYEE_ID'] == self.selected_driver) &
-            (self.abs_df['DATE'] >= self.fy_start) &
-            (self.abs_df['DATE'] <= self.fy_end)
-        ]
-        
-        drv_hours = pd.merge(
-            self.ops_df, self.ser_df[['SERVICE_NUMBER','HOURS']], on='SERVICE_NUMBER', how='left'
-        )
-        drv_hours['HOURS'] = drv_hours['HOURS'].fillna(0)
-        drv_hours2 = drv_hours[
-            (drv_hours['OPERATIONS_DATE'] >= self.fy_start) &
-            (drv_hours['OPERATIONS_DATE'] <= self.fy_end)
-        ]
-        drv_hours = drv_hours[
-            (drv_hours['EMPLOYEE_ID'] == self.selected_driver) &
-            (drv_hours['OPERATIONS_DATE'] >= self.fy_start) &
-            (drv_hours['OPERATIONS_DATE'] <= self.fy_end)
-        ]
+        # --- Driver-specific data: lookups in the per-driver index ---
+        fy = self.index.window(self.fy_start, self.fy_end)
+        drv_ops = self.index.ops(self.selected_driver, self.fy_start, self.fy_end)
+        drv_leaves = self.index.leaves(self.selected_driver, self.fy_start, self.fy_end)
+        drv_hours = drv_ops
+        drv_hours2 = fy["ops"]
         
         # --- Driver health data ---
-        drv_health = pd.DataFrame()
-        if hasattr(self, 'ghc1_df') and self.ghc1_df is not None:
-            if 'EMPLOYEE_ID' in self.ghc1_df.columns:
-                drv_health = self.ghc1_df[self.ghc1_df['EMPLOYEE_ID'] == self.selected_driver]
-        
-        # --- Merge health grade with hours ---
-        drv_ghcgrade = pd.DataFrame()
-        if not drv_hours2.empty and hasattr(self, 'ghc1_df') and self.ghc1_df is not None:
-            drv_ghcgrade = pd.merge(
-                self.ghc1_df[['EMPLOYEE_ID','AGE','FINAL_GRADING']],
-                drv_hours2[['EMPLOYEE_ID','HOURS']],
-                on='EMPLOYEE_ID',
-                how='right'
-            )
-            drv_ghcgrade['HOURS'] = drv_ghcgrade['HOURS'].fillna(0)
+        drv_health = self.index.health(self.selected_driver)
         
         # --- Absenteeism L+S+A ---
         drv_lsa_ghc = pd.DataFrame()  # Initialize as empty DataFrame
 
         if not self.abs_df.empty and hasattr(self, 'ghc1_df') and self.ghc1_df is not None:
-            drv_leaves_filtered = self.abs_df[
-                (self.abs_df['DATE'] >= self.fy_start) &
-                (self.abs_df['DATE'] <= self.fy_end) &
-                (self.abs_df['LEAVE_TYPE'].isin(['L', 'S', 'A']))
-            ]
-            
-            if not drv_leaves_filtered.empty:
-                self.drv_leaves2 = drv_leaves_filtered.groupby('EMPLOYEE_ID').size().reset_index(name='LEAVE_COUNT')
+            if not fy["lsa_counts"].empty:
+                self.drv_leaves2 = fy["lsa_counts"]
                 drv_lsa_ghc = pd.merge(
                     self.drv_leaves2,
                     self.ghc1_df[['EMPLOYEE_ID', 'FINAL_GRADING']],
@@ -845,31 +661,16 @@ class driver_depot_dashboard_ui_DM:
             st.warning("No absenteeism data available for the selected depot and financial year.")
 
         
-        # --- Global averages ---
-        global_ops_time = self.ops_df[
-            (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) &
-            (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-        ]
-        global_hours = pd.merge(
-            self.ops_df, self.ser_df[['SERVICE_NUMBER','HOURS']], on='SERVICE_NUMBER', how='left'
-        )
-        global_hours = global_hours[
-            (global_hours['OPERATIONS_DATE'] >= self.fy_start) &
-            (global_hours['OPERATIONS_DATE'] <= self.fy_end)
-        ]
-        global_leaves = self.abs_df[
-            (self.abs_df['DATE'] >= self.fy_start) &
-            (self.abs_df['DATE'] <= self.fy_end) &
-            (self.abs_df['LEAVE_TYPE'].isin(['L','S','A']))
-        ]
+        # --- Global averages (the index keeps one FY window per financial year) ---
+        global_ops_time = fy["ops"]
         
         global_kms_avg = global_ops_time['OPD_KMS'].mean() if 'OPD_KMS' in global_ops_time.columns else 0
         global_earnings_avg = global_ops_time['DAILY_EARNINGS'].mean() if 'DAILY_EARNINGS' in global_ops_time.columns else 0
-        global_hours_avg = global_hours['HOURS'].mean() if not global_hours.empty else 0
-        global_leaves_avg = global_leaves.groupby('EMPLOYEE_ID').size().reset_index(name='LEAVE_COUNT')['LEAVE_COUNT'].mean() if not global_leaves.empty else 0
+        global_hours_avg = global_ops_time['HOURS'].mean() if not global_ops_time.empty else 0
+        global_leaves_avg = fy["lsa_counts"]['LEAVE_COUNT'].mean() if not fy["lsa_counts"].empty else 0
         
         # --- Driver Info ---
-        driver_info = self.driver_df[self.driver_df['EMPLOYEE_ID'] == str(self.selected_driver)]
+        driver_info = self.index.details(self.selected_driver)
         col_det, col_sum = st.columns(2)
         
         with col_det:
@@ -942,9 +743,7 @@ class driver_depot_dashboard_ui_DM:
             
         # --- Total Kilometers ---
         st.markdown("### Total Kilometers Driven by All Employees")
-        depot_ops_time = self.ops_df[
-            (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) & (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-        ]
+        depot_ops_time = fy["ops"]
         all_emp_kms = depot_ops_time.groupby('EMPLOYEE_ID')['OPD_KMS'].sum().reset_index()
         all_emp_kms['is_selected'] = all_emp_kms['EMPLOYEE_ID'] == self.selected_driver
         
@@ -966,7 +765,7 @@ class driver_depot_dashboard_ui_DM:
             y='OPD_KMS:Q'
         )
 
-        st.altair_chart((bars_kms + avg_line_kms).properties(width=900), use_container_width=True)
+        altair_chart((bars_kms + avg_line_kms).properties(width=900), "depot_employee_kms", all_emp_kms, global_kms_avg)
         chart_legend("Depot Employees: Blue", "#1f77b4", "Selected Employee: Red", "red", "Global Average: Red Dashed")
 
         # --- Total Earnings ---
@@ -993,13 +792,13 @@ class driver_depot_dashboard_ui_DM:
                 y='DAILY_EARNINGS:Q'
             )
 
-            st.altair_chart((bars_earnings + avg_line_earnings).properties(width=900), use_container_width=True)
+            altair_chart((bars_earnings + avg_line_earnings).properties(width=900), "depot_employee_earnings", all_emp_earnings, global_earnings_avg)
             chart_legend("Depot Employees: Blue", "#1f77b4", "Selected Employee: Red", "red", "Global Average: Red Dashed")
         
         # --- Day vs Night Duties ---
         if 'DAY_NIGHT' in depot_ops_time.columns:
             st.markdown("### Day vs Night Duties of All Employees")
-            dn_summary_all = depot_ops_time.groupby(['EMPLOYEE_ID', 'DAY_NIGHT']).size().reset_index(name='Count')
+            dn_summary_all = depot_ops_time.groupby(['EMPLOYEE_ID', 'DAY_NIGHT'], observed=True).size().reset_index(name='Count')
             dn_summary_all['is_selected'] = dn_summary_all['EMPLOYEE_ID'] == self.selected_driver
 
             base_dn = alt.Chart(dn_summary_all).encode(
@@ -1019,7 +818,7 @@ class driver_depot_dashboard_ui_DM:
                 )
             )
             
-            st.altair_chart(bars_dn.properties(width=900), use_container_width=True)
+            altair_chart(bars_dn.properties(width=900), "depot_employee_day_night", dn_summary_all, depot=self.selected_depot)
             chart_legend("Day Out: Blue", "#1f77b4", "Night Out: Purple", "#5A00FF", "Selected Employee: Red")
 
         # --- PRODUCTIVITY HOURS ---
@@ -1046,7 +845,7 @@ class driver_depot_dashboard_ui_DM:
                 y='HOURS:Q'
             )
 
-            st.altair_chart((bars_hours + avg_line_hours).properties(width=900), use_container_width=True)
+            altair_chart((bars_hours + avg_line_hours).properties(width=900), "depot_employee_hours", all_emp_hours, global_hours_avg)
             chart_legend("Depot Employees: Blue", "#1f77b4", "Selected Employee: Red", "red", "Global Average: Red Dashed")
         else:
             st.info("No hours data for selected filters.")
@@ -1075,7 +874,7 @@ class driver_depot_dashboard_ui_DM:
                 y='Leave_Days:Q'
             )
 
-            st.altair_chart((bars_leaves + avg_line_leaves).properties(width=900), use_container_width=True)
+            altair_chart((bars_leaves + avg_line_leaves).properties(width=900), "depot_employee_leaves", all_emp_leaves, global_leaves_avg)
             chart_legend("Depot Employees: Blue", "#1f77b4", "Selected Employee: Red", "red", "Global Average: Red Dashed")
         else:
             st.info("No leave/absenteeism data for selected filters.")
@@ -1084,37 +883,18 @@ class driver_depot_dashboard_ui_DM:
         st.markdown("---")
         st.header("*Productivity (Hours) + Health Grade (GHC2)*")
         if self.ghc1_df is not None and 'DEPOT' in self.ghc1_df.columns:
-            sorted_data3 = drv_ghcgrade.dropna(subset=['FINAL_GRADING']).sort_values(by='FINAL_GRADING', ascending=True)
-            sorted_data3 = sorted_data3.groupby(['EMPLOYEE_ID', 'FINAL_GRADING'])['HOURS'].sum().reset_index()
+            sorted_data3 = fy["hours_by_grade"]
 
             if sorted_data3.empty:
                 st.warning("No data available for the selected depot.")
             else:
-                box_plot = alt.Chart(sorted_data3).mark_boxplot(size=20).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                    y=alt.Y('HOURS:Q', title=None)
-                ).properties(
-                    title=alt.TitleParams(text=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}', anchor='middle')
+                # Box stats per grade + a bounded swarm sample, reduced server-side
+                final_chart = grade_box_swarm(
+                    sorted_data3, 'HOURS', self.selected_driver,
+                    title=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',
+                    y_title=None, tooltip_title='Annual Hours', highlight_stroke=True
                 )
-                
-                swarm_plot = alt.Chart(sorted_data3).mark_point(
-                    color='red', size=30
-                ).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade', axis=alt.Axis(labelAngle=0)),
-                    y=alt.Y('HOURS:Q', title=None),
-                    tooltip=[alt.Tooltip('EMPLOYEE_ID', title='Employee ID'), alt.Tooltip('HOURS', title='Annual Hours')],
-                )
-                
-                # Highlight selected employee in yellow
-                highlighted_employee = alt.Chart(sorted_data3[sorted_data3['EMPLOYEE_ID'] == self.selected_driver]).mark_point(
-                    color='yellow', size=200, filled=True, stroke='black', strokeWidth=2
-                ).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                    y=alt.Y('HOURS:Q')
-                )
-
-                final_chart = (box_plot + swarm_plot + highlighted_employee)
-                st.altair_chart(final_chart, use_container_width=True)
+                altair_chart(final_chart, "depot_hours_vs_grade", sorted_data3, driver=self.selected_driver)
         else:
             st.error("Failed to load data.")
 
@@ -1128,31 +908,13 @@ class driver_depot_dashboard_ui_DM:
             if drv_lsa_ghc.empty:
                 st.warning("No data available for the selected depot.")
             else:
-                box_plot = alt.Chart(drv_lsa_ghc).mark_boxplot(size=20).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                    y=alt.Y('LEAVE_COUNT:Q', title=None)
-                ).properties(
-                    title=alt.TitleParams(text=f'Absenteeism by Health Grade: {self.selected_depot}', anchor='middle')
+                # Box stats per grade + a bounded swarm sample, reduced server-side
+                final_chart = grade_box_swarm(
+                    drv_lsa_ghc, 'LEAVE_COUNT', self.selected_driver,
+                    title=f'Absenteeism by Health Grade: {self.selected_depot}',
+                    y_title=None, tooltip_title='Annual Leaves', highlight_stroke=True
                 )
-                
-                swarm_plot = alt.Chart(drv_lsa_ghc).mark_point(
-                    color='red', size=30
-                ).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade', axis=alt.Axis(labelAngle=0)),
-                    y=alt.Y('LEAVE_COUNT:Q', title=None),
-                    tooltip=[alt.Tooltip('EMPLOYEE_ID', title='Employee ID'), alt.Tooltip('LEAVE_COUNT', title='Annual Leaves')],
-                )
-                
-                # Highlight selected employee in yellow
-                highlighted_employee = alt.Chart(drv_lsa_ghc[drv_lsa_ghc['EMPLOYEE_ID'] == self.selected_driver]).mark_point(
-                    color='yellow', size=200, filled=True, stroke='black', strokeWidth=2
-                ).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                    y=alt.Y('LEAVE_COUNT:Q')
-                )
-                
-                final_chart = (box_plot + swarm_plot + highlighted_employee)
-                st.altair_chart(final_chart, use_container_width=True)
+                altair_chart(final_chart, "depot_leaves_vs_grade", drv_lsa_ghc, driver=self.selected_driver)
         else:
             st.warning("No Data Available!")
 
@@ -1169,6 +931,18 @@ class driver_depot_dashboard_ui_DM:
         else:
             st.info("No health data for this driver.")
 
+    # ---------------- Scorecard export ----------------
+    def scorecards_ui(self):
+        st.markdown("## Driver Scorecards")
+        months = [m.strftime('%Y-%m') for m in pd.date_range(self.fy_start, self.fy_end, freq='MS') if self.max_date >= m]
+        st.caption(f"Scorecards for every driver of {self.selected_depot} for {self.selected_fy}, from the loaded depot data.")
+        scorecard_export_ui(
+            lambda: [(self.index, None)],
+            self.fy_start, self.fy_end, months, fy_label(self.fy_start.year),
+            self.selected_depot, driver_percentiles(),
+        )
+
+
 
 if __name__ == '_main_':
     user_depot = st.session_state.user_depot
@@ -1178,7 +952,7 @@ if __name__ == '_main_':
     obj = driver_depot_dashboard_ui_DM(user_depot, role)
     obj.parameters()
 
-    tab1, tab2 = st.tabs(["Driver Performance", "Driver Performance in Depot"])
+    tab1, tab2, tab3 = st.tabs(["Driver Performance", "Driver Performance in Depot", "Driver Scorecards"])
     with tab1:
         try:
             obj.driver_ui()
@@ -1187,5 +961,10 @@ if __name__ == '_main_':
     with tab2:
         try:
             obj.driver_depot_ui()
+        except Exception as e:
+            st.error(f"{e}")
+    with tab3:
+        try:
+            obj.scorecards_ui()
         except Exception as e:
             st.error(f"{e}")
\ No newline at end of file
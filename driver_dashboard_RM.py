@@ -1,6 +1,16 @@
 import pandas as pd
 import base64
 import altair as alt
+from chart_cache import altair_chart
+from depot_data import freeze, leave_date_sql, shared_cache
+from driver_data import (
+    depot_data_version, enrich_absenteeism, enrich_operations, enrich_services, fy_label, fy_options, read_depot_tables
+)
+from driver_index import DriverIndex, with_hours
+from driver_percentiles import driver_percentiles, fy_caption
+from driver_scorecards import scorecard_export_ui
+from grade_charts import grade_box_swarm
+from query_runner import QueryError, run_queries
 import mysql.connector
 import streamlit as st
 from mysql.connector import Error
@@ -69,6 +79,124 @@ class Sql_connection:
             cursor.close()
 
 
+# ----------------------------------------------------------------------
+# 🗂️ Region summaries + lazily loaded depot partitions
+# ----------------------------------------------------------------------
+# The RM dashboard only needs region-wide averages until a depot is picked, so
+# those come from small SQL rollups. A depot's detail tables are fetched when it
+# is selected and kept in a bounded LRU (shared_cache max_entries), shared
+# between sessions and handed out as per-caller views. The LRU is keyed per
+# (depot, data version) and sized for every RM browsing a different depot at
+# once (a region has about 10 depots, a few RMs are online together). The
+# "All depots in region" scorecard export reads each depot without the cache,
+# one at a time, so it neither evicts the depots the other RMs are on nor
+# holds a whole region in memory.
+
+PARTITION_CACHE_SIZE = 32
+PARTITION_TTL = 600
+LSA_TYPES = ('L', 'S', 'A')
+
+
+def _fy_start_sql(date_col):
+    return f"YEAR({date_col}) - (MONTH({date_col}) < 4)"
+
+
+@shared_cache(show_spinner="Loading region summary …", ttl=PARTITION_TTL)
+def load_region_summary(depots):
+    """
+    Region rollups per financial year (FY_START = starting calendar year):
+    ops - per (DEPOT, FY_START): OPS rows, KMS / EARNINGS sums and non-null counts,
+          HOURS (service hours summed over the operations) and LAST_DATE;
+    leaves - per (EMPLOYEE_ID, FY_START): L/S/A leave count.
+    """
+    depots = tuple(depots or ())
+    ops_cols = ['DEPOT', 'FY_START', 'OPS', 'KMS', 'KMS_N', 'EARNINGS', 'EARNINGS_N', 'HOURS', 'LAST_DATE']
+    if not depots:
+        return {'ops': freeze(pd.DataFrame(columns=ops_cols).astype({'LAST_DATE': 'datetime64[ns]'})),
+                'leaves': freeze(pd.DataFrame(columns=['EMPLOYEE_ID', 'FY_START', 'LEAVE_COUNT']))}
+
+    placeholders = ",".join(["%s"] * len(depots))
+    tables = run_queries({
+        'daily_operations': (f"""
+            SELECT depot, service_number, {_fy_start_sql('operations_date')} AS fy_start,
+                   COUNT(*) AS ops,
+                   SUM(opd_kms) AS kms, COUNT(opd_kms) AS kms_n,
+                   SUM(daily_earnings) AS earnings, COUNT(daily_earnings) AS earnings_n,
+                   MAX(operations_date) AS last_date
+            FROM daily_operations
+            WHERE depot IN ({placeholders}) AND operations_date IS NOT NULL
+            GROUP BY depot, service_number, fy_start
+        """, depots),
+        'service_master': (f"""
+            SELECT depot, service_number, dept_time, arr_time, day_night_code
+            FROM service_master WHERE depot IN ({placeholders})
+        """, depots),
+        'driver_absenteeism': (f"""
+            SELECT employee_id, {_fy_start_sql(leave_date_sql())} AS fy_start, COUNT(*) AS leave_count
+            FROM driver_absenteeism
+            WHERE depot IN ({placeholders}) AND {leave_date_sql()} IS NOT NULL
+              AND leave_type IN ({",".join(["%s"] * len(LSA_TYPES))})
+            GROUP BY employee_id, fy_start
+        """, depots + LSA_TYPES),
+    })
+    for df in tables.values():
+        df.columns = [c.upper() for c in df.columns]
+    ops, services, leaves = tables['daily_operations'], tables['service_master'], tables['driver_absenteeism']
+
+    if ops.empty:
+        ops = pd.DataFrame(columns=ops_cols)
+    else:
+        # service hours per operation: same depot + service number merge as the driver index
+        ops = ops.assign(HOURS=with_hours(ops, enrich_services(services))['HOURS'].to_numpy() * pd.to_numeric(ops['OPS']))
+        num = ['OPS', 'KMS', 'KMS_N', 'EARNINGS', 'EARNINGS_N', 'HOURS']
+        ops = ops.assign(**{c: pd.to_numeric(ops[c], errors='coerce').fillna(0) for c in num})
+        ops = ops.groupby(['DEPOT', 'FY_START'], as_index=False).agg(
+            **{c: (c, 'sum') for c in num}, LAST_DATE=('LAST_DATE', 'max')
+        )
+    ops = ops.assign(LAST_DATE=pd.to_datetime(ops['LAST_DATE']))
+    if leaves.empty:
+        leaves = pd.DataFrame(columns=['EMPLOYEE_ID', 'FY_START', 'LEAVE_COUNT'])
+    return {'ops': freeze(ops), 'leaves': freeze(leaves)}
+
+
+def region_averages(summary, fy_start):
+    """Region-wide per-operation KMs / earnings / hours and mean L+S+A leaves per driver for one FY."""
+    ops = summary['ops'][summary['ops']['FY_START'] == fy_start]
+    leaves = summary['leaves'][summary['leaves']['FY_START'] == fy_start]
+    kms_n, earnings_n, n_ops = ops['KMS_N'].sum(), ops['EARNINGS_N'].sum(), ops['OPS'].sum()
+    return {
+        'kms': ops['KMS'].sum() / kms_n if kms_n else 0,
+        'earnings': ops['EARNINGS'].sum() / earnings_n if earnings_n else 0,
+        'hours': ops['HOURS'].sum() / n_ops if n_ops else 0,
+        'leaves': leaves.groupby('EMPLOYEE_ID')['LEAVE_COUNT'].sum().mean() if not leaves.empty else 0,
+    }
+
+
+def build_depot_partition(depot):
+    """One depot's driver tables, enriched and indexed per (DEPOT, EMPLOYEE_ID); not cached."""
+    tables = read_depot_tables(depot)
+    driver_df, ghc1_df = freeze(tables['driver_details']), freeze(tables['ghc_2024'])
+    ops_df, ser_df, abs_df = tables['daily_operations'], tables['service_master'], tables['driver_absenteeism']
+
+    ops_df = freeze(enrich_operations(ops_df))
+    abs_df = freeze(enrich_absenteeism(abs_df))
+    ser_df = freeze(enrich_services(ser_df))
+    return {
+        'driver_df': driver_df, 'ops_df': ops_df, 'ser_df': ser_df, 'abs_df': abs_df, 'ghc1_df': ghc1_df,
+        'index': DriverIndex(ops_df, abs_df, ser_df, ghc1_df, driver_df, by=('DEPOT', 'EMPLOYEE_ID')),
+    }
+
+
+@shared_cache(show_spinner="Loading depot …", max_entries=PARTITION_CACHE_SIZE, ttl=PARTITION_TTL)
+def _cached_depot_partition(depot, version):
+    return build_depot_partition(depot)
+
+
+def load_depot_partition(depot):
+    """build_depot_partition(depot) through the shared LRU, per data version."""
+    return _cached_depot_partition(depot, depot_data_version(depot))
+
+
 class driver_depot_dashboard_ui_RM:
     def __init__(self, user_depot, user_region, role, ops_df=None):
         self.user_depot = user_depot
@@ -93,53 +221,36 @@ class driver_depot_dashboard_ui_RM:
         if self.ops_df is None:
             self.load_data()
 
-        # Financial years dictionary
-        self.financial_years = {
-            "01-04-2023 to 31-03-2024": (pd.Timestamp("2023-04-01"), pd.Timestamp("2024-03-31")),
-            "01-04-2024 to 31-03-2025": (pd.Timestamp("2024-04-01"), pd.Timestamp("2025-03-31")),
-        }
+        # Financial years present in the region's operations
+        self.financial_years = fy_options(self.region_summary['ops']['FY_START'].unique())
 
     # ---------------- Data Loading ----------------
     def load_data(self):
         sql = Sql_connection()
         self._conn = sql.connect()
-        depots = self.get_user_depots()
-        self.driver_df = sql.load_sql_data('driver_details',depots,'unit')
-        self.ops_df = sql.load_sql_data('daily_operations',depots)
-        self.ser_df = sql.load_sql_data('service_master',depots)
-        self.abs_df = sql.load_sql_data('driver_absenteeism',depots)
-        self.ghc1_df = sql.load_sql_data('ghc_2024',depots)
-        #self.ghc2_df = sql.load_sql_data('ghc_2024',depots)
-
-        # Convert dates
-        self.ops_df['OPERATIONS_DATE'] = pd.to_datetime(self.ops_df['OPERATIONS_DATE'], errors='coerce')
-        self.abs_df['DATE'] = pd.to_datetime(self.abs_df['DATE'], errors='coerce')
-
-        # Format and add MONTH_YEAR
-        self.ops_df = self.parse_and_format(self.ops_df, 'OPERATIONS_DATE')
-        self.abs_df = self.parse_and_format(self.abs_df, 'DATE')
-        self.ser_df['HOURS'] = self.ser_df['DEPT_TIME'] - self.ser_df['ARR_TIME']
-        self.ser_df['HOURS'] = abs(self.ser_df['HOURS'].dt.total_seconds() / 3600).round(2)
-
-        # Add financial year
-        self.ops_df['FINANCIAL_YEAR'] = self.ops_df['OPERATIONS_DATE'].apply(self.get_financial_year)
-        self.max_date = self.ops_df['OPERATIONS_DATE'].max()
+        self.depots = self.get_user_depots()
 
-    # ---------------- Helpers ----------------
-    def parse_and_format(self, df, date_col):
-        if date_col in df.columns:
-            df[date_col] = pd.to_datetime(df[date_col], errors='coerce', dayfirst=True)
-            df.dropna(subset=[date_col], inplace=True)
-            df['MONTH_YEAR'] = df[date_col].dt.to_period('M').dt.strftime('%Y-%m')
-        return df
-
-    def get_financial_year(self, date):
-        year = date.year
-        if date.month < 4:
-            return f"{year-1}-{year}"
-        else:
-            return f"{year}-{year+1}"
+        # Region-level rollups only; depot detail tables load when a depot is selected
+        try:
+            self.region_summary = load_region_summary(self.depots)
+        except QueryError:
+            st.stop()  # already reported by run_queries
+        self.max_date = self.region_summary['ops']['LAST_DATE'].max()
 
+    def load_depot(self, depot):
+        """Point the dashboard at one depot's partition (fetched on first use, then LRU-cached)."""
+        try:
+            partition = load_depot_partition(depot)
+        except QueryError:
+            st.stop()  # already reported by run_queries
+        self.driver_df = partition['driver_df']
+        self.ops_df = partition['ops_df']
+        self.ser_df = partition['ser_df']
+        self.abs_df = partition['abs_df']
+        self.ghc1_df = partition['ghc1_df']
+        self.index = partition['index']
+
+    # ---------------- Helpers ----------------
 
     def get_user_depots(self):
         try:
@@ -157,7 +268,7 @@ class driver_depot_dashboard_ui_RM:
     # ---------------- Parameters UI ----------------
     def parameters(self,):
 
-        depots = self.get_user_depots()
+        depots = self.depots
 
         with st.container():
             col1, col2, col3 = st.columns(3)
@@ -166,6 +277,10 @@ class driver_depot_dashboard_ui_RM:
             with col1:
                 st.markdown("### Select Depot")
                 self.selected_depot = st.selectbox("",depots)
+                if not self.selected_depot:
+                    st.warning("⚠ No depots found for this region.")
+                    st.stop()
+                self.load_depot(self.selected_depot)
                 
                 #self.selected_depot = selected_depot
                 
@@ -178,7 +293,7 @@ class driver_depot_dashboard_ui_RM:
 
             # Driver selection
             with col3:
-                drivers_in_depot = self.ops_df[self.ops_df['DEPOT'] == self.selected_depot]['EMPLOYEE_ID'].unique().tolist()
+                drivers_in_depot = self.index.drivers(self.selected_depot)
                 if not drivers_in_depot:
                     st.warning("⚠ No drivers found for this depot.")
                     st.stop()
@@ -192,43 +307,25 @@ class driver_depot_dashboard_ui_RM:
             if self.max_date >= i:
                 self.month_year.append(i.strftime('%Y-%m'))
         month_year_df = pd.DataFrame({'MONTH_YEAR':self.month_year})        
-        # -- Filter data for selection --
-        drv_ops = self.ops_df[
-            (self.ops_df['EMPLOYEE_ID'] == self.selected_driver) &
-            (self.ops_df['DEPOT'] == self.selected_depot) &
-            (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) & (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-        ]
-        drv_leaves = self.abs_df[
-            (self.abs_df['EMPLOYEE_ID'] == self.selected_driver) &
-            (self.abs_df['DEPOT'] == self.selected_depot) &
-            (self.abs_df['DATE'] >= self.fy_start) & (self.abs_df['DATE'] <= self.fy_end)
-        ]
-        drv_hours = pd.merge(self.ops_df, self.ser_df[['SERVICE_NUMBER','HOURS']],on='SERVICE_NUMBER',how='left')
-        drv_hours['HOURS'] = drv_hours['HOURS'].fillna(0)
-        drv_hours2 = drv_hours[(drv_hours['DEPOT'] == self.selected_depot) & (drv_hours['OPERATIONS_DATE'] >= self.fy_start) & (drv_hours['OPERATIONS_DATE'] <= self.fy_end)]
-        drv_hours = drv_hours[(drv_hours['DEPOT'] == self.selected_depot) & (drv_hours['EMPLOYEE_ID'] == self.selected_driver) & (drv_hours['OPERATIONS_DATE'] >= self.fy_start) & (drv_hours['OPERATIONS_DATE'] <= self.fy_end)]
-        drv_health = self.ghc1_df[self.ghc1_df['EMPLOYEE_ID'] == self.selected_driver] if 'EMPLOYEE_ID' in self.ghc1_df.columns else pd.DataFrame()
-        drv_ghcgrade = pd.merge(self.ghc1_df[['EMPLOYEE_ID','AGE', 'FINAL_GRADING']], drv_hours2[['EMPLOYEE_ID','HOURS']], on='EMPLOYEE_ID', how='right')
-        drv_ghcgrade['HOURS'] = drv_ghcgrade['HOURS'].fillna(0)
-        self.drv_leaves2 = self.abs_df[
-            (self.abs_df['DEPOT'] == self.selected_depot) &
-            (self.abs_df['DATE'] >= self.fy_start) & (self.abs_df['DATE'] <= self.fy_end)
-        ]
-        self.drv_leaves2 = self.drv_leaves2.groupby('EMPLOYEE_ID')['LEAVE_TYPE'].count()
-        self.drv_leaves2 = self.drv_leaves2.reset_index()
+        # -- Driver slices from the per-driver index; depot-wide frames are computed once per FY --
+        driver_key = (self.selected_depot, self.selected_driver)
+        fy = self.index.window(self.fy_start, self.fy_end, self.selected_depot)
+        drv_ops = self.index.ops(driver_key, self.fy_start, self.fy_end)
+        drv_leaves = self.index.leaves(driver_key, self.fy_start, self.fy_end)
+        drv_hours = drv_ops
+        drv_hours2 = fy["ops"]
+        drv_monthly = self.index.monthly(driver_key, self.month_year)
+        self.drv_leaves2 = fy["leave_counts"]
         drv_lsa_ghc = pd.merge(self.drv_leaves2,self.ghc1_df[['EMPLOYEE_ID','FINAL_GRADING']], on='EMPLOYEE_ID',how='inner') 
 
         # Depot-wide averages for context
-        depot_ops_time = self.ops_df[
-            (self.ops_df['DEPOT'] == self.selected_depot) &
-            (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) & (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-        ]
+        depot_ops_time = fy["ops"]
         depot_kms_avg = depot_ops_time['OPD_KMS'].mean() if not depot_ops_time.empty and 'OPD_KMS' in depot_ops_time.columns else 0
         depot_earnings_avg = depot_ops_time['DAILY_EARNINGS'].mean() if not depot_ops_time.empty and 'DAILY_EARNINGS' in depot_ops_time.columns else 0
         depot_hours_avg = drv_hours2['HOURS'].mean()
 
 
-        driver_info = self.driver_df[self.driver_df['EMPLOYEE_ID'] == str(self.selected_driver)]
+        driver_info = self.index.details(self.selected_driver)
         col_det, col_sum = st.columns(2)
         with col_det:
             st.markdown("## Driver Details")
@@ -254,10 +351,6 @@ class driver_depot_dashboard_ui_RM:
             lsa_leaves = f"{(drv_leaves['LEAVE_TYPE'] == 'L').sum()} + {(drv_leaves['LEAVE_TYPE'] == 'S').sum()} + {(drv_leaves['LEAVE_TYPE'] == 'A').sum()}"
 
             # Depot-wide averages
-            depot_ops_time = self.ops_df[
-                (self.ops_df['DEPOT'] == self.selected_depot) &
-                (self.ops_df['OPERATIONS_DATE'].between(self.fy_start, self.fy_end))
-            ]
             depot_kms_avg = depot_ops_time['OPD_KMS'].mean() if not depot_ops_time.empty and 'OPD_KMS' in depot_ops_time.columns else 0
             depot_earnings_avg = depot_ops_time['DAILY_EARNINGS'].mean() if not depot_ops_time.empty and 'DAILY_EARNINGS' in depot_ops_time.columns else 0
             depot_hours_avg = drv_hours2['HOURS'].mean() if not drv_hours2.empty else 0
@@ -300,6 +393,13 @@ class driver_depot_dashboard_ui_RM:
                 unsafe_allow_html=True
             )
 
+        # --- Standing in the FY: depot / region / state percentiles (shared store) ---
+        standing = driver_percentiles().standing_table(self.selected_driver, self.fy_start.year, self.selected_depot)
+        if not standing.empty:
+            st.markdown("### Driver Standing")
+            st.dataframe(standing, use_container_width=True)
+            st.caption(fy_caption(self.fy_start.year))
+
         def chart_legend(label, bar_color, label2=None, bar_color2=None, avg_label="Average Line: Red"):
             s = "<div style='display:flex;align-items:center;gap:24px;margin:10px 0 20px 0;'>"
             s += f"<span style='display:inline-block;width:35px;height:14px;background:{bar_color};margin-right:8px;border-radius:2px;'></span>"
@@ -314,9 +414,7 @@ class driver_depot_dashboard_ui_RM:
         # --------- Visualizations ---------
         # --- Monthly Kilometers ---
         st.markdown("### Monthly Kilometers Driven")
-        monthly_kms = drv_ops.groupby('MONTH_YEAR')['OPD_KMS'].sum().reset_index()
-        monthly_kms = pd.merge(monthly_kms, month_year_df, on='MONTH_YEAR',how='outer')
-        monthly_kms = monthly_kms.fillna(0)
+        monthly_kms = drv_monthly[['MONTH_YEAR', 'OPD_KMS']]
         total_kms_period = monthly_kms['OPD_KMS'].sum()
         st.markdown(f"<div style='font-size:20px;color:#1957a6;margin-bottom:0;'><b>Total Kilometers:</b> {total_kms_period:,.2f} KMs</div>", unsafe_allow_html=True)
         avg_kms = monthly_kms['OPD_KMS'].mean() if not monthly_kms.empty else 0
@@ -344,15 +442,13 @@ class driver_depot_dashboard_ui_RM:
             y='OPD_KMS:Q',
             text='label:N'
         )
-        st.altair_chart((bars + kms_text + avg_line + avg_text).properties(width=900), use_container_width=True)
+        altair_chart((bars + kms_text + avg_line + avg_text).properties(width=900), "driver_monthly_kms", monthly_kms)
         chart_legend("Bar: Blue", "#1f77b4", None, None, "Average Line: Red")
 
         # --- Monthly Earnings ---
         if 'DAILY_EARNINGS' in drv_ops.columns:
             st.markdown("### Monthly Earnings")
-            monthly_earnings = drv_ops.groupby('MONTH_YEAR')['DAILY_EARNINGS'].sum().reset_index()
-            monthly_earnings = pd.merge(monthly_earnings, month_year_df, on='MONTH_YEAR',how='outer')
-            monthly_earnings = monthly_earnings.fillna(0)
+            monthly_earnings = drv_monthly[['MONTH_YEAR', 'DAILY_EARNINGS']]
             total_earnings_period = monthly_earnings['DAILY_EARNINGS'].sum()
             st.markdown(f"<div style='font-size:20px;color:#1957a6;margin-bottom:0;'><b>Total Earnings:</b> ₹{total_earnings_period:,.2f}</div>", unsafe_allow_html=True)
             avg_earn = monthly_earnings['DAILY_EARNINGS'].mean() if not monthly_earnings.empty else 0
@@ -382,7 +478,7 @@ class driver_depot_dashboard_ui_RM:
                 y='DAILY_EARNINGS:Q',
                 text='label:N'
             )
-            st.altair_chart((bars2+ earnings_text + avg_line2 + avg_text2).properties(width=900), use_container_width=True)
+            altair_chart((bars2+ earnings_text + avg_line2 + avg_text2).properties(width=900), "driver_monthly_earnings", monthly_earnings)
             chart_legend("Bar: Blue", "#1f77b4", None, None, "Average Line: Red")
 
         # --- Day vs Night Duties ---
@@ -390,7 +486,7 @@ class driver_depot_dashboard_ui_RM:
             st.markdown("### Day vs Night Duties")
 
             # Group duties
-            dn_summary = drv_ops.groupby(['DAY_NIGHT', 'MONTH_YEAR']).size().reset_index(name='Count')
+            dn_summary = drv_ops.groupby(['DAY_NIGHT', 'MONTH_YEAR'], observed=True).size().reset_index(name='Count')
 
             # Ensure every month has both D and N entries
             duty_types = ['D', 'N']
@@ -458,7 +554,7 @@ class driver_depot_dashboard_ui_RM:
             )
 
             # Combine and show chart
-            st.altair_chart((bars_dn + text_labels + avg_lines + avg_texts).properties(width=900), use_container_width=True)
+            altair_chart((bars_dn + text_labels + avg_lines + avg_texts).properties(width=900), "driver_day_night", dn_summary, avg_df)
 
             chart_legend("Day Out: Blue", "#1f77b4", "Night Out: Purple", "#5A00FF", "Average Line: Red")
 
@@ -467,9 +563,7 @@ class driver_depot_dashboard_ui_RM:
         # --- PRODUCTIVITY HOURS ---
         if not drv_hours.empty:
             st.markdown("### PRODUCTIVITY HOURS")
-            hours_monthly = drv_hours.groupby('MONTH_YEAR')['HOURS'].sum()
-            hours_monthly = pd.merge(hours_monthly, month_year_df, on='MONTH_YEAR',how='outer')
-            hours_monthly = hours_monthly.fillna(0)
+            hours_monthly = drv_monthly[['MONTH_YEAR', 'HOURS']]
             total_hours = hours_monthly['HOURS'].sum()
             st.markdown(f"<div style='font-size:20px;color:#1957a6;margin-bottom:0;'><b>Total Hours:</b> {total_hours} hrs</div>", unsafe_allow_html=True)
             avg_hours = hours_monthly['HOURS'].mean() if not hours_monthly.empty else 0
@@ -497,7 +591,7 @@ class driver_depot_dashboard_ui_RM:
                 y='HOURS:Q',
                 text='label:N'
             )
-            st.altair_chart((hours_bars + hours_text + hours_avg_line + hours_avg_text).properties(width=900), use_container_width=True)
+            altair_chart((hours_bars + hours_text + hours_avg_line + hours_avg_text).properties(width=900), "driver_monthly_hours", hours_monthly)
             chart_legend("Bar: Blue", "#1f77b4", None, None, "Average Line: Red")
         else:
             st.info("No hours data for selected filters.")
@@ -505,9 +599,7 @@ class driver_depot_dashboard_ui_RM:
         # --- Absenteeism/Leave Monthly ---
         if not drv_leaves.empty:
             st.markdown("### Absenteeism / Leave Summary")
-            leave_monthly = drv_leaves.groupby('MONTH_YEAR').size().reset_index(name='Leave_Days')
-            leave_monthly = pd.merge(leave_monthly, month_year_df, on='MONTH_YEAR',how='outer')
-            leave_monthly = leave_monthly.fillna(0)
+            leave_monthly = drv_monthly[['MONTH_YEAR', 'Leave_Days']]
             total_leaves_period = leave_monthly['Leave_Days'].sum()
             st.markdown(f"<div style='font-size:20px;color:#1957a6;margin-bottom:0;'><b>Total for Period:</b> {total_leaves_period} Days</div>", unsafe_allow_html=True)
             avg_leave = leave_monthly['Leave_Days'].mean() if not leave_monthly.empty else 0
@@ -535,7 +627,7 @@ class driver_depot_dashboard_ui_RM:
                 y='Leave_Days:Q',
                 text='label:N'
             )
-            st.altair_chart((leave_bars + leaves_text + leave_avg_line + leave_avg_text).properties(width=900), use_container_width=True)
+            altair_chart((leave_bars + leaves_text + leave_avg_line + leave_avg_text).properties(width=900), "driver_monthly_leaves", leave_monthly)
             chart_legend("Bar: Blue", "#1f77b4", None, None, "Average Line: Red")
         else:
             st.info("No leave/absenteeism data for selected filters.")
@@ -556,68 +648,22 @@ class driver_depot_dashboard_ui_RM:
             if missing_cols:
                 st.error(f"Missing required columns in dataset: {', '.join(missing_cols)}")
             else:
-                # Filter and aggregate data
-                drv_ghcgrade = pd.merge(
-                    self.ghc1_df[['EMPLOYEE_ID', 'FINAL_GRADING']],
-                    drv_hours2[['EMPLOYEE_ID', 'HOURS']],
-                    on='EMPLOYEE_ID', how='right'
-                )
-                drv_ghcgrade['HOURS'] = drv_ghcgrade['HOURS'].fillna(0)
+                # Hours per employee and grade for the FY (computed once per FY by the index)
+                sorted_data3 = fy["hours_by_grade"]
 
-                if drv_ghcgrade.empty:
+                if drv_hours2.empty:
                     st.warning("No data available for the selected depot.")
                 else:
-                    # Aggregate hours per employee and grade
-                    sorted_data3 = drv_ghcgrade.dropna(subset=['FINAL_GRADING']).groupby(
-                        ['EMPLOYEE_ID', 'FINAL_GRADING'], as_index=False
-                    )['HOURS'].sum()
-
-                    # Box plot of hours by health grade
-                    box_plot = alt.Chart(sorted_data3).mark_boxplot(size=20).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('HOURS:Q', title='Annual Hours')
-                    ).properties(
-                        title=alt.TitleParams(
-                            text=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',
-                            anchor='middle'
-                        )
-                    )
 
-                    # Swarm plot (jittered points)
-                    swarm_plot = alt.Chart(sorted_data3).mark_point(
-                        color='red',
-                        size=30
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', axis=alt.Axis(labelAngle=0)),
-                        y=alt.Y('HOURS:Q'),
-                        tooltip=[
-                            alt.Tooltip('EMPLOYEE_ID', title='Employee ID'),
-                            alt.Tooltip('HOURS', title='Annual Hours')
-                        ]
-                    ).transform_calculate(
-                        jitter='sqrt(-2*log(random()))*cos(2*PI*random())'  # Jitter simulation
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('HOURS:Q')
+                    # Box stats per grade + a bounded swarm sample, reduced server-side
+                    final_chart = grade_box_swarm(
+                        sorted_data3, 'HOURS', self.selected_driver,
+                        title=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',
+                        y_title='Annual Hours', tooltip_title='Annual Hours'
                     )
 
-                    # Highlight the selected employee
-                    highlighted_employee = alt.Chart(
-                        sorted_data3[sorted_data3['EMPLOYEE_ID'] == self.selected_driver]
-                    ).mark_point(
-                        color='yellow',
-                        size=200,
-                        filled=True
-                    ).encode(
-                        x='FINAL_GRADING:N',
-                        y='HOURS:Q'
-                    )
-
-                    # Combine charts
-                    final_chart = box_plot + swarm_plot + highlighted_employee
-
                     # Display in Streamlit
-                    st.altair_chart(final_chart, use_container_width=True)
+                    altair_chart(final_chart, "driver_hours_vs_grade", sorted_data3, driver=self.selected_driver)
 
         else:
             st.error("Failed to load GHC data.")
@@ -645,60 +691,20 @@ class driver_depot_dashboard_ui_RM:
                 if drv_lsa_ghc.empty:
                     st.warning("No data available for the selected depot.")
                 else:
-                    # Create the bar graph with matplotlib
-                                    
-                    # Create a box plot
-                    box_plot = alt.Chart(drv_lsa_ghc).mark_boxplot(size=20).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('LEAVE_TYPE:Q', title=None)
-                    ).properties(
-                        title=alt.TitleParams(
-                                        text=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',  # Correctly display selected depot in the title
-                                        anchor='middle'  # Center the title
-                                    ),
+                    # Box stats per grade + a bounded swarm sample, reduced server-side
+                    final_chart = grade_box_swarm(
+                        drv_lsa_ghc, 'LEAVE_TYPE', self.selected_driver,
+                        title=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',
+                        y_title=None, tooltip_title='Annual Leaves'
                     )
                     
-                    # Create a swarm plot (jittered points)
-                    swarm_plot = alt.Chart(drv_lsa_ghc).mark_point(
-                        color='red',
-                        size=30
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('LEAVE_TYPE:Q', title=None),
-                        tooltip=[
-                                    alt.Tooltip('EMPLOYEE_ID', title='Employee ID'),  # Custom label for employee ID
-                                    alt.Tooltip('LEAVE_TYPE', title='Annual Leaves')  # Custom label for total operational kilometers
-                                ],
-                    ).transform_calculate(
-                        jitter='sqrt(-2*log(random()))*cos(2*PI*random())'  # Simulate jittering
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade', axis=alt.Axis(labelAngle=0)),
-                        y=alt.Y('LEAVE_TYPE:Q', title=None)
-                    )
-                    
-                    # Highlight the selected employee with a larger yellow dot
-                    highlighted_employee = alt.Chart(drv_lsa_ghc[drv_lsa_ghc['EMPLOYEE_ID'] == self.selected_driver]).mark_point(
-                        color='yellow',
-                        size=200, filled=True
-                    ).encode(
-                        x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                        y=alt.Y('LEAVE_TYPE:Q'),
-                        #tooltip=['employee_id', 'tot_opd_kms']
-                    )
-
-                    # Combine the box plot, swarm plot, highlighted employee point, and the custom legend
-                    final_chart = (box_plot + swarm_plot + highlighted_employee)
-                    
                     # Display the chart in Streamlit
-                    st.altair_chart(final_chart, use_container_width=True)
+                    altair_chart(final_chart, "driver_leaves_vs_grade", drv_lsa_ghc, driver=self.selected_driver)
         else:
                 st.error("Failed to load data.")
 
         # Filter health data for selected driver
-        drv_health = pd.DataFrame()
-        if hasattr(self, 'ghc1_df') and self.ghc1_df is not None:
-            if 'EMPLOYEE_ID' in self.ghc1_df.columns:
-                drv_health = self.ghc1_df[self.ghc1_df['EMPLOYEE_ID'] == self.selected_driver]
+        drv_health = self.index.health(self.selected_driver)
 
         # --- Health Profile ---
         # --- Health Profile ---
@@ -728,66 +734,23 @@ class driver_depot_dashboard_ui_RM:
 
 
     def driver_depot_ui(self):
-        # --- Filter driver-specific data ---
-        drv_ops = self.ops_df[
-            (self.ops_df['EMPLOYEE_ID'] == self.selected_driver) &
-            (self.ops_df['DEPOT'] == self.selected_depot) &
-            (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) &
-            (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-        ]
-        
-        drv_leaves = self.abs_df[
-            (self.abs_df['EMPLOYEE_ID'] == self.selected_driver) &
-            (self.abs_df['DEPOT'] == self.selected_depot) &
-            (self.abs_df['DATE'] >= self.fy_start) &
-            (self.abs_df['DATE'] <= self.fy_end)
-        ]
-        
-        drv_hours = pd.merge(
-            self.ops_df, self.ser_df[['SERVICE_NUMBER','HOURS']], on='SERVICE_NUMBER', how='left'
-        )
-        drv_hours['HOURS'] = drv_hours['HOURS'].fillna(0)
-        drv_hours2 = drv_hours[
-            (drv_hours['DEPOT'] == self.selected_depot) &
-            (drv_hours['OPERATIONS_DATE'] >= self.fy_start) &
-            (drv_hours['OPERATIONS_DATE'] <= self.fy_end)
-        ]
-        drv_hours = drv_hours[
-            (drv_hours['DEPOT'] == self.selected_depot) &
-            (drv_hours['EMPLOYEE_ID'] == self.selected_driver) &
-            (drv_hours['OPERATIONS_DATE'] >= self.fy_start) &
-            (drv_hours['OPERATIONS_DATE'] <= self.fy_end)
-        ]
+        # --- Driver-specific data: lookups in the per-driver index ---
+        driver_key = (self.selected_depot, self.selected_driver)
+        fy = self.index.window(self.fy_start, self.fy_end, self.selected_depot)
+        drv_ops = self.index.ops(driver_key, self.fy_start, self.fy_end)
+        drv_leaves = self.index.leaves(driver_key, self.fy_start, self.fy_end)
+        drv_hours = drv_ops
+        drv_hours2 = fy["ops"]
         
         # --- Driver health data ---
-        drv_health = pd.DataFrame()
-        if hasattr(self, 'ghc1_df') and self.ghc1_df is not None:
-            if 'EMPLOYEE_ID' in self.ghc1_df.columns:
-                drv_health = self.ghc1_df[self.ghc1_df['EMPLOYEE_ID'] == self.selected_driver]
-        
-        # --- Merge health grade with hours ---
-        drv_ghcgrade = pd.DataFrame()
-        if not drv_hours2.empty and hasattr(self, 'ghc1_df') and self.ghc1_df is not None:
-            drv_ghcgrade = pd.merge(
-                self.ghc1_df[['EMPLOYEE_ID','AGE','FINAL_GRADING']],
-                drv_hours2[['EMPLOYEE_ID','HOURS']],
-                on='EMPLOYEE_ID',
-                how='right'
-            )
-            drv_ghcgrade['HOURS'] = drv_ghcgrade['HOURS'].fillna(0)
+        drv_health = self.index.health(self.selected_driver)
         
         # --- Absenteeism L+S+A ---
         drv_lsa_ghc = pd.DataFrame()  # Initialize as empty DataFrame
 
         if not self.abs_df.empty and hasattr(self, 'ghc1_df') and self.ghc1_df is not None:
-            drv_leaves_filtered = self.abs_df[
-                (self.abs_df['DEPOT'] == self.selected_depot) &
-                (self.abs_df['DATE'] >= self.fy_start) &
-                (self.abs_df['DATE'] <= self.fy_end) &
-                (self.abs_df['LEAVE_TYPE'].isin(['L', 'S', 'A']))
-            ]
-            if not drv_leaves_filtered.empty:
-                self.drv_leaves2 = drv_leaves_filtered.groupby('EMPLOYEE_ID').size().reset_index(name='LEAVE_COUNT')
+            if not fy["lsa_counts"].empty:
+                self.drv_leaves2 = fy["lsa_counts"]
                 drv_lsa_ghc = pd.merge(
                     self.drv_leaves2,
                     self.ghc1_df[['EMPLOYEE_ID', 'FINAL_GRADING']],
@@ -804,31 +767,16 @@ class driver_depot_dashboard_ui_RM:
             st.warning("No absenteeism data available for the selected depot and financial year.")
 
         
-        # --- Global averages ---
-        global_ops_time = self.ops_df[
-            (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) &
-            (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-        ]
-        global_hours = pd.merge(
-            self.ops_df, self.ser_df[['SERVICE_NUMBER','HOURS']], on='SERVICE_NUMBER', how='left'
-        )
-        global_hours = global_hours[
-            (global_hours['OPERATIONS_DATE'] >= self.fy_start) &
-            (global_hours['OPERATIONS_DATE'] <= self.fy_end)
-        ]
-        global_leaves = self.abs_df[
-            (self.abs_df['DATE'] >= self.fy_start) &
-            (self.abs_df['DATE'] <= self.fy_end) &
-            (self.abs_df['LEAVE_TYPE'].isin(['L','S','A']))
-        ]
+        # --- Global averages (from the region summary, no depot partitions needed) ---
+        region_avg = region_averages(self.region_summary, self.fy_start.year)
         
-        global_kms_avg = global_ops_time['OPD_KMS'].mean() if 'OPD_KMS' in global_ops_time.columns else 0
-        global_earnings_avg = global_ops_time['DAILY_EARNINGS'].mean() if 'DAILY_EARNINGS' in global_ops_time.columns else 0
-        global_hours_avg = global_hours['HOURS'].mean() if not global_hours.empty else 0
-        global_leaves_avg = global_leaves.groupby('EMPLOYEE_ID').size().reset_index(name='LEAVE_COUNT')['LEAVE_COUNT'].mean() if not global_leaves.empty else 0
+        global_kms_avg = region_avg['kms']
+        global_earnings_avg = region_avg['earnings']
+        global_hours_avg = region_avg['hours']
+        global_leaves_avg = region_avg['leaves']
         
         # --- Driver Info ---
-        driver_info = self.driver_df[self.driver_df['EMPLOYEE_ID'] == str(self.selected_driver)]
+        driver_info = self.index.details(self.selected_driver)
         col_det, col_sum = st.columns(2)
         
         with col_det:
@@ -901,10 +849,7 @@ class driver_depot_dashboard_ui_RM:
             
         # --- Total Kilometers ---
         st.markdown("### Total Kilometers Driven by All Employees")
-        depot_ops_time = self.ops_df[
-            (self.ops_df['DEPOT'] == self.selected_depot) &
-            (self.ops_df['OPERATIONS_DATE'] >= self.fy_start) & (self.ops_df['OPERATIONS_DATE'] <= self.fy_end)
-        ]
+        depot_ops_time = fy["ops"]
         all_emp_kms = depot_ops_time.groupby('EMPLOYEE_ID')['OPD_KMS'].sum().reset_index()
         all_emp_kms['is_selected'] = all_emp_kms['EMPLOYEE_ID'] == self.selected_driver
         
@@ -926,7 +871,7 @@ class driver_depot_dashboard_ui_RM:
             y='OPD_KMS:Q'
         )
 
-        st.altair_chart((bars_kms + avg_line_kms).properties(width=900), use_container_width=True)
+        altair_chart((bars_kms + avg_line_kms).properties(width=900), "depot_employee_kms", all_emp_kms, global_kms_avg)
         chart_legend("Depot Employees: Blue", "#1f77b4", "Selected Employee: Red", "red", "Global Average: Red Dashed")
 
         # --- Total Earnings ---
@@ -953,13 +898,13 @@ class driver_depot_dashboard_ui_RM:
                 y='DAILY_EARNINGS:Q'
             )
 
-            st.altair_chart((bars_earnings + avg_line_earnings).properties(width=900), use_container_width=True)
+            altair_chart((bars_earnings + avg_line_earnings).properties(width=900), "depot_employee_earnings", all_emp_earnings, global_earnings_avg)
             chart_legend("Depot Employees: Blue", "#1f77b4", "Selected Employee: Red", "red", "Global Average: Red Dashed")
         
         # --- Day vs Night Duties ---
         if 'DAY_NIGHT' in depot_ops_time.columns:
             st.markdown("### Day vs Night Duties of All Employees")
-            dn_summary_all = depot_ops_time.groupby(['EMPLOYEE_ID', 'DAY_NIGHT']).size().reset_index(name='Count')
+            dn_summary_all = depot_ops_time.groupby(['EMPLOYEE_ID', 'DAY_NIGHT'], observed=True).size().reset_index(name='Count')
             dn_summary_all['is_selected'] = dn_summary_all['EMPLOYEE_ID'] == self.selected_driver
 
             base_dn = alt.Chart(dn_summary_all).encode(
@@ -979,7 +924,7 @@ class driver_depot_dashboard_ui_RM:
                 )
             )
             
-            st.altair_chart(bars_dn.properties(width=900), use_container_width=True)
+            altair_chart(bars_dn.properties(width=900), "depot_employee_day_night", dn_summary_all, depot=self.selected_depot)
             chart_legend("Day Out: Blue", "#1f77b4", "Night Out: Purple", "#5A00FF", "Selected Employee: Red")
 
         # --- PRODUCTIVITY HOURS ---
@@ -1006,7 +951,7 @@ class driver_depot_dashboard_ui_RM:
                 y='HOURS:Q'
             )
 
-            st.altair_chart((bars_hours + avg_line_hours).properties(width=900), use_container_width=True)
+            altair_chart((bars_hours + avg_line_hours).properties(width=900), "depot_employee_hours", all_emp_hours, global_hours_avg)
             chart_legend("Depot Employees: Blue", "#1f77b4", "Selected Employee: Red", "red", "Global Average: Red Dashed")
         else:
             st.info("No hours data for selected filters.")
@@ -1035,7 +980,7 @@ class driver_depot_dashboard_ui_RM:
                 y='Leave_Days:Q'
             )
 
-            st.altair_chart((bars_leaves + avg_line_leaves).properties(width=900), use_container_width=True)
+            altair_chart((bars_leaves + avg_line_leaves).properties(width=900), "depot_employee_leaves", all_emp_leaves, global_leaves_avg)
             chart_legend("Depot Employees: Blue", "#1f77b4", "Selected Employee: Red", "red", "Global Average: Red Dashed")
         else:
             st.info("No leave/absenteeism data for selected filters.")
@@ -1044,37 +989,18 @@ class driver_depot_dashboard_ui_RM:
         st.markdown("---")
         st.header("**Productivity (Hours) + Health Grade (GHC2)**")
         if self.ghc1_df is not None and 'DEPOT' in self.ghc1_df.columns:
-            sorted_data3 = drv_ghcgrade.dropna(subset=['FINAL_GRADING']).sort_values(by='FINAL_GRADING', ascending=True)
-            sorted_data3 = sorted_data3.groupby(['EMPLOYEE_ID', 'FINAL_GRADING'])['HOURS'].sum().reset_index()
+            sorted_data3 = fy["hours_by_grade"]
 
             if sorted_data3.empty:
                 st.warning("No data available for the selected depot.")
             else:
-                box_plot = alt.Chart(sorted_data3).mark_boxplot(size=20).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                    y=alt.Y('HOURS:Q', title=None)
-                ).properties(
-                    title=alt.TitleParams(text=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}', anchor='middle')
-                )
-                
-                swarm_plot = alt.Chart(sorted_data3).mark_point(
-                    color='red', size=30
-                ).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade', axis=alt.Axis(labelAngle=0)),
-                    y=alt.Y('HOURS:Q', title=None),
-                    tooltip=[alt.Tooltip('EMPLOYEE_ID', title='Employee ID'), alt.Tooltip('HOURS', title='Annual Hours')],
+                # Box stats per grade + a bounded swarm sample, reduced server-side
+                final_chart = grade_box_swarm(
+                    sorted_data3, 'HOURS', self.selected_driver,
+                    title=f'Productivity by Health Grade (Hours/Yr): {self.selected_depot}',
+                    y_title=None, tooltip_title='Annual Hours', highlight_stroke=True
                 )
-                
-                # Highlight selected employee in yellow
-                highlighted_employee = alt.Chart(sorted_data3[sorted_data3['EMPLOYEE_ID'] == self.selected_driver]).mark_point(
-                    color='yellow', size=200, filled=True, stroke='black', strokeWidth=2
-                ).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                    y=alt.Y('HOURS:Q')
-                )
-
-                final_chart = (box_plot + swarm_plot + highlighted_employee)
-                st.altair_chart(final_chart, use_container_width=True)
+                altair_chart(final_chart, "depot_hours_vs_grade", sorted_data3, driver=self.selected_driver)
         else:
             st.error("Failed to load data.")
 
@@ -1088,31 +1014,13 @@ class driver_depot_dashboard_ui_RM:
             if drv_lsa_ghc.empty:
                 st.warning("No data available for the selected depot.")
             else:
-                box_plot = alt.Chart(drv_lsa_ghc).mark_boxplot(size=20).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                    y=alt.Y('LEAVE_COUNT:Q', title=None)
-                ).properties(
-                    title=alt.TitleParams(text=f'Absenteeism by Health Grade: {self.selected_depot}', anchor='middle')
-                )
-                
-                swarm_plot = alt.Chart(drv_lsa_ghc).mark_point(
-                    color='red', size=30
-                ).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade', axis=alt.Axis(labelAngle=0)),
-                    y=alt.Y('LEAVE_COUNT:Q', title=None),
-                    tooltip=[alt.Tooltip('EMPLOYEE_ID', title='Employee ID'), alt.Tooltip('LEAVE_COUNT', title='Annual Leaves')],
-                )
-                
-                # Highlight selected employee in yellow
-                highlighted_employee = alt.Chart(drv_lsa_ghc[drv_lsa_ghc['EMPLOYEE_ID'] == self.selected_driver]).mark_point(
-                    color='yellow', size=200, filled=True, stroke='black', strokeWidth=2
-                ).encode(
-                    x=alt.X('FINAL_GRADING:N', title='Health Grade'),
-                    y=alt.Y('LEAVE_COUNT:Q')
+                # Box stats per grade + a bounded swarm sample, reduced server-side
+                final_chart = grade_box_swarm(
+                    drv_lsa_ghc, 'LEAVE_COUNT', self.selected_driver,
+                    title=f'Absenteeism by Health Grade: {self.selected_depot}',
+                    y_title=None, tooltip_title='Annual Leaves', highlight_stroke=True
                 )
-                
-                final_chart = (box_plot + swarm_plot + highlighted_employee)
-                st.altair_chart(final_chart, use_container_width=True)
+                altair_chart(final_chart, "depot_leaves_vs_grade", drv_lsa_ghc, driver=self.selected_driver)
         else:
             st.error("Failed to load data.")
 
@@ -1129,6 +1037,23 @@ class driver_depot_dashboard_ui_RM:
         else:
             st.info("No health data for this driver.")
 
+    # ---------------- Scorecard export ----------------
+    def scorecards_ui(self):
+        st.markdown("## Driver Scorecards")
+        months = [m.strftime('%Y-%m') for m in pd.date_range(self.fy_start, self.fy_end, freq='MS') if self.max_date >= m]
+        scope = st.radio("Drivers of", ["Selected depot", "All depots in region"], horizontal=True, key="scorecard_scope")
+        if scope == "Selected depot":
+            load_parts, stem = (lambda: [(self.index, self.selected_depot)]), self.selected_depot
+        else:
+            # a query per depot, never per driver; read outside the partition LRU, one depot at a time
+            load_parts, stem = (lambda: ((build_depot_partition(d)['index'], d) for d in self.depots)), self.user_region
+        st.caption(f"Scorecards for every driver of the {scope.lower()} for {self.selected_fy}.")
+        scorecard_export_ui(
+            load_parts, self.fy_start, self.fy_end, months, fy_label(self.fy_start.year),
+            stem, driver_percentiles(),
+        )
+
+
 
 if __name__ == '__main__':
     user_region = st.session_state.user_region
@@ -1138,8 +1063,10 @@ if __name__ == '__main__':
     obj = driver_depot_dashboard_ui_RM(user_region, role)
     obj.parameters()
 
-    tab1, tab2 = st.tabs(["Driver Performance", "Driver Performance in Depot"])
+    tab1, tab2, tab3 = st.tabs(["Driver Performance", "Driver Performance in Depot", "Driver Scorecards"])
     with tab1:
         obj.driver_ui()
     with tab2:
         obj.driver_depot_ui()
+    with tab3:
+        obj.scorecards_ui()
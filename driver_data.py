@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from chart_cache import data_fingerprint
+from depot_data import freeze, service_hours, shared_cache
+from query_runner import run_queries
+
+# ----------------------------------------------------------------------
+# 🧮 Shared enrichment for the driver dashboards
+# ----------------------------------------------------------------------
+# daily_operations, driver_absenteeism and service_master get their derived
+# columns once, with vectorized ops: MONTH_YEAR, FINANCIAL_YEAR, the service
+# duration (same overnight rules as the depot dashboards) and categorical
+# codes for the low-cardinality label columns. The enriched frames are cached
+# per (depot, data version) and shared read-only between sessions.
+#
+# A depot's data version is one cheap query: the row count of each source
+# table for the depot, re-read at most every VERSION_TTL seconds. The raw
+# tables, the enrichment and the driver index are all cached under it, so a
+# rerun costs a cache lookup and an ETL load shows up within VERSION_TTL.
+# In-place updates that keep the counts are picked up after TABLES_TTL.
+
+OPS_DATE_COL = "OPERATIONS_DATE"
+LEAVE_DATE_COL = "DATE"
+# label columns stored as categoricals (group with observed=True)
+CATEGORY_COLS = ["DEPOT", "DAY_NIGHT", "LEAVE_TYPE"]
+FY_START_MONTH = 4
+
+# source tables of the driver dashboards -> their depot column
+DEPOT_TABLES = {
+    "driver_details": "unit",
+    "daily_operations": "depot",
+    "service_master": "depot",
+    "driver_absenteeism": "depot",
+    "ghc_2024": "depot",
+}
+VERSION_TTL = 60
+TABLES_TTL = 600
+
+
+@st.cache_resource(show_spinner=False, ttl=VERSION_TTL)
+def depot_data_version(depot):
+    """(depot, row count per DEPOT_TABLES table): the cache key of the depot's driver data."""
+    query = " UNION ALL ".join(
+        f"SELECT '{table}' AS source, COUNT(*) AS n FROM {table} WHERE {depot_col} = %s"
+        for table, depot_col in DEPOT_TABLES.items()
+    )
+    counts = run_queries({"versions": (query, (depot,) * len(DEPOT_TABLES))})["versions"]
+    n = dict(zip(counts["source"], counts["n"]))
+    return (depot,) + tuple(int(n.get(table, 0)) for table in DEPOT_TABLES)
+
+
+def read_depot_tables(depot):
+    """load_depot_tables without the cache: fresh, caller-owned frames."""
+    tables = run_queries({
+        table: (f"SELECT * FROM {table} WHERE {depot_col} = %s", (depot,))
+        for table, depot_col in DEPOT_TABLES.items()
+    })
+    for df in tables.values():
+        df.columns = [c.upper() for c in df.columns]
+    return tables
+
+
+@shared_cache(show_spinner="Loading depot …", max_entries=32, ttl=TABLES_TTL)
+def _cached_depot_tables(depot, version):
+    return {table: freeze(df) for table, df in read_depot_tables(depot).items()}
+
+
+def load_depot_tables(depot, version=None):
+    """
+    {table: DataFrame with upper-cased columns} for one depot, cached per (depot,
+    data version); the five reads run concurrently. version defaults to
+    depot_data_version(depot).
+    """
+    return _cached_depot_tables(depot, version if version is not None else depot_data_version(depot))
+
+
+def _labels(codes, fmt):
+    """Format an integer code array through its unique values only (one str per distinct code)."""
+    uniq, inverse = np.unique(codes, return_inverse=True)
+    return np.array([fmt(u) for u in uniq], dtype=object)[inverse] if len(codes) else np.array([], dtype=object)
+
+
+def fy_start_year(dates):
+    """Calendar year in which each date's financial year (April to March) starts."""
+    return dates.dt.year - (dates.dt.month < FY_START_MONTH).astype(int)
+
+
+def fy_label(start_year):
+    return f"{start_year}-{start_year + 1}"
+
+
+def _with_dates(df, date_col):
+    """df with date_col parsed, undated rows dropped and MONTH_YEAR ("YYYY-MM") added."""
+    if date_col not in df.columns:
+        return df.assign(**{date_col: pd.Series(dtype="datetime64[ns]"), "MONTH_YEAR": pd.Series(dtype=object)}).iloc[0:0]
+    df = df.assign(**{date_col: pd.to_datetime(df[date_col], errors="coerce")}).dropna(subset=[date_col])
+    ym = (df[date_col].dt.year * 100 + df[date_col].dt.month).to_numpy()
+    return df.assign(MONTH_YEAR=_labels(ym, lambda u: f"{u // 100:04d}-{u % 100:02d}"))
+
+
+def _as_categories(df):
+    cols = {
+        c: df[c].astype("category") for c in CATEGORY_COLS
+        if c in df.columns and (df[c].dtype == object or pd.api.types.is_string_dtype(df[c]))
+    }
+    return df.assign(**cols) if cols else df
+
+
+def enrich_operations(ops_df):
+    """daily_operations with OPERATIONS_DATE parsed, MONTH_YEAR, FINANCIAL_YEAR and label categoricals."""
+    ops = _with_dates(ops_df, OPS_DATE_COL)
+    starts = fy_start_year(ops[OPS_DATE_COL]).to_numpy() if not ops.empty else np.array([], dtype=int)
+    labels = _labels(starts, fy_label)
+    fy = pd.Categorical(labels, categories=sorted(set(labels)), ordered=True)
+    return _as_categories(ops.assign(FINANCIAL_YEAR=fy))
+
+
+def enrich_absenteeism(abs_df):
+    """driver_absenteeism with DATE parsed, MONTH_YEAR and label categoricals."""
+    return _as_categories(_with_dates(abs_df, LEAVE_DATE_COL))
+
+
+def enrich_services(ser_df):
+    """service_master with HOURS: departure to arrival, rolled over midnight for night / overnight services."""
+    if ser_df.empty or not {"DEPT_TIME", "ARR_TIME"}.issubset(ser_df.columns):
+        return ser_df.assign(HOURS=0.0)
+    day_night = ser_df["DAY_NIGHT_CODE"] if "DAY_NIGHT_CODE" in ser_df.columns else pd.Series(None, index=ser_df.index)
+    return ser_df.assign(HOURS=service_hours(ser_df["DEPT_TIME"], ser_df["ARR_TIME"], day_night).round(2))
+
+
+@shared_cache(show_spinner="Preparing driver data …", max_entries=32)
+def _cached_enrichment(depot, version, _ops_df, _abs_df, _ser_df):
+    return (
+        freeze(enrich_operations(_ops_df)),
+        freeze(enrich_absenteeism(_abs_df)),
+        freeze(enrich_services(_ser_df)),
+    )
+
+
+def enrich_driver_frames(depot, ops_df, abs_df, ser_df, version=None):
+    """
+    Enriched (ops_df, abs_df, ser_df) for a depot (or tuple of depots) plus the data
+    version they were cached under: the caller's version (e.g. depot_data_version)
+    when given, else a fingerprint of the frames.
+    """
+    if version is None:
+        version = data_fingerprint(ops_df, abs_df, ser_df)
+    ops, leaves, services = _cached_enrichment(depot, version, ops_df, abs_df, ser_df)
+    return ops, leaves, services, version
+
+
+def financial_years(ops_df):
+    """
+    Financial-year dropdown options present in the operations data, oldest first:
+    "01-04-2023 to 31-03-2024" -> (start, end) Timestamps. Falls back to the
+    current financial year when there are no dated operations.
+    """
+    dates = pd.to_datetime(ops_df[OPS_DATE_COL], errors="coerce").dropna() \
+        if ops_df is not None and OPS_DATE_COL in ops_df.columns else pd.Series(dtype="datetime64[ns]")
+    return fy_options(fy_start_year(dates).unique().tolist())
+
+
+def fy_options(start_years):
+    """Dropdown options for the given FY start years (current FY when there are none)."""
+    starts = sorted({int(y) for y in start_years if pd.notna(y)})
+    if not starts:
+        starts = fy_start_year(pd.Series([pd.Timestamp.today()])).tolist()
+    return {
+        f"01-04-{y} to 31-03-{y + 1}": (pd.Timestamp(y, FY_START_MONTH, 1), pd.Timestamp(y + 1, 3, 31))
+        for y in starts
+    }
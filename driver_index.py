@@ -0,0 +1,240 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from chart_cache import data_fingerprint
+from depot_data import freeze, session_view
+
+# ----------------------------------------------------------------------
+# 🧭 Per-driver index for the driver dashboards
+# ----------------------------------------------------------------------
+# The loaded depot frames are organised once per employee: operations (with
+# HOURS merged from service_master a single time) and leaves are sorted by
+# (driver, date), so each driver's rows are one contiguous [start, stop) range.
+# Picking another driver is then a dict lookup plus a date bisect instead of
+# several boolean scans and merges over the whole depot.
+
+EMP_COL = "EMPLOYEE_ID"
+OPS_DATE_COL = "OPERATIONS_DATE"
+LEAVE_DATE_COL = "DATE"
+LSA_TYPES = ["L", "S", "A"]
+MONTHLY_METRICS = ["OPD_KMS", "DAILY_EARNINGS", "HOURS"]
+
+
+def with_hours(ops_df, ser_df):
+    """ops_df with the service HOURS merged in (0 when unknown); one row per operation."""
+    if ops_df.empty:
+        return ops_df.assign(HOURS=pd.Series(dtype=float))
+    if ser_df is None or ser_df.empty or not {"SERVICE_NUMBER", "HOURS"}.issubset(ser_df.columns) \
+            or "SERVICE_NUMBER" not in ops_df.columns:
+        return ops_df.assign(HOURS=0.0)
+
+    keys = ["SERVICE_NUMBER"]
+    ops = ops_df.drop(columns=["HOURS"], errors="ignore")
+    hours = ser_df[["SERVICE_NUMBER", "HOURS"] + (["DEPOT"] if "DEPOT" in ser_df.columns else [])]
+    if "DEPOT" in ops.columns and "DEPOT" in hours.columns:
+        # a service number is only unique within its depot
+        ops = ops.assign(_DEPOT_KEY=ops["DEPOT"].astype(str).str.strip().str.upper())
+        hours = hours.assign(_DEPOT_KEY=hours["DEPOT"].astype(str).str.strip().str.upper())
+        keys = ["_DEPOT_KEY", "SERVICE_NUMBER"]
+    hours = hours[keys + ["HOURS"]].drop_duplicates(subset=keys, keep="first")
+
+    merged = ops.merge(hours, on=keys, how="left").drop(columns=["_DEPOT_KEY"], errors="ignore")
+    merged["HOURS"] = merged["HOURS"].fillna(0)
+    return merged
+
+
+def _sorted_ranges(df, by, date_col):
+    """Sort df by (by..., date_col) and return it with {key: (start, stop)} row ranges."""
+    if df.empty or date_col not in df.columns or not set(by).issubset(df.columns):
+        return df.reset_index(drop=True), {}
+    df = df.dropna(subset=[date_col]).sort_values(list(by) + [date_col], kind="mergesort").reset_index(drop=True)
+    ranges = {
+        key: (int(idx[0]), int(idx[-1]) + 1)
+        for key, idx in df.groupby(list(by) if len(by) > 1 else by[0], sort=False, observed=True).indices.items()
+    }
+    return df, ranges
+
+
+class DriverIndex:
+    """
+    Depot data keyed per driver. by is ("EMPLOYEE_ID",) for a single depot or
+    ("DEPOT", "EMPLOYEE_ID") when several depots are loaded; a driver key is the
+    matching scalar or tuple. The frames are frozen (depot_data.freeze) and window()
+    hands out views, so the index can be shared between sessions.
+    """
+
+    def __init__(self, ops_df, abs_df, ser_df, ghc_df, driver_df, by=(EMP_COL,)):
+        self.by = tuple(by)
+        ops_df = ops_df if ops_df is not None else pd.DataFrame()
+        abs_df = abs_df if abs_df is not None else pd.DataFrame()
+
+        # driver dropdowns keep the load order of the operations
+        self._drivers = ops_df[EMP_COL].unique().tolist() if EMP_COL in ops_df.columns else []
+        self._drivers_by_depot = (
+            {d: emps.tolist() for d, emps in ops_df.groupby("DEPOT", sort=False, observed=True)[EMP_COL].unique().items()}
+            if {"DEPOT", EMP_COL}.issubset(ops_df.columns) else {}
+        )
+
+        ops_all, self._ops_ranges = _sorted_ranges(with_hours(ops_df, ser_df), self.by, OPS_DATE_COL)
+        leaves_all, self._leave_ranges = _sorted_ranges(abs_df, self.by, LEAVE_DATE_COL)
+        self.ops_all, self.leaves_all = freeze(ops_all), freeze(leaves_all)
+        self._ops_dates = self.ops_all[OPS_DATE_COL].to_numpy() if OPS_DATE_COL in self.ops_all.columns else None
+        self._leave_dates = self.leaves_all[LEAVE_DATE_COL].to_numpy() if LEAVE_DATE_COL in self.leaves_all.columns else None
+
+        self.ghc_all = freeze(ghc_df)
+        self._ghc_rows = self.ghc_all.groupby(EMP_COL, sort=False).indices if EMP_COL in self.ghc_all.columns else {}
+        self.details_all = freeze(driver_df)
+        self._detail_rows = (
+            self.details_all.groupby(self.details_all[EMP_COL].astype(str), sort=False).indices
+            if EMP_COL in self.details_all.columns else {}
+        )
+
+        # per-driver monthly series: one groupby for every driver at load time
+        keys = list(self.by) + ["MONTH_YEAR"]
+        metrics = [c for c in MONTHLY_METRICS if c in self.ops_all.columns]
+        if not self.ops_all.empty and set(keys).issubset(self.ops_all.columns):
+            ops = self.ops_all.assign(**{c: pd.to_numeric(self.ops_all[c], errors="coerce") for c in metrics})
+            self._monthly_ops = ops.groupby(keys, observed=True)[metrics].sum().sort_index()
+        else:
+            self._monthly_ops = pd.DataFrame(columns=metrics)
+        if not self.leaves_all.empty and set(keys).issubset(self.leaves_all.columns):
+            self._monthly_leaves = self.leaves_all.groupby(keys, observed=True).size().rename("Leave_Days").sort_index()
+        else:
+            self._monthly_leaves = pd.Series(dtype=float, name="Leave_Days")
+
+        self._windows = {}
+        self._windows_lock = threading.Lock()
+
+    # ---------------- Driver lookups ----------------
+    def drivers(self, depot=None):
+        """Employee ids with operations, optionally for one depot."""
+        if depot is None:
+            return list(self._drivers)
+        return list(self._drivers_by_depot.get(depot, []))
+
+    @staticmethod
+    def _slice(df, ranges, dates, key, start, end):
+        if key not in ranges:
+            return df.iloc[0:0]
+        lo, hi = ranges[key]
+        dates = dates[lo:hi]
+        first = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side="left")) if start is not None else 0
+        last = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side="right")) if end is not None else hi - lo
+        return df.iloc[lo + first:lo + max(first, last)]
+
+    def ops(self, key, start=None, end=None):
+        """The driver's operations (with HOURS) dated within [start, end]."""
+        return self._slice(self.ops_all, self._ops_ranges, self._ops_dates, key, start, end)
+
+    def leaves(self, key, start=None, end=None):
+        """The driver's absenteeism rows dated within [start, end]."""
+        return self._slice(self.leaves_all, self._leave_ranges, self._leave_dates, key, start, end)
+
+    def health(self, employee_id):
+        rows = self._ghc_rows.get(employee_id)
+        return self.ghc_all.iloc[rows] if rows is not None else self.ghc_all.iloc[0:0]
+
+    def details(self, employee_id):
+        rows = self._detail_rows.get(str(employee_id))
+        return self.details_all.iloc[rows] if rows is not None else self.details_all.iloc[0:0]
+
+    def monthly(self, key, months):
+        """
+        The driver's MONTH_YEAR series for the given months (missing months are 0):
+        MONTH_YEAR + OPD_KMS / DAILY_EARNINGS / HOURS sums + Leave_Days.
+        """
+        key = key if isinstance(key, tuple) else (key,)
+        months = pd.Index(list(months), name="MONTH_YEAR")
+        ops = self._monthly_ops.loc[key] if key in self._monthly_ops.index \
+            else pd.DataFrame(columns=self._monthly_ops.columns)
+        leaves = self._monthly_leaves.loc[key] if key in self._monthly_leaves.index \
+            else pd.Series(dtype=float, name="Leave_Days")
+        out = ops.reindex(months).assign(Leave_Days=leaves.reindex(months))
+        return out.fillna(0).reset_index()
+
+    def monthly_table(self, months):
+        """Every driver's monthly series for the given months, long format (by... + MONTH_YEAR + metrics + Leave_Days)."""
+        months = list(months)
+        ops = self._monthly_ops
+        if isinstance(ops.index, pd.MultiIndex):
+            ops = ops[ops.index.get_level_values("MONTH_YEAR").isin(months)]
+        leaves = self._monthly_leaves
+        if isinstance(leaves.index, pd.MultiIndex):
+            leaves = leaves[leaves.index.get_level_values("MONTH_YEAR").isin(months)]
+        if ops.empty and leaves.empty:
+            return pd.DataFrame(columns=list(self.by) + ["MONTH_YEAR"] + list(ops.columns) + ["Leave_Days"])
+        if ops.empty:
+            return leaves.reset_index().assign(**{c: 0.0 for c in ops.columns})
+        if leaves.empty:
+            return ops.assign(Leave_Days=0.0).reset_index()
+        return ops.join(leaves, how="outer").fillna(0).reset_index()
+
+    # ---------------- Depot-wide windows ----------------
+    def window(self, start, end, depot=None):
+        """
+        Depot-wide frames for a financial year, computed once per (start, end, depot):
+        ops (with HOURS), leaves, per-driver leave counts (all types and L/S/A only)
+        and per-driver hours with their health grade.
+        """
+        cache_key = (start, end, depot)
+        # sessions share the index: one builds a window while the others wait for it
+        with self._windows_lock:
+            if cache_key not in self._windows:
+                ops, leaves = self.ops_all, self.leaves_all
+                if not ops.empty:
+                    mask = ops[OPS_DATE_COL].between(start, end)
+                    if depot is not None and "DEPOT" in ops.columns:
+                        mask &= ops["DEPOT"] == depot
+                    ops = ops[mask]
+                if not leaves.empty:
+                    mask = leaves[LEAVE_DATE_COL].between(start, end)
+                    if depot is not None and "DEPOT" in leaves.columns:
+                        mask &= leaves["DEPOT"] == depot
+                    leaves = leaves[mask]
+                if leaves.empty:
+                    leave_counts = pd.DataFrame(columns=[EMP_COL, "LEAVE_TYPE"])
+                    lsa_counts = pd.DataFrame(columns=[EMP_COL, "LEAVE_COUNT"])
+                else:
+                    leave_counts = leaves.groupby(EMP_COL)["LEAVE_TYPE"].count().reset_index()
+                    lsa_counts = (
+                        leaves[leaves["LEAVE_TYPE"].isin(LSA_TYPES)]
+                        .groupby(EMP_COL).size().reset_index(name="LEAVE_COUNT")
+                    )
+                if {EMP_COL, "FINAL_GRADING"}.issubset(self.ghc_all.columns) and {EMP_COL, "HOURS"}.issubset(ops.columns):
+                    hours_grade = pd.merge(
+                        self.ghc_all[[EMP_COL, "FINAL_GRADING"]], ops[[EMP_COL, "HOURS"]], on=EMP_COL, how="right"
+                    )
+                    hours_by_grade = (
+                        hours_grade.assign(HOURS=hours_grade["HOURS"].fillna(0))
+                        .dropna(subset=["FINAL_GRADING"])
+                        .groupby([EMP_COL, "FINAL_GRADING"], as_index=False)["HOURS"].sum()
+                    )
+                else:
+                    hours_by_grade = pd.DataFrame(columns=[EMP_COL, "FINAL_GRADING", "HOURS"])
+                self._windows[cache_key] = {
+                    "ops": freeze(ops),
+                    "leaves": freeze(leaves),
+                    "leave_counts": freeze(leave_counts),
+                    "lsa_counts": freeze(lsa_counts),
+                    "hours_by_grade": freeze(hours_by_grade),
+                }
+            return session_view(self._windows[cache_key])
+
+
+@st.cache_resource(show_spinner="Indexing drivers …", max_entries=16)
+def _cached_index(version, by, _ops_df, _abs_df, _ser_df, _ghc_df, _driver_df):
+    return DriverIndex(_ops_df, _abs_df, _ser_df, _ghc_df, _driver_df, by=by)
+
+
+def driver_index(ops_df, abs_df, ser_df, ghc_df, driver_df, by=(EMP_COL,), version=None):
+    """
+    DriverIndex for the loaded frames, shared across reruns while the data is unchanged.
+    version is the data version of all five frames when the caller already has one
+    (e.g. driver_data.depot_data_version); otherwise the frames are fingerprinted.
+    """
+    if version is None:
+        version = data_fingerprint(ops_df, abs_df, ser_df, ghc_df, driver_df)
+    return _cached_index(version, tuple(by), ops_df, abs_df, ser_df, ghc_df, driver_df)
@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from depot_data import freeze, leave_date_sql
+from driver_data import enrich_services, fy_label, fy_start_year
+from driver_index import with_hours
+from query_runner import QueryError, run_queries
+
+# ----------------------------------------------------------------------
+# 🏆 Driver percentiles and league tables (depot / region / state)
+# ----------------------------------------------------------------------
+# Every driver's financial-year totals are rolled up in SQL for the whole
+# corporation and ranked in one vectorized pass: one groupby().rank() per scope
+# (the driver's depot, its region, all depots) over all metrics at once. The
+# store is shared read-only between sessions and refreshed after data loads, so
+# "where does this driver stand" is an index lookup instead of an ad-hoc groupby.
+
+STORE_TTL = 3600
+EMP_COL = "EMPLOYEE_ID"
+
+# metric label -> store column
+METRICS = {
+    "KMs": "KMS",
+    "Hours": "HOURS",
+    "Earnings": "EARNINGS",
+    "Leave Days": "LEAVE_DAYS",
+    "Night Share": "NIGHT_SHARE",
+}
+# fewer leave days ranks higher
+LOWER_IS_BETTER = {"LEAVE_DAYS"}
+
+# scope -> grouping columns (within a financial year)
+SCOPES = {
+    "Depot": ["FY_START", "DEPOT"],
+    "Region": ["FY_START", "REGION"],
+    "State": ["FY_START"],
+}
+
+# driver_rankings.RANK_METRICS column -> store column
+RANKING_COLUMNS = {
+    "total_km": "KMS",
+    "total_hours": "HOURS",
+    "total_earnings": "EARNINGS",
+    "absenteeism": "LEAVE_DAYS",
+}
+
+TOTAL_COLS = ["DEPOT", "REGION", EMP_COL, "FY_START", "OPS", "NIGHT_OPS"] + list(METRICS.values())
+
+
+def _fy_start_sql(date_col):
+    return f"YEAR({date_col}) - (MONTH({date_col}) < 4)"
+
+
+def normalize_key(values):
+    """Employee ids / depot names as stripped, upper-cased strings (ids come back as int or str)."""
+    return values.astype(str).str.strip().str.upper()
+
+
+def load_driver_totals():
+    """
+    One row per (DEPOT, EMPLOYEE_ID, FY_START) for all depots: OPS / NIGHT_OPS
+    counts, KMS / HOURS / EARNINGS sums, LEAVE_DAYS, NIGHT_SHARE and the depot's REGION.
+    """
+    fy = _fy_start_sql("operations_date")
+    tables = run_queries({
+        "daily_operations": (f"""
+            SELECT depot, employee_id, service_number, {fy} AS fy_start,
+                   COUNT(*) AS ops, SUM(day_night = 'N') AS night_ops,
+                   SUM(opd_kms) AS kms, SUM(daily_earnings) AS earnings
+            FROM daily_operations
+            WHERE operations_date IS NOT NULL
+            GROUP BY depot, employee_id, service_number, fy_start
+        """, None),
+        "service_master": ("""
+            SELECT depot, service_number, dept_time, arr_time, day_night_code FROM service_master
+        """, None),
+        "driver_absenteeism": (f"""
+            SELECT depot, employee_id, {_fy_start_sql(leave_date_sql())} AS fy_start, COUNT(*) AS leave_days
+            FROM driver_absenteeism
+            WHERE {leave_date_sql()} IS NOT NULL AND leave_type IS NOT NULL
+            GROUP BY depot, employee_id, fy_start
+        """, None),
+        "TS_ADMIN": ("SELECT depot_name AS depot, region FROM TS_ADMIN", None),
+    })
+    for df in tables.values():
+        df.columns = [c.upper() for c in df.columns]
+    ops, services = tables["daily_operations"], tables["service_master"]
+    leaves, regions = tables["driver_absenteeism"], tables["TS_ADMIN"]
+
+    keys = ["DEPOT", EMP_COL, "FY_START"]
+    if ops.empty:
+        return pd.DataFrame(columns=TOTAL_COLS)
+
+    num = ["OPS", "NIGHT_OPS", "KMS", "EARNINGS"]
+    ops = ops.assign(**{c: pd.to_numeric(ops[c], errors="coerce").fillna(0) for c in num})
+    # service hours per operation, times the operations on that service
+    ops = ops.assign(HOURS=with_hours(ops, enrich_services(services))["HOURS"].to_numpy() * ops["OPS"].to_numpy())
+    ops = ops.assign(DEPOT=normalize_key(ops["DEPOT"]), EMPLOYEE_ID=normalize_key(ops[EMP_COL]))
+    totals = ops.groupby(keys, as_index=False)[num + ["HOURS"]].sum()
+
+    if not leaves.empty:
+        leaves = leaves.assign(
+            DEPOT=normalize_key(leaves["DEPOT"]), EMPLOYEE_ID=normalize_key(leaves[EMP_COL]),
+            LEAVE_DAYS=pd.to_numeric(leaves["LEAVE_DAYS"], errors="coerce").fillna(0),
+        )
+        # drivers are ranked on the years they operated in
+        totals = totals.merge(leaves[keys + ["LEAVE_DAYS"]], on=keys, how="left")
+    totals["LEAVE_DAYS"] = totals["LEAVE_DAYS"].fillna(0) if "LEAVE_DAYS" in totals.columns else 0.0
+
+    region_of = (
+        dict(zip(normalize_key(regions["DEPOT"]), regions["REGION"].astype(str).str.strip().str.upper()))
+        if not regions.empty else {}
+    )
+    totals["REGION"] = totals["DEPOT"].map(region_of).fillna("UNKNOWN")
+    totals["NIGHT_SHARE"] = (totals["NIGHT_OPS"] / totals["OPS"].where(totals["OPS"] > 0)).fillna(0)
+    totals["FY_START"] = pd.to_numeric(totals["FY_START"], errors="coerce").astype("Int64")
+    return totals.dropna(subset=["FY_START"])[TOTAL_COLS]
+
+
+def rank_drivers(totals):
+    """
+    totals with, per scope and metric, <METRIC>_PCT_<SCOPE> (percentile 0-100, 100 =
+    highest, or fewest leave days; ties share the average) and <METRIC>_RANK_<SCOPE>
+    (league position, 1 = top), plus N_<SCOPE>: the drivers ranked in that scope.
+    """
+    metrics = list(METRICS.values())
+    higher = [m for m in metrics if m not in LOWER_IS_BETTER]
+    lower = [m for m in metrics if m in LOWER_IS_BETTER]
+    out = {}
+    for scope, by in SCOPES.items():
+        suffix = scope.upper()
+        out[f"N_{suffix}"] = totals.groupby(by, observed=True)[EMP_COL].transform("size")
+        for cols, ascending in ((higher, True), (lower, False)):
+            grouped = totals.groupby(by, observed=True)[cols]
+            pct = grouped.rank(pct=True, ascending=ascending) * 100
+            rank = grouped.rank(method="min", ascending=not ascending)
+            out.update({f"{m}_PCT_{suffix}": pct[m].round(1) for m in cols})
+            out.update({f"{m}_RANK_{suffix}": rank[m].astype("Int64") for m in cols})
+    return totals.assign(**out)
+
+
+class DriverPercentiles:
+    """
+    Ranked driver totals keyed by (EMPLOYEE_ID, FY_START). A driver who worked
+    at several depots in a year has one row per depot; lookups without a depot
+    use the one with the most operations. Returned frames are shared: don't mutate them.
+    """
+
+    def __init__(self, ranked):
+        # most operations first, so the first row per key is the driver's main depot
+        self.table = freeze(ranked.sort_values(["FY_START", "OPS"], ascending=[True, False], kind="mergesort")
+                            .reset_index(drop=True))
+        self._rows = self.table.groupby([EMP_COL, "FY_START"], sort=False).indices if not self.table.empty else {}
+
+    @property
+    def fy_starts(self):
+        return sorted(int(y) for y in self.table["FY_START"].dropna().unique())
+
+    def standing(self, employee_id, fy_start, depot=None):
+        """The driver's ranked row for a financial year (at depot, when given), or None."""
+        rows = self._rows.get((str(employee_id).strip().upper(), int(fy_start)))
+        if rows is None:
+            return None
+        found = self.table.iloc[rows]
+        if depot is not None:
+            found = found[found["DEPOT"] == str(depot).strip().upper()]
+        return found.iloc[0] if not found.empty else None
+
+    def standing_table(self, employee_id, fy_start, depot=None):
+        """Metric x scope percentiles (with league positions) for one driver, for display."""
+        row = self.standing(employee_id, fy_start, depot)
+        if row is None:
+            return pd.DataFrame()
+        return pd.DataFrame(
+            {
+                f"{scope} %ile": [
+                    f"{row[f'{m}_PCT_{scope.upper()}']:.1f} (#{row[f'{m}_RANK_{scope.upper()}']} of {row[f'N_{scope.upper()}']})"
+                    for m in METRICS.values()
+                ]
+                for scope in SCOPES
+            },
+            index=pd.Index(list(METRICS), name="Metric"),
+        )
+
+    def fy_table(self, fy_start):
+        """One ranked row per driver for a FY (their main depot's)."""
+        return self.table[self.table["FY_START"] == int(fy_start)].drop_duplicates(EMP_COL)
+
+    def fy_rows(self, fy_start, depots, employee_ids):
+        """
+        The ranked row of each (depot, employee) pair in a FY, in input order (all NaN
+        when unranked there). depots is one depot for all rows or one per employee.
+        """
+        employees = normalize_key(pd.Series(employee_ids))
+        depots = normalize_key(pd.Series(np.broadcast_to(np.asarray(depots, dtype=object), (len(employees),))))
+        ranked = self.table[self.table["FY_START"] == int(fy_start)].set_index(["DEPOT", EMP_COL])
+        return ranked.reindex(pd.MultiIndex.from_arrays([depots, employees])).reset_index(drop=True)
+
+    def league_table(self, fy_start, metric, scope="State", name=None):
+        """Drivers of one depot / region (name) or the whole state for a FY, best first by metric."""
+        suffix = scope.upper()
+        df = self.table[self.table["FY_START"] == int(fy_start)]
+        if scope != "State" and name is not None:
+            df = df[df[suffix] == str(name).strip().upper()]
+        return df.sort_values(f"{metric}_RANK_{suffix}", kind="mergesort")[
+            ["DEPOT", "REGION", EMP_COL, metric, f"{metric}_PCT_{suffix}", f"{metric}_RANK_{suffix}"]
+        ].reset_index(drop=True)
+
+    def with_percentiles(self, df, depot_col, emp_col, fy_start, metric, scopes=("Depot", "Region", "State")):
+        """
+        df with a "<scope> %ile" column per scope for the metric of each row's
+        (depot, driver) in a FY (NaN when unranked).
+        """
+        if df.empty:
+            return df
+        ranked = self.fy_rows(fy_start, df[depot_col].to_numpy(), df[emp_col].to_numpy())
+        return df.assign(**{
+            f"{scope} %ile": ranked[f"{metric}_PCT_{scope.upper()}"].to_numpy()
+            for scope in scopes
+        })
+
+
+@st.cache_resource(show_spinner="Ranking drivers …", ttl=STORE_TTL)
+def _driver_percentiles():
+    return DriverPercentiles(rank_drivers(load_driver_totals()))
+
+
+def driver_percentiles():
+    """
+    The shared DriverPercentiles store (rebuilt after refresh_driver_percentiles or
+    STORE_TTL). When the totals can't be read (reported by run_queries) an empty,
+    uncached store is returned, so the pages show no percentiles and the next run retries.
+    """
+    try:
+        return _driver_percentiles()
+    except QueryError:
+        return DriverPercentiles(rank_drivers(pd.DataFrame(columns=TOTAL_COLS)))
+
+
+def refresh_driver_percentiles():
+    """Drop the store so the next reader re-ranks from the freshly loaded tables."""
+    _driver_percentiles.clear()
+
+
+def fy_of(when):
+    """Financial-year start year of a date."""
+    return int(fy_start_year(pd.Series([pd.Timestamp(when)])).iloc[0])
+
+
+def fy_caption(fy_start):
+    return f"Percentiles for FY {fy_label(int(fy_start))}: 100 = highest in the scope (for leave days, fewest)."
@@ -0,0 +1,102 @@
+import math
+
+import pandas as pd
+
+from depot_data import freeze, shared_cache
+from driver_data import FY_START_MONTH
+
+# ----------------------------------------------------------------------
+# 🏅 Top / bottom driver rankings for the depot dashboards
+# ----------------------------------------------------------------------
+# driver_monthly (from preaggregate) is rolled up once per (depot, employee, year);
+# a ranking then only needs nlargest / nsmallest on the per-employee totals
+# instead of sorting every driver.
+
+RANK_METRICS = {
+    "KMs": "total_km",
+    "Hours": "total_hours",
+    "Earnings": "total_earnings",
+    "Absenteeism": "absenteeism",
+}
+# metrics where the smallest value ranks first
+LOWER_IS_BETTER = {"absenteeism"}
+
+# "Show" choices: label -> (n, percentile)
+SHOW_OPTIONS = {
+    "5": (5, None),
+    "10": (10, None),
+    "25": (25, None),
+    "10%": (None, 10),
+    "25%": (None, 25),
+}
+
+
+def _with_metrics(df):
+    missing = [c for c in RANK_METRICS.values() if c not in df.columns]
+    if missing:
+        df = df.assign(**{c: 0.0 for c in missing})
+    return df
+
+
+@shared_cache(show_spinner=False, max_entries=64)
+def driver_yearly_totals(driver_monthly, depot_col="depot", emp_col="employee_id"):
+    """Roll driver_monthly up to one row per (depot, employee, year); shared, handed out as views."""
+    if driver_monthly is None or driver_monthly.empty:
+        return freeze(pd.DataFrame(columns=[depot_col, emp_col, "year"] + list(RANK_METRICS.values())))
+    df = _with_metrics(driver_monthly)
+    return freeze(
+        df.groupby([depot_col, emp_col, "year"], observed=True)[list(RANK_METRICS.values())]
+        .sum()
+        .reset_index()
+    )
+
+
+def driver_totals(driver_monthly, depots, year="All", month=None, depot_col="depot", emp_col="employee_id", fy_start=None):
+    """
+    Per-(depot, employee) totals for the given depots and one of: a month (a Timestamp
+    matching driver_monthly["month"]), a financial year (fy_start, its starting
+    calendar year) or a year ("All" or a calendar year).
+    """
+    depots = {str(d).strip().upper() for d in depots}
+    cols = list(RANK_METRICS.values())
+
+    if month is not None:
+        df = _with_metrics(driver_monthly)
+        df = df[df[depot_col].isin(depots) & (df["month"] == month)]
+    elif fy_start is not None:
+        df = _with_metrics(driver_monthly)
+        start = pd.Timestamp(int(fy_start), FY_START_MONTH, 1)
+        months = pd.to_datetime(df["month"])
+        df = df[df[depot_col].isin(depots) & (months >= start) & (months < start + pd.DateOffset(years=1))]
+    else:
+        df = driver_yearly_totals(driver_monthly, depot_col, emp_col)
+        df = df[df[depot_col].isin(depots)]
+        if year != "All":
+            df = df[df["year"] == int(year)]
+
+    return df.groupby([depot_col, emp_col], observed=True)[cols].sum().reset_index()
+
+
+def top_bottom(summary, metric, n=5, percentile=None):
+    """
+    Top and bottom drivers of summary by metric (a column name).
+    n picks a fixed count; percentile (0-100) picks that share of drivers instead.
+    Both frames are indexed by Rank starting at 1.
+    """
+    if summary is None or summary.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    if percentile is not None:
+        n = max(1, math.ceil(len(summary) * float(percentile) / 100))
+    n = max(1, min(int(n), len(summary)))
+
+    if metric in LOWER_IS_BETTER:
+        top, bottom = summary.nsmallest(n, metric), summary.nlargest(n, metric)
+    else:
+        top, bottom = summary.nlargest(n, metric), summary.nsmallest(n, metric)
+
+    top = top.reset_index(drop=True)
+    bottom = bottom.reset_index(drop=True)
+    top.index = pd.RangeIndex(1, len(top) + 1, name="Rank")
+    bottom.index = pd.RangeIndex(1, len(bottom) + 1, name="Rank")
+    return top, bottom
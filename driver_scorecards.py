@@ -0,0 +1,237 @@
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import streamlit as st
+
+from driver_percentiles import METRICS, SCOPES
+from query_runner import QueryError
+from scorecard_render import render_chunk
+
+# ----------------------------------------------------------------------
+# 🗂️ Bulk driver scorecards
+# ----------------------------------------------------------------------
+# Scorecards for every driver of a depot (or region) are built from frames the
+# dashboards already hold: the DriverIndex FY window and monthly series, the
+# GHC grades and the shared percentile store - no per-driver queries. The
+# summary and monthly tables are computed with one groupby each; only the
+# per-driver files (CSV or printable HTML) are rendered in a process pool, in
+# chunks, with progress reported as chunks finish. The renderers live in
+# scorecard_render, which imports only pandas, so spawned workers don't load
+# streamlit, config.json or the DB engine.
+
+EMP_COL = "EMPLOYEE_ID"
+OPS_DATE_COL = "OPERATIONS_DATE"
+LSA_TYPES = ["L", "S", "A"]
+CHUNK_SIZE = 100  # drivers per worker task
+MAX_PROCESSES = max(1, min(4, (os.cpu_count() or 1)))
+
+# export choice -> (per-driver card format or None, file extension)
+EXPORT_FORMATS = {
+    "Excel workbook (.xlsx)": (None, "xlsx"),
+    "CSV bundle (.zip)": ("csv", "zip"),
+    "Printable scorecards - HTML, print to PDF (.zip)": ("html", "zip"),
+}
+SUMMARY_LABELS = {
+    "DAYS": "Days Operated",
+    "KMS": "KMs",
+    "EARNINGS": "Earnings",
+    "HOURS": "Hours",
+    "NIGHT_DUTIES": "Night Duties",
+    "LEAVE_DAYS": "Leave Days",
+    "LEAVE_L": "Leaves (L)",
+    "LEAVE_S": "Leaves (S)",
+    "LEAVE_A": "Leaves (A)",
+    "FINAL_GRADING": "GHC Grade",
+    "FULL_NAME": "Name",
+}
+
+_pool = None
+
+
+def _process_pool():
+    global _pool
+    if _pool is None:
+        # spawn: forking a server process that runs threads can copy held locks
+        _pool = ProcessPoolExecutor(max_workers=MAX_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _discard_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _numeric(df, cols):
+    return df.assign(**{c: pd.to_numeric(df[c], errors="coerce").fillna(0) for c in cols if c in df.columns})
+
+
+def scorecard_tables(index, fy_start, fy_end, months, store=None, depot=None):
+    """
+    (summary, monthly) for every driver of the index's FY window (optionally one depot):
+    summary has one row per driver - totals, L/S/A leave days, GHC grade, name and
+    depot / region / state percentiles; monthly is the per-driver MONTH_YEAR series.
+    """
+    keys = list(index.by)
+    fy = index.window(fy_start, fy_end, depot)
+    ops = _numeric(fy["ops"], ["OPD_KMS", "DAILY_EARNINGS", "HOURS"])
+
+    if ops.empty:
+        summary = pd.DataFrame(columns=keys + list(SUMMARY_LABELS))
+    else:
+        ops = ops.assign(_NIGHT=(ops["DAY_NIGHT"] == "N") if "DAY_NIGHT" in ops.columns else False)
+        summary = ops.groupby(keys, observed=True).agg(
+            DAYS=(OPS_DATE_COL, "nunique"),
+            KMS=("OPD_KMS", "sum"),
+            EARNINGS=("DAILY_EARNINGS", "sum"),
+            HOURS=("HOURS", "sum"),
+            NIGHT_DUTIES=("_NIGHT", "sum"),
+        )
+        leaves = fy["leaves"]
+        if not leaves.empty and "LEAVE_TYPE" in leaves.columns:
+            by_type = leaves.groupby(keys + ["LEAVE_TYPE"], observed=True).size().unstack(fill_value=0)
+            summary = summary.join(by_type.reindex(columns=LSA_TYPES, fill_value=0).add_prefix("LEAVE_"), how="left")
+            summary = summary.join(by_type.sum(axis=1).rename("LEAVE_DAYS"), how="left")
+        summary = summary.reset_index().fillna(0)
+    summary = summary.assign(**{c: 0 for c in ["LEAVE_DAYS"] + [f"LEAVE_{t}" for t in LSA_TYPES] if c not in summary.columns})
+
+    ghc = index.ghc_all
+    if {EMP_COL, "FINAL_GRADING"}.issubset(ghc.columns):
+        summary = summary.merge(ghc[[EMP_COL, "FINAL_GRADING"]].drop_duplicates(EMP_COL), on=EMP_COL, how="left")
+    details = index.details_all
+    if {EMP_COL, "FULL_NAME"}.issubset(details.columns):
+        names = dict(zip(details[EMP_COL].astype(str), details["FULL_NAME"]))
+        summary.insert(len(keys), "FULL_NAME", summary[EMP_COL].astype(str).map(names))
+
+    if store is not None and not summary.empty:
+        fy_start_year = pd.Timestamp(fy_start).year
+        pct_cols = {
+            f"{m}_PCT_{scope.upper()}": f"{label} %ile ({scope})"
+            for label, m in METRICS.items() for scope in SCOPES
+        }
+        # each driver's row at the depot the card is for; an index without DEPOT keys is one depot's
+        if "DEPOT" in summary.columns:
+            depots = summary["DEPOT"].to_numpy()
+        else:
+            depots = fy["ops"]["DEPOT"].iloc[0] if "DEPOT" in fy["ops"].columns else depot
+        ranked = store.fy_rows(fy_start_year, depots, summary[EMP_COL].to_numpy())
+        summary = summary.assign(**{label: ranked[col].to_numpy() for col, label in pct_cols.items()})
+
+    monthly = index.monthly_table(months)
+    if depot is not None and "DEPOT" in monthly.columns:
+        monthly = monthly[monthly["DEPOT"] == depot]
+    monthly = monthly[monthly.set_index(keys).index.isin(summary.set_index(keys).index)] if not summary.empty else monthly.iloc[0:0]
+    return summary.sort_values(keys, kind="mergesort").reset_index(drop=True), monthly.reset_index(drop=True)
+
+
+def _cards(summary, monthly, keys, fy_label):
+    groups = monthly.groupby(keys, sort=False).indices if not monthly.empty else {}
+    cards = []
+    for rec in summary.to_dict("records"):
+        key = tuple(rec[k] for k in keys)
+        rows = groups.get(key if len(keys) > 1 else key[0])
+        drv_monthly = monthly.iloc[rows].drop(columns=keys) if rows is not None else monthly.iloc[0:0].drop(columns=keys)
+        card = {"Financial Year": fy_label}
+        card.update({SUMMARY_LABELS.get(k, k): (round(v, 2) if isinstance(v, float) else v) for k, v in rec.items()})
+        name = "_".join(str(v) for v in key).replace("/", "-").replace(" ", "_")
+        title = f"Driver Scorecard - {rec[EMP_COL]} {rec.get('FULL_NAME') or ''} ({fy_label})"
+        cards.append((name, title, card, drv_monthly))
+    return cards
+
+
+def render_scorecards(summary, monthly, keys, fmt, fy_label, progress=None):
+    """
+    Render one file per driver in the process pool, CHUNK_SIZE drivers per task.
+    progress(done, total) is called as chunks finish. Returns [(file name, bytes)].
+    """
+    cards = _cards(summary, monthly, keys, fy_label)
+    chunks = [cards[i:i + CHUNK_SIZE] for i in range(0, len(cards), CHUNK_SIZE)]
+    files, done = [], 0
+    try:
+        futures = {_process_pool().submit(render_chunk, fmt, chunk): len(chunk) for chunk in chunks}
+        for future in as_completed(futures):
+            files.extend(future.result())
+            done += futures[future]
+            if progress:
+                progress(done, len(cards))
+    except (BrokenProcessPool, OSError) as e:
+        # a worker died or processes can't be started here: drop the pool (and its
+        # workers) and finish in-process; rendering errors themselves propagate
+        _discard_pool()
+        st.warning(f"⚠️ Rendering scorecards in the main process ({e}).")
+        files, done = [], 0
+        for chunk in chunks:
+            files.extend(render_chunk(fmt, chunk))
+            done += len(chunk)
+            if progress:
+                progress(done, len(cards))
+    return sorted(files)
+
+
+def build_export(summary, monthly, keys, choice, fy_label, progress=None):
+    """(bytes, file extension, mime) for the chosen EXPORT_FORMATS entry."""
+    fmt, ext = EXPORT_FORMATS[choice]
+    if fmt is None:
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf) as writer:
+            summary.rename(columns=SUMMARY_LABELS).to_excel(writer, sheet_name="Scorecards", index=False)
+            monthly.to_excel(writer, sheet_name="Monthly", index=False)
+        if progress:
+            progress(len(summary), len(summary))
+        return buf.getvalue(), ext, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("scorecards.csv", summary.rename(columns=SUMMARY_LABELS).to_csv(index=False))
+        zf.writestr("monthly.csv", monthly.to_csv(index=False))
+        for name, data in render_scorecards(summary, monthly, keys, fmt, fy_label, progress):
+            zf.writestr(f"drivers/{name}", data)
+    return buf.getvalue(), ext, "application/zip"
+
+
+def scorecard_export_ui(load_parts, fy_start, fy_end, months, fy_label, file_stem, store=None):
+    """
+    Export controls for the driver dashboards. load_parts() returns the (index, depot)
+    pairs to export (depot None for the whole index), as a list or a generator; it is
+    only called on Generate.
+    """
+    choice = st.selectbox("Format", list(EXPORT_FORMATS), key="scorecard_format")
+    if not st.button("📦 Generate scorecards", key="scorecard_generate"):
+        return
+
+    with st.spinner("Collecting driver aggregates…"):
+        try:
+            tables = [scorecard_tables(index, fy_start, fy_end, months, store, depot) for index, depot in load_parts()]
+        except QueryError:
+            return  # already reported by run_queries
+    summary = pd.concat([t[0] for t in tables], ignore_index=True) if tables else pd.DataFrame()
+    monthly = pd.concat([t[1] for t in tables], ignore_index=True) if tables else pd.DataFrame()
+    if summary.empty:
+        st.warning("⚠️ No driver operations in the selected financial year.")
+        return
+
+    keys = [c for c in ("DEPOT", EMP_COL) if c in summary.columns and c in monthly.columns] or [EMP_COL]
+    bar = st.progress(0, text=f"Rendering {len(summary)} scorecards…")
+
+    def progress(done, total):
+        bar.progress(done / total if total else 1.0, text=f"Rendered {done} / {total} scorecards")
+
+    try:
+        data, ext, mime = build_export(summary, monthly, keys, choice, fy_label, progress)
+    except ImportError as e:
+        st.error(f"❌ Excel export needs openpyxl or xlsxwriter installed ({e}). Choose a CSV bundle instead.")
+        return
+    st.success(f"✅ {len(summary)} driver scorecards ready.")
+    st.download_button(
+        label="⬇️ Download scorecards",
+        data=data,
+        file_name=f"{file_stem}_scorecards_{fy_label}.{ext}",
+        mime=mime,
+        key="scorecard_download",
+    )
@@ -5,6 +5,10 @@ import json
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 
 from db_config import get_session
+from derived_fields import apply_to_sheet, load_formulas, sheet_frame
+from input_range_edit import range_editor
+from input_store import delete_input_data, input_rows, upsert_input_data
+from input_validation import InputValidator
 from models import InputData  # ORM model
 
 
@@ -14,6 +18,8 @@ def edit():
         config = json.load(f)
 
     category_to_column = config.get("category_to_column", {})
+    formulas = load_formulas(config)
+    validator = InputValidator(config)
     editable_rows = list(category_to_column.keys())
 
     # --------------------------- ORM DATA LOADERS ----------------------------
@@ -40,155 +46,43 @@ def edit():
 
     # --------------------------- ORM DELETE ----------------------------
     def delete_data(depot, date_val):
-        with get_session() as db:
-            record = (
-                db.query(InputData)
-                .filter(InputData.depot_name == depot)
-                .filter(InputData.data_date == date_val)
-                .first()
-            )
-            if record:
-                db.delete(record)
-                db.commit()
-                return True
-            return False
+        # the deleted values are kept in input_data_history
+        return delete_input_data(depot, date_val)
 
     # --------------------------- RECALCULATIONS ----------------------------
-    def recalculate_fields(df):
-        df = df.copy()
-
-        def get_val(category):
-            try:
-                return float(df[df["Category"] == category]["Value"].values[0])
-            except:
-                return 0
-
-        def set_val(category, value):
-            df.loc[df["Category"] == category, "Value"] = round(value) if isinstance(value, (int, float)) else value
-
-        # --- Calculations ---
-        planned_services = get_val("Planned Services")
-        actual_services = get_val("Actual Services")
-        planned_km = get_val("Planned KM")
-        actual_km = get_val("Actual KM")
-        drivers_required = get_val("Drivers Required")
-        planned_schedules = get_val("Planned Schedules")
-        total_drivers = get_val("Total Drivers")
-        medically_unfit = get_val("Medically Unfit")
-        suspended_drivers = get_val("Suspended Drivers")
-
-        weekly_off = get_val("Weekly Off & National Off")
-        special_off = get_val("Special Off (Night Out/IC, Online)")
-        training_pme = get_val("Training, PME(medical)")
-        others = get_val("Others (SDI, DGT, LO, Parking,<br>Relief Van,Depot Spare,<br> Cargo, Releaving duty)")
-        leave_absent = get_val("Leave & Absent")
-        sick_leave = get_val("Sick Leave")
-        spot_absent = get_val("Spot Absent")
-        double_duty = get_val("Double Duty")
-        off_cancellation = get_val("Off Cancellation")
-        drivers_as_conductors = get_val("Drivers as Conductors")
-
-        available_drivers_1 = total_drivers - medically_unfit - suspended_drivers
-        set_val("Available Drivers-1", available_drivers_1)
-        set_val("% Available Drivers-1", (available_drivers_1 / total_drivers) * 100 if total_drivers else 0)
-
-        deductions = weekly_off + special_off + training_pme + others + leave_absent + sick_leave
-        available_drivers_2 = available_drivers_1 - deductions
-        set_val("Available Drivers-2", available_drivers_2)
-        set_val("% Available Drivers-2", (available_drivers_2 / total_drivers) * 100 if total_drivers else 0)
-
-        set_val("Service Variance", actual_services - planned_services)
-        set_val("KM Variance", actual_km - planned_km)
-        set_val("% Weekly Off & National Off", (weekly_off / total_drivers) * 100 if total_drivers else 0)
-        set_val("% Special Off (Night Out/IC, Online)", (special_off / total_drivers) * 100 if total_drivers else 0)
-        set_val("% Others", ((training_pme + others) / total_drivers) * 100 if total_drivers else 0)
-        set_val("% Leave & Absent", (leave_absent / total_drivers) * 100 if total_drivers else 0)
-        set_val("% Sick Leave", (sick_leave / total_drivers) * 100 if total_drivers else 0)
-
-        attending_drivers = available_drivers_2 - spot_absent
-        set_val("Attending Drivers", attending_drivers)
-        set_val("% Attending Drivers", (attending_drivers / total_drivers) * 100 if total_drivers else 0)
-        set_val("% Spot Absent", (spot_absent / total_drivers) * 100 if total_drivers else 0)
-
-        shortage = max(0, drivers_required - attending_drivers)
-        set_val("Driver shortage", shortage)
-        set_val("Driver schedule", (drivers_required / planned_schedules) if planned_schedules else 0)
-        set_val("% Double Duty", (double_duty / total_drivers) * 100 if total_drivers else 0)
-        set_val("% Off Cancellation", (off_cancellation / total_drivers) * 100 if total_drivers else 0)
-
-        drivers_on_duty = attending_drivers + double_duty + off_cancellation
-        set_val("Drivers on Duty", drivers_on_duty)
-        driver_for_bus_services = drivers_on_duty - drivers_as_conductors
-        set_val("Driver for Bus Services", driver_for_bus_services)
-        set_val("KM/Driver", (actual_km / driver_for_bus_services) if driver_for_bus_services else 0)
-        set_val("Service/Driver Check", driver_for_bus_services - actual_services)
-
-        mu_fields = ["Spondilitis", "Spinal Disc", "Vision/Color Blindness", "Neuro/Paralysis (Medical)", "Ortho"]
-        sl_fields = [
-            "Flu/Fever", "BP", "Orthopedic", "Heart", "Weakness", "Eye", "Accident/Injuries",
-            "Neuro/Paralysis (Sick Leave)", "Piles", "Diabetes", "Thyroid", "Gas", "Dental",
-            "Ear", "Skin/Allergy", "General Surgery", "Obesity", "Cancer"
-        ]
-
-        total_mu = sum(get_val(cat) for cat in mu_fields)
-        set_val("Total Drivers (MU Reasons)", total_mu)
-        set_val("Diff (MU Reasons)", total_mu - medically_unfit)
-
-        total_sl = sum(get_val(cat) for cat in sl_fields)
-        set_val("Total Drivers (SL Reasons)", total_sl)
-        set_val("Diff (SL Reasons)", total_sl - sick_leave)
+    derived_cols = [col for cat, col in category_to_column.items() if cat in formulas]
 
+    def recalculate_fields(df):
+        df = apply_to_sheet(df, ["Value"], formulas)
+        # blank calculated rows (a ratio over 0) show as 0
+        derived = df["Category"].isin(formulas)
+        df.loc[derived, "Value"] = df.loc[derived, "Value"].fillna(0)
         return df
 
     # --------------------------- VALIDATION ----------------------------
-    def validate(df):
-        errors = []
-        allow_negative = {"Service Variance", "KM Variance", "Service/Driver Check"}
-        for _, row in df.iterrows():
-            cat, val = row["Category"], row["Value"]
-            try:
-                val = int(float(val))
-            except:
-                errors.append(f"Invalid number: {cat}")
-                continue
-            if val < 0 and cat not in allow_negative:
-                errors.append(f"Negative value not allowed: {cat}")
-        return errors
+    def validate(df, date_val):
+        # same rules as the depot input sheet (config.json validation_rules / special_validations)
+        frame = sheet_frame(df, ["Value"]).set_axis([str(date_val)])
+        return validator.messages(validator.check(frame))
 
     # --------------------------- ORM UPDATE ----------------------------
     def update_data(depot, date_val, df):
-        with get_session() as db:
-            record = (
-                db.query(InputData)
-                .filter(InputData.depot_name == depot)
-                .filter(InputData.data_date == date_val)
-                .first()
-            )
-
-            data_dict = {}
-            for _, row in df.iterrows():
-                cat = row["Category"]
-                if cat in category_to_column:
-                    col = category_to_column[cat]
-                    try:
-                        data_dict[col] = int(float(row["Value"]))
-                    except:
-                        data_dict[col] = 0
-
-            if record:
-                for k, v in data_dict.items():
-                    setattr(record, k, v)
-            else:
-                record = InputData(depot_name=depot, data_date=date_val, **data_dict)
-                db.add(record)
-
-            db.commit()
-        return True
+        # one upsert of the whole record (inserted when it does not exist yet)
+        frame = sheet_frame(df, ["Value"]).set_axis([date_val])
+        rows = input_rows(frame, depot, category_to_column, formulas)
+        # save what the grid shows: blank calculated rows (a ratio over 0) as 0, not NULL
+        rows = rows.assign(**{c: rows[c].fillna(0) for c in derived_cols if c in rows.columns})
+        return upsert_input_data(rows) == 1
 
     # --------------------------- UI ----------------------------
     st.title("🛠 Edit Saved Depot Data")
 
     depots = get_all_depots()
+    mode = st.radio("Edit", ["Single record", "Range (many depots / dates)"], horizontal=True, key="edit_mode")
+    if mode != "Single record":
+        range_editor(depots, config, formulas, validator)
+        return
+
     selected_depot = st.selectbox("Select Depot", depots)
     selected_date = st.date_input("Select Date", value=date.today())
 
@@ -225,19 +119,22 @@ def edit():
         # 💾 Save Button
         with col1:
             if st.button("💾 Save Changes"):
-                errors = validate(edited_df)
+                errors = validate(edited_df, selected_date)
                 if errors:
                     for e in errors:
                         st.error(e)
                 else:
-                    success = update_data(selected_depot, selected_date, edited_df)
+                    try:
+                        success = update_data(selected_depot, selected_date, edited_df)
+                    except Exception as e:
+                        st.error(f"Error saving data: {e}")
+                        success = None
                     if success:
                         st.success("✅ Data updated successfully!")
-                        refreshed_df = fetch_data(selected_depot, selected_date)
-                        if not refreshed_df.empty:
-                            st.markdown("### ✅ Saved Data Preview")
-                            st.dataframe(refreshed_df, use_container_width=True)
-                    else:
+                        st.session_state.df = edited_df.copy()
+                        st.markdown("### ✅ Saved Data Preview")
+                        st.dataframe(edited_df, use_container_width=True)
+                    elif success is not None:
                         st.error("❌ Failed to update data.")
 
         # 🗑️ Delete Button with Confirmation
@@ -7,7 +7,8 @@ from datetime import timedelta, date
 
 # ✅ ORM imports
 from db_config import get_session
-from models import InputData, TSAdmin, User
+from models import TSAdmin, User
+from ratio_cube import ratio_cube
 
 
 # Load config
@@ -49,36 +50,23 @@ def get_depot_settings(_conn=None):
         return {}
 
 
-def load_data(depot_settings, _conn=None):
-    """Load input_data from ORM instead of SQL."""
+# --- Ratio store ---
+# The 8 ratio lines of one depot are read from the shared per-depot prefix
+# sums (ratio_cube): each day, month or year on the chart is two lookups, and
+# depots saved since the store was built are reloaded on access.
+def load_ratio_store():
     try:
-        with get_session() as db:
-            rows = db.query(InputData).all()
-            df = pd.DataFrame([{k: v for k, v in row.__dict__.items() if not k.startswith("_")} for row in rows])
+        return ratio_cube()
     except Exception as e:
         st.error(f"Error fetching data from input_data table: {e}")
         st.stop()
 
-    if df.empty:
-        return pd.DataFrame()
-
-    if 'data_date' in df.columns:
-        df.rename(columns={'data_date': 'Date'}, inplace=True)
-    if 'depot_name' in df.columns:
-        df.rename(columns={'depot_name': 'Depot'}, inplace=True)
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    df.dropna(subset=['Date'], inplace=True)
-    df.columns = df.columns.str.strip()
-
-    if 'Category' not in df.columns:
-        df['Category'] = df['Depot'].map(depot_settings).fillna('Unknown')
-    return df
-
 
 # --- MAIN FUNCTION ---
 def eight_ratios_DM():
     # --- ORM replaces MySQL ---
     mysql_conn = get_connection()
+    cube = load_ratio_store()
 
     if "userid" in st.session_state and st.session_state.userid != "admin":
         st.session_state.depot = get_user_depot(mysql_conn, st.session_state.userid)
@@ -89,12 +77,6 @@ def eight_ratios_DM():
         st.session_state.depot = ""
 
     depot_settings = get_depot_settings(mysql_conn)
-    df = load_data(depot_settings, mysql_conn)
-
-    # --- KEEPING REST OF YOUR CODE UNCHANGED ---
-    if df.empty:
-        st.error("No data loaded from the database. Please ensure your input_data table has data and your DB_CONFIG is correct.")
-        st.stop()
 
     # Define benchmarks for Urban and Rural categories
     benchmarks = {
@@ -133,8 +115,8 @@ def eight_ratios_DM():
         selected_depot = None
 
         if st.session_state.userid == "admin":
-            if not df.empty and 'Depot' in df.columns:
-                all_depots_available = sorted(df['Depot'].unique().tolist())
+            all_depots_available = sorted(cube.depots_with_data())
+            if all_depots_available:
                 if st.session_state.depot in all_depots_available:
                     default_index = all_depots_available.index(st.session_state.depot)
                 else:
@@ -151,6 +133,12 @@ def eight_ratios_DM():
     with col2:
         time_period = st.selectbox("Select Time Period", ["Daily", "Monthly", "Year"])
 
+    bounds = cube.bounds([selected_depot]) if selected_depot else None
+    if bounds is None:
+        st.error("No data loaded from the database. Please ensure your input_data table has data and your DB_CONFIG is correct.")
+        st.stop()
+    min_date_available, max_date_available = bounds
+
     # Determine category for benchmarks
     effective_category_for_benchmarks = 'Urban'
     depot_display_category = "N/A"
@@ -161,85 +149,63 @@ def eight_ratios_DM():
         if depot_category_from_ts_admin in benchmarks:
             effective_category_for_benchmarks = depot_category_from_ts_admin
     elif selected_depot:
-        if not df.empty and 'Depot' in df.columns and 'Category' in df.columns:
-            depot_category_from_df_series = df[df['Depot'] == selected_depot]['Category']
-            if not depot_category_from_df_series.empty:
-                depot_category_from_df = depot_category_from_df_series.iloc[0]
-                depot_display_category = depot_category_from_df
-                if depot_category_from_df in benchmarks:
-                    effective_category_for_benchmarks = depot_category_from_df
-            else:
-                depot_display_category = 'Unknown'
-        else:
-            depot_display_category = 'Unknown'
+        depot_display_category = 'Unknown'
 
     # --- Date Range Filters ---
     start_date_filter = None
     end_date_filter = None
 
     if time_period == "Daily":
-        if not df.empty and 'Date' in df.columns:
-            max_date_available = df['Date'].max()
-            default_daily_end_date = max_date_available.date()
-            default_daily_start_date = (max_date_available - timedelta(days=29)).date()
-
-            col_daily_from, col_daily_to = st.columns(2)
-            with col_daily_from:
-                daily_from_date = st.date_input("From Date", value=default_daily_start_date,
-                                                min_value=df['Date'].min().date(),
-                                                max_value=default_daily_end_date)
-            with col_daily_to:
-                daily_to_date = st.date_input("To Date", value=default_daily_end_date,
-                                              min_value=daily_from_date,
-                                              max_value=default_daily_end_date)
-            start_date_filter = pd.to_datetime(daily_from_date)
-            end_date_filter = pd.to_datetime(daily_to_date)
-        else:
-            st.info("Date data not available for Daily filter.")
+        default_daily_end_date = max_date_available.date()
+        default_daily_start_date = (max_date_available - timedelta(days=29)).date()
+
+        col_daily_from, col_daily_to = st.columns(2)
+        with col_daily_from:
+            daily_from_date = st.date_input("From Date", value=max(default_daily_start_date, min_date_available.date()),
+                                            min_value=min_date_available.date(),
+                                            max_value=default_daily_end_date)
+        with col_daily_to:
+            daily_to_date = st.date_input("To Date", value=default_daily_end_date,
+                                          min_value=daily_from_date,
+                                          max_value=default_daily_end_date)
+        start_date_filter = pd.to_datetime(daily_from_date)
+        end_date_filter = pd.to_datetime(daily_to_date)
 
     elif time_period == "Monthly":
         st.markdown("<h3 style='font-size: 1.4em;'>Month Range (Monthly)</h3>", unsafe_allow_html=True)
-        if not df.empty and 'Date' in df.columns:
-            min_year = df['Date'].min().year
-            max_year = df['Date'].max().year
-            all_years = sorted(list(set(range(min_year, max_year + 1)).union({date.today().year})))
-            all_months = list(calendar.month_name)[1:]
-            month_to_num = {month: i + 1 for i, month in enumerate(all_months)}
-            col_from, col_to = st.columns(2)
-            with col_from:
-                from_month = st.selectbox("From Month", all_months, index=0)
-                from_year = st.selectbox("From Year", all_years, index=0)
-            with col_to:
-                to_month = st.selectbox("To Month", all_months, index=len(all_months) - 1)
-                to_year = st.selectbox("To Year", all_years, index=len(all_years) - 1)
-            start_date_filter = pd.to_datetime(f"{from_year}-{month_to_num[from_month]}-01")
-            end_date_filter = pd.to_datetime(f"{to_year}-{month_to_num[to_month]}-01") + pd.DateOffset(months=1) - pd.DateOffset(days=1)
-        else:
-            st.info("Date data not available for Monthly filter.")
+        min_year = min_date_available.year
+        max_year = max_date_available.year
+        all_years = sorted(list(set(range(min_year, max_year + 1)).union({date.today().year})))
+        all_months = list(calendar.month_name)[1:]
+        month_to_num = {month: i + 1 for i, month in enumerate(all_months)}
+        col_from, col_to = st.columns(2)
+        with col_from:
+            from_month = st.selectbox("From Month", all_months, index=0)
+            from_year = st.selectbox("From Year", all_years, index=0)
+        with col_to:
+            to_month = st.selectbox("To Month", all_months, index=len(all_months) - 1)
+            to_year = st.selectbox("To Year", all_years, index=len(all_years) - 1)
+        start_date_filter = pd.to_datetime(f"{from_year}-{month_to_num[from_month]}-01")
+        end_date_filter = pd.to_datetime(f"{to_year}-{month_to_num[to_month]}-01") + pd.DateOffset(months=1) - pd.DateOffset(days=1)
 
     elif time_period == "Year":
-        if not df.empty and 'Date' in df.columns:
-            years = sorted(df['Date'].dt.year.unique())
-            col_from, col_to = st.columns(2)
-            with col_from:
-                from_year = st.selectbox("From Year", years, index=0)
-            with col_to:
-                to_year = st.selectbox("To Year", years, index=len(years) - 1)
-            start_date_filter = pd.to_datetime(f"{from_year}-01-01")
-            end_date_filter = pd.to_datetime(f"{to_year}-12-31")
-        else:
-            st.info("Date data not available for Year filter.")
+        years = list(range(min_date_available.year, max_date_available.year + 1))
+        col_from, col_to = st.columns(2)
+        with col_from:
+            from_year = st.selectbox("From Year", years, index=0)
+        with col_to:
+            to_year = st.selectbox("To Year", years, index=len(years) - 1)
+        start_date_filter = pd.to_datetime(f"{from_year}-01-01")
+        end_date_filter = pd.to_datetime(f"{to_year}-12-31")
 
     st.markdown("---")
 
     st.markdown(f"### Data for: *{selected_depot if selected_depot else 'N/A'}* Depot ({depot_display_category})")
     st.markdown(f"*Time Period:* {time_period}")
 
-    filtered_df = df.copy()
-    if selected_depot and 'Depot' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['Depot'] == selected_depot]
-    if start_date_filter is not None and end_date_filter is not None and 'Date' in filtered_df.columns:
-        filtered_df = filtered_df[(filtered_df['Date'] >= start_date_filter) & (filtered_df['Date'] <= end_date_filter)]
+    # per-period means of the selected depot, from the ratio store
+    period = {"Daily": "Daily", "Monthly": "Monthly", "Year": "Yearly"}[time_period]
+    filtered_df = cube.periods([selected_depot], start_date_filter, end_date_filter, period)
 
     if filtered_df.empty:
         st.warning("NO DATA FOUND FOR SELECTED FILTERS.")
@@ -255,17 +221,7 @@ def eight_ratios_DM():
                 st.warning(f"Column '{actual_column}' not found in data. Skipping.")
                 continue
 
-            aggregated_df = filtered_df.copy()
-            if time_period == "Daily":
-                group_cols = ['Depot', 'Date']
-                aggregated_df = aggregated_df.groupby(group_cols).agg({actual_column: 'mean'}).reset_index()
-            elif time_period == "Monthly":
-                group_cols = ['Depot', pd.Grouper(key='Date', freq='MS')]
-                aggregated_df = aggregated_df.groupby(group_cols).agg({actual_column: 'mean'}).reset_index()
-            elif time_period == "Year":
-                group_cols = ['Depot', filtered_df['Date'].dt.year.rename('Year')]
-                aggregated_df = filtered_df.groupby(group_cols).agg({actual_column: 'mean'}).reset_index()
-                aggregated_df['Date'] = pd.to_datetime(aggregated_df['Year'], format='%Y')
+            aggregated_df = filtered_df[['Depot', 'Date', actual_column]]
 
             if aggregated_df.empty:
                 st.info(f"No data for {ratio_display_name}")
@@ -6,7 +6,8 @@ import calendar
 
 # ✅ ORM imports
 from db_config import get_session
-from models import InputData, TSAdmin, User
+from models import TSAdmin, User
+from ratio_cube import ratio_cube
 
 # --- Load config.json ---
 try:
@@ -42,30 +43,23 @@ def get_region_for_user(_conn, user_id):
         return None
 
 
-# --- Load Data for Region (ORM version) ---
+# --- Load Data for Region (ratio store) ---
 def load_data(_conn, user_region):
-    df = pd.DataFrame()
+    """({depot: category} of the region's depots with input data, the shared ratio store)."""
     try:
         with get_session() as db:
             rows = (
-                db.query(InputData, TSAdmin.category)
-                .join(TSAdmin, InputData.depot_name == TSAdmin.depot_name)
+                db.query(TSAdmin.depot_name, TSAdmin.category)
                 .filter(TSAdmin.region == user_region)
                 .all()
             )
-            data = []
-            for input_row, category in rows:
-                row_dict = {k: v for k, v in input_row.__dict__.items() if not k.startswith("_")}
-                row_dict["category"] = category
-                data.append(row_dict)
-            df = pd.DataFrame(data)
-
-        df.rename(columns={"data_date": "Date", "depot_name": "Depot"}, inplace=True)
-        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+        cube = ratio_cube()
     except Exception as e:
         st.error(f"Error loading data: {e}")
         st.stop()
-    return df
+    present = set(cube.depots_with_data())
+    categories = {depot: category for depot, category in rows if depot in present}
+    return dict(sorted(categories.items())), cube
 
 
 # --- Main App ---
@@ -79,8 +73,9 @@ def eight_ratios_RM():
         st.stop()
 
     # --- Load region data ---
-    df = load_data(conn, selected_region)
-    if df.empty:
+    categories, cube = load_data(conn, selected_region)
+    region_depots = list(categories)
+    if not region_depots:
         st.warning(f"No data found for region {selected_region}.")
         st.stop()
 
@@ -90,7 +85,11 @@ def eight_ratios_RM():
     # --- Frequency Selector ---
     freq_option = st.selectbox("Select Frequency", ["Daily", "Monthly", "Yearly"])
 
-    min_date, max_date = df["Date"].min(), df["Date"].max()
+    bounds = cube.bounds(region_depots)
+    if bounds is None:
+        st.warning(f"No data found for region {selected_region}.")
+        st.stop()
+    min_date, max_date = bounds
 
     if freq_option == "Daily":
         col_from, col_to = st.columns(2)
@@ -127,27 +126,28 @@ def eight_ratios_RM():
         start_date = pd.to_datetime(f"{from_year}-01-01")
         end_date = pd.to_datetime(f"{to_year}-12-31")
 
-    # --- Filter Data ---
-    df_region = df[(df["Date"] >= pd.to_datetime(start_date)) & (df["Date"] <= pd.to_datetime(end_date))]
+    # --- Depot totals over the range (two lookups per depot) ---
+    stats = cube.totals(start_date, end_date, region_depots)
+    stats = stats[stats["days"] > 0]
 
     st.markdown(f"## Region: {selected_region}")
     st.markdown("---")
 
-    if df_region.empty:
+    if stats.empty:
         st.warning("No data in selected range.")
     else:
         # Loop through each KPI ratio
         for selected_ratio_key in benchmarks["Urban"].keys():
             actual_column = config["category_to_column"].get(selected_ratio_key)
-            if actual_column not in df_region.columns:
+            if actual_column not in stats.columns:
                 continue
 
-            # Aggregate depot averages
-            agg_df = df_region.groupby("Depot")[actual_column].mean().reset_index()
+            # Depot averages
+            agg_df = stats[[actual_column]].reset_index()
 
             # Benchmark (use category of first depot)
             first_depot = agg_df["Depot"].iloc[0]
-            depot_category = df_region[df_region["Depot"] == first_depot]["category"].iloc[0]
+            depot_category = categories[first_depot]
             benchmark_val = benchmarks.get(depot_category, benchmarks["Urban"]).get(selected_ratio_key, 0)
 
             # Region Average
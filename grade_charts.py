@@ -0,0 +1,95 @@
+import altair as alt
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------------
+# 📦 Health-grade box + swarm charts, reduced server-side
+# ----------------------------------------------------------------------
+# The grade charts used to ship one row per driver to the browser and let
+# Vega-Lite compute the box plot. Now the quartiles / whiskers are computed
+# here (one row per grade) and the swarm is a deterministic, value-stratified
+# sample per grade that always includes the selected driver, so the chart
+# payload stays bounded however many drivers the depot has.
+
+GRADE_COL = "FINAL_GRADING"
+EMP_COL = "EMPLOYEE_ID"
+# swarm points drawn per grade (the selected driver comes on top)
+MAX_POINTS_PER_GRADE = 150
+BOX_COLS = [GRADE_COL, "LOWER", "Q1", "MEDIAN", "Q3", "UPPER", "COUNT"]
+
+
+def grade_quantiles(df, value_col):
+    """
+    One row per grade: Q1 / MEDIAN / Q3 and the 1.5 x IQR whiskers (clamped to the
+    data, as Vega-Lite's boxplot draws them) plus the driver COUNT.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=BOX_COLS)
+    data = df[[GRADE_COL, value_col]].assign(**{value_col: pd.to_numeric(df[value_col], errors="coerce")}).dropna()
+    grouped = data.groupby(GRADE_COL, observed=True)[value_col]
+    box = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    box.columns = ["Q1", "MEDIAN", "Q3"]
+    iqr = box["Q3"] - box["Q1"]
+    data = data.join((box["Q1"] - 1.5 * iqr).rename("_LO"), on=GRADE_COL).join((box["Q3"] + 1.5 * iqr).rename("_HI"), on=GRADE_COL)
+    inside = data[data[value_col].between(data["_LO"], data["_HI"])].groupby(GRADE_COL, observed=True)[value_col]
+    box = box.assign(LOWER=inside.min(), UPPER=inside.max(), COUNT=grouped.size())
+    return box.reset_index()[BOX_COLS]
+
+
+def swarm_sample(df, value_col, selected=None, per_grade=MAX_POINTS_PER_GRADE):
+    """
+    At most per_grade rows per grade, evenly spaced through the grade's sorted
+    values (so the minimum, maximum and shape survive), plus the selected driver's rows.
+    The same data always yields the same sample.
+    """
+    if df.empty:
+        return df
+    data = df.sort_values([GRADE_COL, value_col, EMP_COL], kind="mergesort")
+    pos = data.groupby(GRADE_COL, observed=True).cumcount().to_numpy()
+    size = data.groupby(GRADE_COL, observed=True)[value_col].transform("size").to_numpy()
+    # keep the first row at or past each of per_grade evenly spaced positions
+    step = np.maximum(size - 1, 1) / max(per_grade - 1, 1)
+    keep = (size <= per_grade) | (np.floor(pos / step) != np.floor((pos - 1) / step)) | (pos == size - 1)
+    if selected is not None:
+        keep |= (data[EMP_COL] == selected).to_numpy()
+    return data[keep]
+
+
+def grade_box_swarm(df, value_col, selected, title, y_title=None, tooltip_title=None, highlight_stroke=False):
+    """Box plot per health grade over a sampled swarm, with the selected driver highlighted."""
+    box = grade_quantiles(df, value_col)
+    points = swarm_sample(df, value_col, selected)[[EMP_COL, GRADE_COL, value_col]]
+    x = alt.X(f"{GRADE_COL}:N", title="Health Grade", axis=alt.Axis(labelAngle=0))
+
+    base = alt.Chart(box).encode(x=x)
+    whiskers = base.mark_rule().encode(y=alt.Y("LOWER:Q", title=y_title), y2="UPPER:Q")
+    boxes = base.mark_bar(size=20).encode(
+        y="Q1:Q", y2="Q3:Q",
+        tooltip=[
+            alt.Tooltip(f"{GRADE_COL}:N", title="Health Grade"),
+            alt.Tooltip("COUNT:Q", title="Drivers"),
+            alt.Tooltip("LOWER:Q", title="Lower whisker", format=",.2f"),
+            alt.Tooltip("Q1:Q", format=",.2f"),
+            alt.Tooltip("MEDIAN:Q", title="Median", format=",.2f"),
+            alt.Tooltip("Q3:Q", format=",.2f"),
+            alt.Tooltip("UPPER:Q", title="Upper whisker", format=",.2f"),
+        ],
+    )
+    medians = base.mark_tick(color="white", size=20).encode(y="MEDIAN:Q")
+
+    swarm = alt.Chart(points).mark_point(color="red", size=30).encode(
+        x=x,
+        y=alt.Y(f"{value_col}:Q", title=y_title),
+        tooltip=[
+            alt.Tooltip(EMP_COL, title="Employee ID"),
+            alt.Tooltip(value_col, title=tooltip_title or value_col),
+        ],
+    )
+    stroke = {"stroke": "black", "strokeWidth": 2} if highlight_stroke else {}
+    highlighted = alt.Chart(points[points[EMP_COL] == selected]).mark_point(
+        color="yellow", size=200, filled=True, **stroke
+    ).encode(x=x, y=f"{value_col}:Q")
+
+    return (whiskers + boxes + medians + swarm + highlighted).properties(
+        title=alt.TitleParams(text=title, anchor="middle")
+    )
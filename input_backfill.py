@@ -0,0 +1,166 @@
+import json
+from datetime import date, timedelta
+
+import pandas as pd
+import streamlit as st
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
+from st_aggrid.shared import JsCode
+
+from derived_fields import js_value_getter, sheet_frame
+from input_store import input_rows, upsert_input_data
+
+# ----------------------------------------------------------------------
+# 🗓️ Backfill: a range of missing dates in one submit
+# ----------------------------------------------------------------------
+# A depot catching up after an outage enters (or uploads) every missing day
+# at once. The whole range is validated in one vectorized pass and written
+# with a single multi-row upsert in one transaction, so a month of catch-up
+# is one submit instead of one save and rerun per day.
+
+MAX_BACKFILL_DAYS = 62
+DATE_COL = "data_date"
+MAX_ERRORS_SHOWN = 50
+
+
+def read_upload(file, dates, category_to_column):
+    """
+    An uploaded CSV / Excel sheet (one row per data_date, columns labelled by
+    category or DB column) as a frame indexed by the backfill dates.
+    """
+    df = pd.read_excel(file) if file.name.lower().endswith((".xlsx", ".xls")) else pd.read_csv(file)
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.rename(columns={col: cat for cat, col in category_to_column.items()})
+    if DATE_COL not in df.columns:
+        raise ValueError(f"the file needs a '{DATE_COL}' column")
+    # YYYY-MM-DD only (Excel date cells come in as dates): a day-first or US date
+    # would otherwise be guessed at and could land on the wrong day
+    parsed = pd.to_datetime(df[DATE_COL], format="%Y-%m-%d", errors="coerce")
+    if parsed.isna().any():
+        bad = df.loc[parsed.isna(), DATE_COL].astype(str)
+        raise ValueError(
+            f"'{DATE_COL}' must be a date or YYYY-MM-DD text; {len(bad)} row(s) are not: {', '.join(bad.head(5))}"
+        )
+    df[DATE_COL] = parsed.dt.strftime("%Y-%m-%d")
+    if df[DATE_COL].duplicated().any():
+        raise ValueError(f"duplicate dates: {', '.join(df.loc[df[DATE_COL].duplicated(), DATE_COL].unique())}")
+    outside = sorted(set(df[DATE_COL]) - set(dates))
+    if outside:
+        raise ValueError(f"dates outside the backfill range: {', '.join(outside)}")
+    # dates missing from the file come back as blank rows (reported as empty)
+    return df.set_index(DATE_COL).reindex(dates)
+
+
+def template_csv(dates, editable_rows):
+    return pd.DataFrame({DATE_COL: dates, **{cat: "" for cat in editable_rows}}).to_csv(index=False)
+
+
+def _backfill_grid(dates, config, formulas):
+    """Category x date grid for the range; returns the edited sheet on submit, else None."""
+    editable_rows = config.get("editable_rows", [])
+    sheet = pd.DataFrame({"Category": config.get("category_rows", [])})
+    for col in dates:
+        sheet[col] = ""
+
+    gb = GridOptionsBuilder.from_dataframe(sheet)
+    gb.configure_default_column(resizable=False, sortable=False)
+    gb.configure_grid_options(
+        getRowId=JsCode("function(params) { return params.data.Category; }").js_code,
+        suppressMovableColumns=True,
+        # derived rows read other rows: redraw the edited date column
+        onCellValueChanged=JsCode("""
+            function(params) {
+                params.api.refreshCells({columns: [params.column.colId], force: true});
+            }
+        """).js_code,
+    )
+    gb.configure_column("Category", pinned="left", editable=False, width=260)
+    editable_js = JsCode(f"""
+        function(params) {{
+            return {json.dumps(editable_rows)}.includes(params.data.Category);
+        }}
+    """)
+    for col in dates:
+        gb.configure_column(
+            field=col,
+            header_name=pd.to_datetime(col).strftime("%d-%b-%y"),
+            editable=editable_js,
+            width=80,
+            valueGetter=JsCode(js_value_getter(formulas)).js_code,
+        )
+
+    with st.form("backfill_form"):
+        grid = AgGrid(
+            sheet,
+            gridOptions=gb.build(),
+            update_mode=GridUpdateMode.VALUE_CHANGED,
+            theme="material",
+            height=min(30 * len(sheet) + 45, 900),
+            allow_unsafe_jscode=True,
+            data_return_mode="AS_INPUT",
+            key=f"backfill_grid_{dates[0]}_{dates[-1]}",
+        )
+        submitted = st.form_submit_button("💾 Submit backfill")
+    return pd.DataFrame(grid["data"]) if submitted else None
+
+
+def backfill_sheet(depot, first_date, config, formulas, validator):
+    """Backfill mode of the depot input sheet: every date from first_date to the chosen end in one submit."""
+    st.header("BACKFILL MISSING DATES")
+    today = date.today()
+    if first_date > today:
+        st.info(f"✅ {depot} is up to date: nothing to backfill.")
+        return
+
+    last_allowed = min(today, first_date + timedelta(days=MAX_BACKFILL_DAYS - 1))
+    end_date = st.date_input(
+        f"📅 Fill from {first_date:%d %b %y} up to", value=last_allowed,
+        min_value=first_date, max_value=last_allowed, key="backfill_end",
+    )
+    dates = pd.date_range(first_date, end_date).strftime("%Y-%m-%d").tolist()
+    st.caption(f"{len(dates)} day(s); at most {MAX_BACKFILL_DAYS} per submit.")
+
+    category_to_column = config.get("category_to_column", {})
+    source = st.radio("Enter data", ["In the grid", "Upload CSV / Excel"], horizontal=True, key="backfill_source")
+    if source == "Upload CSV / Excel":
+        st.download_button(
+            "📄 Download template",
+            data=template_csv(dates, config.get("editable_rows", [])),
+            file_name=f"{depot}_backfill_{dates[0]}_{dates[-1]}.csv",
+            mime="text/csv",
+        )
+        file = st.file_uploader("📁 Upload the filled template", type=["csv", "xlsx"], key="backfill_file")
+        if file is None:
+            return
+        try:
+            frame = read_upload(file, dates, category_to_column)
+        except ImportError as e:
+            st.error(f"❌ Excel upload needs openpyxl installed ({e}). Upload a CSV instead.")
+            return
+        except Exception as e:
+            st.error(f"❌ Could not read the file: {e}")
+            return
+        st.dataframe(frame, use_container_width=True)
+        if not st.button("💾 Submit backfill", key="backfill_upload_submit"):
+            return
+    else:
+        sheet = _backfill_grid(dates, config, formulas)
+        if sheet is None:
+            return
+        frame = sheet_frame(sheet, dates)
+
+    errors = validator.check(frame)
+    if not errors.empty:
+        messages = validator.messages(errors)
+        for e in messages[:MAX_ERRORS_SHOWN]:
+            st.error(e)
+        if len(messages) > MAX_ERRORS_SHOWN:
+            st.error(f"❌ … and {len(messages) - MAX_ERRORS_SHOWN} more.")
+        st.warning(f"⚠️ {errors['ROW'].nunique()} of {len(dates)} day(s) need corrections; nothing was saved.")
+        return
+
+    try:
+        saved = upsert_input_data(input_rows(frame, depot, category_to_column, formulas))
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
+        return
+    st.success(f"✅ Saved {saved} day(s) for {depot}: {dates[0]} to {dates[-1]}")
@@ -0,0 +1,246 @@
+import os
+import tempfile
+from datetime import date, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from db_config import engine, get_session
+from derived_fields import recompute_columns
+from models import TSAdmin
+
+# ----------------------------------------------------------------------
+# 📤 Streaming export of input_data
+# ----------------------------------------------------------------------
+# Any set of depots and dates is read through a server-side cursor
+# (stream_results) CHUNK_ROWS rows at a time and each chunk is appended to a
+# file on disk (CSV, write-only XLSX, Parquet row groups), so a year of all
+# depots never sits in the Streamlit process as one frame. Columns are
+# labelled by category; derived rows are either recomputed from the exported
+# inputs or left out.
+#
+# st.download_button only serves bytes held in memory, so the finished file
+# is read back whole. MAX_EXPORT_ROWS bounds that: 100,000 rows (about three
+# years of every depot) is a CSV of roughly 40 MB; larger ranges are refused
+# before anything is read, and have to be exported in parts.
+
+CHUNK_ROWS = 5000
+MAX_EXPORT_ROWS = 100_000
+KEY_LABELS = {"depot_name": "Depot", "data_date": "Date"}
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# export choice -> (file extension, mime)
+EXPORT_FORMATS = {
+    "CSV (.csv)": ("csv", "text/csv"),
+    "Excel workbook (.xlsx)": ("xlsx", XLSX_MIME),
+    "Parquet (.parquet)": ("parquet", "application/octet-stream"),
+}
+
+
+def depot_scope(region=None, zone=None):
+    """{region: [depots]} from TS_ADMIN, limited to one region or zone (every depot when neither)."""
+    with get_session() as db:
+        query = db.query(TSAdmin.region, TSAdmin.depot_name).distinct()
+        if region is not None:
+            query = query.filter(TSAdmin.region == region)
+        if zone is not None:
+            query = query.filter(TSAdmin.zone == zone)
+        rows = query.order_by(TSAdmin.region, TSAdmin.depot_name).all()
+    scope = {}
+    for reg, depot in rows:
+        scope.setdefault(reg or "Unassigned", []).append(depot)
+    return scope
+
+
+def export_columns(category_to_column, formulas, include_derived):
+    """(DB column, header) pairs of the export, in category_to_column order."""
+    cols = list(KEY_LABELS.items())
+    for cat, col in category_to_column.items():
+        if include_derived or cat not in formulas:
+            cols.append((col, cat))
+    return cols
+
+
+def _range_filter(depots):
+    placeholders = ",".join(["%s"] * len(depots))
+    return f"depot_name IN ({placeholders}) AND data_date BETWEEN %s AND %s"
+
+
+def count_rows(depots, start, end):
+    query = f"SELECT COUNT(*) FROM input_data WHERE {_range_filter(depots)}"
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(query, (*depots, start, end)).scalar() or 0
+
+
+def iter_input_chunks(depots, start, end, category_to_column, formulas, include_derived=True):
+    """
+    input_data for depots between start and end (ordered by depot and date) as
+    category-labelled frames of at most CHUNK_ROWS rows, streamed from a
+    server-side cursor. With include_derived the derived columns are recomputed
+    from the chunk's inputs, otherwise they are not exported.
+    """
+    columns = export_columns(category_to_column, formulas, include_derived)
+    select = ", ".join(f"`{col}`" for col, _ in columns)
+    query = f"SELECT {select} FROM input_data WHERE {_range_filter(depots)} ORDER BY depot_name, data_date"
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(query, conn, params=(*depots, start, end), chunksize=CHUNK_ROWS):
+            if include_derived:
+                chunk = recompute_columns(chunk, category_to_column, formulas)
+            yield chunk.rename(columns=dict(columns))
+
+
+# ---------------- Chunked writers ----------------
+def _write_csv(path, chunks):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=i == 0, index=False)
+
+
+def _write_xlsx(path, chunks, headers):
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+    if xlsxwriter is not None:
+        # constant_memory flushes each row to disk once the next one starts
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "default_date_format": "yyyy-mm-dd"})
+        sheet = workbook.add_worksheet("input_data")
+        sheet.write_row(0, 0, headers)
+        row = 1
+        for chunk in chunks:
+            for rec in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+                sheet.write_row(row, 0, rec)
+                row += 1
+        workbook.close()
+        return
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("input_data")
+    sheet.append(headers)
+    for chunk in chunks:
+        for rec in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append(rec)
+    workbook.save(path)
+
+
+def _write_parquet(path, chunks, headers):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # fixed schema: a chunk whose column happens to be all whole numbers or all NULL must not change its type
+    schema = pa.schema(
+        [(headers[0], pa.string()), (headers[1], pa.date32())] + [(h, pa.float64()) for h in headers[2:]]
+    )
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            values = chunk[headers[2:]].apply(pd.to_numeric, errors="coerce").astype(float)
+            chunk = pd.concat([chunk[headers[:2]], values], axis=1)
+            chunk[headers[1]] = pd.to_datetime(chunk[headers[1]]).dt.date
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_export(path, chunks, ext, headers):
+    """Write the frames of chunks to path as ext (csv, xlsx or parquet), one chunk at a time."""
+    if ext == "csv":
+        _write_csv(path, chunks)
+    elif ext == "xlsx":
+        _write_xlsx(path, chunks, headers)
+    else:
+        _write_parquet(path, chunks, headers)
+
+
+def _counted(chunks, total, bar):
+    done = 0
+    for chunk in chunks:
+        yield chunk
+        done += len(chunk)
+        bar.progress(min(done / total, 1.0) if total else 1.0, text=f"Exported {done:,} / {total:,} rows")
+
+
+def export_panel(scope, config, formulas, key, default_days=30):
+    """
+    Export controls for the depots of scope ({region: [depots]}): depot / date
+    selection, format and derived rows. The file is only built on Prepare.
+    """
+    if not scope:
+        st.warning("⚠️ No depots found for export.")
+        return
+    regions = list(scope)
+    if len(regions) > 1:
+        regions = st.multiselect("Regions", regions, default=regions, key=f"{key}_regions")
+    available = [d for r in regions for d in scope[r]]
+    if len(available) > 1:
+        depots = st.multiselect("Depots", available, default=available, key=f"{key}_depots")
+    else:
+        depots = available
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start = st.date_input("From Date", value=date.today() - timedelta(days=default_days), key=f"{key}_from")
+    with col2:
+        end = st.date_input("To Date", value=date.today(), min_value=start, key=f"{key}_to")
+    with col3:
+        choice = st.selectbox("Format", list(EXPORT_FORMATS), key=f"{key}_format")
+    include_derived = st.checkbox("Include derived rows (totals, differences, ratios)", value=True, key=f"{key}_derived")
+
+    if not st.button("📦 Prepare export", key=f"{key}_prepare"):
+        return
+    if not depots:
+        st.warning("⚠️ Select at least one depot.")
+        return
+
+    category_to_column = config.get("category_to_column", {})
+    ext, mime = EXPORT_FORMATS[choice]
+    headers = [label for _, label in export_columns(category_to_column, formulas, include_derived)]
+    fd, path = tempfile.mkstemp(suffix=f".{ext}")
+    os.close(fd)
+    try:
+        total = count_rows(depots, start, end)
+        if total == 0:
+            st.warning("⚠️ No data available for this range.")
+            return
+        if total > MAX_EXPORT_ROWS:
+            st.warning(
+                f"⚠️ {total:,} rows selected; one export holds at most {MAX_EXPORT_ROWS:,}. "
+                "Choose fewer depots or a shorter date range."
+            )
+            return
+        bar = st.progress(0.0, text=f"Exporting {total:,} rows…")
+        chunks = iter_input_chunks(depots, start, end, category_to_column, formulas, include_derived)
+        write_export(path, _counted(chunks, total, bar), ext, headers)
+        with open(path, "rb") as f:
+            data = f.read()
+    except ImportError as e:
+        st.error(f"❌ {choice} export needs {e.name or 'an extra package'} installed. Choose CSV instead.")
+        return
+    except Exception as e:
+        st.error(f"Error exporting data: {e}")
+        return
+    finally:
+        os.remove(path)
+
+    stem = depots[0] if len(depots) == 1 else f"{len(depots)}_depots"
+    st.success(f"✅ {total:,} rows ready.")
+    st.download_button(
+        label=f"📥 Download {ext.upper()}",
+        data=data,
+        file_name=f"{stem}_{start}_{end}.{ext}",
+        mime=mime,
+        key=f"{key}_download",
+    )
+
+
+def export_input_data(config, formulas, region=None, zone=None):
+    """Input data export page for RMs (their region) and EDs (their zone)."""
+    st.title("📤 Export Input Data")
+    if region is None and zone is None:
+        st.error("❌ No region or zone is assigned to this user.")
+        return
+    try:
+        scope = depot_scope(region=region, zone=zone)
+    except Exception as e:
+        st.error(f"Error loading depots: {e}")
+        return
+    export_panel(scope, config, formulas, key="export")
@@ -0,0 +1,142 @@
+import json
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from db_config import engine
+from input_store import KEY_COLS, ensure_history_table, load_input_range
+
+# ----------------------------------------------------------------------
+# 🕘 input_data history and point-in-time reads
+# ----------------------------------------------------------------------
+# input_data_history holds one row per changed value (see input_store).
+# The values of any depot / date range as of a past moment are the current
+# rows with every later change undone: per cell, the old value of the first
+# change after that moment. Rows inserted later drop out, rows deleted later
+# come back from the values their delete logged.
+
+MAX_LOG_ROWS = 5000
+
+
+def _in_range(depots):
+    placeholders = ",".join(["%s"] * len(depots))
+    return f"depot_name IN ({placeholders}) AND data_date BETWEEN %s AND %s"
+
+
+def load_history(depots, start, end, since=None, limit=None):
+    """
+    Change log rows for depots between start and end (optionally only after since),
+    oldest first; with limit, the latest limit rows, newest first.
+    """
+    depots = list(depots)
+    ensure_history_table()
+    query = f"""
+        SELECT id, changed_at, changed_by, action, depot_name, data_date, column_name, old_value, new_value
+        FROM input_data_history
+        WHERE {_in_range(depots)}
+        {"AND changed_at > %s" if since is not None else ""}
+        ORDER BY id {f"DESC LIMIT {int(limit)}" if limit else ""}
+    """
+    params = (*depots, start, end) + ((since,) if since is not None else ())
+    df = pd.read_sql(query, engine, params=params)
+    df["data_date"] = pd.to_datetime(df["data_date"]).dt.date
+    return df
+
+
+def load_input_depots():
+    query = "SELECT DISTINCT depot_name FROM input_data"
+    return pd.read_sql(query, engine)["depot_name"].tolist()
+
+
+def undo_changes(current, log):
+    """
+    current (input_data rows, DB columns) with the changes of log (the log rows made
+    after some moment, oldest first) undone: the rows as they were at that moment.
+    """
+    if log.empty:
+        return current
+    value_cols = [c for c in current.columns if c not in KEY_COLS]
+    base = current.set_index(KEY_COLS)
+
+    first = log.drop_duplicates(KEY_COLS).set_index(KEY_COLS)["action"]
+    inserted = first.index[first == "insert"]
+    deleted = pd.MultiIndex.from_frame(log.loc[log["action"] == "delete", KEY_COLS].drop_duplicates())
+    # rows deleted later existed then: rebuild them from the logged values alone
+    base = base.drop(index=deleted.intersection(base.index))
+    base = pd.concat([base, pd.DataFrame(index=deleted.difference(base.index), columns=value_cols, dtype=float)])
+    base = base.drop(index=inserted.intersection(base.index))
+
+    cells = log[log["column_name"].isin(value_cols)].drop_duplicates(KEY_COLS + ["column_name"])
+    cells = cells.set_index(KEY_COLS + ["column_name"])["old_value"]
+    old = cells.unstack("column_name").reindex(index=base.index, columns=value_cols)
+    touched = pd.Series(True, index=cells.index).unstack("column_name", fill_value=False)
+    touched = touched.reindex(index=base.index, columns=value_cols, fill_value=False).astype(bool)
+    base = base.astype(float).mask(touched, old)
+    return base.sort_index().reset_index()
+
+
+def values_as_of(depots, start, end, as_of):
+    """input_data rows for depots between start and end as they were at as_of (a datetime)."""
+    current = load_input_range(depots, start, end)
+    return undo_changes(current, load_history(depots, start, end, since=as_of))
+
+
+def history_page():
+    """Admin view of the input_data change log, and the stored values at a past moment."""
+    with open("config.json") as f:
+        config = json.load(f)
+    column_to_category = {col: cat for cat, col in config.get("category_to_column", {}).items()}
+
+    st.title("🕘 Input Data History")
+    depots = sorted(load_input_depots())
+    selected = st.multiselect("Select Depots", depots, key="history_depots")
+    col1, col2 = st.columns(2)
+    with col1:
+        start = st.date_input("From Date", value=date.today() - timedelta(days=30), key="history_from")
+    with col2:
+        end = st.date_input("To Date", value=date.today(), min_value=start, key="history_to")
+    if not selected:
+        return
+
+    tab_log, tab_as_of = st.tabs(["Change Log", "Values As Of"])
+    with tab_log:
+        try:
+            log = load_history(selected, start, end, limit=MAX_LOG_ROWS)
+        except Exception as e:
+            st.error(f"Error loading history: {e}")
+            return
+        if log.empty:
+            st.info("No recorded changes for this selection.")
+        else:
+            log = log.assign(column_name=log["column_name"].map(column_to_category).fillna(log["column_name"]))
+            st.dataframe(
+                log.drop(columns="id").rename(columns={
+                    "changed_at": "Changed At", "changed_by": "User", "action": "Action",
+                    "depot_name": "Depot", "data_date": "Date", "column_name": "Category",
+                    "old_value": "Old", "new_value": "New",
+                }),
+                use_container_width=True,
+            )
+            if len(log) == MAX_LOG_ROWS:
+                st.caption(f"Latest {MAX_LOG_ROWS} changes.")
+
+    with tab_as_of:
+        col3, col4 = st.columns(2)
+        with col3:
+            day = st.date_input("As of date", value=date.today(), key="history_as_of_date")
+        with col4:
+            moment = st.time_input("Time", value=time(23, 59), key="history_as_of_time")
+        if st.button("🔍 Show values"):
+            try:
+                rows = values_as_of(selected, start, end, datetime.combine(day, moment))
+            except Exception as e:
+                st.error(f"Error loading data: {e}")
+                return
+            if rows.empty:
+                st.warning("No data for this selection at that time.")
+            else:
+                st.dataframe(
+                    rows.rename(columns={**column_to_category, "depot_name": "Depot", "data_date": "Date"}),
+                    use_container_width=True,
+                )
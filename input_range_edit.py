@@ -0,0 +1,281 @@
+import ast
+import operator
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
+
+from derived_fields import recompute_columns
+from input_store import KEY_COLS, changed_cells, changed_mask, load_input_range, upsert_input_data
+from models import InputData
+
+# ----------------------------------------------------------------------
+# 🧰 Range editor: many depots and dates in one save
+# ----------------------------------------------------------------------
+# Correcting a systematic error (a wrong Total Drivers for a depot over a
+# month) loads every affected row at once, applies column-level edits (set,
+# add, multiply or a formula over other columns) to a depot / date subset, and
+# lets single cells be fixed in a grid. On preview only the rows whose inputs
+# changed get their derived columns recomputed, in one vectorized pass; they
+# are validated together and written with one multi-row upsert, with a
+# summary of every changed value.
+
+MAX_RANGE_DAYS = 366
+MAX_CELLS_SHOWN = 500
+
+# operation label -> op
+RANGE_OPS = {
+    "Set to": "set",
+    "Add": "add",
+    "Multiply by": "multiply",
+    "Formula (DB columns, e.g. Total_Drivers - 2)": "formula",
+}
+
+# the only syntax a formula may use: numbers, input_data column names, + - * / and ( )
+FORMULA_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+FORMULA_SIGNS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+FORMULA_COLUMNS = frozenset(c.name for c in InputData.__table__.columns) - set(KEY_COLS)
+
+
+def evaluate_formula(df, formula):
+    """
+    Value of formula for every row of df: numeric literals and input_data column
+    names combined with + - * / and parentheses. Anything else (attribute access,
+    calls, other names or operators) raises ValueError before anything is evaluated.
+    """
+    try:
+        tree = ast.parse(str(formula).strip(), mode="eval")
+    except SyntaxError:
+        raise ValueError("not a valid formula") from None
+
+    def check(node):
+        if isinstance(node, ast.BinOp) and type(node.op) in FORMULA_OPS:
+            check(node.left)
+            check(node.right)
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in FORMULA_SIGNS:
+            check(node.operand)
+        elif isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            pass
+        elif isinstance(node, ast.Name):
+            if node.id not in FORMULA_COLUMNS or node.id not in df.columns:
+                raise ValueError(f"unknown column '{node.id}'")
+        else:
+            raise ValueError("only numbers, column names, + - * / and ( ) are allowed")
+
+    def value(node):
+        if isinstance(node, ast.BinOp):
+            return FORMULA_OPS[type(node.op)](value(node.left), value(node.right))
+        if isinstance(node, ast.UnaryOp):
+            return FORMULA_SIGNS[type(node.op)](value(node.operand))
+        if isinstance(node, ast.Constant):
+            return float(node.value)
+        return pd.to_numeric(df[node.id], errors="coerce").astype(float)
+
+    check(tree.body)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return value(tree.body)
+
+
+def apply_column_edit(df, column, op, value, rows):
+    """
+    df with column changed on the boolean rows mask: set to / add / multiply by
+    value, or the result of a formula over the DB columns (see evaluate_formula).
+    """
+    current = df[column].astype(float)
+    if op == "set":
+        new = pd.Series(float(value), index=df.index)
+    elif op == "add":
+        new = current.fillna(0) + float(value)
+    elif op == "multiply":
+        new = current * float(value)
+    else:
+        result = evaluate_formula(df, value)
+        new = result if isinstance(result, pd.Series) else pd.Series(result, index=df.index)
+        new = new.replace([np.inf, -np.inf], np.nan)
+    return df.assign(**{column: current.where(~rows, new.astype(float))})
+
+
+def pending_changes(original, edited, category_to_column, formulas):
+    """
+    (rows, cells) for an edited copy of original: rows are the input_data rows
+    whose inputs changed, with derived columns recomputed; cells lists every
+    value (inputs and derived) that differs from original.
+    """
+    inputs = [col for cat, col in category_to_column.items() if cat not in formulas and col in edited.columns]
+    touched = changed_mask(original[inputs], edited[inputs]).any(axis=1)
+    rows = recompute_columns(edited.loc[touched], category_to_column, formulas)
+    return rows, changed_cells(original.loc[touched], rows)
+
+
+def change_summary(cells, column_to_category):
+    """Per changed column: rows changed and the column total before / after."""
+    if cells.empty:
+        return pd.DataFrame(columns=["Category", "Rows changed", "Total before", "Total after"])
+    summary = cells.groupby("column", sort=False).agg(
+        rows=("new", "size"), before=("old", "sum"), after=("new", "sum")
+    ).reset_index()
+    summary["column"] = summary["column"].map(column_to_category).fillna(summary["column"])
+    return summary.set_axis(["Category", "Rows changed", "Total before", "Total after"], axis=1)
+
+
+def _reset(state, original):
+    state["original"] = original
+    state["edited"] = original.copy()
+    state["ops"] = []
+    state["version"] = state.get("version", 0) + 1
+
+
+def _edit_form(state, input_cats, category_to_column):
+    edited = state["edited"]
+    loaded_depots = sorted(edited["depot_name"].unique())
+    with st.form("range_op_form"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            cat = st.selectbox("Category", input_cats)
+        with col2:
+            op_label = st.selectbox("Operation", list(RANGE_OPS))
+        with col3:
+            value = st.text_input("Value / formula")
+        col4, col5, col6 = st.columns(3)
+        with col4:
+            depots = st.multiselect("Apply to depots", loaded_depots, default=loaded_depots)
+        with col5:
+            start = st.date_input("From", value=min(edited["data_date"]), key="range_op_from")
+        with col6:
+            end = st.date_input("To", value=max(edited["data_date"]), key="range_op_to")
+        submitted = st.form_submit_button("➕ Apply to column")
+    if not submitted:
+        return
+    if not str(value).strip():
+        st.warning("⚠️ Enter a value or formula.")
+        return
+
+    rows = (edited["depot_name"].isin(depots) & (edited["data_date"] >= start) & (edited["data_date"] <= end)).to_numpy()
+    try:
+        state["edited"] = apply_column_edit(edited, category_to_column[cat], RANGE_OPS[op_label], value, rows)
+    except Exception as e:
+        st.error(f"❌ Could not apply '{value}': {e}")
+        return
+    state["ops"].append((cat, f"{cat}: {op_label.split(' (')[0]} {value} on {int(rows.sum())} row(s)"))
+    state["version"] += 1
+    st.rerun()
+
+
+def _cell_grid(state, input_cats, category_to_column):
+    """Editable grid of the chosen categories; grid edits are written back to state["edited"]."""
+    shown = st.multiselect(
+        "Categories in the grid", input_cats,
+        default=list(dict.fromkeys(cat for cat, _ in state["ops"]))[:8] or input_cats[:4],
+        key="range_grid_cols",
+    )
+    if not shown:
+        return
+    edited = state["edited"]
+    cols = [category_to_column[c] for c in shown]
+    view = edited[KEY_COLS + cols].rename(columns={category_to_column[c]: c for c in shown})
+    view["data_date"] = view["data_date"].astype(str)
+
+    gb = GridOptionsBuilder.from_dataframe(view)
+    gb.configure_default_column(resizable=True, sortable=False, editable=True)
+    gb.configure_column("depot_name", header_name="Depot", editable=False, pinned="left")
+    gb.configure_column("data_date", header_name="Date", editable=False, pinned="left")
+    grid = AgGrid(
+        view,
+        gridOptions=gb.build(),
+        update_mode=GridUpdateMode.VALUE_CHANGED,
+        theme="material",
+        height=min(30 * len(view) + 45, 600),
+        data_return_mode="AS_INPUT",
+        key=f"range_grid_{state['version']}_{hash(tuple(shown))}",
+    )
+    data = pd.DataFrame(grid["data"])
+    if len(data) == len(edited) and set(shown).issubset(data.columns):
+        values = data[shown].apply(pd.to_numeric, errors="coerce").astype(float).to_numpy()
+        state["edited"] = edited.assign(**{col: values[:, i] for i, col in enumerate(cols)})
+
+
+def range_editor(depots, config, formulas, validator):
+    """Range mode of the admin edit page: load, edit, preview and save many (depot, date) rows at once."""
+    category_to_column = config.get("category_to_column", {})
+    column_to_category = {col: cat for cat, col in category_to_column.items()}
+    input_cats = [cat for cat in category_to_column if cat not in formulas]
+    state = st.session_state.setdefault("range_edit", {})
+
+    selected = st.multiselect("Select Depots", depots, key="range_depots")
+    col1, col2 = st.columns(2)
+    with col1:
+        start = st.date_input("From Date", value=date.today() - timedelta(days=30), key="range_from")
+    with col2:
+        end = st.date_input("To Date", value=date.today(), min_value=start, key="range_to")
+
+    if st.button("🔍 Load Range"):
+        if not selected:
+            st.warning("⚠️ Select at least one depot.")
+        elif (end - start).days >= MAX_RANGE_DAYS:
+            st.warning(f"⚠️ Load at most {MAX_RANGE_DAYS} days at a time.")
+        else:
+            try:
+                _reset(state, load_input_range(selected, start, end))
+            except Exception as e:
+                st.error(f"Error loading data: {e}")
+                return
+
+    if "saved" in state:
+        st.success(state.pop("saved"))
+    if "original" not in state:
+        return
+    if state["original"].empty:
+        st.warning("No saved data for this selection.")
+        return
+
+    original = state["original"]
+    st.caption(f"{len(original)} row(s): {original['depot_name'].nunique()} depot(s), "
+               f"{original['data_date'].min()} to {original['data_date'].max()}")
+    _edit_form(state, input_cats, category_to_column)
+    if state["ops"]:
+        st.markdown("**Applied edits:** " + "; ".join(text for _, text in state["ops"]))
+    _cell_grid(state, input_cats, category_to_column)
+
+    rows, cells = pending_changes(original, state["edited"], category_to_column, formulas)
+    if cells.empty:
+        st.info("No changes yet.")
+        return
+
+    st.markdown(f"### Changes: {len(rows)} row(s), {len(cells)} value(s)")
+    st.dataframe(change_summary(cells, column_to_category), use_container_width=True)
+    with st.expander("Changed values"):
+        shown = cells.head(MAX_CELLS_SHOWN).assign(column=lambda c: c["column"].map(column_to_category).fillna(c["column"]))
+        st.dataframe(shown.rename(columns={"depot_name": "Depot", "data_date": "Date", "column": "Category",
+                                           "old": "Old", "new": "New"}), use_container_width=True)
+        if len(cells) > MAX_CELLS_SHOWN:
+            st.caption(f"First {MAX_CELLS_SHOWN} of {len(cells)}.")
+
+    frame = rows.rename(columns=column_to_category).set_index(KEY_COLS)
+    errors = validator.check(frame)
+    if not errors.empty:
+        messages = validator.messages(errors)
+        for e in messages[:MAX_CELLS_SHOWN // 10]:
+            st.error(e)
+        if len(messages) > MAX_CELLS_SHOWN // 10:
+            st.error(f"❌ … and {len(messages) - MAX_CELLS_SHOWN // 10} more.")
+        st.warning("⚠️ Correct the errors before saving.")
+
+    col_save, col_discard = st.columns(2)
+    with col_save:
+        if st.button(f"💾 Save {len(rows)} row(s)", disabled=not errors.empty):
+            try:
+                saved = upsert_input_data(rows)
+            except Exception as e:
+                st.error(f"Error saving data: {e}")
+                return
+            merged = original.copy()
+            merged.loc[rows.index, rows.columns] = rows
+            _reset(state, merged)
+            state["saved"] = f"✅ Updated {saved} row(s)."
+            st.rerun()
+    with col_discard:
+        if st.button("↩️ Discard changes"):
+            _reset(state, original)
+            st.rerun()
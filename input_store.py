@@ -0,0 +1,309 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from db_config import engine, get_session
+from depot_data import freeze, shared_cache
+from derived_fields import evaluate
+from models import InputData, InputDataChange
+
+# ----------------------------------------------------------------------
+# 💾 Set-based writes to input_data
+# ----------------------------------------------------------------------
+# Category-labelled frames (one row per date) become input_data rows with
+# their derived columns recomputed in one pass, and any number of rows is
+# written with multi-row INSERT ... ON DUPLICATE KEY UPDATE statements in a
+# single transaction, instead of a lookup-then-setattr-or-add per record.
+#
+# Every write also appends the values it changed to input_data_history, in
+# the same transaction: the rows about to be overwritten are read by key, the
+# old / new arrays are diffed in one vectorized pass and only changed cells
+# are logged (an insert logs one marker row, a delete the values it removes).
+#
+# input_data_history is not part of the original schema: ensure_history_table()
+# creates it (CREATE TABLE IF NOT EXISTS, with its indexes) the first time a
+# process writes or reads history, so existing deployments need no manual step.
+#
+# The DM input sheet's state (last saved date, depot category, the rows of the
+# 10-day window) is one query, cached per (depot, data version); writes made
+# through this module bump the depot's version, and a TTL covers writers in
+# other processes.
+
+KEY_COLS = ["depot_name", "data_date"]
+UPSERT_CHUNK = 1000  # rows per INSERT statement
+WINDOW_DAYS = 10  # dates shown on the DM input sheet, ending at the next date to enter
+STATE_TTL = 600
+
+_versions = {}
+
+
+def data_version(depot):
+    """Number of input_data writes for depot made through this process."""
+    return _versions.get(depot, 0)
+
+
+def data_versions():
+    """{depot: version} for every depot written through this process."""
+    return dict(_versions)
+
+
+def bump_data_version(depots):
+    if isinstance(depots, str):
+        depots = [depots]
+    for depot in depots:
+        _versions[depot] = _versions.get(depot, 0) + 1
+
+
+def input_rows(frame, depot, category_to_column, formulas):
+    """
+    input_data rows (DB column names, depot_name / data_date keys) for frame: one
+    row per date (the index), one column per category; derived columns recomputed.
+    """
+    values = evaluate(frame.reset_index(drop=True), formulas)
+    cats = [c for c in category_to_column if c in values.columns]
+    rows = values[cats].apply(pd.to_numeric, errors="coerce").rename(columns=category_to_column)
+    rows.insert(0, "data_date", pd.to_datetime(pd.Series(frame.index)).dt.date.to_numpy())
+    rows.insert(0, "depot_name", depot)
+    return rows
+
+
+def _db_value(value):
+    """NaN -> NULL, whole floats -> int (the count columns are INTEGER)."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value.item() if hasattr(value, "item") else value
+
+
+def _current_user():
+    try:
+        return st.session_state.get("userid") or None
+    except Exception:
+        return None
+
+
+def _stored_rows(db, keys, cols):
+    """The input_data rows (cols) stored under keys (a depot_name / data_date frame), read by primary key."""
+    table = InputData.__table__
+    pairs = list(keys.itertuples(index=False, name=None))
+    parts = []
+    for start in range(0, len(pairs), UPSERT_CHUNK):
+        result = db.execute(
+            select(*[table.c[c] for c in cols])
+            .where(tuple_(table.c.depot_name, table.c.data_date).in_(pairs[start:start + UPSERT_CHUNK]))
+        )
+        parts.append(pd.DataFrame(result.fetchall(), columns=cols))
+    stored = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=cols)
+    stored["data_date"] = pd.to_datetime(stored["data_date"]).dt.date
+    return stored
+
+
+@st.cache_resource(show_spinner=False)
+def ensure_history_table():
+    """Create input_data_history if it doesn't exist yet (once per process; retried after a failure)."""
+    InputDataChange.__table__.create(engine, checkfirst=True)
+    return True
+
+
+def _history_records(action, cells, when, user):
+    return [
+        {
+            "changed_at": when, "changed_by": user, "action": action,
+            "depot_name": depot, "data_date": day, "column_name": col,
+            "old_value": _db_value(old), "new_value": _db_value(new),
+        }
+        for depot, day, col, old, new in cells.itertuples(index=False, name=None)
+    ]
+
+
+def _log_changes(db, rows, cols, user):
+    """Append the cells of rows (about to be written) that differ from what is stored to input_data_history."""
+    keys = rows[KEY_COLS].assign(data_date=pd.to_datetime(rows["data_date"]).dt.date).reset_index(drop=True)
+    stored = keys.merge(_stored_rows(db, keys, cols), on=KEY_COLS, how="left", indicator=True)
+    existed = (stored.pop("_merge") == "both").to_numpy()
+    new = rows[cols].reset_index(drop=True).assign(data_date=keys["data_date"])
+
+    when = datetime.now()
+    records = _history_records("update", changed_cells(stored[existed], new[existed]), when, user)
+    inserted = keys[~existed].assign(column=None, old=None, new=None)
+    records += _history_records("insert", inserted, when, user)
+    if records:
+        db.execute(InputDataChange.__table__.insert(), records)
+
+
+def upsert_input_data(rows, user=None):
+    """
+    Insert or overwrite input_data rows (keyed by depot_name, data_date) in one
+    transaction, UPSERT_CHUNK rows per statement, logging the changed values to
+    input_data_history. Returns the number of rows written.
+    """
+    if rows.empty:
+        return 0
+    table = InputData.__table__
+    cols = [c for c in rows.columns if c in table.columns]
+    records = [
+        {c: _db_value(v) for c, v in zip(cols, rec)}
+        for rec in rows[cols].itertuples(index=False, name=None)
+    ]
+    ensure_history_table()
+    with get_session() as db:
+        _log_changes(db, rows, cols, user or _current_user())
+        for start in range(0, len(records), UPSERT_CHUNK):
+            stmt = mysql_insert(table).values(records[start:start + UPSERT_CHUNK])
+            stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in cols if c not in KEY_COLS})
+            db.execute(stmt)
+    bump_data_version(rows["depot_name"].unique().tolist())
+    return len(records)
+
+
+def delete_input_data(depot, day, user=None):
+    """Delete one input_data row, logging the values it held. Returns False when there was none."""
+    table = InputData.__table__
+    cols = [c.name for c in table.columns]
+    keys = pd.DataFrame({"depot_name": [depot], "data_date": [day]})
+    ensure_history_table()
+    with get_session() as db:
+        stored = _stored_rows(db, keys, cols)
+        if stored.empty:
+            return False
+        cells = changed_cells(stored, stored.assign(**{c: np.nan for c in cols if c not in KEY_COLS}))
+        records = _history_records("delete", cells, datetime.now(), user or _current_user())
+        if records:
+            db.execute(InputDataChange.__table__.insert(), records)
+        db.execute(table.delete().where(table.c.depot_name == depot, table.c.data_date == day))
+    bump_data_version(depot)
+    return True
+
+
+def load_input_range(depots, start, end):
+    """
+    input_data rows (DB columns, numeric values) for depots between start and end,
+    ordered by depot and date. Not cached: this is what editors change.
+    """
+    depots = list(depots)
+    if not depots:
+        return pd.DataFrame(columns=[c.name for c in InputData.__table__.columns])
+    placeholders = ",".join(["%s"] * len(depots))
+    query = f"""
+        SELECT *
+        FROM input_data
+        WHERE depot_name IN ({placeholders})
+          AND data_date BETWEEN %s AND %s
+        ORDER BY depot_name, data_date
+    """
+    df = pd.read_sql(query, engine, params=(*depots, start, end))
+    values = [c for c in df.columns if c not in KEY_COLS]
+    df[values] = df[values].apply(pd.to_numeric, errors="coerce").astype(float)
+    df["data_date"] = pd.to_datetime(df["data_date"]).dt.date
+    return df
+
+
+def changed_mask(before, after):
+    """Cell mask of values that changed (NaN equals NaN) between two aligned numeric frames."""
+    old = before.to_numpy(dtype=float)
+    new = after.to_numpy(dtype=float)
+    return ~((old == new) | (np.isnan(old) & np.isnan(new)))
+
+
+def changed_cells(before, after):
+    """
+    depot_name, data_date, column, old, new for every value that differs between two
+    frames of the same input_data rows (same keys in the same order).
+    """
+    cols = [c for c in after.columns if c not in KEY_COLS and c in before.columns]
+    old = before[cols].apply(pd.to_numeric, errors="coerce").astype(float)
+    new = after[cols].apply(pd.to_numeric, errors="coerce").astype(float)
+    r, c = np.nonzero(changed_mask(old, new))
+    return pd.DataFrame({
+        "depot_name": after["depot_name"].to_numpy()[r],
+        "data_date": after["data_date"].to_numpy()[r],
+        "column": np.asarray(cols, dtype=object)[c],
+        "old": old.to_numpy()[r, c],
+        "new": new.to_numpy()[r, c],
+    })
+
+
+@shared_cache(show_spinner=False, max_entries=256, ttl=STATE_TTL)
+def _load_sheet_state(depot, version):
+    query = f"""
+        SELECT m.last_date, t.category AS depot_category, d.*
+        FROM (SELECT MAX(data_date) AS last_date FROM input_data WHERE depot_name = %(depot)s) m
+        LEFT JOIN (SELECT category FROM ts_admin WHERE depot_name = %(depot)s LIMIT 1) t ON 1 = 1
+        LEFT JOIN input_data d
+          ON d.depot_name = %(depot)s
+         AND d.data_date >= COALESCE(m.last_date + INTERVAL 1 DAY, CURDATE()) - INTERVAL {WINDOW_DAYS - 1} DAY
+    """
+    df = pd.read_sql(query, engine, params={"depot": depot})
+    first = df.iloc[0] if not df.empty else {}
+    last_date = pd.to_datetime(first.get("last_date")).date() if pd.notna(first.get("last_date")) else None
+    category = first.get("depot_category") if pd.notna(first.get("depot_category")) else None
+
+    rows = df.drop(columns=["last_date", "depot_category"]).dropna(subset=["data_date"])
+    rows = rows.assign(data_date=pd.to_datetime(rows["data_date"]).dt.strftime("%Y-%m-%d"))
+    return {"last_date": last_date, "category": category, "rows": freeze(rows.reset_index(drop=True))}
+
+
+def input_sheet_state(depot):
+    """
+    The DM input sheet's DB state from one query: last_date (None before the first
+    entry), next_date (the date to enter), window_dates (WINDOW_DAYS "YYYY-MM-DD"
+    strings ending at next_date), category (TS_ADMIN depot type, None when unknown)
+    and rows (the window's input_data rows, the caller's own view).
+    """
+    state = dict(_load_sheet_state(depot, data_version(depot)))
+    next_date = state["last_date"] + timedelta(days=1) if state["last_date"] else date.today()
+    state["next_date"] = next_date
+    state["window_dates"] = [
+        (next_date - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(WINDOW_DAYS - 1, -1, -1)
+    ]
+    return state
+
+
+@shared_cache(show_spinner="Loading input data …", max_entries=64, ttl=STATE_TTL)
+def _load_daily_sums(depots, start, end, version):
+    cols = [c.name for c in InputData.__table__.columns if c.name not in KEY_COLS]
+    sums = ",\n            ".join(f"SUM(`{c}`) AS `{c}`" for c in cols)
+    placeholders = ",".join(["%s"] * len(depots))
+    query = f"""
+        SELECT
+            data_date,
+            {sums}
+        FROM input_data
+        WHERE depot_name IN ({placeholders})
+          AND data_date BETWEEN %s AND %s
+        GROUP BY data_date
+        ORDER BY data_date
+    """
+    df = pd.read_sql(query, engine, params=(*depots, start, end))
+    df["data_date"] = pd.to_datetime(df["data_date"]).dt.strftime("%Y-%m-%d")
+    return freeze(df.set_index("data_date"))
+
+
+def daily_sums(depots, start, end, category_to_column, formulas):
+    """
+    One row per date ("YYYY-MM-DD") with every category summed over depots in SQL
+    (GROUP BY data_date). Ratio rows (the % rows, KM/Driver, Driver schedule) are
+    recomputed from the summed counts: a sum of per-depot ratios means nothing.
+    """
+    depots = tuple(sorted(set(depots)))
+    # versions only grow, so their sum changes whenever any of the depots is written
+    version = sum(data_version(d) for d in depots)
+    sums = _load_daily_sums(depots, start, end, version)
+    to_cat = {col: cat for cat, col in category_to_column.items() if col in sums.columns}
+    wide = sums[list(to_cat)].rename(columns=to_cat)
+    ratios = {name: f for name, f in formulas.items() if f["op"] == "ratio"}
+    return evaluate(wide, ratios)
+
+
+def category_grid(wide, category_rows, date_columns):
+    """Category x date values (the input-sheet layout) for a date x category frame; blank cells are None."""
+    values = wide.T
+    values.index = values.index.str.strip().str.lower()
+    keys = pd.Index([str(c).strip().lower() for c in category_rows])
+    grid = values.reindex(index=keys, columns=date_columns).astype(object)
+    return grid.where(grid.notna(), None).reset_index(drop=True)
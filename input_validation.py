@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+from derived_fields import evaluate, load_formulas
+
+# ----------------------------------------------------------------------
+# ✅ Input validation compiled from config.json
+# ----------------------------------------------------------------------
+# "editable_rows", "validation_rules" (min / max per category) and
+# "special_validations" (reason totals that must equal their category) are
+# compiled once into bound arrays; a check is then a handful of boolean masks
+# over a frame with one row per depot / date and one column per category, so
+# the input sheet, the edit page and bulk loads share the same rules and a
+# month of all depots validates in one pass.
+
+ERROR_COLS = ["ROW", "CATEGORY", "RULE", "MESSAGE"]
+
+
+def _numeric(frame, col):
+    if col not in frame.columns:
+        return np.zeros(len(frame))
+    return pd.to_numeric(frame[col], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+
+def _as_float(raw):
+    """
+    (values, blank) for a frame of inputs: float array (NaN where not a number) and
+    the mask of empty cells. Converted as one block: numpy parses the whole object
+    array at once; pd.to_numeric (much slower on strings) only runs when some
+    cell is not a number, i.e. when the frame fails validation anyway.
+    """
+    if all(pd.api.types.is_numeric_dtype(t) for t in raw.dtypes):
+        values = raw.to_numpy(dtype=float)
+        return values, np.isnan(values)
+    values = raw.to_numpy(dtype=object)
+    blank = raw.isna().to_numpy() | (values == "")
+    if blank.any():
+        values = np.where(blank, np.nan, values)
+    try:
+        return values.astype(float), blank
+    except (TypeError, ValueError):
+        flat = pd.to_numeric(pd.Series(values.ravel()), errors="coerce")
+        return flat.to_numpy(dtype=float).reshape(values.shape), blank
+
+
+def _where(label):
+    """Row label for messages: the date, or "at DEPOT on date" for (depot, date) rows."""
+    if isinstance(label, tuple):
+        return f"at {label[0]} on {' '.join(str(v) for v in label[1:])}"
+    return f"on {label}"
+
+
+class InputValidator:
+    """
+    Compiled input rules. Every editable category must be a whole number; those
+    with a validation_rules entry must lie in [min, max], the rest must not be
+    negative; each special_validations total (the sum of its subcategories, or
+    its derived field) must equal its compare category within the tolerance.
+    """
+
+    def __init__(self, config):
+        self.formulas = load_formulas(config)
+        self.categories = list(config.get("editable_rows", []))
+        rules = config.get("validation_rules", {})
+        self.ranged = np.array([c in rules for c in self.categories], dtype=bool)
+        self.lower = np.array([rules.get(c, {}).get("min", -np.inf) for c in self.categories], dtype=float)
+        self.upper = np.array([rules.get(c, {}).get("max", np.inf) for c in self.categories], dtype=float)
+
+        special = dict(config.get("special_validations", {}))
+        self.tolerance = float(special.pop("tolerance", 1e-9))
+        self.totals = [(self._diff_label(name, rule), rule) for name, rule in special.items()]
+
+    def _diff_label(self, name, rule):
+        """The derived "Diff (...)" field a total rule is about (the rule key when there is none)."""
+        pair = [rule["total_category"], rule["compare_category"]]
+        for field, formula in self.formulas.items():
+            if formula["op"] == "sub" and list(formula["args"]) == pair:
+                return field
+        return name
+
+    def check(self, frame):
+        """
+        One row per failed check of frame (one row per depot / date, one column per
+        category): ROW (the frame's index label), CATEGORY, RULE (empty, integer,
+        range, negative or total) and MESSAGE. Empty when everything passes.
+        """
+        labels = frame.index.to_list()
+        frame = frame.reset_index(drop=True)
+        raw = frame.reindex(columns=self.categories)
+        num, blank = _as_float(raw)
+        with np.errstate(invalid="ignore"):
+            not_int = ~blank & (np.isnan(num) | (num != np.round(num)))
+            ok = ~blank & ~not_int
+            out_of_range = ok & self.ranged & ((num < self.lower) | (num > self.upper))
+            negative = ok & ~self.ranged & (num < 0)
+
+        errors = []
+        for rule, mask, text in (
+            ("empty", blank, "'{cat}' is empty {where}"),
+            ("integer", not_int, "'{cat}' must be an integer {where}"),
+            ("range", out_of_range, "'{cat}' Check the value {where} (allowed {lo:g} to {hi:g})"),
+            ("negative", negative, "'{cat}' cannot be negative {where}"),
+        ):
+            for i, j in zip(*np.nonzero(mask)):
+                cat = self.categories[j]
+                errors.append((labels[i], cat, rule, text.format(
+                    cat=cat, where=_where(labels[i]), lo=self.lower[j], hi=self.upper[j]
+                )))
+
+        values = None
+        for label, rule in self.totals:
+            total_cat, compare_cat = rule["total_category"], rule["compare_category"]
+            if "subcategories" in rule:
+                total = np.sum([_numeric(frame, c) for c in rule["subcategories"]], axis=0)
+            else:
+                # the total as its derived field computes it from the current inputs
+                if values is None:
+                    values = evaluate(frame, self.formulas)
+                total = _numeric(values, total_cat)
+            compare = _numeric(frame, compare_cat)
+            for i in np.nonzero(np.abs(total - compare) > self.tolerance)[0]:
+                errors.append((labels[i], label, "total", (
+                    f"'{label}' must be 0 {_where(labels[i])}. "
+                    f"({total_cat}: {total[i]:g}, {compare_cat}: {compare[i]:g})"
+                )))
+        return pd.DataFrame(errors, columns=ERROR_COLS)
+
+    @staticmethod
+    def messages(errors):
+        return [f"❌ {m}" for m in errors["MESSAGE"]]
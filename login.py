@@ -36,6 +36,9 @@ from depot_list import depotlist
 from pending import pending_depot
 from edit_sheet import edit
 from Etl_main import run_etl_dashboard
+from input_export import export_input_data
+from input_history import history_page
+from derived_fields import load_formulas
 
 # ORM imports
 from db_config import get_session
@@ -45,6 +48,7 @@ from models import TSAdmin, User
 with open("config.json") as f:
     config = json.load(f)
 logo_path = config["logo_path"]
+formulas = load_formulas(config)
 
 # ------------------- ENSURE ADMIN -------------------
 ensure_admin_exists()
@@ -56,6 +60,7 @@ if "logged_in" not in st.session_state:
     st.session_state.user_role = None
     st.session_state.user_depot = None
     st.session_state.user_region = None
+    st.session_state.user_zone = None
 
 # ------------------- SESSION FEEDBACK -------------------
 if st.session_state.get("session_expired"):
@@ -120,6 +125,8 @@ if not st.session_state.logged_in or not is_authenticated():
                     st.session_state.user_depot = depot
                 elif role_from_db == "Regional Manager(RMs)":
                     st.session_state.user_region = depot
+                elif role_from_db == "Executive Director(EDs)":
+                    st.session_state.user_zone = depot
                 else:
                     st.session_state.user_depot = None
                     st.session_state.user_region = None
@@ -170,7 +177,7 @@ else:
 
     # ------------------- ADMIN -------------------
     if st.session_state.userid == "admin":
-        menu = ["Add New User", "Add Depot Category", "INPUT SHEET EDIT","DATA UPLOAD"]
+        menu = ["Add New User", "Add Depot Category", "INPUT SHEET EDIT", "INPUT DATA HISTORY", "DATA UPLOAD"]
         admin_task = st.sidebar.selectbox("Select screen", menu)
         st.markdown("---")
 
@@ -233,6 +240,8 @@ else:
             admin()
         elif admin_task == "INPUT SHEET EDIT":
             edit(); depotlist(); pending_depot()
+        elif admin_task == "INPUT DATA HISTORY":
+            history_page()
         elif admin_task == "DATA UPLOAD":
             run_etl_dashboard()
 
@@ -263,11 +272,13 @@ else:
             elif selection == "Driver Dashboard":
                 obj = driver_depot_dashboard_ui_DM(st.session_state.user_depot, role)
                 obj.parameters()
-                tab1, tab2 = st.tabs(["Driver Performance", "Driver Performance in Depot"])
+                tab1, tab2, tab3 = st.tabs(["Driver Performance", "Driver Performance in Depot", "Driver Scorecards"])
                 with tab1:
                     obj.driver_ui()
                 with tab2:
                     obj.driver_depot_ui()
+                with tab3:
+                    obj.scorecards_ui()
 
         elif role == "Regional Manager(RMs)":
             menu = [
@@ -275,7 +286,8 @@ else:
                 "Productivity Budget 8 Ratios (Rural/Urban)",
                 "Productivity Budget vs. Actual 8 Ratios",
                 "Depot Dashboard",
-                "Driver Dashboard"
+                "Driver Dashboard",
+                "Export Input Data"
             ]
             selection = st.sidebar.selectbox("Select Screen", menu)
             if selection == "Daily Depot Input Sheet":
@@ -289,8 +301,18 @@ else:
             elif selection == "Driver Dashboard":
                 obj = driver_depot_dashboard_ui_RM(st.session_state.user_depot, st.session_state.user_region, role)
                 obj.parameters()
-                tab1, tab2 = st.tabs(["Driver Performance", "Driver Performance in Depot"])
+                tab1, tab2, tab3 = st.tabs(["Driver Performance", "Driver Performance in Depot", "Driver Scorecards"])
                 with tab1:
                     obj.driver_ui()
                 with tab2:
                     obj.driver_depot_ui()
+                with tab3:
+                    obj.scorecards_ui()
+            elif selection == "Export Input Data":
+                export_input_data(config, formulas, region=st.session_state.user_region)
+
+        elif role == "Executive Director(EDs)":
+            menu = ["Export Input Data"]
+            selection = st.sidebar.selectbox("Select Screen", menu)
+            if selection == "Export Input Data":
+                export_input_data(config, formulas, zone=st.session_state.get("user_zone"))
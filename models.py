@@ -7,6 +7,7 @@ from sqlalchemy import (
     Date,
     DateTime,
     Text,
+    Index,
 )
 from db_config import Base
 
@@ -257,3 +258,24 @@ class ServiceMaster(Base):
     dept_date = Column(Date)
     arr_date = Column(Date)
     Hours = Column(Integer)
+
+# ----------------------------------------------------------------------
+# 1️⃣1️⃣ input_data_history (append-only change log of input_data)
+# ----------------------------------------------------------------------
+class InputDataChange(Base):
+    __tablename__ = "input_data_history"
+    __table_args__ = (
+        Index("ix_input_data_history_key", "depot_name", "data_date"),
+        Index("ix_input_data_history_changed_at", "changed_at"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    changed_at = Column(DateTime, nullable=False)
+    changed_by = Column(String(255))
+    action = Column(String(10), nullable=False)  # insert / update / delete
+    depot_name = Column(String(100), nullable=False)
+    data_date = Column(Date, nullable=False)
+    column_name = Column(String(100))  # NULL for an insert (the row itself)
+    old_value = Column(Float)
+    new_value = Column(Float)
@@ -0,0 +1,98 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import streamlit as st
+
+from db_config import engine
+
+# ----------------------------------------------------------------------
+# 🚦 Concurrent reads for the dashboard loaders
+# ----------------------------------------------------------------------
+# Independent SELECTs are submitted together to a small thread pool, each on
+# its own pooled connection from db_config.engine, and collected once all of
+# them are done, so a loader waits for its slowest query instead of the sum.
+# Every query has a time budget, counted from when it starts running (time
+# spent queued behind other queries doesn't count): MySQL aborts it
+# server-side (MAX_EXECUTION_TIME, where supported) and the caller stops
+# waiting for it.
+#
+# A failed or timed-out query raises QueryError instead of coming back empty,
+# so the st.cache_resource loaders above run_queries never cache a failure.
+
+QUERY_TIMEOUT = 60  # seconds per query
+# db_config.engine pools 5 connections + 10 overflow
+MAX_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dashboard-sql")
+
+
+class QueryError(Exception):
+    """One or more run_queries reads failed or timed out; failures maps name -> reason."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        super().__init__("; ".join(f"{name}: {reason}" for name, reason in failures.items()))
+
+
+def _statement_timeout(conn, seconds):
+    """Set the session's SELECT time limit (0 = none); False when the server doesn't support it."""
+    try:
+        conn.exec_driver_sql(f"SET SESSION MAX_EXECUTION_TIME = {int(seconds * 1000)}")
+        return True
+    except Exception:
+        return False
+
+
+def _read(query, params, timeout, started, name):
+    started[name] = time.monotonic()
+    with engine.connect() as conn:
+        limited = _statement_timeout(conn, timeout)
+        try:
+            return pd.read_sql(query, conn, params=params)
+        finally:
+            # the connection goes back to the pool: don't leave the limit on it
+            if limited:
+                _statement_timeout(conn, 0)
+
+
+def run_queries(queries, timeout=QUERY_TIMEOUT):
+    """
+    Run independent SELECTs concurrently and return {name: DataFrame}.
+    queries maps a name (used in error messages) to (sql, params). Each query may
+    run for timeout seconds from its start. When any query fails or times out,
+    every failure is reported with st.error and QueryError is raised.
+    """
+    started = {}
+    futures = {
+        name: _executor.submit(_read, query, params, timeout, started, name)
+        for name, (query, params) in queries.items()
+    }
+
+    timed_out = set()
+    while True:
+        now = time.monotonic()
+        timed_out.update(
+            name for name, future in futures.items()
+            if not future.done() and name in started and now - started[name] >= timeout
+        )
+        pending = [f for name, f in futures.items() if not f.done() and name not in timed_out]
+        if not pending:
+            break
+        # wake up at the next deadline of a running query (queued ones: poll)
+        deadlines = [started[name] + timeout for name, f in futures.items() if f in pending and name in started]
+        wait(pending, timeout=max(min(deadlines, default=now + 1) - now, 0.05), return_when=FIRST_COMPLETED)
+
+    results, failures = {}, {}
+    for name, future in futures.items():
+        if name in timed_out:
+            failures[name] = f"timed out after {timeout}s"
+        elif future.exception() is not None:
+            failures[name] = f"database error: {future.exception()}"
+        else:
+            results[name] = future.result()
+    if failures:
+        for name, reason in failures.items():
+            st.error(f"❌ Query for '{name}' failed ({reason}).")
+        raise QueryError(failures)
+    return results
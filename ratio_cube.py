@@ -0,0 +1,259 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from db_config import engine
+from input_store import data_versions
+
+# ----------------------------------------------------------------------
+# 📐 Ratio store: per-depot prefix sums over the day axis
+# ----------------------------------------------------------------------
+# The ratio pages average the daily % columns and total the schedule / driver
+# counts over a day, month, quarter, year or any date range. The store keeps,
+# per depot and column, the running sum of the values and the running count
+# of non-blank values over one shared day axis (plus the running count of
+# days with data), so any window is two lookups per depot: its mean is
+# (sum[end] - sum[start]) / (count[end] - count[start]), for one depot or
+# vectorized across all of them.
+#
+# It is loaded once per STORE_TTL for every depot and shared read-only by
+# all sessions. Depots written through input_store since then (their data
+# version moved) are reloaded alone and only their running sums are
+# recomputed; the axis grows when new days arrive.
+#
+# Both 8 ratios pages (DM and RM) read only from this store: the depot list,
+# the date bounds of the period widgets and every window come from it, with
+# no per-depot / per-window SQL of their own.
+
+RATIO_COLS = [
+    'Pct_Weekly_Off_National_Off', 'Pct_Special_Off_Night_Out_IC_Online', 'Pct_Others',
+    'Pct_Leave_Absent', 'Pct_Sick_Leave', 'Pct_Spot_Absent', 'Pct_Double_Duty', 'Pct_Off_Cancellation'
+]
+COUNT_COLS = ['Planned_Schedules', 'Total_Drivers']
+STORE_COLS = RATIO_COLS + COUNT_COLS
+STORE_TTL = 3600
+
+# period -> pandas frequency of the period starts
+PERIOD_FREQ = {"Daily": "D", "Monthly": "MS", "Quarterly": "QS", "Yearly": "YS"}
+
+
+def load_input_columns(depots=None):
+    """(depot_name, data_date, *STORE_COLS) rows of input_data (every depot when depots is None) as plain tuples."""
+    query = f"SELECT depot_name, data_date, {', '.join(f'`{c}`' for c in STORE_COLS)} FROM input_data"
+    params = ()
+    if depots is not None:
+        query += f" WHERE depot_name IN ({','.join(['%s'] * len(depots))})"
+        params = tuple(depots)
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(query, params).fetchall()
+
+
+def _prefix(values):
+    """Running totals along axis 1 with a leading zero: window [a, b) is p[:, b] - p[:, a]."""
+    shape = list(values.shape)
+    shape[1] = 1
+    return np.concatenate([np.zeros(shape, dtype=values.dtype), np.cumsum(values, axis=1)], axis=1)
+
+
+class RatioCube:
+    """
+    Prefix sums of STORE_COLS per depot over a daily axis from origin. Window
+    queries take inclusive start / end dates; depots without data in a window
+    get 0 days and NaN means.
+    """
+
+    def __init__(self, rows, versions):
+        self._lock = threading.Lock()
+        self.versions = dict(versions)
+        self.depots = []
+        self.origin = None
+        self.values = np.full((0, 0, len(STORE_COLS)), np.nan)
+        self.present = np.zeros((0, 0), dtype=bool)
+        self._put(rows)
+        self._rebuild()
+
+    # ---------------- building ----------------
+    def _put(self, rows, reset_depots=()):
+        """Write rows into the dense depot x day x column grid, growing the axes as needed."""
+        for depot in reset_depots:
+            if depot in self.depots:
+                i = self.depots.index(depot)
+                self.values[i] = np.nan
+                self.present[i] = False
+        if not rows:
+            return
+        cols = list(zip(*rows))
+        depots = np.array(cols[0], dtype=object)
+        days = np.array(cols[1], dtype="datetime64[D]")
+        data = np.array(cols[2:], dtype=float).T
+
+        new_depots = [d for d in pd.unique(depots) if d not in self.depots]
+        first, last = days.min(), days.max()
+        origin = first if self.origin is None else min(self.origin, first)
+        end = last if self.origin is None else max(self.origin + self.present.shape[1] - 1, last)
+        front = 0 if self.origin is None else int((self.origin - origin).astype(int))
+        n_days = int((end - origin).astype(int)) + 1
+        back = n_days - front - self.present.shape[1]
+        if new_depots or front or back:
+            self.values = np.pad(self.values, ((0, len(new_depots)), (front, back), (0, 0)), constant_values=np.nan)
+            self.present = np.pad(self.present, ((0, len(new_depots)), (front, back)), constant_values=False)
+            self.depots = self.depots + new_depots
+            self.origin = origin
+
+        index = {d: i for i, d in enumerate(self.depots)}
+        di = np.array([index[d] for d in depots])
+        ti = (days - self.origin).astype(int)
+        self.values[di, ti] = data
+        self.present[di, ti] = True
+
+    def _rebuild(self, rows=None):
+        """Recompute the running totals (all depots, or only the given depot rows)."""
+        if rows is None or self.sums.shape[:2] != (len(self.depots), self.present.shape[1] + 1):
+            self.sums = _prefix(np.nan_to_num(self.values))
+            self.counts = _prefix((~np.isnan(self.values)).astype(np.int32))
+            self.days = _prefix(self.present.astype(np.int32))
+            return
+        self.sums[rows] = _prefix(np.nan_to_num(self.values[rows]))
+        self.counts[rows] = _prefix((~np.isnan(self.values[rows])).astype(np.int32))
+        self.days[rows] = _prefix(self.present[rows].astype(np.int32))
+
+    def refresh(self):
+        """Reload the depots written through input_store since they were loaded (a no-op when none were)."""
+        versions = data_versions()
+        stale = sorted(d for d, v in versions.items() if self.versions.get(d) != v)
+        if not stale:
+            return
+        rows = load_input_columns(stale)
+        with self._lock:
+            self._put(rows, reset_depots=stale)
+            self._rebuild([self.depots.index(d) for d in stale if d in self.depots])
+            self.versions.update({d: versions[d] for d in stale})
+
+    # ---------------- queries ----------------
+    def depots_with_data(self):
+        """Depots with at least one day of data, in store order (depots never leave self.depots)."""
+        with self._lock:
+            return [d for d, has in zip(self.depots, self.present.any(axis=1)) if has]
+
+    def bounds(self, depots=None):
+        """(first, last) date with data for depots (every depot when None) as Timestamps, None when there is none."""
+        with self._lock:
+            days = np.nonzero(self._present(depots).any(axis=0))[0]
+            if days.size == 0:
+                return None
+            return pd.Timestamp(self.origin + days[0]), pd.Timestamp(self.origin + days[-1])
+
+    def years(self, depots=None):
+        """Years with data for depots (every depot when None), ascending."""
+        with self._lock:
+            days = np.nonzero(self._present(depots).any(axis=0))[0]
+            return sorted(set(pd.DatetimeIndex(self.origin + days).year)) if days.size else []
+
+    def _rows(self, depots):
+        """(grid rows, found mask) for depots; unknown depots map to row 0 and are masked out."""
+        index = {d: i for i, d in enumerate(self.depots)}
+        found = np.array([d in index for d in depots], dtype=bool)
+        return np.array([index.get(d, 0) for d in depots], dtype=int), found
+
+    def _present(self, depots):
+        if depots is None:
+            return self.present
+        rows, found = self._rows(depots)
+        return self.present[rows[found]]
+
+    def _positions(self, dates):
+        """Prefix positions of dates on the axis, clipped to it."""
+        if self.origin is None:
+            return np.zeros(len(dates), dtype=int)
+        offsets = (np.asarray(dates, dtype="datetime64[D]") - self.origin).astype(int)
+        return np.clip(offsets, 0, self.present.shape[1])
+
+    def windows(self, depots, starts, ends):
+        """
+        (days, sums, counts) of depots over each [starts[k], ends[k]] window:
+        days is depots x windows, sums and counts depots x windows x STORE_COLS.
+        """
+        starts = pd.DatetimeIndex(starts)
+        ends = pd.DatetimeIndex(ends)
+        with self._lock:
+            a = self._positions(starts)
+            b = self._positions(ends + pd.Timedelta(days=1))
+            if not self.depots:
+                shape = (len(depots), len(a))
+                return np.zeros(shape, int), np.zeros(shape + (len(STORE_COLS),)), np.zeros(shape + (len(STORE_COLS),), int)
+            rows, found = self._rows(depots)
+            days = (self.days[rows][:, b] - self.days[rows][:, a]) * found[:, None]
+            sums = (self.sums[rows][:, b] - self.sums[rows][:, a]) * found[:, None, None]
+            counts = (self.counts[rows][:, b] - self.counts[rows][:, a]) * found[:, None, None]
+        return days, sums, counts
+
+    def totals(self, start, end, depots=None):
+        """
+        One row per depot (every depot when None) over [start, end]: "days" with
+        data, the sum of each count column and the mean of each ratio column
+        (over its non-blank days, NaN when there are none).
+        """
+        depots = list(self.depots) if depots is None else list(depots)
+        days, sums, counts = self.windows(depots, [pd.Timestamp(start)], [pd.Timestamp(end)])
+        return self._frame(days[:, 0], sums[:, 0], counts[:, 0], pd.Index(depots, name="Depot"))
+
+    def periods(self, depots, start, end, period):
+        """
+        Per depot and period ("Daily", "Monthly", "Quarterly", "Yearly") within
+        [start, end]: Depot, Date (the period start), days, sums and means as in
+        totals. Periods without data are left out.
+        """
+        start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        freq = PERIOD_FREQ[period]
+        labels = pd.date_range(start, end, freq=freq)
+        if len(labels) == 0 or labels[0] != start:
+            # the first period starts before start (e.g. mid-month): label it by its own start
+            labels = pd.DatetimeIndex([start.to_period(freq.rstrip("S")).start_time]).append(labels)
+        starts = labels.where(labels >= start, start)
+        ends = labels[1:].append(pd.DatetimeIndex([end + pd.Timedelta(days=1)])) - pd.Timedelta(days=1)
+
+        depots = list(depots)
+        days, sums, counts = self.windows(depots, starts, ends)
+        index = pd.MultiIndex.from_product([depots, labels], names=["Depot", "Date"])
+        n = len(depots) * len(labels)
+        frame = self._frame(days.reshape(n), sums.reshape(n, -1), counts.reshape(n, -1), index)
+        return frame[frame["days"] > 0].reset_index()
+
+    @staticmethod
+    def _frame(days, sums, counts, index):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.where(counts > 0, sums / np.where(counts > 0, counts, 1), np.nan)
+        n_ratio = len(RATIO_COLS)
+        frame = pd.DataFrame(means[:, :n_ratio], index=index, columns=RATIO_COLS)
+        frame[COUNT_COLS] = sums[:, n_ratio:]
+        frame.insert(0, "days", days)
+        return frame
+
+
+@st.cache_resource(show_spinner="Building ratio store …", ttl=STORE_TTL)
+def _ratio_cube():
+    # versions first: a write landing during the load is picked up by the next refresh
+    versions = data_versions()
+    return RatioCube(load_input_columns(), versions)
+
+
+def ratio_cube():
+    """The shared RatioCube, with depots saved since it was built reloaded."""
+    cube = _ratio_cube()
+    cube.refresh()
+    return cube
+
+
+def period_window(period, day=None, year=None, month=None, quarter=None):
+    """(start, end) Timestamps of a Daily / Monthly / Quarterly / Yearly selection."""
+    if period == "Daily":
+        return pd.Timestamp(day), pd.Timestamp(day)
+    if period == "Monthly":
+        start = pd.Timestamp(year=int(year), month=int(month), day=1)
+        return start, start + pd.offsets.MonthEnd(1)
+    if period == "Quarterly":
+        start = pd.Timestamp(year=int(year), month=3 * (int(quarter) - 1) + 1, day=1)
+        return start, start + pd.offsets.QuarterEnd(1)
+    return pd.Timestamp(year=int(year), month=1, day=1), pd.Timestamp(year=int(year), month=12, day=31)
@@ -0,0 +1,46 @@
+import html
+import io
+
+import pandas as pd
+
+# ----------------------------------------------------------------------
+# 🖨️ Per-driver scorecard files (run in driver_scorecards' worker processes)
+# ----------------------------------------------------------------------
+# Spawned workers import the module of the function they run. This one only
+# needs pandas, so a worker never imports streamlit, config.json or the DB
+# engine (driver_percentiles / query_runner / db_config).
+
+def card_csv(card, monthly):
+    buf = io.StringIO()
+    pd.Series(card, name="Value").rename_axis("Field").to_frame().to_csv(buf)
+    buf.write("\n")
+    monthly.to_csv(buf, index=False)
+    return buf.getvalue().encode("utf-8")
+
+
+def card_html(card, monthly, title):
+    rows = "".join(
+        f"<tr><th>{html.escape(str(k))}</th><td>{html.escape(str(v))}</td></tr>" for k, v in card.items()
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(title)}</title>"
+        "<style>body{font-family:Arial,sans-serif;margin:24px;}"
+        "table{border-collapse:collapse;margin-bottom:20px;}"
+        "th,td{border:1px solid #ccc;padding:4px 10px;text-align:left;}"
+        "th{background:#f0f2f6;}</style></head><body>"
+        f"<h2>{html.escape(title)}</h2><table>{rows}</table>"
+        "<h3>Monthly</h3>"
+        f"{monthly.to_html(index=False, float_format=lambda v: f'{v:,.2f}')}"
+        "</body></html>"
+    ).encode("utf-8")
+
+
+def render_chunk(fmt, cards):
+    """[(file name, bytes)] for a chunk of (name, title, card dict, monthly frame)."""
+    out = []
+    for name, title, card, monthly in cards:
+        data = card_csv(card, monthly) if fmt == "csv" else card_html(card, monthly, title)
+        out.append((f"{name}.{fmt}", data))
+    return out
+